@@ -0,0 +1,1124 @@
+"""
+Vectorized time series analysis for MCP server.
+
+Aligns many series onto one time grid and scores them together with NumPy,
+so questions like "what changed in the last hour?" are answered from a
+single range query instead of one history call per series.
+"""
+
+import math
+import warnings
+from dataclasses import dataclass, field
+from statistics import NormalDist
+from typing import Any
+
+from .columnar import Series
+
+np: Any
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+ANOMALY_METHODS = ("zscore", "mad", "cusum")
+CORRELATION_METHODS = ("pearson", "spearman")
+FORECAST_METHODS = ("linear", "holt_winters", "seasonal")
+DEFAULT_QUANTILES = (0.5, 0.9, 0.99)
+
+# Scales the median absolute deviation to a standard deviation for normal data
+_MAD_SCALE = 1.4826
+_MEAN_AD_SCALE = 1.2533
+
+# Fewest baseline samples a series needs to be scored
+_MIN_BASELINE_POINTS = 5
+
+# Fewest overlapping samples a candidate needs to be correlated
+MIN_CORRELATION_POINTS = 10
+
+# Fewest samples a series needs to be forecast
+_MIN_FORECAST_POINTS = 5
+
+# Holt-Winters level and trend smoothing tried per series; the seasonal
+# smoothing is fixed
+_HOLT_WINTERS_GRID = ((0.2, 0.05), (0.2, 0.2), (0.5, 0.05), (0.5, 0.2), (0.8, 0.1))
+_HOLT_WINTERS_GAMMA = 0.3
+
+# Forecast points returned per series
+_FORECAST_POINTS = 24
+
+
+def _require_numpy() -> None:
+    """Raise a clear error when the optional NumPy dependency is missing."""
+    if np is None:
+        raise ValueError(
+            "This analysis requires NumPy; install the 'analysis' extra "
+            '(pip install "mcp-prometheus-server[analysis]")'
+        )
+
+
+def align_series(series_list: list[Series], step: float) -> tuple[Any, Any]:
+    """Place samples of many series on one shared time grid.
+
+    Range query results are already step-aligned, so each sample maps to a
+    grid column by rounding; missing samples become NaN.
+
+    Args:
+        series_list: Series to align
+        step: Grid resolution in seconds
+
+    Returns:
+        Tuple of grid timestamps (T,) and values matrix (N, T)
+    """
+    _require_numpy()
+    counts = np.fromiter((len(s) for s in series_list), dtype=np.int64)
+    if not series_list or counts.sum() == 0:
+        return np.empty(0), np.empty((len(series_list), 0))
+
+    timestamps = np.concatenate(
+        [np.frombuffer(s.timestamps, dtype=np.float64) for s in series_list]
+    )
+    values = np.concatenate(
+        [np.frombuffer(s.values, dtype=np.float64) for s in series_list]
+    )
+
+    origin = timestamps.min()
+    columns = np.rint((timestamps - origin) / step).astype(np.int64)
+    rows = np.repeat(np.arange(len(series_list)), counts)
+
+    matrix = np.full((len(series_list), columns.max() + 1), np.nan)
+    matrix[rows, columns] = values
+    grid = origin + np.arange(matrix.shape[1]) * step
+    return grid, matrix
+
+
+@dataclass
+class Anomaly:
+    """One anomalous series and why it was flagged."""
+
+    labels: dict[str, str]
+    score: float
+    scores: dict[str, float] = field(default_factory=dict)
+    change_point: float | None = None
+    baseline_mean: float = 0.0
+    recent_mean: float = 0.0
+
+    @property
+    def direction(self) -> str:
+        """Return "up" or "down" relative to the baseline."""
+        return "up" if self.recent_mean >= self.baseline_mean else "down"
+
+
+@dataclass
+class AnomalyReport:
+    """Ranked anomalies found in one range result."""
+
+    series_count: int
+    scored_count: int
+    anomalies: list[Anomaly]
+
+
+def _robust_divide(numerator: Any, denominator: Any) -> Any:
+    """Divide, mapping x/0 to +-inf (or 0 when x is 0) instead of warning."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        result = numerator / denominator
+        infinite = np.where(numerator == 0, 0.0, np.sign(numerator) * np.inf)
+    return np.where(denominator == 0, infinite, result)
+
+
+def _cusum(z: Any, grid: Any, drift: float, limit: float) -> tuple[Any, Any]:
+    """Run a two-sided tabular CUSUM over standardized values.
+
+    Args:
+        z: Standardized values (N, T); NaN samples add no evidence
+        grid: Timestamps of the columns (T,)
+        drift: Slack subtracted each step, in standard deviations
+        limit: Decision threshold, in standard deviations
+
+    Returns:
+        Peak CUSUM statistic divided by the limit (N,), and the timestamp
+        where each series first crossed the limit, NaN if it never did (N,)
+    """
+    rising = np.where(np.isnan(z), 0.0, z - drift)
+    falling = np.where(np.isnan(z), 0.0, -z - drift)
+
+    upper = np.zeros(z.shape[0])
+    lower = np.zeros(z.shape[0])
+    peak = np.zeros(z.shape[0])
+    change_point = np.full(z.shape[0], np.nan)
+
+    # Loop over time, vectorized across series
+    for column in range(z.shape[1]):
+        upper = np.maximum(0.0, upper + rising[:, column])
+        lower = np.maximum(0.0, lower + falling[:, column])
+        current = np.maximum(upper, lower)
+        peak = np.maximum(peak, current)
+        crossed = (current > limit) & np.isnan(change_point)
+        change_point[crossed] = grid[column]
+
+    return peak / limit, change_point
+
+
+def detect_anomalies(
+    series_list: list[Series],
+    step: float,
+    window: float,
+    methods: tuple[str, ...] = ANOMALY_METHODS,
+    threshold: float = 3.0,
+    cusum_threshold: float = 5.0,
+    cusum_drift: float = 0.5,
+    limit: int = 10,
+) -> AnomalyReport:
+    """Score every series at once and return the most anomalous ones.
+
+    The last ``window`` seconds of each series are compared with everything
+    before it (the baseline):
+
+    - ``zscore``: largest recent deviation in baseline standard deviations
+    - ``mad``: the same using median and median absolute deviation, robust
+      to spikes inside the baseline
+    - ``cusum``: cumulative drift of the recent window, which catches level
+      shifts too small for a single point to stand out, and when they began
+
+    Args:
+        series_list: Series from one range query
+        step: Resolution of the range query in seconds
+        window: Seconds at the end of the range to examine
+        methods: Scoring methods to apply
+        threshold: Score above which zscore and mad flag a series
+        cusum_threshold: CUSUM decision limit in standard deviations
+        cusum_drift: CUSUM slack per step in standard deviations
+        limit: Maximum number of anomalies to return
+
+    Returns:
+        Report with anomalies ranked by their strongest normalized score
+
+    Raises:
+        ValueError: If a method is unknown or NumPy is not installed
+    """
+    _require_numpy()
+    unknown = set(methods) - set(ANOMALY_METHODS)
+    if unknown:
+        raise ValueError(f"Unknown anomaly method: {', '.join(sorted(unknown))}")
+
+    grid, matrix = align_series(series_list, step)
+    if matrix.shape[1] == 0:
+        return AnomalyReport(len(series_list), 0, [])
+
+    recent_columns = grid > grid[-1] - window
+    baseline = matrix[:, ~recent_columns]
+    recent = matrix[:, recent_columns]
+
+    baseline_points = np.count_nonzero(~np.isnan(baseline), axis=1)
+    scored = (baseline_points >= _MIN_BASELINE_POINTS) & np.any(
+        ~np.isnan(recent), axis=1
+    )
+
+    with warnings.catch_warnings():
+        # All-NaN rows are expected and excluded via ``scored``
+        warnings.simplefilter("ignore", RuntimeWarning)
+        mean = np.nanmean(baseline, axis=1)
+        std = np.nanstd(baseline, axis=1)
+        median = np.nanmedian(baseline, axis=1)
+        deviation = np.abs(baseline - median[:, None])
+        mad = np.nanmedian(deviation, axis=1) * _MAD_SCALE
+        # Mostly-constant baselines have a MAD of 0; fall back to the mean
+        # absolute deviation so a single change does not score infinity
+        mad = np.where(mad == 0, np.nanmean(deviation, axis=1) * _MEAN_AD_SCALE, mad)
+        recent_mean = np.nanmean(recent, axis=1)
+
+    # Normalized scores: 1.0 means exactly at the method's threshold
+    normalized = {}
+    raw_scores = {}
+    change_points = np.full(matrix.shape[0], np.nan)
+
+    if "zscore" in methods:
+        z = _robust_divide(recent - mean[:, None], std[:, None])
+        raw_scores["zscore"] = _nanmax_abs(z)
+        normalized["zscore"] = raw_scores["zscore"] / threshold
+
+    if "mad" in methods:
+        robust_z = _robust_divide(recent - median[:, None], mad[:, None])
+        raw_scores["mad"] = _nanmax_abs(robust_z)
+        normalized["mad"] = raw_scores["mad"] / threshold
+
+    if "cusum" in methods:
+        z = _robust_divide(recent - mean[:, None], std[:, None])
+        z = np.clip(z, -1e6, 1e6)
+        normalized["cusum"], change_points = _cusum(
+            z, grid[recent_columns], cusum_drift, cusum_threshold
+        )
+        raw_scores["cusum"] = normalized["cusum"] * cusum_threshold
+
+    combined = np.max(np.vstack(list(normalized.values())), axis=0)
+    combined = np.where(scored, combined, 0.0)
+
+    flagged = np.flatnonzero(combined > 1.0)
+    ranked = flagged[np.argsort(-combined[flagged], kind="stable")][:limit]
+
+    anomalies = [
+        Anomaly(
+            labels=series_list[index].labels,
+            score=float(combined[index]),
+            scores={name: float(values[index]) for name, values in raw_scores.items()},
+            change_point=(
+                None if np.isnan(change_points[index]) else float(change_points[index])
+            ),
+            baseline_mean=float(mean[index]),
+            recent_mean=float(recent_mean[index]),
+        )
+        for index in ranked
+    ]
+    return AnomalyReport(len(series_list), int(scored.sum()), anomalies)
+
+
+def _nanmax_abs(values: Any) -> Any:
+    """Return the largest absolute value per row, ignoring NaN."""
+    magnitudes = np.where(np.isnan(values), -np.inf, np.abs(values))
+    return np.maximum(magnitudes.max(axis=1, initial=-np.inf), 0.0)
+
+
+@dataclass
+class Correlation:
+    """How closely one candidate series followed the target."""
+
+    index: int
+    labels: dict[str, str]
+    coefficient: float
+    lag: float
+    coefficient_at_zero: float
+    points: int
+
+
+@dataclass
+class CorrelationReport:
+    """Candidates ranked by the strength of their correlation."""
+
+    method: str
+    candidate_count: int
+    scored_count: int
+    correlations: list[Correlation]
+
+
+def rank_rows(matrix: Any) -> Any:
+    """Replace each row's values by their ranks, averaging ties.
+
+    Args:
+        matrix: Values (N, T); NaN samples are not ranked
+
+    Returns:
+        Ranks starting at 1 (N, T), NaN where the input was NaN
+    """
+    _require_numpy()
+    rows, columns = matrix.shape
+    # NaN sorts last, so valid samples of every row come first
+    order = np.argsort(matrix, axis=1, kind="stable")
+    ordered = np.take_along_axis(matrix, order, axis=1)
+    positions = np.broadcast_to(np.arange(columns), (rows, columns))
+
+    starts = np.ones((rows, columns), dtype=bool)
+    starts[:, 1:] = ordered[:, 1:] != ordered[:, :-1]
+    ends = np.ones((rows, columns), dtype=bool)
+    ends[:, :-1] = starts[:, 1:]
+    first = np.maximum.accumulate(np.where(starts, positions, 0), axis=1)
+    ends_at = np.where(ends, positions, columns)
+    last = np.minimum.accumulate(ends_at[:, ::-1], axis=1)[:, ::-1]
+
+    ranks = np.empty((rows, columns))
+    np.put_along_axis(ranks, order, (first + last) / 2 + 1, axis=1)
+    ranks[np.isnan(matrix)] = np.nan
+    return ranks
+
+
+def _pearson_rows(x: Any, matrix: Any) -> tuple[Any, Any]:
+    """Correlate one series with every row over their shared samples.
+
+    Args:
+        x: Target values (T,)
+        matrix: Candidate values (N, T)
+
+    Returns:
+        Pearson coefficient per row (N,), NaN where undefined, and the
+        number of samples both series have (N,)
+    """
+    valid = ~np.isnan(matrix) & ~np.isnan(x)[None, :]
+    points = valid.sum(axis=1)
+    count = np.maximum(points, 1)
+    xs = np.where(valid, x[None, :], 0.0)
+    ys = np.where(valid, matrix, 0.0)
+
+    # Center on the means of the shared samples before multiplying
+    xc = np.where(valid, xs - (xs.sum(axis=1) / count)[:, None], 0.0)
+    yc = np.where(valid, ys - (ys.sum(axis=1) / count)[:, None], 0.0)
+    covariance = (xc * yc).sum(axis=1)
+    scale = np.sqrt((xc * xc).sum(axis=1) * (yc * yc).sum(axis=1))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        coefficient = np.where(scale > 0, covariance / scale, np.nan)
+    return np.clip(coefficient, -1.0, 1.0), points
+
+
+def correlate(
+    target: Series,
+    candidates: list[Series],
+    step: float,
+    method: str = "pearson",
+    max_lag: float = 0.0,
+    min_points: int = MIN_CORRELATION_POINTS,
+    limit: int = 10,
+) -> CorrelationReport:
+    """Rank candidate series by how closely they move with a target.
+
+    All series are aligned onto one grid and every candidate is correlated
+    with the target at once. With ``max_lag``, the candidates are also
+    shifted against the target by up to that many seconds either way, and
+    each one is scored at the lag where it correlates most strongly; a
+    positive lag means the candidate moves after the target.
+
+    Args:
+        target: Series the candidates are compared with
+        candidates: Series from the candidate queries
+        step: Resolution of the range queries in seconds
+        method: "pearson" for linear correlation, "spearman" for rank
+            correlation, which also catches monotonic non-linear relations
+        max_lag: Largest shift to try in seconds
+        min_points: Fewest shared samples a candidate needs at a lag
+        limit: Maximum number of candidates to return
+
+    Returns:
+        Report with candidates ranked by absolute coefficient
+
+    Raises:
+        ValueError: If the method is unknown or NumPy is not installed
+    """
+    _require_numpy()
+    if method not in CORRELATION_METHODS:
+        raise ValueError(f"Unknown correlation method: {method}")
+
+    empty = CorrelationReport(method, len(candidates), 0, [])
+    _, matrix = align_series([target, *candidates], step)
+    if matrix.shape[1] == 0 or not candidates:
+        return empty
+
+    if method == "spearman":
+        matrix = rank_rows(matrix)
+    x, others = matrix[0], matrix[1:]
+    columns = matrix.shape[1]
+    lags = int(max_lag // step) if step > 0 else 0
+    lags = min(lags, columns - 1)
+
+    best = np.full(len(candidates), np.nan)
+    best_lag = np.zeros(len(candidates), dtype=np.int64)
+    best_points = np.zeros(len(candidates), dtype=np.int64)
+    at_zero = np.full(len(candidates), np.nan)
+
+    # Loop over lags, vectorized across candidates
+    for lag in range(-lags, lags + 1):
+        if lag >= 0:
+            shifted_x, shifted = x[: columns - lag], others[:, lag:]
+        else:
+            shifted_x, shifted = x[-lag:], others[:, : columns + lag]
+        coefficient, points = _pearson_rows(shifted_x, shifted)
+        coefficient = np.where(points >= min_points, coefficient, np.nan)
+        if lag == 0:
+            at_zero = coefficient
+
+        stronger = ~np.isnan(coefficient) & (
+            np.isnan(best) | (np.abs(coefficient) > np.abs(best))
+        )
+        best = np.where(stronger, coefficient, best)
+        best_lag = np.where(stronger, lag, best_lag)
+        best_points = np.where(stronger, points, best_points)
+
+    scored = np.flatnonzero(~np.isnan(best))
+    ranked = scored[np.argsort(-np.abs(best[scored]), kind="stable")][:limit]
+    correlations = [
+        Correlation(
+            index=int(index),
+            labels=candidates[index].labels,
+            coefficient=float(best[index]),
+            lag=float(best_lag[index] * step),
+            coefficient_at_zero=float(at_zero[index]),
+            points=int(best_points[index]),
+        )
+        for index in ranked
+    ]
+    return CorrelationReport(method, len(candidates), len(scored), correlations)
+
+
+@dataclass
+class Forecast:
+    """Forecast of one series over the horizon."""
+
+    labels: dict[str, str]
+    last_value: float
+    value: float
+    lower: float
+    upper: float
+    time_to_threshold: float | None = None
+    earliest_time_to_threshold: float | None = None
+    points: list[tuple[float, float, float, float]] = field(default_factory=list)
+
+
+@dataclass
+class ForecastReport:
+    """Forecasts of the series of one range result."""
+
+    method: str
+    series_count: int
+    fitted_count: int
+    forecasts: list[Forecast]
+
+
+def _fill_gaps(matrix: Any) -> Any:
+    """Carry the last sample over gaps; leading gaps take the first sample."""
+    valid = ~np.isnan(matrix)
+    rows = np.arange(matrix.shape[0])[:, None]
+    last = np.maximum.accumulate(np.where(valid, np.arange(matrix.shape[1]), 0), axis=1)
+    filled = matrix[rows, last]
+    first = matrix[rows[:, 0], np.argmax(valid, axis=1)]
+    return np.where(np.isnan(filled), first[:, None], filled)
+
+
+def _linear_forecast(matrix: Any, step: float, steps: int) -> tuple[Any, Any, Any]:
+    """Fit a least-squares line per row and extend it.
+
+    Returns:
+        Forecast (N, H), standard error of each forecast point (N, H) and
+        rows that could be fitted (N,)
+    """
+    x = (np.arange(matrix.shape[1]) - (matrix.shape[1] - 1)) * step
+    valid = ~np.isnan(matrix)
+    points = valid.sum(axis=1)
+    count = np.maximum(points, 1)
+    xs = np.where(valid, x[None, :], 0.0)
+    ys = np.where(valid, matrix, 0.0)
+    x_mean = xs.sum(axis=1) / count
+    y_mean = ys.sum(axis=1) / count
+    xc = np.where(valid, xs - x_mean[:, None], 0.0)
+    yc = np.where(valid, ys - y_mean[:, None], 0.0)
+    sxx = (xc * xc).sum(axis=1)
+
+    fitted = (points >= _MIN_FORECAST_POINTS) & (sxx > 0)
+    safe_sxx = np.where(fitted, sxx, 1.0)
+    slope = np.where(fitted, (xc * yc).sum(axis=1) / safe_sxx, 0.0)
+    residuals = np.where(valid, yc - slope[:, None] * xc, 0.0)
+    sigma = np.sqrt((residuals * residuals).sum(axis=1) / np.maximum(points - 2, 1))
+
+    future = np.arange(1, steps + 1) * step
+    offset = future[None, :] - x_mean[:, None]
+    predicted = y_mean[:, None] + slope[:, None] * offset
+    error = sigma[:, None] * np.sqrt(
+        1 + 1 / count[:, None] + offset * offset / safe_sxx[:, None]
+    )
+    return predicted, error, fitted
+
+
+def _holt_winters_pass(
+    y: Any, season: int, alpha: float, beta: float, gamma: float
+) -> tuple[Any, Any, Any, Any]:
+    """Run additive Holt-Winters smoothing over every row at once.
+
+    Returns:
+        Final level (N,), trend (N,) and seasonal components (N, m), and
+        the mean squared one-step error per row (N,)
+    """
+    columns = y.shape[1]
+    if season:
+        first = y[:, :season].mean(axis=1)
+        level = first
+        trend = (y[:, season : 2 * season].mean(axis=1) - first) / season
+        seasonal = y[:, :season] - first[:, None]
+        start = season
+    else:
+        level = y[:, 0]
+        trend = y[:, 1] - y[:, 0]
+        seasonal = np.zeros((y.shape[0], 1))
+        start = 1
+
+    # Loop over time, vectorized across series
+    squared = np.zeros(y.shape[0])
+    for t in range(start, columns):
+        slot = t % season if season else 0
+        component = seasonal[:, slot]
+        error = y[:, t] - (level + trend + component)
+        squared += error * error
+        previous = level
+        level = alpha * (y[:, t] - component) + (1 - alpha) * (level + trend)
+        trend = beta * (level - previous) + (1 - beta) * trend
+        if season:
+            seasonal[:, slot] = gamma * (y[:, t] - level) + (1 - gamma) * component
+    return level, trend, seasonal, squared / max(columns - start, 1)
+
+
+def _holt_winters_forecast(
+    matrix: Any, season: int, steps: int
+) -> tuple[Any, Any, Any]:
+    """Forecast with additive Holt-Winters, smoothing chosen per row.
+
+    Without a season this is Holt's linear trend method. Each row keeps
+    the smoothing parameters from a small grid with the lowest one-step
+    error.
+
+    Returns:
+        Forecast (N, H), standard error of each forecast point (N, H) and
+        rows that could be fitted (N,)
+    """
+    rows, columns = matrix.shape
+    points = (~np.isnan(matrix)).sum(axis=1)
+    fitted = points >= max(_MIN_FORECAST_POINTS, 2 * season)
+    if columns < max(2, 2 * season):
+        return np.zeros((rows, steps)), np.zeros((rows, steps)), np.zeros(rows, bool)
+
+    y = _fill_gaps(matrix)
+    y = np.where(np.isnan(y), 0.0, y)
+    horizon = np.arange(1, steps + 1)
+    slots = (columns - 1 + horizon) % season if season else np.zeros(steps, int)
+    gamma = _HOLT_WINTERS_GAMMA if season else 0.0
+
+    best_error = np.full(rows, np.inf)
+    predicted = np.zeros((rows, steps))
+    spread = np.zeros((rows, steps))
+    for alpha, beta in _HOLT_WINTERS_GRID:
+        level, trend, seasonal, mse = _holt_winters_pass(y, season, alpha, beta, gamma)
+        better = mse < best_error
+        best_error = np.where(better, mse, best_error)
+        candidate = level[:, None] + horizon * trend[:, None] + seasonal[:, slots]
+        predicted = np.where(better[:, None], candidate, predicted)
+
+        # Variance of the h-step error relative to the one-step error
+        lags = np.arange(1, steps)
+        weights = alpha * (1 + lags * beta)
+        if season:
+            weights = weights + gamma * (lags % season == 0)
+        growth = np.sqrt(1 + np.concatenate([[0.0], np.cumsum(weights * weights)]))
+        spread = np.where(better[:, None], growth[None, :], spread)
+
+    error = np.sqrt(best_error)[:, None] * spread
+    return predicted, error, fitted
+
+
+def _seasonal_forecast(matrix: Any, season: int, steps: int) -> tuple[Any, Any, Any]:
+    """Repeat the last season, with errors from season-over-season changes.
+
+    Returns:
+        Forecast (N, H), standard error of each forecast point (N, H) and
+        rows that could be fitted (N,)
+    """
+    rows, columns = matrix.shape
+    if columns <= season:
+        return np.zeros((rows, steps)), np.zeros((rows, steps)), np.zeros(rows, bool)
+
+    y = _fill_gaps(matrix)
+    horizon = np.arange(steps)
+    predicted = y[:, columns - season + horizon % season]
+
+    changes = matrix[:, season:] - matrix[:, :-season]
+    points = (~np.isnan(changes)).sum(axis=1)
+    with warnings.catch_warnings():
+        # Rows without changes are excluded via ``fitted``
+        warnings.simplefilter("ignore", RuntimeWarning)
+        sigma = np.sqrt(np.nanmean(changes * changes, axis=1))
+    seasons_ahead = horizon // season + 1
+    error = sigma[:, None] * np.sqrt(seasons_ahead)[None, :]
+    return predicted, error, points >= _MIN_FORECAST_POINTS
+
+
+def _first_crossing(crossed: Any, step: float) -> Any:
+    """Return seconds until each row first crosses, NaN if it never does."""
+    first = np.argmax(crossed, axis=1)
+    return np.where(crossed.any(axis=1), (first + 1) * step, np.nan)
+
+
+def forecast(
+    series_list: list[Series],
+    step: float,
+    horizon: float,
+    method: str = "linear",
+    season: float | None = None,
+    threshold: float | None = None,
+    confidence: float = 0.95,
+    limit: int = 10,
+) -> ForecastReport:
+    """Forecast every series at once and estimate when they cross a threshold.
+
+    - ``linear``: least-squares trend line, for steady growth such as disks
+      filling up
+    - ``holt_winters``: additive exponential smoothing of level, trend and,
+      given a season, the seasonal pattern; the smoothing is picked per
+      series from a small grid by one-step error
+    - ``seasonal``: repeats the last season, a baseline for daily or weekly
+      patterns without trend
+
+    Confidence bands assume normally distributed errors: prediction
+    intervals for the linear fit, the growth of the one-step error for
+    Holt-Winters and season-over-season changes for the seasonal baseline.
+
+    Args:
+        series_list: Series from one range query
+        step: Resolution of the range query in seconds
+        horizon: Seconds to forecast past the last sample
+        method: Forecasting method
+        season: Length of the seasonal pattern in seconds; required for
+            ``seasonal``, optional for ``holt_winters``
+        threshold: Value whose crossing time is estimated
+        confidence: Coverage of the confidence band, between 0 and 1
+        limit: Maximum number of forecasts to return
+
+    Returns:
+        Report with the series that cross the threshold soonest first, or
+        in result order without a threshold
+
+    Raises:
+        ValueError: If the method is unknown, the horizon, season or
+            confidence is invalid, or NumPy is not installed
+    """
+    _require_numpy()
+    if method not in FORECAST_METHODS:
+        raise ValueError(f"Unknown forecast method: {method}")
+    if horizon < step:
+        raise ValueError("Forecast horizon must be at least one step")
+    if not 0 < confidence < 1:
+        raise ValueError("Confidence must be between 0 and 1")
+    season_steps = round(season / step) if season else 0
+    if method == "seasonal" and not season_steps:
+        raise ValueError("The seasonal method requires a season")
+    if season and season_steps < 2:
+        raise ValueError("Season must be at least two steps long")
+
+    grid, matrix = align_series(series_list, step)
+    if matrix.shape[1] == 0:
+        return ForecastReport(method, len(series_list), 0, [])
+
+    steps = int(horizon // step)
+    if method == "linear":
+        predicted, error, fitted = _linear_forecast(matrix, step, steps)
+    elif method == "holt_winters":
+        predicted, error, fitted = _holt_winters_forecast(matrix, season_steps, steps)
+    else:
+        predicted, error, fitted = _seasonal_forecast(matrix, season_steps, steps)
+
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    lower = predicted - z * error
+    upper = predicted + z * error
+    last = _fill_gaps(matrix)[:, -1]
+
+    eta = earliest = np.full(matrix.shape[0], np.nan)
+    order = np.flatnonzero(fitted)
+    if threshold is not None:
+        rising = (last < threshold)[:, None]
+        eta = _first_crossing(
+            np.where(rising, predicted >= threshold, predicted <= threshold), step
+        )
+        earliest = _first_crossing(
+            np.where(rising, upper >= threshold, lower <= threshold), step
+        )
+        soonest = np.where(np.isnan(earliest), np.inf, earliest)
+        soonest = np.where(np.isnan(eta), soonest, np.minimum(soonest, eta))
+        order = order[np.argsort(soonest[order], kind="stable")]
+
+    sampled = np.unique(np.linspace(0, steps - 1, min(steps, _FORECAST_POINTS)).round())
+    sampled = sampled.astype(np.int64)
+    times = grid[-1] + (sampled + 1) * step
+
+    forecasts = [
+        Forecast(
+            labels=series_list[index].labels,
+            last_value=float(last[index]),
+            value=float(predicted[index, -1]),
+            lower=float(lower[index, -1]),
+            upper=float(upper[index, -1]),
+            time_to_threshold=None if np.isnan(eta[index]) else float(eta[index]),
+            earliest_time_to_threshold=(
+                None if np.isnan(earliest[index]) else float(earliest[index])
+            ),
+            points=[
+                (
+                    float(timestamp),
+                    float(predicted[index, column]),
+                    float(lower[index, column]),
+                    float(upper[index, column]),
+                )
+                for timestamp, column in zip(times, sampled, strict=True)
+            ],
+        )
+        for index in order[:limit]
+    ]
+    return ForecastReport(method, len(series_list), int(fitted.sum()), forecasts)
+
+
+@dataclass
+class HistogramMatrix:
+    """Bucket rates of histograms, per group and timestamp.
+
+    Classic and native histograms share this form: every group has a rate
+    per bucket (not cumulative) at every grid timestamp, with NaN where a
+    sample is missing.
+    """
+
+    native: bool
+    groups: list[dict[str, str]]
+    grid: Any
+    lower: Any
+    upper: Any
+    counts: Any
+    totals: Any
+    sums: Any
+
+
+@dataclass
+class HistogramSummary:
+    """Quantiles and mean of one histogram group."""
+
+    labels: dict[str, str]
+    rate: float
+    quantiles: dict[float, float]
+    window_quantiles: dict[float, float]
+    mean: float
+    window_mean: float
+    quantile_series: dict[float, list[float]] = field(default_factory=dict)
+    heatmap: list[list[float]] = field(default_factory=list)
+
+
+@dataclass
+class HistogramReport:
+    """Summaries of the histogram groups of one query."""
+
+    native: bool
+    group_count: int
+    timestamps: list[float]
+    buckets: list[tuple[float, float]]
+    summaries: list[HistogramSummary]
+
+
+def _quantile_bounds(quantiles: Any, shape: tuple[int, ...]) -> Any:
+    """Return -Inf/+Inf for quantiles below 0 or above 1, and 0 otherwise."""
+    bounds = np.where(quantiles < 0, -np.inf, np.where(quantiles > 1, np.inf, 0.0))
+    return np.broadcast_to(
+        bounds.reshape(-1, *([1] * len(shape))), (len(quantiles), *shape)
+    )
+
+
+def bucket_quantiles(upper: Any, cumulative: Any, quantiles: Any) -> Any:
+    """Interpolate quantiles from classic cumulative buckets.
+
+    Follows Prometheus' ``histogram_quantile``: the rank is located in the
+    first bucket whose cumulative count reaches it and interpolated
+    linearly within that bucket, taking 0 as the lower bound of the first
+    bucket. Ranks in the +Inf bucket return the highest finite bound.
+
+    Args:
+        upper: Ascending upper bounds (B,), the last one +Inf
+        cumulative: Cumulative counts (..., B)
+        quantiles: Quantiles to compute (Q,)
+
+    Returns:
+        Quantile values (Q, ...), NaN where they are undefined
+    """
+    _require_numpy()
+    quantiles = np.asarray(quantiles, dtype=np.float64)
+    shape = cumulative.shape[:-1]
+    buckets = len(upper)
+    if buckets < 2 or upper[-1] != np.inf:
+        return np.full((len(quantiles), *shape), np.nan)
+
+    # Missing buckets take the count below them, and counts are made
+    # monotonic to absorb rate() precision issues
+    cumulative = np.fmax.accumulate(cumulative, axis=-1)
+    total = cumulative[..., -1]
+
+    rank = quantiles.reshape(-1, *([1] * len(shape))) * total
+    index = np.minimum((cumulative < rank[..., None]).sum(axis=-1), buckets - 1)
+    below = np.where(index > 0, np.take(upper, index - 1), 0.0)
+    previous = np.where(
+        index > 0,
+        np.take_along_axis(
+            np.broadcast_to(cumulative, (len(quantiles), *cumulative.shape)),
+            np.maximum(index - 1, 0)[..., None],
+            axis=-1,
+        )[..., 0],
+        0.0,
+    )
+    reached = np.take_along_axis(
+        np.broadcast_to(cumulative, (len(quantiles), *cumulative.shape)),
+        index[..., None],
+        axis=-1,
+    )[..., 0]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fraction = (rank - previous) / (reached - previous)
+    bound = np.take(upper, index)
+    values = below + (bound - below) * fraction
+    values = np.where((index == 0) & (upper[0] <= 0), upper[0], values)
+    values = np.where(index == buckets - 1, upper[-2], values)
+    values = np.where((total > 0) & ~np.isnan(total), values, np.nan)
+
+    bounds = _quantile_bounds(quantiles, shape)
+    return np.where(bounds != 0, bounds, np.where(np.isnan(rank), np.nan, values))
+
+
+def native_quantiles(lower: Any, upper: Any, counts: Any, quantiles: Any) -> Any:
+    """Interpolate quantiles from native histogram buckets.
+
+    Follows Prometheus' ``histogram_quantile`` for native histograms:
+    buckets are scanned in order, skipping empty ones, and the rank is
+    interpolated exponentially within exponential buckets and linearly
+    within the zero bucket, whose far bound is taken as 0 when the
+    histogram only has buckets on the other side.
+
+    Args:
+        lower: Lower bounds (B,), ascending
+        upper: Upper bounds (B,)
+        counts: Bucket counts (..., B), not cumulative
+        quantiles: Quantiles to compute (Q,)
+
+    Returns:
+        Quantile values (Q, ...), NaN where they are undefined
+    """
+    _require_numpy()
+    quantiles = np.asarray(quantiles, dtype=np.float64)
+    shape = counts.shape[:-1]
+    if counts.shape[-1] == 0:
+        return np.full((len(quantiles), *shape), np.nan)
+
+    counts = np.where(np.isnan(counts), 0.0, counts)
+    cumulative = np.cumsum(counts, axis=-1)
+    total = cumulative[..., -1]
+    occupied = counts > 0
+    zero_bucket = (lower < 0) & (upper > 0)
+    negative = (occupied & (upper <= 0) & ~zero_bucket).any(axis=-1)
+    positive = (occupied & (lower >= 0) & ~zero_bucket).any(axis=-1)
+    last = counts.shape[-1] - 1 - np.argmax(occupied[..., ::-1], axis=-1)
+
+    rank = quantiles.reshape(-1, *([1] * len(shape))) * total
+    found = (cumulative >= rank[..., None]) & occupied
+    index = np.where(found.any(axis=-1), np.argmax(found, axis=-1), last)
+
+    def gather(values: Any) -> Any:
+        expanded = np.broadcast_to(values, (len(quantiles), *values.shape))
+        return np.take_along_axis(expanded, index[..., None], axis=-1)[..., 0]
+
+    low = np.take(lower, index)
+    high = np.take(upper, index)
+    in_zero = (low < 0) & (high > 0)
+    low = np.where(in_zero & positive & ~negative, 0.0, low)
+    high = np.where(in_zero & negative & ~positive, 0.0, high)
+
+    count = gather(counts)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fraction = (rank - (gather(cumulative) - count)) / count
+        linear = low + (high - low) * fraction
+        log_low = np.log2(np.abs(low))
+        log_high = np.log2(np.abs(high))
+        exponential = np.where(
+            low > 0,
+            np.exp2(log_low + (log_high - log_low) * fraction),
+            -np.exp2(log_high + (log_low - log_high) * (1 - fraction)),
+        )
+    values = np.where((low <= 0) & (high >= 0), linear, exponential)
+    values = np.where(found.any(axis=-1), values, high)
+    values = np.where(total > 0, values, np.nan)
+
+    bounds = _quantile_bounds(quantiles, shape)
+    return np.where(bounds != 0, bounds, np.where(np.isnan(rank), np.nan, values))
+
+
+def histogram_from_buckets(
+    buckets: list[Series],
+    sums: list[Series],
+    counts: list[Series],
+    step: float,
+) -> HistogramMatrix:
+    """Arrange classic ``_bucket`` rate series into a bucket matrix.
+
+    Args:
+        buckets: Series with an ``le`` label, summed by ``le`` and grouping
+            labels
+        sums: ``_sum`` rate series per group
+        counts: ``_count`` rate series per group
+        step: Resolution of the range queries in seconds
+
+    Returns:
+        Bucket matrix; observation totals and sums come from the ``_count``
+        and ``_sum`` series
+    """
+    _require_numpy()
+    buckets = [series for series in buckets if "le" in series.labels]
+    grid, matrix = align_series([*buckets, *sums, *counts], step)
+    groups: dict[tuple[tuple[str, str], ...], int] = {}
+    bounds = sorted({float(series.labels["le"]) for series in buckets})
+    columns = {bound: index for index, bound in enumerate(bounds)}
+
+    rows = []
+    for series in buckets:
+        key = tuple(sorted((k, v) for k, v in series.labels.items() if k != "le"))
+        rows.append(
+            (groups.setdefault(key, len(groups)), columns[float(series.labels["le"])])
+        )
+
+    cumulative = np.full((len(groups), matrix.shape[1], len(bounds)), np.nan)
+    for position, (group, column) in enumerate(rows):
+        cumulative[group, :, column] = matrix[position]
+    cumulative = np.fmax.accumulate(cumulative, axis=-1)
+    rates = np.diff(cumulative, axis=-1, prepend=0.0)
+
+    def by_group(series_list: list[Series], offset: int) -> Any:
+        values = np.full((len(groups), matrix.shape[1]), np.nan)
+        for position, series in enumerate(series_list):
+            group = groups.get(tuple(sorted(series.labels.items())))
+            if group is not None:
+                values[group] = matrix[offset + position]
+        return values
+
+    upper = np.array(bounds, dtype=np.float64)
+    lower = np.concatenate([[min(0.0, upper[0]) if len(upper) else 0.0], upper[:-1]])
+    return HistogramMatrix(
+        native=False,
+        groups=[dict(key) for key in groups],
+        grid=grid,
+        lower=lower,
+        upper=upper,
+        counts=rates,
+        totals=by_group(counts, len(buckets) + len(sums)),
+        sums=by_group(sums, len(buckets)),
+    )
+
+
+def histogram_from_native(
+    entries: list[dict[str, Any]], step: float
+) -> HistogramMatrix:
+    """Arrange native histogram samples of a range result into a bucket matrix.
+
+    Buckets differ between samples, so the matrix spans the union of the
+    bucket boundaries seen in the result.
+
+    Args:
+        entries: Matrix result entries with ``histograms`` samples
+        step: Resolution of the range query in seconds
+
+    Returns:
+        Bucket matrix with totals and sums taken from the samples
+    """
+    _require_numpy()
+    entries = [entry for entry in entries if entry.get("histograms")]
+    timestamps = [
+        float(sample[0]) for entry in entries for sample in entry["histograms"]
+    ]
+    bounds = sorted(
+        {
+            (float(bucket[1]), float(bucket[2]))
+            for entry in entries
+            for _, histogram in entry["histograms"]
+            for bucket in histogram.get("buckets", [])
+        }
+    )
+    columns = {bound: index for index, bound in enumerate(bounds)}
+    origin = min(timestamps, default=0.0)
+    width = round((max(timestamps, default=0.0) - origin) / step) + 1
+    if not entries:
+        width = 0
+
+    counts = np.full((len(entries), width, len(bounds)), np.nan)
+    totals = np.full((len(entries), width), np.nan)
+    sums = np.full((len(entries), width), np.nan)
+    for row, entry in enumerate(entries):
+        for timestamp, histogram in entry["histograms"]:
+            column = round((float(timestamp) - origin) / step)
+            counts[row, column] = 0.0
+            totals[row, column] = float(histogram.get("count", "nan"))
+            sums[row, column] = float(histogram.get("sum", "nan"))
+            for bucket in histogram.get("buckets", []):
+                bucket_bounds = (float(bucket[1]), float(bucket[2]))
+                counts[row, column, columns[bucket_bounds]] = float(bucket[3])
+
+    return HistogramMatrix(
+        native=True,
+        groups=[dict(entry.get("metric", {})) for entry in entries],
+        grid=origin + np.arange(width) * step,
+        lower=np.array([bound[0] for bound in bounds], dtype=np.float64),
+        upper=np.array([bound[1] for bound in bounds], dtype=np.float64),
+        counts=counts,
+        totals=totals,
+        sums=sums,
+    )
+
+
+def summarize_histograms(
+    histograms: HistogramMatrix,
+    quantiles: tuple[float, ...] = DEFAULT_QUANTILES,
+    heatmap: bool = False,
+    limit: int = 10,
+) -> HistogramReport:
+    """Compute quantiles and means of every histogram group at once.
+
+    Quantiles are computed at every timestamp and over the whole window,
+    from the bucket rates averaged over it. Groups with the most
+    observations come first.
+
+    Args:
+        histograms: Bucket matrix from one query
+        quantiles: Quantiles to compute, between 0 and 1
+        heatmap: Also return quantiles over time and the bucket rates at
+            every timestamp
+        limit: Maximum number of groups to return
+
+    Returns:
+        Report with one summary per group
+    """
+    _require_numpy()
+    counts = histograms.counts
+    window = np.nanmean(counts, axis=1) if counts.shape[1] else counts[:, :1]
+    if histograms.native:
+        over_time = native_quantiles(
+            histograms.lower, histograms.upper, counts, quantiles
+        )
+        whole = native_quantiles(histograms.lower, histograms.upper, window, quantiles)
+    else:
+        over_time = bucket_quantiles(
+            histograms.upper, np.nancumsum(counts, axis=-1), quantiles
+        )
+        whole = bucket_quantiles(
+            histograms.upper, np.nancumsum(window, axis=-1), quantiles
+        )
+
+    with warnings.catch_warnings(), np.errstate(divide="ignore", invalid="ignore"):
+        # Groups without samples are expected and reported as NaN
+        warnings.simplefilter("ignore", RuntimeWarning)
+        totals, sums = histograms.totals, histograms.sums
+        mean = sums / totals
+        window_total = np.nansum(totals, axis=1)
+        window_mean = np.nansum(sums, axis=1) / window_total
+        rate = np.nanmean(totals, axis=1)
+
+    observed = np.where(np.isnan(rate), -np.inf, rate)
+    order = np.argsort(-observed, kind="stable")[:limit]
+    last = counts.shape[1] - 1
+    summaries = []
+    for group in order:
+        summary = HistogramSummary(
+            labels=histograms.groups[group],
+            rate=float(rate[group]),
+            quantiles={
+                q: float(over_time[i, group, last]) if last >= 0 else math.nan
+                for i, q in enumerate(quantiles)
+            },
+            window_quantiles={
+                q: float(whole[i, group]) for i, q in enumerate(quantiles)
+            },
+            mean=float(mean[group, last]) if last >= 0 else math.nan,
+            window_mean=float(window_mean[group]),
+        )
+        if heatmap:
+            summary.quantile_series = {
+                q: over_time[i, group].tolist() for i, q in enumerate(quantiles)
+            }
+            summary.heatmap = counts[group].T.tolist()
+        summaries.append(summary)
+
+    return HistogramReport(
+        native=histograms.native,
+        group_count=len(histograms.groups),
+        timestamps=histograms.grid.tolist(),
+        buckets=list(
+            zip(histograms.lower.tolist(), histograms.upper.tolist(), strict=True)
+        ),
+        summaries=summaries,
+    )
@@ -0,0 +1,180 @@
+"""
+Results cache for MCP server.
+
+Stores Prometheus query results for a short time so repeated and
+pre-evaluated queries are served without another upstream request.
+"""
+
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from typing import Any
+
+
+class ResultsCache:
+    """Size-bounded LRU cache with per-entry expiry."""
+
+    def __init__(self, ttl: float = 15.0, max_entries: int = 256) -> None:
+        """Initialize results cache.
+
+        Args:
+            ttl: Default seconds an entry stays fresh
+            max_entries: Maximum number of entries before evicting the least
+                recently used one
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def __len__(self) -> int:
+        """Return number of cached entries, including expired ones."""
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Any | None:
+        """Get a fresh entry.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            Cached value, or None if missing or expired
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+        """Store an entry.
+
+        Args:
+            key: Cache key
+            value: Value to cache
+            ttl: Seconds the entry stays fresh; defaults to the cache TTL
+        """
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0 or self.max_entries <= 0:
+            return
+
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def resize(self, ttl: float | None = None, max_entries: int | None = None) -> None:
+        """Change the default TTL or size, keeping the entries that still fit.
+
+        Args:
+            ttl: Default seconds new entries stay fresh
+            max_entries: Maximum number of entries; the least recently used
+                entries over it are evicted
+        """
+        if ttl is not None:
+            self.ttl = ttl
+        if max_entries is not None:
+            self.max_entries = max_entries
+            while len(self._entries) > max(max_entries, 0):
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove all entries."""
+        self._entries.clear()
+
+
+class PartitionedCache:
+    """Results caches kept apart per partition, such as per tenant.
+
+    Each partition has its own LRU, so one busy partition cannot evict
+    another's entries, and keys of different partitions never collide.
+    """
+
+    def __init__(
+        self,
+        partition: Callable[[], Hashable],
+        ttl: float = 15.0,
+        max_entries: int = 256,
+    ) -> None:
+        """Initialize partitioned cache.
+
+        Args:
+            partition: Returns the partition of the current caller
+            ttl: Default seconds an entry stays fresh
+            max_entries: Maximum number of entries per partition
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._partition = partition
+        self._caches: dict[Hashable, ResultsCache] = {}
+
+    def __len__(self) -> int:
+        """Return number of cached entries across partitions."""
+        return sum(len(cache) for cache in self._caches.values())
+
+    @property
+    def hits(self) -> int:
+        """Return lookups served from cache across partitions."""
+        return sum(cache.hits for cache in self._caches.values())
+
+    @property
+    def misses(self) -> int:
+        """Return lookups not served from cache across partitions."""
+        return sum(cache.misses for cache in self._caches.values())
+
+    def partition(self) -> ResultsCache:
+        """Return the cache of the current caller's partition."""
+        key = self._partition()
+        cache = self._caches.get(key)
+        if cache is None:
+            cache = self._caches[key] = ResultsCache(self.ttl, self.max_entries)
+        return cache
+
+    def get(self, key: Hashable) -> Any | None:
+        """Get a fresh entry of the current partition.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            Cached value, or None if missing or expired
+        """
+        return self.partition().get(key)
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+        """Store an entry in the current partition.
+
+        Args:
+            key: Cache key
+            value: Value to cache
+            ttl: Seconds the entry stays fresh; defaults to the cache TTL
+        """
+        self.partition().set(key, value, ttl)
+
+    def resize(self, ttl: float | None = None, max_entries: int | None = None) -> None:
+        """Change the default TTL or per-partition size of every partition.
+
+        Args:
+            ttl: Default seconds new entries stay fresh
+            max_entries: Maximum number of entries per partition
+        """
+        if ttl is not None:
+            self.ttl = ttl
+        if max_entries is not None:
+            self.max_entries = max_entries
+        for cache in self._caches.values():
+            cache.resize(ttl, max_entries)
+
+    def clear(self) -> None:
+        """Remove all entries of all partitions."""
+        self._caches.clear()
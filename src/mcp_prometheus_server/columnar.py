@@ -0,0 +1,78 @@
+"""
+Columnar time series buffers for MCP server.
+
+Holds samples as packed arrays of timestamps and values instead of one
+dictionary per data point, so long histories stay compact in memory and can
+be handed to numeric code without copying.
+"""
+
+from array import array
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from typing import Any
+
+
+@dataclass
+class Series:
+    """One time series with its samples stored column by column."""
+
+    labels: dict[str, str]
+    timestamps: array = field(default_factory=lambda: array("d"))
+    values: array = field(default_factory=lambda: array("d"))
+
+    def __len__(self) -> int:
+        """Return number of samples."""
+        return len(self.timestamps)
+
+    def append(self, timestamp: float, value: float) -> None:
+        """Append one sample.
+
+        Args:
+            timestamp: Unix timestamp in seconds
+            value: Sample value
+        """
+        self.timestamps.append(timestamp)
+        self.values.append(value)
+
+    def samples(self) -> Iterator[tuple[float, float]]:
+        """Iterate over (timestamp, value) pairs."""
+        return zip(self.timestamps, self.values)
+
+
+def series_from_matrix(result: dict[str, Any]) -> list[Series]:
+    """Convert a Prometheus JSON query result to columnar series.
+
+    Args:
+        result: Query result dictionary with a matrix or vector result
+
+    Returns:
+        One series per result entry
+
+    Raises:
+        ValueError: If the query failed
+    """
+    if result.get("status") != "success":
+        raise ValueError(f"Query failed: {result.get('error', 'Unknown error')}")
+
+    return [
+        series_from_entry(entry) for entry in result.get("data", {}).get("result", [])
+    ]
+
+
+def series_from_entry(entry: dict[str, Any]) -> Series:
+    """Convert one Prometheus JSON result entry to a columnar series.
+
+    Args:
+        entry: Matrix or vector result entry
+
+    Returns:
+        Series with the entry's labels and samples
+    """
+    points = entry.get("values")
+    if points is None:
+        points = [entry["value"]] if "value" in entry else []
+
+    series = Series(labels=entry.get("metric", {}))
+    series.timestamps.extend(float(timestamp) for timestamp, _ in points)
+    series.values.extend(float(value) for _, value in points)
+    return series
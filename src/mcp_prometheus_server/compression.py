@@ -0,0 +1,366 @@
+"""
+Compressed upstream transfers for MCP server.
+
+Negotiates response compression with Prometheus, decodes large bodies in a
+worker thread, and counts wire versus decoded bytes per endpoint so the
+bandwidth saved can be measured.
+"""
+
+import asyncio
+import logging
+import zlib
+from collections.abc import AsyncIterator
+from dataclasses import dataclass, field
+from typing import Any, Protocol
+
+import httpx
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Wire size from which decompression moves off the event loop
+DEFAULT_THREAD_THRESHOLD = 1024 * 1024
+
+# Compressed bytes handed to the worker thread at a time
+_THREAD_BATCH_SIZE = 256 * 1024
+
+# Encodings of protocol payloads that callers decode themselves, such as
+# sampled remote-read responses; their bodies are passed through as-is
+PASSTHROUGH_ENCODINGS = ("snappy",)
+
+
+class _Decoder(Protocol):
+    """Incremental decompressor."""
+
+    def decompress(self, data: bytes) -> bytes: ...
+
+    def flush(self) -> bytes: ...
+
+
+class _ZlibDecoder:
+    """gzip or deflate decoder."""
+
+    def __init__(self, wbits: int) -> None:
+        self._decompressor = zlib.decompressobj(wbits)
+
+    def decompress(self, data: bytes) -> bytes:
+        return self._decompressor.decompress(data)
+
+    def flush(self) -> bytes:
+        return self._decompressor.flush()
+
+
+class _BrotliDecoder:
+    """Brotli decoder."""
+
+    def __init__(self) -> None:
+        self._decompressor = brotli.Decompressor()
+
+    def decompress(self, data: bytes) -> bytes:
+        decoded: bytes = self._decompressor.process(data)
+        return decoded
+
+    def flush(self) -> bytes:
+        return b""
+
+
+class _ZstdDecoder:
+    """Zstandard decoder."""
+
+    def __init__(self) -> None:
+        self._decompressor = zstandard.ZstdDecompressor().decompressobj()
+
+    def decompress(self, data: bytes) -> bytes:
+        decoded: bytes = self._decompressor.decompress(data)
+        return decoded
+
+    def flush(self) -> bytes:
+        decoded: bytes = self._decompressor.flush()
+        return decoded
+
+
+def supported_encodings() -> list[str]:
+    """Return the content encodings that can be decoded, best first."""
+    encodings = []
+    if zstandard is not None:
+        encodings.append("zstd")
+    if brotli is not None:
+        encodings.append("br")
+    encodings.extend(["gzip", "deflate"])
+    return encodings
+
+
+def accept_encoding_header(encodings: str | None = None) -> str:
+    """Build the Accept-Encoding header sent to Prometheus.
+
+    Args:
+        encodings: Comma-separated encodings to offer, in preference order;
+            defaults to every supported encoding. ``identity`` disables
+            compression.
+
+    Returns:
+        Header value
+
+    Raises:
+        ValueError: If none of the requested encodings can be decoded
+    """
+    supported = supported_encodings()
+    if encodings is None:
+        return ", ".join(supported)
+
+    requested = [name.strip().lower() for name in encodings.split(",") if name.strip()]
+    if requested == ["identity"]:
+        return "identity"
+
+    offered = [name for name in requested if name in supported]
+    for name in requested:
+        if name not in supported:
+            logger.warning(f"Content encoding '{name}' is not available, skipping")
+    if not offered:
+        raise ValueError(f"No supported content encoding in: {encodings}")
+    return ", ".join(offered)
+
+
+def _make_decoder(encoding: str) -> _Decoder | None:
+    """Return a decoder for a Content-Encoding value, None to pass through."""
+    if encoding in ("", "identity", *PASSTHROUGH_ENCODINGS):
+        return None
+    if encoding == "gzip":
+        return _ZlibDecoder(zlib.MAX_WBITS | 16)
+    if encoding == "deflate":
+        return _ZlibDecoder(zlib.MAX_WBITS)
+    if encoding == "br" and brotli is not None:
+        return _BrotliDecoder()
+    if encoding == "zstd" and zstandard is not None:
+        return _ZstdDecoder()
+    raise httpx.DecodingError(f"Unsupported content encoding: {encoding}")
+
+
+@dataclass
+class EndpointTransfer:
+    """Transfer counters for one upstream endpoint."""
+
+    requests: int = 0
+    wire_bytes: int = 0
+    decoded_bytes: int = 0
+    encodings: dict[str, int] = field(default_factory=dict)
+
+    @property
+    def ratio(self) -> float:
+        """Return decoded bytes per wire byte."""
+        return self.decoded_bytes / self.wire_bytes if self.wire_bytes else 1.0
+
+
+class TransferStats:
+    """Wire and decoded byte counters, keyed by endpoint path."""
+
+    def __init__(self) -> None:
+        """Initialize transfer stats."""
+        self._endpoints: dict[str, EndpointTransfer] = {}
+
+    def record(
+        self,
+        endpoint: str,
+        encoding: str,
+        wire_bytes: int,
+        decoded_bytes: int,
+    ) -> None:
+        """Record one response body.
+
+        Args:
+            endpoint: Request path
+            encoding: Content-Encoding of the response
+            wire_bytes: Bytes received from the network
+            decoded_bytes: Bytes after decompression
+        """
+        entry = self._endpoints.setdefault(endpoint, EndpointTransfer())
+        entry.requests += 1
+        entry.wire_bytes += wire_bytes
+        entry.decoded_bytes += decoded_bytes
+        entry.encodings[encoding] = entry.encodings.get(encoding, 0) + 1
+
+    def get(self, endpoint: str) -> EndpointTransfer | None:
+        """Return the counters of one endpoint."""
+        return self._endpoints.get(endpoint)
+
+    def snapshot(self) -> dict[str, dict[str, Any]]:
+        """Return all counters as plain data."""
+        return {
+            endpoint: {
+                "requests": entry.requests,
+                "wire_bytes": entry.wire_bytes,
+                "decoded_bytes": entry.decoded_bytes,
+                "ratio": round(entry.ratio, 2),
+                "encodings": dict(entry.encodings),
+            }
+            for endpoint, entry in sorted(self._endpoints.items())
+        }
+
+    def reset(self) -> None:
+        """Clear all counters."""
+        self._endpoints.clear()
+
+
+class _DecodingStream(httpx.AsyncByteStream):
+    """Response body that decodes and counts bytes as it is read."""
+
+    def __init__(
+        self,
+        raw: httpx.AsyncByteStream,
+        encoding: str,
+        endpoint: str,
+        stats: TransferStats,
+        thread_threshold: int,
+        offload: bool,
+    ) -> None:
+        self._raw = raw
+        self._encoding = encoding
+        self._decoder = _make_decoder(encoding)
+        self._endpoint = endpoint
+        self._stats = stats
+        self._thread_threshold = thread_threshold
+        self._offload = offload
+        self._passthrough = encoding in PASSTHROUGH_ENCODINGS
+        self._wire_bytes = 0
+        self._decoded_bytes = 0
+        self._recorded = False
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        pending: list[bytes] = []
+        pending_size = 0
+        async for chunk in self._raw:
+            self._wire_bytes += len(chunk)
+            if self._decoder is None:
+                # Passed-through bodies are still encoded; only their wire
+                # size is known
+                if not self._passthrough:
+                    self._decoded_bytes += len(chunk)
+                yield chunk
+                continue
+
+            if not self._offload and self._wire_bytes < self._thread_threshold:
+                data = self._decoder.decompress(chunk)
+            else:
+                # Large body: decompress batches off the event loop
+                pending.append(chunk)
+                pending_size += len(chunk)
+                if pending_size < _THREAD_BATCH_SIZE:
+                    continue
+                data = await asyncio.to_thread(
+                    self._decoder.decompress, b"".join(pending)
+                )
+                pending, pending_size = [], 0
+
+            if data:
+                self._decoded_bytes += len(data)
+                yield data
+
+        if self._decoder is not None:
+            data = b""
+            if pending:
+                data = await asyncio.to_thread(
+                    self._decoder.decompress, b"".join(pending)
+                )
+            data += self._decoder.flush()
+            if data:
+                self._decoded_bytes += len(data)
+                yield data
+
+        self._record()
+
+    async def aclose(self) -> None:
+        await self._raw.aclose()
+        self._record()
+
+    def _record(self) -> None:
+        """Report this body's counters once."""
+        if self._recorded:
+            return
+        self._recorded = True
+        self._stats.record(
+            self._endpoint,
+            self._encoding or "identity",
+            self._wire_bytes,
+            self._decoded_bytes,
+        )
+
+
+class CompressionTransport(httpx.AsyncBaseTransport):
+    """Transport that decodes compressed responses and measures them.
+
+    Responses are returned with their Content-Encoding removed, so httpx
+    hands the decoded body to callers unchanged. Bodies in a passthrough
+    encoding keep their header and are left for the caller to decode.
+    """
+
+    def __init__(
+        self,
+        transport: httpx.AsyncBaseTransport | None = None,
+        stats: TransferStats | None = None,
+        thread_threshold: int = DEFAULT_THREAD_THRESHOLD,
+    ) -> None:
+        """Initialize transport.
+
+        Args:
+            transport: Transport that performs the requests
+            stats: Counters to record transfers into
+            thread_threshold: Wire bytes from which decompression runs in a
+                worker thread
+        """
+        self._transport = transport or httpx.AsyncHTTPTransport()
+        self.stats = stats or TransferStats()
+        self.thread_threshold = thread_threshold
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        """Send a request and wrap its body in a decoding stream."""
+        response = await self._transport.handle_async_request(request)
+
+        encoding = response.headers.get("content-encoding", "").strip().lower()
+        content_length = response.headers.get("content-length", "")
+        offload = (
+            content_length.isdigit() and int(content_length) >= self.thread_threshold
+        )
+
+        removed: tuple[str, ...] = ("content-length",)
+        if encoding not in PASSTHROUGH_ENCODINGS:
+            removed = ("content-encoding", "content-length")
+        headers = [
+            (name, value)
+            for name, value in response.headers.multi_items()
+            if name.lower() not in removed
+        ]
+        stream = response.stream
+        assert isinstance(stream, httpx.AsyncByteStream)
+
+        try:
+            decoding_stream = _DecodingStream(
+                stream,
+                encoding,
+                request.url.path,
+                self.stats,
+                self.thread_threshold,
+                offload,
+            )
+        except httpx.DecodingError:
+            await stream.aclose()
+            raise
+
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=headers,
+            stream=decoding_stream,
+            extensions=response.extensions,
+        )
+
+    async def aclose(self) -> None:
+        """Close the wrapped transport."""
+        await self._transport.aclose()
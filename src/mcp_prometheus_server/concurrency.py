@@ -0,0 +1,331 @@
+"""
+Upstream admission control for MCP server.
+
+Caps the number of concurrent requests sent to Prometheus and decides who
+goes next when they queue: priority classes share the slots by weight, and
+within a class every client session takes turns, so one agent's runaway
+batch cannot starve everyone else.
+"""
+
+import asyncio
+from collections import OrderedDict, deque
+from collections.abc import AsyncIterator, Iterator
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Any
+
+
+class Priority(IntEnum):
+    """Request priority class; lower values win ties."""
+
+    INTERACTIVE = 0
+    BATCH = 1
+    BACKGROUND = 2
+
+
+# Relative share of upstream slots each class gets while all are queued
+DEFAULT_WEIGHTS = {
+    Priority.INTERACTIVE: 8.0,
+    Priority.BATCH: 3.0,
+    Priority.BACKGROUND: 1.0,
+}
+
+DEFAULT_SESSION = "default"
+
+_current_priority: ContextVar[Priority] = ContextVar(
+    "request_priority", default=Priority.INTERACTIVE
+)
+_current_session: ContextVar[str] = ContextVar(
+    "request_session", default=DEFAULT_SESSION
+)
+
+
+def current_priority() -> Priority:
+    """Return the priority of upstream requests made in the current context."""
+    return _current_priority.get()
+
+
+@contextmanager
+def request_priority(priority: Priority) -> Iterator[None]:
+    """Run upstream requests in this block at the given priority.
+
+    Args:
+        priority: Priority for requests made inside the block
+    """
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def current_session() -> str:
+    """Return the client session upstream requests are queued under."""
+    return _current_session.get()
+
+
+@contextmanager
+def request_session(session: str) -> Iterator[None]:
+    """Queue upstream requests in this block under a client session.
+
+    Args:
+        session: Identifier of the client session
+    """
+    token = _current_session.set(session)
+    try:
+        yield
+    finally:
+        _current_session.reset(token)
+
+
+def parse_weights(spec: str | None) -> dict[Priority, float]:
+    """Parse priority class weights.
+
+    Args:
+        spec: Comma-separated ``class=weight`` pairs, e.g.
+            "interactive=8,batch=3,background=1"; missing classes keep
+            their default weight
+
+    Returns:
+        Weight of every priority class
+
+    Raises:
+        ValueError: If a class is unknown or a weight is not positive
+    """
+    weights = dict(DEFAULT_WEIGHTS)
+    for entry in (spec or "").split(","):
+        if not entry.strip():
+            continue
+        name, _, value = entry.partition("=")
+        try:
+            priority = Priority[name.strip().upper()]
+            weight = float(value)
+        except (KeyError, ValueError):
+            raise ValueError(f"Invalid priority weight: {entry.strip()}") from None
+        if weight <= 0:
+            raise ValueError(f"Priority weight must be positive: {entry.strip()}")
+        weights[priority] = weight
+    return weights
+
+
+@dataclass
+class _Waiter:
+    """One queued request."""
+
+    future: asyncio.Future[None]
+    enqueued_at: float
+
+
+@dataclass
+class _ClassQueue:
+    """Queued requests of one priority class, one FIFO per session."""
+
+    weight: float
+    sessions: OrderedDict[str, deque[_Waiter]] = field(default_factory=OrderedDict)
+    # Virtual time of the class; advances by 1/weight per admitted request
+    virtual_time: float = 0.0
+    admitted: int = 0
+    wait_total: float = 0.0
+    wait_max: float = 0.0
+
+    def __len__(self) -> int:
+        """Return number of live waiters."""
+        return sum(
+            1
+            for queue in self.sessions.values()
+            for waiter in queue
+            if not waiter.future.done()
+        )
+
+    def push(self, session: str, waiter: _Waiter) -> None:
+        """Queue a waiter behind earlier requests of its session."""
+        self.sessions.setdefault(session, deque()).append(waiter)
+
+    def pop(self) -> _Waiter | None:
+        """Take the next live waiter, visiting sessions round robin."""
+        while self.sessions:
+            session, queue = next(iter(self.sessions.items()))
+            waiter = queue.popleft()
+            if queue:
+                self.sessions.move_to_end(session)
+            else:
+                del self.sessions[session]
+            if not waiter.future.done():
+                return waiter
+        return None
+
+
+class AdmissionController:
+    """Admits requests to a fixed number of upstream slots.
+
+    Free slots go to the priority class with the lowest virtual time
+    (stride scheduling), so while every class is queued they share slots
+    in proportion to their weights, and an idle class cannot bank credit.
+    Within a class, sessions take turns. Non-interactive requests are never
+    allowed to hold every slot, so an interactive request can always start
+    without waiting for them.
+    """
+
+    def __init__(
+        self, limit: int, weights: dict[Priority, float] | None = None
+    ) -> None:
+        """Initialize controller.
+
+        Args:
+            limit: Maximum number of concurrently held slots
+            weights: Relative share of each priority class
+        """
+        if limit < 1:
+            raise ValueError(f"Concurrency limit must be at least 1: {limit}")
+        self.limit = limit
+        self.in_use = 0
+        self.background_in_use = 0
+        weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+        self._classes = {
+            priority: _ClassQueue(weights[priority]) for priority in Priority
+        }
+        self._virtual_time = 0.0
+
+    def reconfigure(
+        self, limit: int, weights: dict[Priority, float] | None = None
+    ) -> None:
+        """Change the slot limit and class weights without dropping waiters.
+
+        Requests holding slots keep them; when the limit shrinks, new
+        requests wait until enough of them finish.
+
+        Args:
+            limit: Maximum number of concurrently held slots
+            weights: Relative share of each priority class
+        """
+        if limit < 1:
+            raise ValueError(f"Concurrency limit must be at least 1: {limit}")
+        weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+        self.limit = limit
+        for priority, queue in self._classes.items():
+            queue.weight = weights[priority]
+        if self.waiting:
+            self._wake()
+
+    @property
+    def waiting(self) -> int:
+        """Return number of requests waiting for a slot."""
+        return sum(len(queue) for queue in self._classes.values())
+
+    def stats(self) -> dict[str, Any]:
+        """Return slot usage, queue depths and wait times per class."""
+        classes = {}
+        for priority, queue in self._classes.items():
+            average = queue.wait_total / queue.admitted if queue.admitted else 0.0
+            classes[priority.name.lower()] = {
+                "weight": queue.weight,
+                "queued": len(queue),
+                "admitted": queue.admitted,
+                "avg_wait_ms": round(average * 1000, 1),
+                "max_wait_ms": round(queue.wait_max * 1000, 1),
+            }
+        return {
+            "limit": self.limit,
+            "in_use": self.in_use,
+            "waiting": self.waiting,
+            "classes": classes,
+        }
+
+    def _background_limit(self) -> int:
+        """Return how many slots non-interactive requests may hold."""
+        return max(self.limit - 1, 1)
+
+    def _can_start(self, priority: Priority) -> bool:
+        """Return True if a request of this priority may take a slot now."""
+        if self.in_use >= self.limit:
+            return False
+        if priority > Priority.INTERACTIVE:
+            return self.background_in_use < self._background_limit()
+        return True
+
+    def _take(self, priority: Priority) -> None:
+        """Account for a newly held slot."""
+        self.in_use += 1
+        if priority > Priority.INTERACTIVE:
+            self.background_in_use += 1
+
+    async def acquire(self, priority: Priority, session: str | None = None) -> None:
+        """Wait for a slot.
+
+        Args:
+            priority: Priority class of the request
+            session: Client session; defaults to the current context's
+        """
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(loop.create_future(), loop.time())
+        queue = self._classes[priority]
+        if not len(queue):
+            # A class returning from idle starts at the current virtual time,
+            # neither ahead from credit nor behind from uncontended use
+            queue.virtual_time = self._virtual_time
+        queue.push(current_session() if session is None else session, waiter)
+        self._wake()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Slot was handed over just before cancellation; give it back
+                self.release(priority)
+            raise
+
+    def release(self, priority: Priority) -> None:
+        """Release a slot and hand it to the next waiter.
+
+        Args:
+            priority: Priority the slot was acquired with
+        """
+        self.in_use -= 1
+        if priority > Priority.INTERACTIVE:
+            self.background_in_use -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        """Hand free slots to waiters, lowest class virtual time first."""
+        now = asyncio.get_running_loop().time()
+        while self.in_use < self.limit:
+            candidates = [
+                (queue.virtual_time, priority)
+                for priority, queue in self._classes.items()
+                if queue.sessions and self._can_start(priority)
+            ]
+            if not candidates:
+                return
+
+            _, priority = min(candidates)
+            queue = self._classes[priority]
+            waiter = queue.pop()
+            if waiter is None:
+                continue
+
+            self._take(priority)
+            self._virtual_time = queue.virtual_time
+            queue.virtual_time += 1.0 / queue.weight
+            wait = now - waiter.enqueued_at
+            queue.admitted += 1
+            queue.wait_total += wait
+            queue.wait_max = max(queue.wait_max, wait)
+            waiter.future.set_result(None)
+
+    @asynccontextmanager
+    async def slot(
+        self, priority: Priority | None = None, session: str | None = None
+    ) -> AsyncIterator[None]:
+        """Hold a slot for the duration of the block.
+
+        Args:
+            priority: Request priority; defaults to the current context's
+            session: Client session; defaults to the current context's
+        """
+        priority = current_priority() if priority is None else priority
+        await self.acquire(priority, session)
+        try:
+            yield
+        finally:
+            self.release(priority)
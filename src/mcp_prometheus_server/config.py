@@ -0,0 +1,229 @@
+"""
+Configuration file for MCP server.
+
+Settings are read from ``PROMETHEUS_*`` environment variables, overridden
+by an optional TOML file. A file key is the variable name lowercased and
+without the prefix, so ``results_cache_ttl = 30`` sets
+``PROMETHEUS_RESULTS_CACHE_TTL``. The file is watched while the server
+runs and changes are applied to the live server without a restart.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import sys
+from collections.abc import Callable, Mapping
+from pathlib import Path
+from typing import Any, overload
+
+if sys.version_info >= (3, 11):
+    import tomllib
+else:  # pragma: no cover
+    import tomli as tomllib
+
+logger = logging.getLogger(__name__)
+
+ENV_PREFIX = "PROMETHEUS_"
+
+# Seconds between checks of the configuration file for changes
+DEFAULT_RELOAD_INTERVAL = 5.0
+
+
+def _setting_value(key: str, value: Any) -> str:
+    """Convert a TOML value to its environment variable form.
+
+    Lists become comma-separated values and tables comma-separated
+    ``key=value`` pairs, as used by the weight, deadline and tenant settings.
+    """
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (str, int, float)):
+        return str(value)
+    if isinstance(value, list):
+        return ",".join(_setting_value(key, item) for item in value)
+    if isinstance(value, dict):
+        return ",".join(
+            f"{name}={_setting_value(key, item)}" for name, item in value.items()
+        )
+    raise ValueError(f"Unsupported value for configuration key {key}: {value!r}")
+
+
+def parse_config(text: str) -> dict[str, str]:
+    """Parse a TOML configuration file.
+
+    Args:
+        text: File content
+
+    Returns:
+        Environment variable names mapped to their values
+
+    Raises:
+        ValueError: If the file is not valid TOML or a value is unsupported
+    """
+    try:
+        data = tomllib.loads(text)
+    except tomllib.TOMLDecodeError as e:
+        raise ValueError(f"Invalid configuration file: {e}") from None
+    return {
+        f"{ENV_PREFIX}{key.upper()}": _setting_value(key, value)
+        for key, value in data.items()
+    }
+
+
+def load_config(path: str | Path) -> dict[str, str]:
+    """Read and parse a TOML configuration file.
+
+    Args:
+        path: Path of the file
+
+    Returns:
+        Environment variable names mapped to their values
+    """
+    return parse_config(Path(path).read_text(encoding="utf-8"))
+
+
+class ConfigSource:
+    """Settings from a configuration file, falling back to the environment."""
+
+    def __init__(
+        self,
+        values: Mapping[str, str] | None = None,
+        environ: Mapping[str, str] | None = None,
+    ) -> None:
+        """Initialize source.
+
+        Args:
+            values: Settings from the configuration file
+            environ: Environment; defaults to ``os.environ``
+        """
+        self.values = dict(values or {})
+        self.environ = os.environ if environ is None else environ
+        self._read: set[str] = set()
+
+    @overload
+    def get(self, name: str) -> str | None: ...
+
+    @overload
+    def get(self, name: str, default: str) -> str: ...
+
+    def get(self, name: str, default: str | None = None) -> str | None:
+        """Return a setting.
+
+        Args:
+            name: Environment variable name
+            default: Value if neither the file nor the environment sets it
+
+        Returns:
+            Value from the file, else the environment, else the default
+        """
+        self._read.add(name)
+        if name in self.values:
+            return self.values[name]
+        return self.environ.get(name, default)
+
+    def unknown(self) -> list[str]:
+        """Return file keys that no setting has read."""
+        return sorted(
+            name.removeprefix(ENV_PREFIX).lower()
+            for name in self.values.keys() - self._read
+        )
+
+
+class ConfigWatcher:
+    """Re-applies a configuration file whenever its content changes.
+
+    The file is polled, so edits through editors that replace it and
+    updates of mounted ConfigMaps are picked up alike. A file that fails to
+    parse or apply is logged and the running configuration is kept.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        apply: Callable[[dict[str, str]], Any],
+        interval: float = DEFAULT_RELOAD_INTERVAL,
+    ) -> None:
+        """Initialize watcher.
+
+        Args:
+            path: Path of the configuration file
+            apply: Called with the parsed settings after each change
+            interval: Seconds between checks
+        """
+        self.path = Path(path)
+        self.apply = apply
+        self.interval = interval
+        self.reloads = 0
+        self.failures = 0
+        self._stat: tuple[int, int] | None = None
+        self._digest: str | None = None
+        self._task: asyncio.Task[None] | None = None
+        self._check_stat()
+        self._check_content()
+
+    def _check_stat(self) -> bool:
+        """Return True if the file's modification time or size changed."""
+        try:
+            stat = self.path.stat()
+        except OSError:
+            return False
+        current = (stat.st_mtime_ns, stat.st_size)
+        changed = current != self._stat
+        self._stat = current
+        return changed
+
+    def _check_content(self) -> bytes | None:
+        """Return the file content if it differs from the last one seen."""
+        try:
+            content = self.path.read_bytes()
+        except OSError:
+            return None
+        digest = hashlib.blake2b(content, digest_size=16).hexdigest()
+        if digest == self._digest:
+            return None
+        self._digest = digest
+        return content
+
+    def check(self) -> bool:
+        """Reload the file if it changed.
+
+        Returns:
+            True if new settings were applied
+        """
+        if not self._check_stat():
+            return False
+        content = self._check_content()
+        if content is None:
+            return False
+
+        try:
+            self.apply(parse_config(content.decode("utf-8")))
+        except Exception as e:
+            self.failures += 1
+            logger.warning(
+                f"Configuration file {self.path} not applied, "
+                f"keeping current configuration: {e}"
+            )
+            return False
+        self.reloads += 1
+        logger.info(f"Applied configuration file {self.path}")
+        return True
+
+    def start(self) -> None:
+        """Start checking the file in the background."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop checking the file."""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def _run(self) -> None:
+        """Check the file every interval until cancelled."""
+        while True:
+            await asyncio.sleep(self.interval)
+            self.check()
@@ -0,0 +1,338 @@
+"""
+Query cost estimation for MCP server.
+
+Estimates how much a range query will return before it is sent, as
+series x points x bytes per sample, and shapes queries over budget into a
+coarser step or an aggregate so expensive requests are cut down before
+they reach the TSDB. Queries that cannot be shaped are refused.
+"""
+
+import math
+from collections.abc import Iterator, Mapping
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from .promql import (
+    Aggregation,
+    BinaryExpr,
+    Call,
+    Expr,
+    NumberLiteral,
+    ParenExpr,
+    PromQLQuery,
+    StringLiteral,
+    Subquery,
+    UnaryExpr,
+    VectorMatching,
+    VectorSelector,
+    format_duration,
+)
+
+COST_FALLBACKS = ("auto", "downsample", "refuse")
+
+# Encoded size of one range query sample, e.g. [1700000000,"0.123456"],
+DEFAULT_BYTES_PER_SAMPLE = 32
+
+# Points per series a downsampled or aggregated query keeps at least
+MIN_POINTS = 30
+
+# Steps a query is coarsened to, in seconds
+_STEPS = (
+    1,
+    5,
+    10,
+    15,
+    30,
+    60,
+    120,
+    300,
+    600,
+    900,
+    1800,
+    3600,
+    7200,
+    10800,
+    21600,
+    43200,
+    86400,
+)
+
+# Functions returning a scalar or at most one series
+_SCALAR_FUNCTIONS = {"scalar", "time", "pi"}
+_SINGLE_SERIES_FUNCTIONS = {"vector", "absent", "absent_over_time"}
+
+# Aggregations that keep up to ``param`` series per group
+_LIMITING_AGGREGATIONS = {"topk", "bottomk", "limitk"}
+
+_plans: ContextVar[list["QueryPlan"] | None] = ContextVar("query_plans", default=None)
+
+
+@dataclass
+class CostEstimate:
+    """Estimated size of a range query response."""
+
+    series: int
+    points: int
+    bytes_per_sample: int = DEFAULT_BYTES_PER_SAMPLE
+
+    @property
+    def samples(self) -> int:
+        """Return number of samples returned."""
+        return self.series * self.points
+
+    @property
+    def bytes(self) -> int:
+        """Return estimated response size in bytes."""
+        return self.samples * self.bytes_per_sample
+
+
+@dataclass
+class QueryPlan:
+    """How a range query is run after cost shaping."""
+
+    query: str
+    step: str
+    action: str
+    original: CostEstimate
+    estimate: CostEstimate
+    original_step: str
+    limit: int
+
+    @property
+    def shaped(self) -> bool:
+        """Return True if the query or step was changed."""
+        return self.action != "run"
+
+
+@contextmanager
+def collect_plans() -> Iterator[list[QueryPlan]]:
+    """Collect the plans of queries shaped inside the block."""
+    plans: list[QueryPlan] = []
+    token = _plans.set(plans)
+    try:
+        yield plans
+    finally:
+        _plans.reset(token)
+
+
+def record_plan(plan: QueryPlan) -> None:
+    """Report a shaped query to the enclosing ``collect_plans`` block."""
+    plans = _plans.get()
+    if plans is not None and plan.shaped:
+        plans.append(plan)
+
+
+def range_points(window: float, step: float) -> int:
+    """Return number of points per series of a range query."""
+    return int(window // step) + 1
+
+
+def estimate_series(expr: Expr, cardinality: Mapping[str, int]) -> int | None:
+    """Estimate an upper bound of the series an expression returns.
+
+    Args:
+        expr: Parsed expression
+        cardinality: Series count per selector (``VectorSelector.selector()``)
+
+    Returns:
+        Estimated series count, or None for scalar and string expressions
+    """
+    if isinstance(expr, VectorSelector):
+        return cardinality.get(expr.selector(), 0)
+    if isinstance(expr, (NumberLiteral, StringLiteral)):
+        return None
+    if isinstance(expr, (ParenExpr, UnaryExpr, Subquery)):
+        return estimate_series(expr.expr, cardinality)
+
+    if isinstance(expr, Call):
+        if expr.func in _SCALAR_FUNCTIONS:
+            return None
+        if expr.func in _SINGLE_SERIES_FUNCTIONS:
+            return 1
+        counts = [estimate_series(arg, cardinality) for arg in expr.args]
+        return max((count for count in counts if count is not None), default=1)
+
+    if isinstance(expr, Aggregation):
+        inner = estimate_series(expr.expr, cardinality) or 0
+        if expr.op in _LIMITING_AGGREGATIONS:
+            if isinstance(expr.param, NumberLiteral) and not expr.has_grouping:
+                return min(inner, max(int(expr.param.value), 0))
+            return inner
+        if expr.op == "count_values" or expr.without:
+            return inner
+        if expr.has_grouping and expr.grouping:
+            # Group count is unknown; each group needs at least one series
+            return inner
+        return min(inner, 1)
+
+    # Only binary expressions are left
+    lhs = estimate_series(expr.lhs, cardinality)
+    rhs = estimate_series(expr.rhs, cardinality)
+    if lhs is None or rhs is None:
+        return rhs if lhs is None else lhs
+    if expr.op == "or":
+        return lhs + rhs
+    if expr.op in ("and", "unless"):
+        return lhs
+    card = expr.matching.card if expr.matching is not None else None
+    if card == "group_left":
+        return lhs
+    if card == "group_right":
+        return rhs
+    return min(lhs, rhs)
+
+
+def coarser_step(window: float, step: float, max_points: int) -> float:
+    """Return the finest round step, at least ``step``, within ``max_points``.
+
+    Args:
+        window: Query range in seconds
+        step: Current step in seconds
+        max_points: Maximum points per series
+
+    Returns:
+        Step in seconds
+    """
+    needed = max(window / max(max_points - 1, 1), step)
+    for candidate in _STEPS:
+        if candidate >= needed:
+            return float(candidate)
+    return math.ceil(needed / _STEPS[-1]) * float(_STEPS[-1])
+
+
+def _coarsest_step(window: float, step: float) -> float:
+    """Return the coarsest round step, at least ``step``, keeping MIN_POINTS."""
+    candidates = [
+        float(candidate)
+        for candidate in _STEPS
+        if candidate >= step and range_points(window, candidate) >= MIN_POINTS
+    ]
+    return candidates[-1] if candidates else step
+
+
+def top_over_window(
+    expr: Expr,
+    count: int,
+    window: float,
+    step: float,
+    labels: list[str] | None = None,
+) -> Expr:
+    """Limit a range query to the series with the highest average.
+
+    ``topk`` in a range query ranks anew at every step, so the response
+    can still hold every series. Ranking the window average once, at the
+    end of the range, keeps the same ``count`` series at every step.
+
+    Args:
+        expr: Expression to limit
+        count: Number of series to keep
+        window: Query range in seconds
+        step: Query step in seconds
+        labels: Labels identifying the series, if ``expr`` sums by them
+
+    Returns:
+        Expression returning at most ``count`` series
+    """
+    operand = expr if isinstance(expr, VectorSelector) else ParenExpr(expr)
+    ranked = Aggregation(
+        "topk",
+        Call("avg_over_time", [Subquery(operand, window, step, at="end()")]),
+        param=NumberLiteral(float(count)),
+    )
+    matching = VectorMatching(on=True, labels=list(labels)) if labels else None
+    lhs = ParenExpr(expr) if isinstance(expr, BinaryExpr) else expr
+    return BinaryExpr("and", lhs, ranked, matching=matching)
+
+
+def shape_query(
+    parsed: PromQLQuery,
+    window: float,
+    step: float,
+    series: int,
+    limit: int,
+    fallback: str = "auto",
+    bytes_per_sample: int = DEFAULT_BYTES_PER_SAMPLE,
+    aggregate_by: list[str] | None = None,
+    groups: int | None = None,
+) -> QueryPlan:
+    """Choose how to run a range query within a response size budget.
+
+    A query within budget runs unchanged. Otherwise the step is raised if
+    at least ``MIN_POINTS`` points per series remain; failing that, the
+    query is aggregated at the coarsest step that keeps ``MIN_POINTS``
+    points, summed by ``aggregate_by`` labels when given and limited to
+    the series with the highest window average that fit.
+
+    Args:
+        parsed: Parsed query
+        window: Query range in seconds
+        step: Requested step in seconds
+        series: Estimated series count
+        limit: Response size budget in bytes
+        fallback: "auto" to downsample or aggregate, "downsample" to only
+            raise the step, "refuse" to only refuse
+        bytes_per_sample: Encoded size of one sample
+        aggregate_by: Labels to sum by when aggregating
+        groups: Estimated series count after summing by ``aggregate_by``
+
+    Returns:
+        Plan with the query and step to run
+
+    Raises:
+        ValueError: If the query exceeds the budget and cannot be shaped
+    """
+    if fallback not in COST_FALLBACKS:
+        raise ValueError(f"Invalid cost fallback: {fallback}")
+
+    step_text = format_duration(step)
+    original = CostEstimate(series, range_points(window, step), bytes_per_sample)
+
+    def plan(
+        query: str, new_step: float, action: str, estimate: CostEstimate
+    ) -> QueryPlan:
+        return QueryPlan(
+            query=query,
+            step=format_duration(new_step),
+            action=action,
+            original=original,
+            estimate=estimate,
+            original_step=step_text,
+            limit=limit,
+        )
+
+    if original.bytes <= limit:
+        return plan(parsed.query, step, "run", original)
+
+    if fallback != "refuse":
+        coarse = coarser_step(window, step, limit // (series * bytes_per_sample))
+        points = range_points(window, coarse)
+        if points >= MIN_POINTS:
+            estimate = CostEstimate(series, points, bytes_per_sample)
+            return plan(parsed.query, coarse, "downsample", estimate)
+
+    if fallback == "auto":
+        coarse = _coarsest_step(window, step)
+        points = range_points(window, coarse)
+        max_series = limit // (points * bytes_per_sample)
+
+        expr: Expr = parsed.expr
+        kept = series
+        if aggregate_by:
+            expr = Aggregation(
+                "sum", expr, grouping=list(aggregate_by), has_grouping=True
+            )
+            kept = series if groups is None else groups
+        if kept > max_series and max_series >= 1:
+            expr = top_over_window(expr, max_series, window, coarse, aggregate_by)
+            kept = max_series
+        if kept <= max_series:
+            estimate = CostEstimate(kept, points, bytes_per_sample)
+            return plan(str(expr), coarse, "aggregate", estimate)
+
+    raise ValueError(
+        f"Query refused: estimated {original.bytes} bytes "
+        f"({original.series} series x {original.points} points at step "
+        f"{step_text}) exceeds the limit of {limit} bytes. Narrow the selector, "
+        "shorten the time range or use a coarser step."
+    )
@@ -0,0 +1,157 @@
+"""
+History cursors for MCP server.
+
+A cursor records, per series, the timestamp of the last sample a client
+has seen. Passing it back lets ``get_metric_history`` fetch only the tail
+of the window after the oldest watermark and return only samples newer
+than each series' own watermark, so polling agents stop re-reading the
+whole window every time.
+"""
+
+import base64
+import binascii
+import hashlib
+import json
+import zlib
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+
+from .columnar import Series
+from .promql import parse_promql, parse_step
+
+# Prometheus marks a series stale after this long without samples; cursor
+# watermarks that fall this far behind the newest one are dropped
+STALENESS_SECONDS = 300.0
+
+_CURSOR_VERSION = 1
+
+
+def series_key(labels: dict[str, str]) -> str:
+    """Return a short stable key identifying a series by its labels."""
+    encoded = json.dumps(labels, sort_keys=True, separators=(",", ":"))
+    return hashlib.blake2b(encoded.encode(), digest_size=8).hexdigest()
+
+
+@dataclass
+class HistoryCursor:
+    """Last seen sample timestamp per series of one history query."""
+
+    query: str
+    step: str
+    watermarks: dict[str, float] = field(default_factory=dict)
+
+    @classmethod
+    def for_query(cls, query: str, step: str) -> "HistoryCursor":
+        """Create an empty cursor for a query.
+
+        Args:
+            query: PromQL query string
+            step: Query resolution step width
+
+        Returns:
+            Cursor keyed on the query's canonical form
+        """
+        return cls(parse_promql(query).canonical, step)
+
+    def matches(self, query: str, step: str) -> bool:
+        """Return True if the cursor was issued for this query and step."""
+        return self.query == parse_promql(query).canonical and self.step == step
+
+    def oldest(self) -> float | None:
+        """Return the oldest watermark, or None for an empty cursor."""
+        return min(self.watermarks.values(), default=None)
+
+    def select(self, series_list: Iterable[Series]) -> list[Series]:
+        """Keep only samples newer than each series' watermark.
+
+        Args:
+            series_list: Series fetched from the tail of the window
+
+        Returns:
+            Series with unseen samples; series without any are dropped
+        """
+        selected = []
+        for series in series_list:
+            watermark = self.watermarks.get(series_key(series.labels))
+            if watermark is None:
+                if len(series):
+                    selected.append(series)
+                continue
+
+            tail = Series(labels=series.labels)
+            for timestamp, value in series.samples():
+                if timestamp > watermark:
+                    tail.append(timestamp, value)
+            if len(tail):
+                selected.append(tail)
+        return selected
+
+    def advance(self, series_list: Iterable[Series]) -> "HistoryCursor":
+        """Return a cursor past the last sample of each series.
+
+        Watermarks of series that went stale, relative to the newest one,
+        are dropped so one vanished series cannot hold the tail open.
+
+        Args:
+            series_list: Series returned to the client
+
+        Returns:
+            New cursor
+        """
+        watermarks = dict(self.watermarks)
+        for series in series_list:
+            if len(series):
+                key = series_key(series.labels)
+                watermarks[key] = max(watermarks.get(key, 0.0), series.timestamps[-1])
+
+        if watermarks:
+            step = parse_step(self.step)
+            horizon = max(watermarks.values()) - max(STALENESS_SECONDS, step) - step
+            watermarks = {
+                key: watermark
+                for key, watermark in watermarks.items()
+                if watermark >= horizon
+            }
+        return HistoryCursor(self.query, self.step, watermarks)
+
+    def encode(self) -> str:
+        """Encode the cursor as an opaque URL-safe token."""
+        # Series polled together share watermarks, so group keys by them
+        groups: dict[float, list[str]] = {}
+        for key, watermark in sorted(self.watermarks.items()):
+            groups.setdefault(watermark, []).append(key)
+        payload = {
+            "v": _CURSOR_VERSION,
+            "q": self.query,
+            "s": self.step,
+            "w": [[watermark, "".join(keys)] for watermark, keys in groups.items()],
+        }
+        data = zlib.compress(json.dumps(payload, separators=(",", ":")).encode())
+        return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+    @classmethod
+    def decode(cls, token: str) -> "HistoryCursor":
+        """Decode a token made by ``encode``.
+
+        Args:
+            token: Cursor token
+
+        Returns:
+            Decoded cursor
+
+        Raises:
+            ValueError: If the token is not a valid cursor
+        """
+        try:
+            data = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+            payload = json.loads(zlib.decompress(data))
+            if payload["v"] != _CURSOR_VERSION:
+                raise ValueError(payload["v"])
+            watermarks = {
+                keys[i : i + 16]: float(watermark)
+                for watermark, keys in payload["w"]
+                for i in range(0, len(keys), 16)
+            }
+            return cls(payload["q"], payload["s"], watermarks)
+        except (binascii.Error, zlib.error, KeyError, TypeError, ValueError):
+            raise ValueError("Invalid history cursor") from None
@@ -0,0 +1,172 @@
+"""
+Tool deadlines and upstream cancellation for MCP server.
+
+Gives each tool call a time budget that travels with the request context
+down to the HTTP layer, where it becomes Prometheus' own query timeout, and
+keeps count of upstream work that was abandoned before it finished.
+"""
+
+import asyncio
+import math
+import time
+from collections.abc import AsyncIterator, Iterator
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any
+
+from .promql import format_duration, parse_duration
+
+# Loop time by which the current tool call must finish, if any
+_deadline: ContextVar[float | None] = ContextVar("tool_deadline", default=None)
+
+# Seconds the deadline in force was set to, independent of time spent since
+_budget: ContextVar[float | None] = ContextVar("tool_budget", default=None)
+
+# Endpoints that evaluate PromQL and accept a ``timeout`` parameter
+QUERY_ENDPOINTS = ("/api/v1/query", "/api/v1/query_range")
+
+
+def parse_deadlines(spec: str | None) -> dict[str, float]:
+    """Parse per-tool deadline overrides.
+
+    Args:
+        spec: Comma-separated ``tool=duration`` pairs, e.g.
+            "query_metric=30s,export_query=10m"
+
+    Returns:
+        Mapping of tool name to deadline in seconds
+
+    Raises:
+        ValueError: If an entry is malformed
+    """
+    deadlines = {}
+    for entry in (spec or "").split(","):
+        if not entry.strip():
+            continue
+        name, sep, duration = entry.partition("=")
+        if not sep or not name.strip():
+            raise ValueError(f"Invalid tool deadline: {entry.strip()}")
+        deadlines[name.strip()] = parse_duration(duration.strip())
+    return deadlines
+
+
+@contextmanager
+def deadline(seconds: float | None) -> Iterator[None]:
+    """Give upstream requests in this block a shared time budget.
+
+    A nested deadline never extends an enclosing one.
+
+    Args:
+        seconds: Budget in seconds; None leaves the current deadline as is
+    """
+    if seconds is None:
+        yield
+        return
+
+    expires = asyncio.get_running_loop().time() + seconds
+    current = _deadline.get()
+    if current is not None and current <= expires:
+        yield
+        return
+
+    token = _deadline.set(expires)
+    budget_token = _budget.set(seconds)
+    try:
+        yield
+    finally:
+        _budget.reset(budget_token)
+        _deadline.reset(token)
+
+
+@contextmanager
+def without_deadline() -> Iterator[None]:
+    """Run long-lived work started from a tool call without its deadline."""
+    token = _deadline.set(None)
+    budget_token = _budget.set(None)
+    try:
+        yield
+    finally:
+        _budget.reset(budget_token)
+        _deadline.reset(token)
+
+
+def remaining_time() -> float | None:
+    """Return seconds left in the current deadline, or None without one."""
+    expires = _deadline.get()
+    if expires is None:
+        return None
+    return max(expires - asyncio.get_running_loop().time(), 0.0)
+
+
+def with_query_timeout(
+    endpoint: str, params: dict[str, Any] | None
+) -> dict[str, Any] | None:
+    """Add the tool's budget as Prometheus' query timeout.
+
+    Prometheus stops evaluating once its timeout passes, so a query whose
+    caller gave up does not keep holding a query slot upstream. The budget
+    the deadline was set to is sent rather than the time left, rounded up
+    to whole seconds, so the same query always makes the same request.
+
+    Args:
+        endpoint: API path of the request
+        params: Query parameters
+
+    Returns:
+        Parameters with ``timeout`` set, or unchanged ones
+    """
+    budget = _budget.get()
+    if budget is None or endpoint not in QUERY_ENDPOINTS or params is None:
+        return params
+    if "timeout" in params:
+        return params
+    return {**params, "timeout": format_duration(max(math.ceil(budget), 1))}
+
+
+@dataclass
+class AbortedEndpoint:
+    """Upstream requests to one endpoint that were abandoned."""
+
+    requests: int = 0
+    seconds: float = 0.0
+
+
+class AbortStats:
+    """Counts upstream requests cancelled before completing, per endpoint."""
+
+    def __init__(self) -> None:
+        """Initialize statistics."""
+        self._endpoints: dict[str, AbortedEndpoint] = {}
+
+    def record(self, endpoint: str, seconds: float) -> None:
+        """Record one aborted request.
+
+        Args:
+            endpoint: API path of the request
+            seconds: How long it ran before it was cancelled
+        """
+        entry = self._endpoints.setdefault(endpoint, AbortedEndpoint())
+        entry.requests += 1
+        entry.seconds += seconds
+
+    def snapshot(self) -> dict[str, dict[str, float]]:
+        """Return aborted requests and seconds spent, per endpoint."""
+        return {
+            endpoint: {"requests": entry.requests, "seconds": round(entry.seconds, 3)}
+            for endpoint, entry in sorted(self._endpoints.items())
+        }
+
+    @asynccontextmanager
+    async def track(self, endpoint: str) -> AsyncIterator[None]:
+        """Record the request made in this block if it gets cancelled.
+
+        Args:
+            endpoint: API path of the request
+        """
+        started = time.monotonic()
+        try:
+            yield
+        except asyncio.CancelledError:
+            self.record(endpoint, time.monotonic() - started)
+            raise
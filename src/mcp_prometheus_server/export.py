@@ -0,0 +1,255 @@
+"""
+File export of query results for MCP server.
+
+Writes range query results to Arrow IPC, Parquet or CSV files one batch at
+a time as series arrive, so exports of any size run in bounded memory and
+only a path and a short summary are returned to the agent.
+"""
+
+import asyncio
+import contextlib
+import csv
+import re
+from array import array
+from collections.abc import AsyncIterable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from .columnar import Series
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pa_compute
+    import pyarrow.ipc as pa_ipc
+    import pyarrow.parquet as pa_parquet
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+
+EXPORT_FORMATS = ("csv", "arrow", "parquet")
+
+FILE_EXTENSIONS = {"csv": ".csv", "arrow": ".arrow", "parquet": ".parquet"}
+
+# Rows buffered before a batch is written
+DEFAULT_BATCH_ROWS = 65536
+
+_FILENAME = re.compile(r"[A-Za-z0-9][A-Za-z0-9._-]*")
+
+
+@dataclass
+class ExportSummary:
+    """Outcome of one export."""
+
+    path: Path
+    format: str
+    series: int
+    rows: int
+    bytes: int
+    start: float | None
+    end: float | None
+
+
+def export_path(directory: str | Path, filename: str, fmt: str) -> Path:
+    """Resolve the output file for an export inside the export directory.
+
+    Args:
+        directory: Configured export directory
+        filename: Base file name; the format's extension is added if missing
+        fmt: Export format
+
+    Returns:
+        Absolute output path
+
+    Raises:
+        ValueError: If the format is unknown or the name is not a plain
+            file name
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(
+            f"Invalid export format: {fmt} (expected {', '.join(EXPORT_FORMATS)})"
+        )
+    if not _FILENAME.fullmatch(filename) or ".." in filename:
+        raise ValueError(f"Invalid export file name: {filename}")
+
+    extension = FILE_EXTENSIONS[fmt]
+    if not filename.endswith(extension):
+        filename += extension
+    return Path(directory).resolve() / filename
+
+
+def selector_string(labels: dict[str, str]) -> str:
+    """Format a label set as a series selector, e.g. up{job="api"}."""
+    name = labels.get("__name__", "")
+    pairs = ",".join(
+        f"{key}={_quote(value)}"
+        for key, value in sorted(labels.items())
+        if key != "__name__"
+    )
+    return f"{name}{{{pairs}}}" if pairs or not name else name
+
+
+def _quote(value: str) -> str:
+    """Quote a label value the way PromQL string literals are written."""
+    escaped = value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return f'"{escaped}"'
+
+
+class _CSVWriter:
+    """Writes metric,timestamp,value rows."""
+
+    def __init__(self, path: Path) -> None:
+        self._file = path.open("w", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(["metric", "timestamp", "value"])
+
+    def write(self, batch: list[Series]) -> None:
+        for series in batch:
+            metric = selector_string(series.labels)
+            self._writer.writerows(
+                (metric, repr(timestamp), repr(value))
+                for timestamp, value in series.samples()
+            )
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class _ArrowWriter:
+    """Writes series/labels/timestamp/value record batches."""
+
+    def __init__(self, path: Path, fmt: str) -> None:
+        self.schema = pa.schema(
+            [
+                ("series", pa.string()),
+                ("labels", pa.map_(pa.string(), pa.string())),
+                ("timestamp", pa.timestamp("ms", tz="UTC")),
+                ("value", pa.float64()),
+            ]
+        )
+        if fmt == "parquet":
+            self._writer: Any = pa_parquet.ParquetWriter(str(path), self.schema)
+        else:
+            self._writer = pa_ipc.new_file(str(path), self.schema)
+
+    def write(self, batch: list[Series]) -> None:
+        series_names = pa.array(
+            [selector_string(series.labels) for series in batch], pa.string()
+        )
+        label_sets = pa.array(
+            [sorted(series.labels.items()) for series in batch], self.schema[1].type
+        )
+        # Repeat per-series columns to one entry per sample
+        repeats = array("i")
+        for index, series in enumerate(batch):
+            repeats.extend(array("i", [index]) * len(series))
+        indices = pa.Array.from_buffers(
+            pa.int32(), len(repeats), [None, pa.py_buffer(repeats)]
+        )
+        timestamps = _float_column([series.timestamps for series in batch])
+        values = _float_column([series.values for series in batch])
+        milliseconds = pa_compute.round(pa_compute.multiply(timestamps, 1000.0))
+
+        record_batch = pa.record_batch(
+            [
+                series_names.take(indices),
+                label_sets.take(indices),
+                milliseconds.cast(pa.int64()).cast(self.schema[2].type),
+                values,
+            ],
+            schema=self.schema,
+        )
+        self._writer.write(pa.Table.from_batches([record_batch]))
+
+    def close(self) -> None:
+        self._writer.close()
+
+
+def _float_column(columns: list[array]) -> Any:
+    """Concatenate packed float arrays into one Arrow array without boxing."""
+    joined = array("d")
+    for column in columns:
+        joined.extend(column)
+    return pa.Array.from_buffers(
+        pa.float64(), len(joined), [None, pa.py_buffer(joined)]
+    )
+
+
+async def export_series(
+    series_iter: AsyncIterable[Series],
+    path: Path,
+    fmt: str,
+    batch_rows: int = DEFAULT_BATCH_ROWS,
+) -> ExportSummary:
+    """Write series to a file as they arrive.
+
+    Rows are buffered until ``batch_rows`` is reached and each batch is
+    written in a worker thread. Data goes to a ``.partial`` file that is
+    renamed on success and removed on failure, so a path in the export
+    directory always holds a complete file.
+
+    Args:
+        series_iter: Series to export, e.g. from stream_range_query
+        path: Output path
+        fmt: Export format: "csv", "arrow" or "parquet"
+        batch_rows: Rows buffered before a batch is written
+
+    Returns:
+        Summary of the written file
+
+    Raises:
+        ValueError: If the format is unknown or needs missing PyArrow
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Invalid export format: {fmt}")
+    if fmt != "csv" and pa is None:
+        raise ValueError(
+            f"Exporting to {fmt} requires PyArrow; install the 'export' extra "
+            '(pip install "mcp-prometheus-server[export]") or use format "csv"'
+        )
+
+    partial = path.with_name(path.name + ".partial")
+    writer: _CSVWriter | _ArrowWriter = (
+        _CSVWriter(partial) if fmt == "csv" else _ArrowWriter(partial, fmt)
+    )
+
+    series_count, rows = 0, 0
+    first: float | None = None
+    last: float | None = None
+    batch: list[Series] = []
+    batch_size = 0
+
+    try:
+        async for series in series_iter:
+            series_count += 1
+            if not len(series):
+                continue
+            rows += len(series)
+            head, tail = series.timestamps[0], series.timestamps[-1]
+            first = head if first is None else min(first, head)
+            last = tail if last is None else max(last, tail)
+
+            batch.append(series)
+            batch_size += len(series)
+            if batch_size >= batch_rows:
+                await asyncio.to_thread(writer.write, batch)
+                batch, batch_size = [], 0
+
+        if batch:
+            await asyncio.to_thread(writer.write, batch)
+        await asyncio.to_thread(writer.close)
+        partial.replace(path)
+    except BaseException:
+        with contextlib.suppress(Exception):
+            writer.close()
+        partial.unlink(missing_ok=True)
+        raise
+
+    return ExportSummary(
+        path=path,
+        format=fmt,
+        series=series_count,
+        rows=rows,
+        bytes=path.stat().st_size,
+        start=first,
+        end=last,
+    )
@@ -7,19 +7,80 @@ instance value reading, and historical data access.
 """
 
 import asyncio
+import dataclasses
 import logging
 import os
+import secrets
+import time
 from typing import Any
 
-from mcp.server import Server
+from mcp.server import NotificationOptions, Server
+from mcp.server.lowlevel.helper_types import ReadResourceContents
 from mcp.server.models import InitializationOptions
+from mcp.server.session import ServerSession
 from mcp.server.stdio import stdio_server
 from mcp.types import (
+    Resource,
     TextContent,
     Tool,
 )
+from pydantic import AnyUrl
 
+from .analysis import (
+    ANOMALY_METHODS,
+    CORRELATION_METHODS,
+    DEFAULT_QUANTILES,
+    FORECAST_METHODS,
+    AnomalyReport,
+    CorrelationReport,
+    ForecastReport,
+    HistogramReport,
+    correlate,
+    detect_anomalies,
+    forecast,
+    summarize_histograms,
+)
+from .columnar import Series, series_from_matrix
+from .concurrency import (
+    DEFAULT_SESSION,
+    Priority,
+    current_session,
+    parse_weights,
+    request_priority,
+    request_session,
+)
+from .config import (
+    DEFAULT_RELOAD_INTERVAL,
+    ConfigSource,
+    ConfigWatcher,
+    load_config,
+)
+from .cost import QueryPlan, collect_plans, record_plan
+from .cursors import HistoryCursor
+from .deadlines import deadline, parse_deadlines
+from .export import EXPORT_FORMATS, ExportSummary, export_path, export_series
 from .prometheus_client import PrometheusClient
+from .promql import format_duration, parse_duration, parse_step
+from .result_store import SORT_KEYS, ResultPage, ResultStore
+from .scheduler import WarmQueryScheduler, load_watchlist
+from .snapshots import RULE_GROUP, RULE_HEALTH, RULE_NAME, RULE_TYPE, STATE
+from .sparkline import render_table, trend_content
+from .structured import (
+    query_result_content,
+    sample_value,
+    series_content,
+    series_list_content,
+)
+from .subscriptions import SubscriptionManager, format_delta
+from .targets import filter_summary
+from .tenants import (
+    ANY_TENANT,
+    parse_tenant_limits,
+    parse_tenants,
+    request_tenant,
+    validate_tenant,
+)
+from .warmup import warm_up
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -28,23 +89,191 @@ logger = logging.getLogger(__name__)
 # Create server instance
 server = Server("mcp-prometheus-server")
 
+# Text content shown to agents and the structured content it was rendered from
+ToolResult = tuple[list[TextContent], dict[str, Any] | None]
+
+# Settings come from PROMETHEUS_* environment variables, overridden by an
+# optional TOML file that is watched and re-applied while the server runs
+config_file = os.getenv("PROMETHEUS_CONFIG_FILE")
+config_reload_interval = float(
+    os.getenv("PROMETHEUS_CONFIG_RELOAD_INTERVAL", str(DEFAULT_RELOAD_INTERVAL))
+)
+config = ConfigSource(load_config(config_file) if config_file else {})
+
+# Settings only read at startup; changing them in the file needs a restart
+RESTART_SETTINGS = ("PROMETHEUS_WATCHLIST_FILE", "PROMETHEUS_WARMUP")
+
+
+def _client_settings(source: ConfigSource) -> dict[str, Any]:
+    """Read the Prometheus client settings.
+
+    Returns:
+        Keyword arguments of ``PrometheusClient``
+    """
+    return {
+        "prometheus_url": source.get("PROMETHEUS_URL", "http://localhost:9090"),
+        "auth_token": source.get("PROMETHEUS_AUTH_TOKEN"),
+        "username": source.get("PROMETHEUS_USERNAME"),
+        "password": source.get("PROMETHEUS_PASSWORD"),
+        "metadata_ttl": float(source.get("PROMETHEUS_METADATA_TTL", "300")),
+        "max_concurrency": int(source.get("PROMETHEUS_MAX_CONCURRENCY", "10")),
+        "results_cache_ttl": float(source.get("PROMETHEUS_RESULTS_CACHE_TTL", "15")),
+        "results_cache_size": int(source.get("PROMETHEUS_RESULTS_CACHE_SIZE", "256")),
+        "accept_encoding": source.get("PROMETHEUS_ACCEPT_ENCODING"),
+        "decompress_thread_threshold": int(
+            source.get("PROMETHEUS_DECOMPRESS_THREAD_THRESHOLD", str(1024 * 1024))
+        ),
+        "history_backend": source.get("PROMETHEUS_HISTORY_BACKEND", "query_range"),
+        "time_alignment": source.get("PROMETHEUS_TIME_ALIGNMENT", "1s"),
+        "priority_weights": parse_weights(source.get("PROMETHEUS_PRIORITY_WEIGHTS")),
+        # Range queries estimated to return more are downsampled, aggregated
+        # or refused; 0 disables cost estimation
+        "max_query_bytes": int(
+            source.get("PROMETHEUS_MAX_QUERY_BYTES", str(64 * 1024 * 1024))
+        ),
+        "cost_fallback": source.get("PROMETHEUS_COST_FALLBACK", "auto"),
+        "cardinality_ttl": float(source.get("PROMETHEUS_CARDINALITY_TTL", "300")),
+        "snapshot_ttl": float(source.get("PROMETHEUS_SNAPSHOT_TTL", "10")),
+        "targets_ttl": float(source.get("PROMETHEUS_TARGETS_TTL", "30")),
+        # Multi-tenant backends (Cortex, Mimir, Thanos): the tenant sent when
+        # a tool call selects none, and how many upstream requests each
+        # tenant may have in flight
+        "tenant": source.get("PROMETHEUS_TENANT") or None,
+        "tenant_limits": parse_tenant_limits(source.get("PROMETHEUS_TENANT_LIMITS")),
+    }
+
+
+def _server_settings(source: ConfigSource) -> dict[str, Any]:
+    """Read the settings of the MCP server itself.
+
+    Returns:
+        Setting values by module attribute name
+    """
+    return {
+        # Tenants tool calls may select
+        "allowed_tenants": parse_tenants(source.get("PROMETHEUS_TENANTS")),
+        # Large results are kept server-side so agents can page through them
+        "result_store_bytes": int(
+            source.get("PROMETHEUS_RESULT_STORE_BYTES", str(64 * 1024 * 1024))
+        ),
+        # Time budget of a tool call, including all upstream requests it
+        # makes; tools that scan or write large results get longer defaults
+        "tool_timeout": parse_duration(source.get("PROMETHEUS_TOOL_TIMEOUT", "60s")),
+        "tool_deadlines": {
+            "analyze_histogram": 120.0,
+            "correlate_metrics": 120.0,
+            "detect_anomalies": 120.0,
+            "forecast_metric": 120.0,
+            "export_query": 600.0,
+            **parse_deadlines(source.get("PROMETHEUS_TOOL_DEADLINES")),
+        },
+        # Directory export_query writes files to; exports are disabled when
+        # unset
+        "export_dir": source.get("PROMETHEUS_EXPORT_DIR"),
+        # Shortest interval subscriptions may re-evaluate at
+        "subscription_min_interval": float(
+            source.get("PROMETHEUS_SUBSCRIPTION_MIN_INTERVAL", "5")
+        ),
+    }
+
+
+client_settings = _client_settings(config)
+server_settings = _server_settings(config)
+for key in config.unknown():
+    logger.warning(f"Unknown configuration key: {key}")
+
 # Initialize Prometheus client
-prometheus_url = os.getenv("PROMETHEUS_URL", "http://localhost:9090")
-auth_token = os.getenv("PROMETHEUS_AUTH_TOKEN")
-username = os.getenv("PROMETHEUS_USERNAME")
-password = os.getenv("PROMETHEUS_PASSWORD")
-prometheus_client = PrometheusClient(
-    prometheus_url=prometheus_url,
-    auth_token=auth_token,
-    username=username,
-    password=password,
+prometheus_client = PrometheusClient(**client_settings)
+
+allowed_tenants: set[str] = server_settings["allowed_tenants"]
+result_store = ResultStore(max_bytes=server_settings["result_store_bytes"])
+tool_timeout: float = server_settings["tool_timeout"]
+tool_deadlines: dict[str, float] = server_settings["tool_deadlines"]
+export_dir: str | None = server_settings["export_dir"]
+
+# Tool argument selecting the tenant of a call's upstream requests
+TENANT_PROPERTY = {
+    "type": "string",
+    "description": "Tenant (X-Scope-OrgID) to query. Default: the server's configured tenant",
+}
+
+# Upstream priority class of each tool's requests; the rest are interactive
+TOOL_PRIORITIES = {
+    "analyze_histogram": Priority.BATCH,
+    "correlate_metrics": Priority.BATCH,
+    "detect_anomalies": Priority.BATCH,
+    "forecast_metric": Priority.BATCH,
+    "export_query": Priority.BATCH,
+}
+
+# Queries kept warm in the results cache
+watchlist_file = config.get("PROMETHEUS_WATCHLIST_FILE")
+
+# Warm connections and detect backend capabilities while starting up
+warmup_enabled = config.get("PROMETHEUS_WARMUP", "true").lower() not in (
+    "0",
+    "false",
+    "no",
+)
+
+# Subscriptions share one evaluation loop per query and interval
+subscription_manager = SubscriptionManager(
+    prometheus_client, min_interval=server_settings["subscription_min_interval"]
 )
 
 
+def apply_config(values: dict[str, str]) -> list[str]:
+    """Apply the settings of a changed configuration file to the live server.
+
+    Everything is parsed and validated before anything changes, and applied
+    without yielding to the event loop, so a bad file leaves the running
+    configuration untouched and no tool call sees half of a change. Warm
+    caches, pooled connections, subscriptions and queued requests are kept.
+
+    Args:
+        values: Settings parsed from the file
+
+    Returns:
+        Names of the settings that changed
+
+    Raises:
+        ValueError: If a setting is invalid
+    """
+    global config, client_settings, server_settings
+    global allowed_tenants, tool_timeout, tool_deadlines, export_dir
+
+    source = ConfigSource(values)
+    new_client = _client_settings(source)
+    new_server = _server_settings(source)
+    for name in RESTART_SETTINGS:
+        if source.get(name) != config.get(name):
+            logger.warning(f"{name} changed; it takes effect after a restart")
+    for key in source.unknown():
+        logger.warning(f"Unknown configuration key: {key}")
+
+    changed = prometheus_client.reconfigure(**new_client)
+    changed += sorted(
+        name for name, value in new_server.items() if value != server_settings[name]
+    )
+
+    config, client_settings, server_settings = source, new_client, new_server
+    allowed_tenants = new_server["allowed_tenants"]
+    tool_timeout = new_server["tool_timeout"]
+    tool_deadlines = new_server["tool_deadlines"]
+    export_dir = new_server["export_dir"]
+    result_store.resize(new_server["result_store_bytes"])
+    subscription_manager.min_interval = new_server["subscription_min_interval"]
+    return changed
+
+
 @server.list_tools()
 async def handle_list_tools() -> list[Tool]:
-    """List available Prometheus tools."""
-    return [
+    """List available Prometheus tools.
+
+    When tool calls may select a tenant, every tool takes a ``tenant``
+    argument.
+    """
+    tools = [
         Tool(
             name="query_metric",
             description="Execute any PromQL query against Prometheus. Use this for complex queries, aggregations, or when you need specific metric combinations. Returns both current values and time series data depending on the query type.",
@@ -60,13 +289,23 @@ async def handle_list_tools() -> list[Tool]:
                         "description": "Time offset from now for the query (e.g., '5m', '1h', '24h'). Default: '5m'",
                         "default": "5m",
                     },
+                    "step": {
+                        "type": "string",
+                        "description": "Resolution step of the returned series (e.g., '15s', '1m'). May be raised automatically for expensive queries. Default: '1m'",
+                        "default": "1m",
+                    },
+                    "aggregate_by": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Labels to sum by if the query is too expensive to return every series (e.g., ['job']). Without it, only the top series that fit are returned.",
+                    },
                 },
                 "required": ["query"],
             },
         ),
         Tool(
             name="get_instance_value",
-            description="Get the current value of a specific metric for a particular instance. Use this when you know the exact metric name and instance identifier. Returns a single numeric value with timestamp.",
+            description="Get the current value of a specific metric for a particular instance. Use this when you know the exact metric name and instance identifier. Returns a single numeric value with timestamp. To check many instances at once, pass 'instances' or 'instance_regex' instead of 'instance' to get an instance-to-value table from a single query.",
             inputSchema={
                 "type": "object",
                 "properties": {
@@ -78,13 +317,22 @@ async def handle_list_tools() -> list[Tool]:
                         "type": "string",
                         "description": "Instance identifier from the 'instance' label (e.g., 'server1:8080', '192.168.1.100:9090', 'web-01')",
                     },
+                    "instances": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Several instance identifiers to look up together (e.g., ['web-01', 'web-02'])",
+                    },
+                    "instance_regex": {
+                        "type": "string",
+                        "description": "Regex the 'instance' label must fully match (e.g., 'web-.*:9100')",
+                    },
                     "relative_time": {
                         "type": "string",
                         "description": "Time offset from now for the query (e.g., '5m', '1h', '24h'). Default: '5m'",
                         "default": "5m",
                     },
                 },
-                "required": ["metric_name", "instance"],
+                "required": ["metric_name"],
             },
         ),
         Tool(
@@ -107,6 +355,21 @@ async def handle_list_tools() -> list[Tool]:
                         "description": "Data point interval - how often to sample the metric (e.g., '1m', '5m', '1h'). Smaller steps = more data points. Default: '1m'",
                         "default": "1m",
                     },
+                    "aggregate_by": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Labels to sum by if the query is too expensive to return every series (e.g., ['job']). Without it, only the top series that fit are returned.",
+                    },
+                    "format": {
+                        "type": "string",
+                        "enum": ["sparkline", "points"],
+                        "description": "How to show the data: 'sparkline' for one line per series with its trend, min, max and last value, or 'points' for the latest raw data points. Default: 'sparkline'",
+                        "default": "sparkline",
+                    },
+                    "cursor": {
+                        "type": "string",
+                        "description": "Cursor returned by a previous call with the same metric_name and step. Only samples newer than it are fetched and returned, so polling stays cheap.",
+                    },
                 },
                 "required": ["metric_name"],
             },
@@ -120,182 +383,1865 @@ async def handle_list_tools() -> list[Tool]:
                     "pattern": {
                         "type": "string",
                         "description": "Optional regex pattern to filter metrics (e.g., 'cpu.*', 'memory.*', 'http_.*'). If not provided, returns all available metrics.",
-                    }
+                    },
+                    "include_metadata": {
+                        "type": "boolean",
+                        "description": "Annotate each metric with its type and help text from the cached metadata. Default: false",
+                        "default": False,
+                    },
                 },
                 "required": [],
             },
         ),
-    ]
-
-
-@server.call_tool()
-async def handle_call_tool(
-    name: str, arguments: dict[str, Any] | None
-) -> list[TextContent]:
-    """Handle Prometheus tool calls."""
-    if not arguments:
-        arguments = {}
-
-    try:
-        if name == "query_metric":
-            query = arguments.get("query", "")
-            relative_time = arguments.get("relative_time", "5m")
-
-            if not query:
-                raise ValueError("Query parameter is required")
-
-            result = await prometheus_client.query_metric(query, relative_time)
-
-            return [
-                TextContent(
-                    type="text", text=f"Query Result:\n{_format_query_result(result)}"
-                )
-            ]
-
-        if name == "get_instance_value":
-            metric_name = arguments.get("metric_name", "")
-            instance = arguments.get("instance", "")
-            relative_time = arguments.get("relative_time", "5m")
-
-            if not metric_name or not instance:
-                raise ValueError("metric_name and instance parameters are required")
-
-            value = await prometheus_client.get_instance_value(
-                metric_name, instance, relative_time
-            )
-
-            if value is not None:
-                return [
-                    TextContent(
-                        type="text",
-                        text=f"Instance '{instance}' metric '{metric_name}' value: {value}",
-                    )
-                ]
-            return [
-                TextContent(
-                    type="text",
-                    text=f"No value found for metric '{metric_name}' on instance '{instance}'",
-                )
-            ]
-
-        if name == "get_metric_history":
-            metric_name = arguments.get("metric_name", "")
-            relative_time = arguments.get("relative_time", "1h")
-            step = arguments.get("step", "1m")
-
-            if not metric_name:
-                raise ValueError("metric_name parameter is required")
-
-            history = await prometheus_client.get_metric_history(
-                metric_name, relative_time, step
-            )
-
-            if history:
-                history_text = (
-                    f"Historical data for '{metric_name}' ({relative_time}):\n"
-                )
-                for data_point in history[-10:]:  # Show last 10 points
-                    timestamp = data_point["timestamp"]
-                    value = data_point["value"]
-                    labels = data_point["labels"]
-                    history_text += f"  {timestamp}: {value} {labels}\n"
-
-                return [TextContent(type="text", text=history_text)]
-            return [
-                TextContent(
-                    type="text",
-                    text=f"No historical data found for metric '{metric_name}'",
-                )
-            ]
-
-        if name == "list_available_metrics":
-            pattern = arguments.get("pattern")
-
-            metrics = await prometheus_client.list_available_metrics(pattern)
-
-            if metrics:
-                metrics_text = f"Available metrics ({len(metrics)} found):\n"
-                for metric in metrics[:20]:  # Show first 20 metrics
-                    metrics_text += f"  {metric}\n"
-
-                if len(metrics) > 20:
-                    metrics_text += f"  ... and {len(metrics) - 20} more"
-
-                return [TextContent(type="text", text=metrics_text)]
-            return [TextContent(type="text", text="No metrics found")]
-
-        raise ValueError(f"Unknown tool: {name}")
-
-    except Exception as e:
-        logger.error(f"Tool call failed: {e}")
-        return [TextContent(type="text", text=f"Error: {e!s}")]
-
-
-def _format_query_result(result: dict[str, Any]) -> str:
-    """Format Prometheus query result for display."""
-    if result.get("status") != "success":
-        return f"Query failed: {result.get('error', 'Unknown error')}"
-
-    data = result.get("data", {})
-    result_type = data.get("resultType", "")
-    results = data.get("result", [])
-
-    if not results:
-        return "No data returned"
-
-    formatted = f"Result type: {result_type}\n"
-
-    for i, series in enumerate(results[:5]):  # Show first 5 series
-        metric = series.get("metric", {})
-        formatted += f"\nSeries {i + 1}:\n"
-        formatted += f"  Labels: {metric}\n"
-
-        if "value" in series:
-            # Instant query result
-            timestamp, value = series["value"]
-            formatted += f"  Value: {value} (at {timestamp})\n"
-        elif "values" in series:
-            # Range query result
-            values = series["values"]
-            formatted += f"  Data points: {len(values)}\n"
-            if values:
-                latest = values[-1]
-                formatted += f"  Latest: {latest[1]} (at {latest[0]})\n"
-
-    if len(results) > 5:
-        formatted += f"\n... and {len(results) - 5} more series"
-
-    return formatted
-
-
-async def main() -> None:
-    """Run the MCP Prometheus server."""
-    logger.info("Starting MCP Prometheus server...")
-    logger.info(f"Prometheus URL: {prometheus_url}")
-    
-    # Log authentication method
-    if auth_token:
-        logger.info("Using Bearer token authentication")
-    elif username and password:
-        logger.info(f"Using basic authentication for user: {username}")
-    else:
-        logger.info("No authentication configured")
-    
+        Tool(
+            name="get_metric_metadata",
+            description="Get the type (counter, gauge, histogram, summary), help text and unit of metrics. Use this before querying to pick the right functions, e.g. rate() for counters or histogram_quantile() for histograms. Served from a periodically refreshed cache.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "metric_name": {
+                        "type": "string",
+                        "description": "Exact metric name to look up (e.g., 'http_requests_total'). Histogram and summary series such as '_bucket' resolve to their parent metric.",
+                    },
+                    "pattern": {
+                        "type": "string",
+                        "description": "Optional regex pattern to filter metric names (e.g., 'http_.*')",
+                    },
+                    "metric_type": {
+                        "type": "string",
+                        "description": "Optional metric type filter",
+                        "enum": [
+                            "counter",
+                            "gauge",
+                            "histogram",
+                            "gaugehistogram",
+                            "summary",
+                            "info",
+                            "stateset",
+                            "unknown",
+                        ],
+                    },
+                },
+                "required": [],
+            },
+        ),
+        Tool(
+            name="subscribe_metric",
+            description="Subscribe to a PromQL query instead of polling it. The server evaluates the query on an interval and sends a resource-updated notification when any series changes; read the returned resource URI to get only the changed, new and removed series since the last read.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "query": {
+                        "type": "string",
+                        "description": "PromQL query to follow (e.g., 'up == 0', 'rate(http_requests_total[5m])')",
+                    },
+                    "interval": {
+                        "type": "string",
+                        "description": "How often to evaluate the query (e.g., '15s', '1m'). Default: '15s'",
+                        "default": "15s",
+                    },
+                },
+                "required": ["query"],
+            },
+        ),
+        Tool(
+            name="unsubscribe_metric",
+            description="Stop a subscription created with subscribe_metric.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "subscription_id": {
+                        "type": "string",
+                        "description": "Subscription id or resource URI returned by subscribe_metric",
+                    },
+                },
+                "required": ["subscription_id"],
+            },
+        ),
+        Tool(
+            name="detect_anomalies",
+            description="Find what changed recently across many series at once. Fetches one range result for the query and scores every series against its own baseline (z-score, robust MAD score and CUSUM change points), returning only the ranked anomalous series. Use this instead of reading histories one by one when asking 'what changed in the last hour?'.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "query": {
+                        "type": "string",
+                        "description": "PromQL query returning the series to scan (e.g., 'rate(http_requests_total[5m])', 'node_load1')",
+                    },
+                    "window": {
+                        "type": "string",
+                        "description": "Recent period to examine (e.g., '15m', '1h'). Default: '1h'",
+                        "default": "1h",
+                    },
+                    "baseline": {
+                        "type": "string",
+                        "description": "Period before the window that defines normal behaviour (e.g., '6h', '1d'). Default: '6h'",
+                        "default": "6h",
+                    },
+                    "step": {
+                        "type": "string",
+                        "description": "Resolution of the range query (e.g., '1m', '5m'). Default: '1m'",
+                        "default": "1m",
+                    },
+                    "method": {
+                        "type": "string",
+                        "description": "Scoring method: one of the methods or 'all'. Default: 'all'",
+                        "enum": ["all", *ANOMALY_METHODS],
+                        "default": "all",
+                    },
+                    "threshold": {
+                        "type": "number",
+                        "description": "Deviation in standard deviations above which a series is anomalous. Default: 3",
+                        "default": 3.0,
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "description": "Maximum number of anomalous series to return. Default: 10",
+                        "default": 10,
+                    },
+                },
+                "required": ["query"],
+            },
+        ),
+        Tool(
+            name="correlate_metrics",
+            description="Find which metrics move together with a target series. Fetches the target and all candidates over one time grid (candidate metric names are batched into a few queries), correlates every candidate with the target at once and returns the strongest correlates, optionally shifted in time to find leading or lagging signals. Use this to look for causes or effects of a change.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "target": {
+                        "type": "string",
+                        "description": "PromQL query returning exactly one series (e.g., 'sum(rate(http_requests_total{code=~\"5..\"}[5m]))')",
+                    },
+                    "candidates": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Metric names or PromQL queries to compare with the target; every series they return is a candidate (e.g., ['node_load1', 'rate(node_cpu_seconds_total[5m])'])",
+                    },
+                    "relative_time": {
+                        "type": "string",
+                        "description": "Time range to compare over (e.g., '1h', '6h'). Default: '1h'",
+                        "default": "1h",
+                    },
+                    "step": {
+                        "type": "string",
+                        "description": "Resolution of the range queries (e.g., '1m', '5m'). Default: '1m'",
+                        "default": "1m",
+                    },
+                    "method": {
+                        "type": "string",
+                        "description": "'pearson' for linear correlation or 'spearman' for rank correlation, which also catches non-linear monotonic relations. Default: 'pearson'",
+                        "enum": list(CORRELATION_METHODS),
+                        "default": "pearson",
+                    },
+                    "max_lag": {
+                        "type": "string",
+                        "description": "Largest time shift to try in either direction (e.g., '10m'); '0s' compares samples at the same time only. Default: '0s'",
+                        "default": "0s",
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "description": "Maximum number of correlated series to return. Default: 10",
+                        "default": 10,
+                    },
+                },
+                "required": ["target", "candidates"],
+            },
+        ),
+        Tool(
+            name="forecast_metric",
+            description="Forecast series from their history and estimate when they cross a threshold, e.g. 'when will this disk fill?'. Fits a linear trend, Holt-Winters smoothing or a seasonal baseline to every series of the query at once and returns forecasts with confidence bands, soonest threshold crossings first. History comes from the results cache when it was fetched recently.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "query": {
+                        "type": "string",
+                        "description": "PromQL query returning the series to forecast (e.g., 'node_filesystem_avail_bytes{mountpoint=\"/\"}')",
+                    },
+                    "relative_time": {
+                        "type": "string",
+                        "description": "History to fit (e.g., '1d', '7d'). Default: '1d'",
+                        "default": "1d",
+                    },
+                    "step": {
+                        "type": "string",
+                        "description": "Resolution of history and forecast (e.g., '5m', '1h'). Default: '5m'",
+                        "default": "5m",
+                    },
+                    "horizon": {
+                        "type": "string",
+                        "description": "How far past now to forecast (e.g., '6h', '7d'). Default: '1d'",
+                        "default": "1d",
+                    },
+                    "method": {
+                        "type": "string",
+                        "description": "'linear' for a trend line, 'holt_winters' for exponential smoothing (seasonal when season is given) or 'seasonal' to repeat the last season. Default: 'linear'",
+                        "enum": list(FORECAST_METHODS),
+                        "default": "linear",
+                    },
+                    "season": {
+                        "type": "string",
+                        "description": "Length of the repeating pattern (e.g., '1d', '7d'); required for 'seasonal', optional for 'holt_winters'",
+                    },
+                    "threshold": {
+                        "type": "number",
+                        "description": "Value whose crossing time is estimated (e.g., 0 for free bytes running out)",
+                    },
+                    "confidence": {
+                        "type": "number",
+                        "description": "Coverage of the confidence band, between 0 and 1. Default: 0.95",
+                        "default": 0.95,
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "description": "Maximum number of series to return. Default: 10",
+                        "default": 10,
+                    },
+                },
+                "required": ["query"],
+            },
+        ),
+        Tool(
+            name="analyze_histogram",
+            description="Compute many quantiles (e.g., p50, p90, p99), the mean and bucket heatmap data of a latency or size histogram from a single fetch of its bucket rates, instead of one histogram_quantile query per quantile. Quantiles are interpolated like histogram_quantile, per timestamp and over the whole window. Works with classic '_bucket' histograms and native histograms.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "metric": {
+                        "type": "string",
+                        "description": "Histogram name with optional label matchers (e.g., 'http_request_duration_seconds{job=\"api\"}')",
+                    },
+                    "quantiles": {
+                        "type": "array",
+                        "items": {"type": "number"},
+                        "description": "Quantiles between 0 and 1. Default: [0.5, 0.9, 0.99]",
+                    },
+                    "by": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Labels to keep separate histograms for (e.g., ['handler']); all other labels are summed",
+                    },
+                    "relative_time": {
+                        "type": "string",
+                        "description": "Time range to analyze (e.g., '1h', '6h'). Default: '1h'",
+                        "default": "1h",
+                    },
+                    "step": {
+                        "type": "string",
+                        "description": "Resolution of the range query (e.g., '1m', '5m'). Default: '1m'",
+                        "default": "1m",
+                    },
+                    "rate_window": {
+                        "type": "string",
+                        "description": "Range of the rate() over the buckets (e.g., '5m'). Default: '5m'",
+                        "default": "5m",
+                    },
+                    "type": {
+                        "type": "string",
+                        "description": "Histogram type; 'auto' tries classic buckets first, then native. Default: 'auto'",
+                        "enum": ["auto", "classic", "native"],
+                        "default": "auto",
+                    },
+                    "heatmap": {
+                        "type": "boolean",
+                        "description": "Also return quantiles over time and bucket rates per timestamp. Default: false",
+                        "default": False,
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "description": "Maximum number of histograms to return, busiest first. Default: 10",
+                        "default": 10,
+                    },
+                },
+                "required": ["metric"],
+            },
+        ),
+        Tool(
+            name="browse_result",
+            description="Page through a stored result by its handle (returned by query_metric and list_available_metrics when output was truncated). Filter series by label regex, slice samples by time and sort, without querying Prometheus again.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "handle": {
+                        "type": "string",
+                        "description": "Result handle (e.g., 'r-AbCdEf12')",
+                    },
+                    "offset": {
+                        "type": "integer",
+                        "description": "Index of the first series to show. Default: 0",
+                        "minimum": 0,
+                        "default": 0,
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "description": "Number of series to show. Default: 20",
+                        "minimum": 0,
+                        "default": 20,
+                    },
+                    "match": {
+                        "type": "object",
+                        "description": "Label name to regex that must fully match (e.g., {'job': 'api.*', 'code': '5..'})",
+                        "additionalProperties": {"type": "string"},
+                    },
+                    "start": {
+                        "type": "number",
+                        "description": "Only use samples at or after this Unix timestamp",
+                    },
+                    "end": {
+                        "type": "number",
+                        "description": "Only use samples at or before this Unix timestamp",
+                    },
+                    "sort": {
+                        "type": "string",
+                        "description": "Sort by labels or by a statistic of the samples. Default: 'labels'",
+                        "enum": list(SORT_KEYS),
+                        "default": "labels",
+                    },
+                    "order": {
+                        "type": "string",
+                        "description": "Sort order. Default: ascending for labels, descending for statistics",
+                        "enum": ["asc", "desc"],
+                    },
+                },
+                "required": ["handle"],
+            },
+        ),
+        Tool(
+            name="summarize_result",
+            description="Summarize a stored result by its handle: series and sample counts, time span, and for each label the number of distinct values and the most common ones. Use this to decide how to filter with browse_result.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "handle": {
+                        "type": "string",
+                        "description": "Result handle (e.g., 'r-AbCdEf12')",
+                    },
+                },
+                "required": ["handle"],
+            },
+        ),
+        Tool(
+            name="export_query",
+            description="Export a range query result to a file (Arrow IPC, Parquet or CSV) in the server's export directory instead of returning the data. The result is streamed to disk series by series, so any size works; only the file path and a summary are returned. Use this to hand large results to other tools.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "query": {
+                        "type": "string",
+                        "description": "PromQL query to export (e.g., 'rate(http_requests_total[5m])')",
+                    },
+                    "relative_time": {
+                        "type": "string",
+                        "description": "Time range to look back (e.g., '1h', '1d', '1w'). Default: '1h'",
+                        "default": "1h",
+                    },
+                    "step": {
+                        "type": "string",
+                        "description": "Query resolution step width (e.g., '15s', '1m', '5m'). Default: '1m'",
+                        "default": "1m",
+                    },
+                    "format": {
+                        "type": "string",
+                        "description": "File format; arrow and parquet need PyArrow. Default: 'parquet'",
+                        "enum": list(EXPORT_FORMATS),
+                        "default": "parquet",
+                    },
+                    "filename": {
+                        "type": "string",
+                        "description": "File name inside the export directory, without directories (e.g., 'cpu-week'). Default: generated from the time",
+                    },
+                },
+                "required": ["query"],
+            },
+        ),
+        Tool(
+            name="get_alerts",
+            description="List active alerts (firing and pending) from Prometheus. Use this during incidents to see what is firing instead of querying ALERTS. Served from a shared snapshot refreshed every few seconds; pass the returned etag to learn cheaply whether anything changed.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "alertname": {
+                        "type": "string",
+                        "description": "Only alerts with this alertname (e.g., 'HighErrorRate')",
+                    },
+                    "severity": {
+                        "type": "string",
+                        "description": "Only alerts with this severity label (e.g., 'critical', 'warning')",
+                    },
+                    "state": {
+                        "type": "string",
+                        "enum": ["firing", "pending"],
+                        "description": "Only alerts in this state",
+                    },
+                    "labels": {
+                        "type": "object",
+                        "additionalProperties": {"type": "string"},
+                        "description": "Other label values the alerts must have (e.g., {'namespace': 'prod'})",
+                    },
+                    "etag": {
+                        "type": "string",
+                        "description": "Etag from a previous call; if no alert changed since, only that is reported",
+                    },
+                },
+                "required": [],
+            },
+        ),
+        Tool(
+            name="get_rules",
+            description="List alerting and recording rules with their health, state and last error. Use this to check whether an alert is defined, why it is not firing or which rules fail to evaluate.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "name": {
+                        "type": "string",
+                        "description": "Only rules with this name (alert name or recorded metric)",
+                    },
+                    "type": {
+                        "type": "string",
+                        "enum": ["alerting", "recording"],
+                        "description": "Only rules of this type",
+                    },
+                    "health": {
+                        "type": "string",
+                        "enum": ["ok", "err", "unknown"],
+                        "description": "Only rules with this health (e.g., 'err' for failing rules)",
+                    },
+                    "group": {
+                        "type": "string",
+                        "description": "Only rules in this rule group",
+                    },
+                    "labels": {
+                        "type": "object",
+                        "additionalProperties": {"type": "string"},
+                        "description": "Label values the rules must set (e.g., {'severity': 'critical'})",
+                    },
+                    "etag": {
+                        "type": "string",
+                        "description": "Etag from a previous call; if no rule changed since, only that is reported",
+                    },
+                },
+                "required": [],
+            },
+        ),
+        Tool(
+            name="get_targets",
+            description="Summarize scrape target health: up, down and unknown targets per job, scrape durations and the most common scrape errors, with details only for unhealthy targets. Use this to find which jobs have targets down without listing every target.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "job": {
+                        "type": "string",
+                        "description": "Only targets of this job",
+                    },
+                    "pool": {
+                        "type": "string",
+                        "description": "Only targets of this scrape pool (filtered by Prometheus)",
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "description": "Maximum jobs and unhealthy targets to show. Default: 20",
+                        "default": 20,
+                        "minimum": 1,
+                    },
+                },
+                "required": [],
+            },
+        ),
+        Tool(
+            name="get_server_stats",
+            description="Show how the server talks to Prometheus: per-endpoint request counts, compressed (wire) versus decoded bytes, results cache hit rate and upstream concurrency. Use this to diagnose slow or expensive queries.",
+            inputSchema={
+                "type": "object",
+                "properties": {},
+                "required": [],
+            },
+        ),
+    ]
+
+    if allowed_tenants:
+        for tool in tools:
+            tool.inputSchema["properties"]["tenant"] = TENANT_PROPERTY
+    return tools
+
+
+@server.call_tool()
+async def handle_call_tool(name: str, arguments: dict[str, Any] | None) -> ToolResult:
+    """Handle Prometheus tool calls within the tool's deadline.
+
+    Cancelling the call, by the client or by the deadline, cancels the
+    upstream requests it is waiting on. Upstream requests are queued under
+    the tool's priority class and the calling client's session, and sent
+    for the selected tenant. Queries shaped to stay within the cost limit
+    are noted after the result.
+
+    Returns:
+        Text content for agents and, for tools that return data, structured
+        content for programs
+    """
+    budget = tool_deadlines.get(name, tool_timeout)
+    priority = TOOL_PRIORITIES.get(name, Priority.INTERACTIVE)
+    try:
+        tenant = _select_tenant(arguments)
+    except ValueError as e:
+        return _text(f"Error: {e!s}")
+
+    try:
+        with (
+            deadline(budget),
+            request_priority(priority),
+            request_session(_session_id()),
+            request_tenant(tenant),
+            collect_plans() as plans,
+        ):
+            content, structured = await asyncio.wait_for(
+                _call_tool(name, arguments), budget
+            )
+        if plans and content:
+            notes = "\n".join(_format_query_plan(plan) for plan in plans)
+            content[0] = TextContent(type="text", text=f"{content[0].text}\n\n{notes}")
+            if structured is not None:
+                structured["shaping"] = [_plan_content(plan) for plan in plans]
+        return content, structured
+    except asyncio.TimeoutError:
+        logger.warning(f"Tool call '{name}' exceeded its deadline of {budget}s")
+        return _text(
+            f"Error: '{name}' did not finish within "
+            f"{format_duration(budget)}; its upstream queries were "
+            "cancelled. Narrow the query or time range and retry."
+        )
+
+
+def _session_id() -> str:
+    """Return an identifier for the client session of the current request."""
+    if current_session() != DEFAULT_SESSION:
+        # Set by _serve for the whole connection
+        return current_session()
+    try:
+        session = server.request_context.session
+    except LookupError:
+        return DEFAULT_SESSION
+    return f"session-{id(session):x}"
+
+
+def _select_tenant(arguments: dict[str, Any] | None) -> str | None:
+    """Return the tenant a tool call selects, or None for the default.
+
+    Raises:
+        ValueError: If the tenant is invalid or may not be selected
+    """
+    tenant: str | None = (arguments or {}).get("tenant")
+    if not tenant:
+        return None
+
+    validate_tenant(tenant)
+    if tenant != prometheus_client.tenant and not (
+        tenant in allowed_tenants or ANY_TENANT in allowed_tenants
+    ):
+        raise ValueError(f"Tenant not allowed: {tenant}")
+    return tenant
+
+
+def _text(text: str, structured: dict[str, Any] | None = None) -> ToolResult:
+    """Build a tool result from its text view and structured content."""
+    return [TextContent(type="text", text=text)], structured
+
+
+async def _call_tool(name: str, arguments: dict[str, Any] | None) -> ToolResult:
+    """Run a tool call and render its result or error."""
+    if not arguments:
+        arguments = {}
+
+    try:
+        if name == "query_metric":
+            query = arguments.get("query", "")
+            relative_time = arguments.get("relative_time", "5m")
+            step = arguments.get("step", "1m")
+            aggregate_by = arguments.get("aggregate_by")
+
+            if not query:
+                raise ValueError("Query parameter is required")
+
+            result = await prometheus_client.query_metric(
+                query, relative_time, step=step, aggregate_by=aggregate_by
+            )
+
+            content = query_result_content(result)
+            lines = ["Query Result:", _format_query_content(content)]
+            handle = _store_truncated_result(query, result)
+            if handle:
+                content["handle"] = handle
+                lines.append(
+                    f"Result handle: {handle} (use browse_result to page, "
+                    "filter or sort all series without re-querying)"
+                )
+
+            return _text("\n".join(lines), content)
+
+        if name == "get_instance_value":
+            metric_name = arguments.get("metric_name", "")
+            instance = arguments.get("instance", "")
+            instances = arguments.get("instances")
+            instance_regex = arguments.get("instance_regex")
+            relative_time = arguments.get("relative_time", "5m")
+
+            if metric_name and (instances or instance_regex) and not instance:
+                values = await prometheus_client.get_instance_values(
+                    metric_name, instances, instance_regex, relative_time
+                )
+                return _text(
+                    _format_instance_values(metric_name, values),
+                    {"metric": metric_name, "values": _json_values(values)},
+                )
+
+            if not metric_name or not instance:
+                raise ValueError(
+                    "metric_name and instance parameters are required "
+                    "(or instances / instance_regex for several instances)"
+                )
+
+            value = await prometheus_client.get_instance_value(
+                metric_name, instance, relative_time
+            )
+
+            instance_content = {
+                "metric": metric_name,
+                "values": _json_values({instance: value}),
+            }
+            if value is not None:
+                return _text(
+                    f"Instance '{instance}' metric '{metric_name}' value: {value}",
+                    instance_content,
+                )
+            return _text(
+                f"No value found for metric '{metric_name}' on instance '{instance}'",
+                instance_content,
+            )
+
+        if name == "get_metric_history":
+            metric_name = arguments.get("metric_name", "")
+            relative_time = arguments.get("relative_time", "1h")
+            step = arguments.get("step", "1m")
+            aggregate_by = arguments.get("aggregate_by")
+            history_format = arguments.get("format", "sparkline")
+            cursor_token = arguments.get("cursor")
+
+            if not metric_name:
+                raise ValueError("metric_name parameter is required")
+            if history_format not in ("sparkline", "points"):
+                raise ValueError(f"Invalid history format: {history_format}")
+            cursor = HistoryCursor.decode(cursor_token) if cursor_token else None
+
+            with collect_plans() as plans:
+                series_list = await prometheus_client.get_history_series(
+                    metric_name,
+                    relative_time,
+                    step,
+                    aggregate_by=aggregate_by,
+                    cursor=cursor,
+                )
+            for plan in plans:
+                record_plan(plan)
+
+            # Tie a new cursor to the query as run, which cost shaping may
+            # have coarsened or aggregated
+            query, query_step = (
+                (plans[-1].query, plans[-1].step) if plans else (metric_name, step)
+            )
+            seen = cursor or HistoryCursor.for_query(query, query_step)
+            next_cursor = seen.advance(series_list).encode()
+            # The sparkline table gets its columns, not every raw sample
+            content = {
+                "metric": metric_name,
+                "relative_time": relative_time,
+                "cursor": next_cursor,
+                **(
+                    trend_content(series_list)
+                    if history_format == "sparkline"
+                    else series_list_content(series_list)
+                ),
+            }
+            cursor_line = (
+                f"Cursor: {next_cursor} (pass it back to get only newer samples)"
+            )
+            title = f"Historical data for '{metric_name}' ({relative_time})"
+            if cursor is not None:
+                title = f"New data for '{metric_name}' since the cursor"
+
+            samples = sum(len(series) for series in series_list)
+            if samples and history_format == "sparkline":
+                lines = [
+                    f"{title}: {len(series_list)} series, {samples} points",
+                    *render_table(series_list),
+                    cursor_line,
+                ]
+                return _text("\n".join(lines), content)
+            if samples:
+                lines = [f"{title}:"]
+                lines.extend(
+                    f"  {timestamp}: {value} {labels}"
+                    for timestamp, value, labels in _last_samples(series_list, 10)
+                )
+                lines.append(cursor_line)
+                return _text("\n".join(lines), content)
+            if cursor is not None:
+                return _text(
+                    f"No new data for '{metric_name}' since the cursor\n{cursor_line}",
+                    content,
+                )
+            return _text(
+                f"No historical data found for metric '{metric_name}'", content
+            )
+
+        if name == "list_available_metrics":
+            pattern = arguments.get("pattern")
+            include_metadata = arguments.get("include_metadata", False)
+
+            metrics = await prometheus_client.list_available_metrics(pattern)
+
+            if metrics:
+                metadata: dict[str, dict[str, str]] = {}
+                if include_metadata:
+                    metadata = await prometheus_client.describe_metrics(metrics[:20])
+
+                content = {"metrics": metrics}
+                if metadata:
+                    content["metadata"] = metadata
+                lines = [f"Available metrics ({len(metrics)} found):"]
+                lines.extend(
+                    f"  {_format_metric_line(metric, metadata)}"
+                    for metric in metrics[:20]  # Show first 20 metrics
+                )
+
+                if len(metrics) > 20:
+                    lines.append(f"  ... and {len(metrics) - 20} more")
+                    handle = result_store.put(
+                        pattern or ".+",
+                        "metrics",
+                        [Series(labels={"__name__": metric}) for metric in metrics],
+                    )
+                    if handle:
+                        content["handle"] = handle
+                        lines.append(
+                            f"Result handle: {handle} (use browse_result "
+                            "to page through all names)"
+                        )
+                else:
+                    lines.append("")
+
+                return _text("\n".join(lines), content)
+            return _text("No metrics found", {"metrics": []})
+
+        if name == "get_metric_metadata":
+            metric_name = arguments.get("metric_name")
+            pattern = arguments.get("pattern")
+            metric_type = arguments.get("metric_type")
+
+            metadata = await prometheus_client.get_metric_metadata(
+                metric_name, pattern, metric_type
+            )
+
+            if metadata:
+                lines = [f"Metric metadata ({len(metadata)} found):"]
+                lines.extend(
+                    f"  {_format_metric_line(metric, metadata)}"
+                    for metric in list(metadata)[:50]  # Show first 50 metrics
+                )
+
+                if len(metadata) > 50:
+                    lines.append(f"  ... and {len(metadata) - 50} more")
+                else:
+                    lines.append("")
+
+                return _text("\n".join(lines), {"metadata": metadata})
+            return _text("No metric metadata found", {"metadata": {}})
+
+        if name == "subscribe_metric":
+            query = arguments.get("query", "")
+            interval = arguments.get("interval", "15s")
+
+            if not query:
+                raise ValueError("Query parameter is required")
+
+            session = _current_session()
+
+            async def notify(uri: str) -> None:
+                await session.send_resource_updated(AnyUrl(uri))
+
+            subscription = await subscription_manager.subscribe(
+                query, parse_duration(interval), notify
+            )
+            delta = subscription.take_delta()
+
+            lines = [
+                f"Subscribed to '{query}' every {interval}",
+                f"Subscription id: {subscription.id}",
+                f"Resource URI: {subscription.uri}",
+                f"Initial state ({len(delta['changed'])} series):",
+            ]
+            lines.extend(
+                f"  {series['labels']}: {series['value']}"
+                for series in delta["changed"][:20]  # Show first 20 series
+            )
+
+            if len(delta["changed"]) > 20:
+                lines.append(f"  ... and {len(delta['changed']) - 20} more")
+            else:
+                lines.append("")
+
+            return _text("\n".join(lines), {"uri": subscription.uri, **delta})
+
+        if name == "unsubscribe_metric":
+            subscription_id = arguments.get("subscription_id", "")
+
+            if not subscription_id:
+                raise ValueError("subscription_id parameter is required")
+
+            if await subscription_manager.unsubscribe(subscription_id):
+                return _text(
+                    f"Unsubscribed from '{subscription_id}'",
+                    {"subscription_id": subscription_id, "unsubscribed": True},
+                )
+            return _text(
+                f"No subscription found for '{subscription_id}'",
+                {"subscription_id": subscription_id, "unsubscribed": False},
+            )
+
+        if name == "detect_anomalies":
+            query = arguments.get("query", "")
+            window = arguments.get("window", "1h")
+            baseline = arguments.get("baseline", "6h")
+            step = arguments.get("step", "1m")
+            method = arguments.get("method", "all")
+
+            if not query:
+                raise ValueError("Query parameter is required")
+
+            step_seconds = parse_step(step)
+            window_seconds = parse_duration(window)
+            lookback = window_seconds + parse_duration(baseline)
+            relative_time = format_duration(lookback)
+
+            series_list = await prometheus_client.query_range(
+                query, relative_time, step
+            )
+            report = detect_anomalies(
+                series_list,
+                step=step_seconds,
+                window=window_seconds,
+                methods=ANOMALY_METHODS if method == "all" else (method,),
+                threshold=float(arguments.get("threshold", 3.0)),
+                limit=int(arguments.get("limit", 10)),
+            )
+
+            return _text(
+                _format_anomaly_report(query, window, baseline, report),
+                _anomaly_content(query, window, baseline, report),
+            )
+
+        if name == "correlate_metrics":
+            target = arguments.get("target", "")
+            candidates = arguments.get("candidates") or []
+            relative_time = arguments.get("relative_time", "1h")
+            step = arguments.get("step", "1m")
+            method = arguments.get("method", "pearson")
+            max_lag = arguments.get("max_lag", "0s")
+
+            if not target:
+                raise ValueError("target parameter is required")
+            if not candidates:
+                raise ValueError("candidates parameter is required")
+            step_seconds = parse_step(step)
+            max_lag_seconds = parse_duration(max_lag)
+
+            targets, pairs = await asyncio.gather(
+                prometheus_client.query_range(target, relative_time, step),
+                prometheus_client.query_range_many(candidates, relative_time, step),
+            )
+            if len(targets) != 1:
+                raise ValueError(
+                    f"Target must return exactly one series, got {len(targets)}; "
+                    "aggregate it, e.g. with sum()"
+                )
+
+            correlation_report = correlate(
+                targets[0],
+                [series for _, series in pairs],
+                step=step_seconds,
+                method=method,
+                max_lag=max_lag_seconds,
+                limit=int(arguments.get("limit", 10)),
+            )
+            sources = [pairs[c.index][0] for c in correlation_report.correlations]
+
+            return _text(
+                _format_correlation_report(
+                    target, relative_time, correlation_report, sources
+                ),
+                _correlation_content(
+                    target, relative_time, correlation_report, sources
+                ),
+            )
+
+        if name == "forecast_metric":
+            query = arguments.get("query", "")
+            relative_time = arguments.get("relative_time", "1d")
+            step = arguments.get("step", "5m")
+            horizon = arguments.get("horizon", "1d")
+            season = arguments.get("season")
+            threshold = arguments.get("threshold")
+            threshold = None if threshold is None else float(threshold)
+
+            if not query:
+                raise ValueError("Query parameter is required")
+            step_seconds = parse_step(step)
+            horizon_seconds = parse_duration(horizon)
+            season_seconds = parse_duration(season) if season else None
+
+            series_list = await prometheus_client.query_range(
+                query, relative_time, step
+            )
+            forecast_report = forecast(
+                series_list,
+                step=step_seconds,
+                horizon=horizon_seconds,
+                method=arguments.get("method", "linear"),
+                season=season_seconds,
+                threshold=threshold,
+                confidence=float(arguments.get("confidence", 0.95)),
+                limit=int(arguments.get("limit", 10)),
+            )
+
+            return _text(
+                _format_forecast_report(query, horizon, threshold, forecast_report),
+                _forecast_content(query, horizon, threshold, forecast_report),
+            )
+
+        if name == "analyze_histogram":
+            metric = arguments.get("metric", "")
+            quantiles = tuple(
+                float(q) for q in arguments.get("quantiles") or DEFAULT_QUANTILES
+            )
+            histogram_type = arguments.get("type", "auto")
+
+            if not metric:
+                raise ValueError("metric parameter is required")
+            if not all(0 <= q <= 1 for q in quantiles):
+                raise ValueError("Quantiles must be between 0 and 1")
+
+            histograms = await prometheus_client.query_histogram(
+                metric,
+                by=arguments.get("by"),
+                relative_time=arguments.get("relative_time", "1h"),
+                step=arguments.get("step", "1m"),
+                rate_window=arguments.get("rate_window", "5m"),
+                native={"classic": False, "native": True}.get(histogram_type),
+            )
+            histogram_report = summarize_histograms(
+                histograms,
+                quantiles,
+                heatmap=bool(arguments.get("heatmap", False)),
+                limit=int(arguments.get("limit", 10)),
+            )
+
+            return _text(
+                _format_histogram_report(metric, histogram_report),
+                _histogram_content(metric, histogram_report),
+            )
+
+        if name == "browse_result":
+            handle = arguments.get("handle", "")
+
+            if not handle:
+                raise ValueError("handle parameter is required")
+
+            order = arguments.get("order")
+            page = result_store.view(
+                handle,
+                offset=int(arguments.get("offset", 0)),
+                limit=int(arguments.get("limit", 20)),
+                match=arguments.get("match"),
+                start=arguments.get("start"),
+                end=arguments.get("end"),
+                sort=arguments.get("sort", "labels"),
+                descending=None if order is None else order == "desc",
+            )
+            return _text(_format_result_page(page), _page_content(page))
+
+        if name == "summarize_result":
+            handle = arguments.get("handle", "")
+
+            if not handle:
+                raise ValueError("handle parameter is required")
+
+            summary = result_store.summarize(handle)
+            return _text(_format_result_summary(summary), summary)
+
+        if name == "export_query":
+            query = arguments.get("query", "")
+            relative_time = arguments.get("relative_time", "1h")
+            step = arguments.get("step", "1m")
+            fmt = arguments.get("format", "parquet")
+
+            if not query:
+                raise ValueError("Query parameter is required")
+            if not export_dir:
+                raise ValueError(
+                    "Exports are disabled; set PROMETHEUS_EXPORT_DIR to a "
+                    "writable directory"
+                )
+
+            filename = arguments.get("filename") or time.strftime(
+                "export-%Y%m%dT%H%M%S"
+            )
+            path = export_path(export_dir, filename, fmt)
+            exported = await export_series(
+                prometheus_client.stream_range_query(query, relative_time, step),
+                path,
+                fmt,
+            )
+            return _text(
+                _format_export_summary(query, exported),
+                {**dataclasses.asdict(exported), "path": str(exported.path)},
+            )
+
+        if name == "get_alerts":
+            criteria = {
+                **arguments.get("labels", {}),
+                "alertname": arguments.get("alertname"),
+                "severity": arguments.get("severity"),
+                STATE: arguments.get("state"),
+            }
+            alerts = await prometheus_client.get_alerts(_criteria(criteria))
+            snapshot = prometheus_client.alerts_cache
+            if arguments.get("etag") == snapshot.etag:
+                return _text(
+                    f"Alerts unchanged (etag {snapshot.etag})",
+                    {"etag": snapshot.etag, "changed": False},
+                )
+            return _text(
+                _format_alerts(alerts, len(snapshot), snapshot.etag),
+                {
+                    "etag": snapshot.etag,
+                    "changed": True,
+                    "total": len(snapshot),
+                    "alerts": alerts,
+                },
+            )
+
+        if name == "get_rules":
+            criteria = {
+                **arguments.get("labels", {}),
+                RULE_NAME: arguments.get("name"),
+                RULE_TYPE: arguments.get("type"),
+                RULE_HEALTH: arguments.get("health"),
+                RULE_GROUP: arguments.get("group"),
+            }
+            rules = await prometheus_client.get_rules(_criteria(criteria))
+            snapshot = prometheus_client.rules_cache
+            if arguments.get("etag") == snapshot.etag:
+                return _text(
+                    f"Rules unchanged (etag {snapshot.etag})",
+                    {"etag": snapshot.etag, "changed": False},
+                )
+            return _text(
+                _format_rules(rules, len(snapshot), snapshot.etag),
+                {
+                    "etag": snapshot.etag,
+                    "changed": True,
+                    "total": len(snapshot),
+                    "rules": rules,
+                },
+            )
+
+        if name == "get_targets":
+            limit = int(arguments.get("limit", 20))
+            if limit < 1:
+                raise ValueError("limit must be at least 1")
+
+            summary = filter_summary(
+                await prometheus_client.get_target_health(arguments.get("pool")),
+                arguments.get("job"),
+            )
+            return _text(_format_targets(summary, limit), summary)
+
+        if name == "get_server_stats":
+            stats = prometheus_client.get_stats()
+            return _text(_format_server_stats(stats), stats)
+
+        raise ValueError(f"Unknown tool: {name}")
+
+    except Exception as e:
+        logger.error(f"Tool call failed: {e}")
+        return _text(f"Error: {e!s}")
+
+
+@server.list_resources()
+async def handle_list_resources() -> list[Resource]:
+    """List active query subscriptions as resources."""
+    return [
+        Resource(
+            uri=AnyUrl(subscription.uri),
+            name=f"subscription-{subscription.id}",
+            description=f"Changes of '{subscription.feed.query}' every {subscription.feed.interval}s",
+            mimeType="application/json",
+        )
+        for subscription in subscription_manager.active()
+    ]
+
+
+@server.read_resource()
+async def handle_read_resource(uri: AnyUrl) -> list[ReadResourceContents]:
+    """Return the changes of a subscription since it was last read."""
+    subscription = subscription_manager.get(str(uri))
+    if subscription is None:
+        raise ValueError(f"Unknown resource: {uri}")
+
+    return [
+        ReadResourceContents(
+            content=format_delta(subscription.take_delta()),
+            mime_type="application/json",
+        )
+    ]
+
+
+@server.subscribe_resource()
+async def handle_subscribe_resource(uri: AnyUrl) -> None:
+    """Accept resource subscriptions for existing query subscriptions."""
+    if subscription_manager.get(str(uri)) is None:
+        raise ValueError(f"Unknown resource: {uri}")
+
+
+@server.unsubscribe_resource()
+async def handle_unsubscribe_resource(uri: AnyUrl) -> None:
+    """Stop a query subscription when its resource is unsubscribed."""
+    await subscription_manager.unsubscribe(str(uri))
+
+
+def _current_session() -> ServerSession:
+    """Return the MCP session of the tool call being handled."""
+    try:
+        return server.request_context.session
+    except LookupError:
+        raise ValueError("Subscriptions require an active MCP session") from None
+
+
+def _last_samples(
+    series_list: list[Series], count: int
+) -> list[tuple[float, float, dict[str, str]]]:
+    """Return the last samples of series laid end to end, with their labels."""
+    samples: list[tuple[float, float, dict[str, str]]] = []
+    for series in reversed(series_list):
+        start = max(len(series) - (count - len(samples)), 0)
+        samples[:0] = [
+            (timestamp, value, series.labels)
+            for timestamp, value in zip(
+                series.timestamps[start:], series.values[start:], strict=True
+            )
+        ]
+        if len(samples) >= count:
+            break
+    return samples
+
+
+def _format_metric_line(metric: str, metadata: dict[str, dict[str, str]]) -> str:
+    """Format a metric name annotated with its cached type, unit and help."""
+    entry = metadata.get(metric)
+    if entry is None:
+        return metric
+
+    line = f"{metric} ({entry['type']}"
+    if entry.get("unit"):
+        line += f", {entry['unit']}"
+    line += ")"
+    if entry.get("help"):
+        line += f": {entry['help']}"
+    return line
+
+
+def _format_query_result(result: dict[str, Any]) -> str:
+    """Format Prometheus query result for display."""
+    return _format_query_content(query_result_content(result))
+
+
+def _format_query_content(content: dict[str, Any]) -> str:
+    """Format structured query result content for display."""
+    if content["status"] != "success":
+        return f"Query failed: {content['error']}"
+
+    result_type = content["result_type"]
+    if result_type in ("scalar", "string"):
+        return (
+            f"Result type: {result_type}\n"
+            f"Value: {_format_value(content['value'])} "
+            f"(at {_format_value(content['timestamp'])})"
+        )
+
+    series_list = content["series"]
+    if not series_list:
+        return "No data returned"
+
+    lines = [f"Result type: {result_type}"]
+    for i, series in enumerate(series_list[:5]):  # Show first 5 series
+        lines.append(f"\nSeries {i + 1}:")
+        lines.append(f"  Labels: {series['labels']}")
+
+        if "value" in series:
+            # Instant query result
+            lines.append(
+                f"  Value: {_format_value(series['value'])} "
+                f"(at {_format_value(series['timestamp'])})"
+            )
+        elif "values" in series:
+            # Range query result
+            values = series["values"]
+            lines.append(f"  Data points: {len(values)}")
+            if values:
+                lines.append(
+                    f"  Latest: {_format_value(values[-1])} "
+                    f"(at {_format_value(series['timestamps'][-1])})"
+                )
+
+    if content["total_series"] > 5:
+        lines.append(f"\n... and {content['total_series'] - 5} more series")
+
+    return "\n".join(lines)
+
+
+def _format_value(value: float | str) -> str:
+    """Format a structured number the way Prometheus prints it."""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _json_values(values: dict[str, float | None]) -> dict[str, float | str | None]:
+    """Make an instance-to-value table JSON-safe."""
+    return {
+        instance: None if value is None else sample_value(value)
+        for instance, value in values.items()
+    }
+
+
+def _store_truncated_result(query: str, result: dict[str, Any]) -> str | None:
+    """Store a query result whose display was truncated, returning its handle."""
+    data = result.get("data", {})
+    if (
+        result.get("status") != "success"
+        or data.get("resultType") not in ("vector", "matrix")
+        or len(data.get("result", [])) <= 5
+    ):
+        return None
+    return result_store.put(query, data["resultType"], series_from_matrix(result))
+
+
+def _format_result_page(page: ResultPage) -> str:
+    """Format one page of a stored result for display."""
+    result = page.result
+    if not page.series:
+        return f"Result {result.handle}: no series match ({page.total} total)"
+
+    lines = [
+        (
+            f"Result {result.handle} for '{result.query}': series "
+            f"{page.offset + 1}-{page.offset + len(page.series)} of {page.total}"
+        )
+    ]
+    for series in page.series:
+        if result.result_type == "metrics":
+            lines.append(f"  {series.labels['__name__']}")
+        elif not len(series):
+            lines.append(f"  {series.labels}: no samples in range")
+        elif result.result_type == "vector":
+            lines.append(
+                f"  {series.labels}: {series.values[-1]} (at {series.timestamps[-1]})"
+            )
+        else:
+            lines.append(
+                f"  {series.labels}: {len(series)} points, "
+                f"min {min(series.values)}, max {max(series.values)}, "
+                f"last {series.values[-1]} (at {series.timestamps[-1]})"
+            )
+
+    remaining = page.total - page.offset - len(page.series)
+    if remaining > 0:
+        lines.append(
+            f"  ... {remaining} more (offset={page.offset + len(page.series)})"
+        )
+    return "\n".join(lines)
+
+
+def _page_content(page: ResultPage) -> dict[str, Any]:
+    """Return the structured form of one page of a stored result."""
+    result = page.result
+    if result.result_type == "metrics":
+        series = [{"labels": item.labels} for item in page.series]
+    else:
+        series = [series_content(item, result.result_type) for item in page.series]
+    return {
+        "handle": result.handle,
+        "query": result.query,
+        "result_type": result.result_type,
+        "total_series": page.total,
+        "offset": page.offset,
+        "series": series,
+    }
+
+
+def _criteria(criteria: dict[str, Any]) -> dict[str, str]:
+    """Drop filters that were not given."""
+    return {key: str(value) for key, value in criteria.items() if value is not None}
+
+
+def _format_alerts(alerts: list[dict[str, Any]], total: int, etag: str | None) -> str:
+    """Format active alerts for display."""
+    firing = sum(alert.get("state") == "firing" for alert in alerts)
+    lines = [
+        (
+            f"Alerts: {len(alerts)} matching ({firing} firing, "
+            f"{len(alerts) - firing} pending) of {total} active; etag {etag}"
+        )
+    ]
+    for alert in alerts[:50]:  # Show first 50 alerts
+        labels = dict(alert.get("labels", {}))
+        alertname = labels.pop("alertname", "")
+        severity = labels.pop("severity", None)
+        line = f"  {alertname}"
+        if severity:
+            line += f" [{severity}]"
+        line += f" {alert.get('state', '')} since {alert.get('activeAt', '?')}"
+        if labels:
+            line += f" {labels}"
+        lines.append(line)
+
+    if len(alerts) > 50:
+        lines.append(f"  ... and {len(alerts) - 50} more")
+    return "\n".join(lines)
+
+
+def _format_rules(rules: list[dict[str, Any]], total: int, etag: str | None) -> str:
+    """Format alerting and recording rules for display."""
+    failing = sum(rule.get("health") == "err" for rule in rules)
+    lines = [
+        f"Rules: {len(rules)} matching ({failing} failing) of {total}; etag {etag}"
+    ]
+    for rule in rules[:50]:  # Show first 50 rules
+        details = [rule.get("type", ""), f"health {rule.get('health', 'unknown')}"]
+        if "state" in rule:
+            details.append(rule["state"])
+        if rule.get("alerts"):
+            details.append(f"{len(rule['alerts'])} alerts")
+        lines.append(f"  {rule['group']}/{rule.get('name', '')} ({', '.join(details)})")
+        if rule.get("lastError"):
+            lines.append(f"    error: {rule['lastError']}")
+
+    if len(rules) > 50:
+        lines.append(f"  ... and {len(rules) - 50} more")
+    return "\n".join(lines)
+
+
+def _format_targets(summary: dict[str, Any], limit: int) -> str:
+    """Format a scrape target health summary for display."""
+    jobs = summary["jobs"]
+    lines = [
+        (
+            f"Targets: {summary['total']} total, {summary['up']} up, "
+            f"{summary['down']} down, {summary['unknown']} unknown "
+            f"across {len(jobs)} jobs"
+        )
+    ]
+    for entry in jobs[:limit]:
+        name = entry["job"]
+        if entry["pool"] != name:
+            name = f"{entry['pool']}/{name}"
+        lines.append(
+            f"  {name}: {entry['up']}/{entry['total']} up, "
+            f"scrape avg {entry['avg_scrape_seconds'] * 1000:.0f}ms, "
+            f"max {entry['max_scrape_seconds'] * 1000:.0f}ms"
+        )
+        lines.extend(
+            f"    {count}x {error}" for error, count in entry["errors"].items()
+        )
+    if len(jobs) > limit:
+        lines.append(f"  ... and {len(jobs) - limit} more jobs")
+
+    unhealthy = summary["unhealthy"]
+    if unhealthy:
+        lines.append(f"Unhealthy targets ({summary['unhealthy_total']}):")
+    for target in unhealthy[:limit]:
+        line = f"  {target['job']} {target['instance']} {target['health']}"
+        if target["last_error"]:
+            line += f": {target['last_error']}"
+        lines.append(line)
+    if summary["unhealthy_total"] > min(len(unhealthy), limit):
+        lines.append(
+            f"  ... and {summary['unhealthy_total'] - min(len(unhealthy), limit)} more"
+        )
+    return "\n".join(lines)
+
+
+def _format_result_summary(summary: dict[str, Any]) -> str:
+    """Format a stored result summary for display."""
+    lines = [
+        (
+            f"Result {summary['handle']} for '{summary['query']}' "
+            f"({summary['result_type']}): {summary['series']} series, "
+            f"{summary['samples']} samples"
+        )
+    ]
+    if summary["start"] is not None:
+        lines.append(f"Time span: {summary['start']} to {summary['end']}")
+
+    lines.append("Labels:")
+    for name, info in summary["labels"].items():
+        top = ", ".join(f"{value} ({count})" for value, count in info["top"])
+        lines.append(f"  {name}: {info['distinct']} distinct; {top}")
+    return "\n".join(lines)
+
+
+def _format_anomaly_report(
+    query: str, window: str, baseline: str, report: AnomalyReport
+) -> str:
+    """Format ranked anomalies for display."""
+    header = (
+        f"Anomalies in '{query}' (last {window} vs previous {baseline}): "
+        f"{len(report.anomalies)} shown, {report.scored_count} of "
+        f"{report.series_count} series scored"
+    )
+    if not report.anomalies:
+        return f"{header}\nNo anomalous series found"
+
+    lines = [header]
+    for rank, anomaly in enumerate(report.anomalies, 1):
+        scores = ", ".join(
+            f"{name}={value:.1f}" for name, value in anomaly.scores.items()
+        )
+        line = (
+            f"{rank}. {anomaly.labels} {anomaly.direction}: "
+            f"{anomaly.baseline_mean:.4g} -> {anomaly.recent_mean:.4g} ({scores})"
+        )
+        if anomaly.change_point is not None:
+            line += f", changed at {anomaly.change_point:.0f}"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def _anomaly_content(
+    query: str, window: str, baseline: str, report: AnomalyReport
+) -> dict[str, Any]:
+    """Return the structured form of ranked anomalies."""
+    return {
+        "query": query,
+        "window": window,
+        "baseline": baseline,
+        "series_count": report.series_count,
+        "scored_count": report.scored_count,
+        "anomalies": [
+            {
+                "labels": anomaly.labels,
+                "direction": anomaly.direction,
+                "score": sample_value(anomaly.score),
+                "scores": {
+                    name: sample_value(value) for name, value in anomaly.scores.items()
+                },
+                "baseline_mean": sample_value(anomaly.baseline_mean),
+                "recent_mean": sample_value(anomaly.recent_mean),
+                "change_point": anomaly.change_point,
+            }
+            for anomaly in report.anomalies
+        ],
+    }
+
+
+def _format_correlation_report(
+    target: str, relative_time: str, report: CorrelationReport, sources: list[str]
+) -> str:
+    """Format ranked correlates for display."""
+    header = (
+        f"Series correlated with '{target}' over {relative_time} "
+        f"({report.method}): {len(report.correlations)} shown, "
+        f"{report.scored_count} of {report.candidate_count} series scored"
+    )
+    if not report.correlations:
+        return f"{header}\nNo series had enough samples to correlate"
+
+    lines = [header]
+    for rank, (correlation, source) in enumerate(
+        zip(report.correlations, sources, strict=True), 1
+    ):
+        line = f"{rank}. {source} {correlation.labels}: r={correlation.coefficient:.3f}"
+        if correlation.lag:
+            relation = "lags" if correlation.lag > 0 else "leads"
+            line += (
+                f" ({relation} by {format_duration(abs(correlation.lag))}, "
+                f"r={correlation.coefficient_at_zero:.3f} unshifted)"
+            )
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def _correlation_content(
+    target: str, relative_time: str, report: CorrelationReport, sources: list[str]
+) -> dict[str, Any]:
+    """Return the structured form of ranked correlates."""
+    return {
+        "target": target,
+        "relative_time": relative_time,
+        "method": report.method,
+        "candidate_count": report.candidate_count,
+        "scored_count": report.scored_count,
+        "correlations": [
+            {
+                "source": source,
+                "labels": correlation.labels,
+                "coefficient": sample_value(correlation.coefficient),
+                "lag_seconds": correlation.lag,
+                "coefficient_at_zero": sample_value(correlation.coefficient_at_zero),
+                "points": correlation.points,
+            }
+            for correlation, source in zip(report.correlations, sources, strict=True)
+        ],
+    }
+
+
+def _format_forecast_report(
+    query: str, horizon: str, threshold: float | None, report: ForecastReport
+) -> str:
+    """Format forecasts for display."""
+    header = (
+        f"Forecast of '{query}' for the next {horizon} ({report.method}): "
+        f"{len(report.forecasts)} shown, {report.fitted_count} of "
+        f"{report.series_count} series fitted"
+    )
+    if not report.forecasts:
+        return f"{header}\nNo series had enough history to forecast"
+
+    lines = [header]
+    for rank, item in enumerate(report.forecasts, 1):
+        line = (
+            f"{rank}. {item.labels}: {item.last_value:.4g} -> {item.value:.4g} "
+            f"[{item.lower:.4g}, {item.upper:.4g}]"
+        )
+        eta, earliest = item.time_to_threshold, item.earliest_time_to_threshold
+        if threshold is not None and eta is not None:
+            line += f", reaches {threshold:g} in {format_duration(eta)}"
+        elif threshold is not None and earliest is None:
+            line += f", does not reach {threshold:g}"
+        elif threshold is not None:
+            line += f", may reach {threshold:g}"
+        if earliest is not None and earliest != eta:
+            line += f" (earliest in {format_duration(earliest)})"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def _forecast_content(
+    query: str, horizon: str, threshold: float | None, report: ForecastReport
+) -> dict[str, Any]:
+    """Return the structured form of forecasts."""
+    return {
+        "query": query,
+        "horizon": horizon,
+        "method": report.method,
+        "threshold": threshold,
+        "series_count": report.series_count,
+        "fitted_count": report.fitted_count,
+        "forecasts": [
+            {
+                "labels": item.labels,
+                "last_value": sample_value(item.last_value),
+                "value": sample_value(item.value),
+                "lower": sample_value(item.lower),
+                "upper": sample_value(item.upper),
+                "time_to_threshold": item.time_to_threshold,
+                "earliest_time_to_threshold": item.earliest_time_to_threshold,
+                "points": [
+                    [timestamp, *(sample_value(v) for v in values)]
+                    for timestamp, *values in item.points
+                ],
+            }
+            for item in report.forecasts
+        ],
+    }
+
+
+def _format_histogram_report(metric: str, report: HistogramReport) -> str:
+    """Format histogram quantiles and means for display."""
+    kind = "native" if report.native else "classic"
+    header = (
+        f"Histogram '{metric}' ({kind}): {len(report.summaries)} of "
+        f"{report.group_count} histograms shown"
+    )
+    if not report.summaries:
+        return f"{header}\nNo histogram data found"
+
+    def values(quantiles: dict[float, float], mean: float) -> str:
+        text = ", ".join(f"p{q * 100:g}={value:.4g}" for q, value in quantiles.items())
+        return f"{text}, mean={mean:.4g}"
+
+    lines = [header]
+    for rank, summary in enumerate(report.summaries, 1):
+        lines.append(f"{rank}. {summary.labels} ({summary.rate:.4g}/s)")
+        lines.append(f"   Latest: {values(summary.quantiles, summary.mean)}")
+        lines.append(
+            f"   Window: {values(summary.window_quantiles, summary.window_mean)}"
+        )
+    return "\n".join(lines)
+
+
+def _histogram_content(metric: str, report: HistogramReport) -> dict[str, Any]:
+    """Return the structured form of histogram quantiles and means."""
+    content: dict[str, Any] = {
+        "metric": metric,
+        "native": report.native,
+        "group_count": report.group_count,
+        "histograms": [],
+    }
+    heatmap = any(summary.heatmap for summary in report.summaries)
+    if heatmap:
+        content["timestamps"] = report.timestamps
+        content["buckets"] = [
+            [sample_value(lower), sample_value(upper)]
+            for lower, upper in report.buckets
+        ]
+    for summary in report.summaries:
+        entry: dict[str, Any] = {
+            "labels": summary.labels,
+            "rate": sample_value(summary.rate),
+            "quantiles": {
+                f"{q:g}": sample_value(value) for q, value in summary.quantiles.items()
+            },
+            "window_quantiles": {
+                f"{q:g}": sample_value(value)
+                for q, value in summary.window_quantiles.items()
+            },
+            "mean": sample_value(summary.mean),
+            "window_mean": sample_value(summary.window_mean),
+        }
+        if heatmap:
+            entry["quantile_series"] = {
+                f"{q:g}": [sample_value(value) for value in series]
+                for q, series in summary.quantile_series.items()
+            }
+            entry["heatmap"] = [
+                [sample_value(value) for value in row] for row in summary.heatmap
+            ]
+        content["histograms"].append(entry)
+    return content
+
+
+def _format_instance_values(metric_name: str, values: dict[str, float | None]) -> str:
+    """Format an instance-to-value table for display."""
+    if not values:
+        return f"No instances found for metric '{metric_name}'"
+
+    found = sum(value is not None for value in values.values())
+    width = max(len(instance) for instance in values)
+    lines = [f"Metric '{metric_name}' ({found} of {len(values)} instances):"]
+    lines.extend(
+        f"  {instance:<{width}}  {'no data' if value is None else value}"
+        for instance, value in values.items()
+    )
+    return "\n".join(lines)
+
+
+def _format_export_summary(query: str, summary: ExportSummary) -> str:
+    """Format the outcome of an export for display."""
+    lines = [
+        f"Exported '{query}' to {summary.path}",
+        f"Format: {summary.format}, {_format_bytes(summary.bytes)}",
+        f"Series: {summary.series}, rows: {summary.rows}",
+    ]
+    if summary.start is not None:
+        lines.append(f"Time span: {summary.start:.0f} to {summary.end:.0f}")
+    return "\n".join(lines)
+
+
+def _format_bytes(size: float) -> str:
+    """Format a byte count with a binary unit."""
+    if size < 1024:
+        return f"{size:.0f} B"
+    for unit in ("KiB", "MiB"):
+        size /= 1024
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+    return f"{size / 1024:.1f} GiB"
+
+
+def _format_query_plan(plan: QueryPlan) -> str:
+    """Describe how an expensive query was shaped."""
+    original = plan.original
+    estimate = (
+        f"estimated {_format_bytes(original.bytes)} ({original.series} series x "
+        f"{original.points} points at step {plan.original_step}) exceeds the "
+        f"{_format_bytes(plan.limit)} limit"
+    )
+    if plan.action == "downsample":
+        return (
+            f"Note: query downsampled: {estimate}; step raised to {plan.step} "
+            f"(~{_format_bytes(plan.estimate.bytes)})."
+        )
+    return (
+        f"Note: query aggregated: {estimate}; ran `{plan.query}` at step "
+        f"{plan.step} instead (~{_format_bytes(plan.estimate.bytes)})."
+    )
+
+
+def _plan_content(plan: QueryPlan) -> dict[str, Any]:
+    """Return the structured form of a shaped query plan."""
+    return {
+        "action": plan.action,
+        "query": plan.query,
+        "step": plan.step,
+        "original_step": plan.original_step,
+        "estimated_bytes": plan.original.bytes,
+        "shaped_bytes": plan.estimate.bytes,
+        "limit": plan.limit,
+    }
+
+
+def _format_server_stats(stats: dict[str, Any]) -> str:
+    """Format client statistics for display."""
+    lines = ["Upstream transfer:"]
+
+    transfer = stats.get("transfer", {})
+    if not transfer:
+        lines.append("  No requests yet")
+    for endpoint, entry in transfer.items():
+        encodings = ", ".join(
+            f"{encoding} x{count}" for encoding, count in entry["encodings"].items()
+        )
+        lines.append(
+            f"  {endpoint}: {entry['requests']} requests, "
+            f"{_format_bytes(entry['wire_bytes'])} wire, "
+            f"{_format_bytes(entry['decoded_bytes'])} decoded "
+            f"({entry['ratio']}x; {encodings})"
+        )
+
+    cache = stats.get("results_cache", {})
+    lookups = cache.get("hits", 0) + cache.get("misses", 0)
+    hit_rate = cache.get("hits", 0) / lookups * 100 if lookups else 0.0
+    lines.append(
+        f"Results cache: {cache.get('entries', 0)} entries, "
+        f"{cache.get('hits', 0)} hits, {cache.get('misses', 0)} misses "
+        f"({hit_rate:.0f}% hit rate)"
+    )
+
+    upstream = stats.get("upstream", {})
+    lines.append(
+        f"Upstream requests: {upstream.get('in_use', 0)}/{upstream.get('limit', 0)} "
+        f"in flight, {upstream.get('waiting', 0)} waiting"
+    )
+    for name, entry in upstream.get("classes", {}).items():
+        lines.append(
+            f"  {name} (weight {entry['weight']:g}): {entry['queued']} queued, "
+            f"{entry['admitted']} admitted, avg wait {entry['avg_wait_ms']:.0f}ms, "
+            f"max {entry['max_wait_ms']:.0f}ms"
+        )
+
+    aborted = stats.get("aborted", {})
+    if aborted:
+        lines.append("Aborted upstream requests (cancelled or past deadline):")
+    for endpoint, entry in aborted.items():
+        lines.append(
+            f"  {endpoint}: {entry['requests']} requests, "
+            f"{entry['seconds']:.1f}s of upstream time"
+        )
+
+    for name, entry in stats.get("snapshots", {}).items():
+        lines.append(
+            f"{name.capitalize()} snapshot: {entry['items']} items, "
+            f"{entry['fetches']} fetches for {entry['reads']} reads"
+        )
+
+    tenants = stats.get("tenants", {})
+    if tenants:
+        lines.append("Tenant upstream requests:")
+    for tenant, entry in tenants.items():
+        lines.append(
+            f"  {tenant}: {entry['in_use']}/{entry['limit']} in flight, "
+            f"{entry['waiting']} waiting, {entry['requests']} total"
+        )
+
+    capabilities = stats.get("capabilities")
+    lines.append(f"Backend: {capabilities or 'not detected yet'}")
+    return "\n".join(lines)
+
+
+def _server_capabilities() -> Any:
+    """Build server capabilities, advertising resource subscriptions."""
+    capabilities = server.get_capabilities(
+        notification_options=NotificationOptions(resources_changed=True),
+        experimental_capabilities={},
+    )
+    if capabilities.resources is not None:
+        capabilities.resources.subscribe = True
+    return capabilities
+
+
+async def _serve(
+    read_stream: Any, write_stream: Any, options: InitializationOptions
+) -> None:
+    """Serve one client session and drop its subscriptions when it ends."""
+    session = f"session-{secrets.token_hex(4)}"
+    try:
+        with request_session(session):
+            await server.run(read_stream, write_stream, options)
+    finally:
+        dropped = await subscription_manager.unsubscribe_session(session)
+        if dropped:
+            logger.info(f"Session ended, dropped {dropped} subscriptions")
+
+
+async def main() -> None:
+    """Run the MCP Prometheus server."""
+    logger.info("Starting MCP Prometheus server...")
+    logger.info(f"Prometheus URL: {prometheus_client.prometheus_url}")
+
+    # Log authentication method
+    username = client_settings["username"]
+    if client_settings["auth_token"]:
+        logger.info("Using Bearer token authentication")
+    elif username and client_settings["password"]:
+        logger.info(f"Using basic authentication for user: {username}")
+    else:
+        logger.info("No authentication configured")
+
+    watcher = None
+    if config_file:
+        watcher = ConfigWatcher(config_file, apply_config, config_reload_interval)
+        watcher.start()
+
+    scheduler = None
+    if watchlist_file:
+        scheduler = WarmQueryScheduler(
+            prometheus_client, load_watchlist(watchlist_file)
+        )
+        scheduler.start()
+
+    # Runs alongside the MCP initialize handshake instead of before it
+    warmup = None
+    if warmup_enabled:
+        warmup = asyncio.create_task(warm_up(prometheus_client))
+
     try:
         async with stdio_server() as (read_stream, write_stream):
-            await server.run(
+            await _serve(
                 read_stream,
                 write_stream,
                 InitializationOptions(
                     server_name="mcp-prometheus-server",
                     server_version="0.1.0",
-                    capabilities=server.get_capabilities(
-                        notification_options=None,
-                        experimental_capabilities=None,
-                    ),
+                    capabilities=_server_capabilities(),
                 ),
             )
     finally:
+        if warmup is not None:
+            warmup.cancel()
+        await subscription_manager.close()
+        if scheduler is not None:
+            await scheduler.stop()
+        if watcher is not None:
+            await watcher.stop()
         await prometheus_client.close()
 
 
@@ -0,0 +1,162 @@
+"""
+Metric metadata cache for MCP server.
+
+Keeps an indexed copy of the Prometheus ``/api/v1/metadata`` response so
+metric types, help strings and units can be looked up without extra
+upstream requests, next to the names of all metrics with series.
+"""
+
+import re
+import time
+from collections.abc import Iterable
+from typing import Any
+
+# Suffixes Prometheus appends to the series of histograms and summaries.
+_DERIVED_SUFFIXES = ("_bucket", "_sum", "_count", "_total", "_created")
+
+
+class MetricMetadataCache:
+    """Indexed, periodically refreshed cache of metric metadata."""
+
+    def __init__(self, ttl: float = 300.0) -> None:
+        """Initialize metadata cache.
+
+        Args:
+            ttl: Seconds before the cached metadata is considered stale
+        """
+        self.ttl = ttl
+        self.loaded_at: float | None = None
+        self._entries: dict[str, dict[str, str]] = {}
+        self._by_type: dict[str, set[str]] = {}
+        self.names_loaded_at: float | None = None
+        self.names_truncated = False
+        self._names: list[str] = []
+
+    def __len__(self) -> int:
+        """Return number of metrics with cached metadata."""
+        return len(self._entries)
+
+    def is_stale(self) -> bool:
+        """Return True if the cache was never loaded or has expired."""
+        if self.loaded_at is None:
+            return True
+        return time.monotonic() - self.loaded_at >= self.ttl
+
+    def names_stale(self) -> bool:
+        """Return True if the name index was never loaded or has expired."""
+        if self.names_loaded_at is None:
+            return True
+        return time.monotonic() - self.names_loaded_at >= self.ttl
+
+    def update(self, metadata: dict[str, list[dict[str, Any]]]) -> None:
+        """Replace cache contents with a ``/api/v1/metadata`` payload.
+
+        Args:
+            metadata: The ``data`` field of a metadata API response, mapping
+                metric names to a list of metadata entries
+        """
+        entries: dict[str, dict[str, str]] = {}
+        by_type: dict[str, set[str]] = {}
+
+        for name, items in metadata.items():
+            if not items:
+                continue
+            # Targets may disagree; the first entry is what Prometheus shows
+            item = items[0]
+            entry = {
+                "type": item.get("type", "unknown") or "unknown",
+                "help": item.get("help", ""),
+                "unit": item.get("unit", ""),
+            }
+            entries[name] = entry
+            by_type.setdefault(entry["type"], set()).add(name)
+
+        # Swap both indexes at once so readers never see a partial update
+        self._entries, self._by_type = entries, by_type
+        self.loaded_at = time.monotonic()
+
+    def get(self, metric_name: str) -> dict[str, str] | None:
+        """Look up metadata for a metric or one of its derived series.
+
+        Series such as ``foo_bucket`` or ``foo_count`` resolve to the
+        metadata of their parent ``foo`` when no direct entry exists.
+
+        Args:
+            metric_name: Metric or series name
+
+        Returns:
+            Metadata dictionary with type, help and unit, or None
+        """
+        entry = self._entries.get(metric_name)
+        if entry is not None:
+            return entry
+
+        for suffix in _DERIVED_SUFFIXES:
+            if metric_name.endswith(suffix):
+                parent = self._entries.get(metric_name[: -len(suffix)])
+                if parent is not None:
+                    return parent
+        return None
+
+    def search(
+        self,
+        pattern: str | None = None,
+        metric_type: str | None = None,
+    ) -> dict[str, dict[str, str]]:
+        """Find cached metadata by name pattern and/or metric type.
+
+        Args:
+            pattern: Optional regex matched against the full metric name
+            metric_type: Optional metric type (counter, gauge, histogram, ...)
+
+        Returns:
+            Mapping of metric name to metadata, sorted by name
+
+        Raises:
+            ValueError: If pattern is not a valid regex
+        """
+        if metric_type:
+            names = self._by_type.get(metric_type.lower(), set())
+        else:
+            names = set(self._entries)
+
+        if pattern:
+            try:
+                compiled = re.compile(pattern)
+            except re.error as e:
+                raise ValueError(f"Invalid metric pattern '{pattern}': {e}") from e
+            names = {name for name in names if compiled.fullmatch(name)}
+
+        return {name: self._entries[name] for name in sorted(names)}
+
+    def update_names(self, names: Iterable[str], truncated: bool = False) -> None:
+        """Replace the metric name index.
+
+        Args:
+            names: Names of metrics with series, e.g. from the label values
+                API of ``__name__``
+            truncated: True if the backend has more names than were loaded
+        """
+        self._names = sorted(set(names))
+        self.names_truncated = truncated
+        self.names_loaded_at = time.monotonic()
+
+    def match_names(self, pattern: str | None = None) -> list[str]:
+        """Find metric names in the name index.
+
+        Args:
+            pattern: Optional regex matched against the full metric name
+
+        Returns:
+            Matching metric names, sorted
+
+        Raises:
+            ValueError: If pattern is not a valid regex
+        """
+        if not pattern:
+            return list(self._names)
+        try:
+            compiled = re.compile(pattern)
+        except re.error as e:
+            raise ValueError(f"Invalid metric pattern '{pattern}': {e}") from e
+        return [name for name in self._names if compiled.fullmatch(name)]
@@ -6,16 +6,87 @@ Handles communication with Prometheus API, focusing on relative time queries
 and instance value reading.
 """
 
+import asyncio
+import base64
 import logging
-import re
-from datetime import datetime, timedelta
-from typing import Any
+import math
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable, Hashable
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Any, TypeVar
 
 import httpx
 from prometheus_api_client import PrometheusConnect
 
+from .analysis import HistogramMatrix, histogram_from_buckets, histogram_from_native
+from .cache import PartitionedCache
+from .columnar import Series, series_from_entry, series_from_matrix
+from .compression import (
+    DEFAULT_THREAD_THRESHOLD,
+    CompressionTransport,
+    TransferStats,
+    accept_encoding_header,
+)
+from .concurrency import AdmissionController, Priority
+from .cost import (
+    COST_FALLBACKS,
+    DEFAULT_BYTES_PER_SAMPLE,
+    QueryPlan,
+    estimate_series,
+    record_plan,
+    shape_query,
+)
+from .cursors import HistoryCursor
+from .deadlines import AbortStats, with_query_timeout
+from .metadata_cache import MetricMetadataCache
+from .promql import (
+    Aggregation,
+    Call,
+    Matcher,
+    PromQLQuery,
+    VectorSelector,
+    escape_regex,
+    parse_duration,
+    parse_promql,
+    parse_step,
+)
+from .remote_read import (
+    REMOTE_READ_ENDPOINT,
+    REMOTE_READ_HEADERS,
+    STREAMED_CONTENT_TYPE,
+    ChunkedReadDecoder,
+    decode_read_response,
+    encode_read_request,
+    remote_read_selector,
+    snappy_block,
+)
+from .snapshots import SnapshotCache, alert_keys, flatten_rules, rule_keys
+from .streaming_json import JSONArrayStream
+from .targets import TargetHealthAggregator
+from .tenants import (
+    TENANT_HEADER,
+    TenantLimiter,
+    TenantState,
+    current_tenant,
+    validate_tenant,
+)
+from .warmup import Capabilities
+
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+HISTORY_BACKENDS = ("query_range", "remote_read")
+
+# Longest instance regex sent in one query; longer lists are split
+MAX_INSTANCE_PATTERN_LENGTH = 4096
+
+# Most metric names kept in the name index of a tenant
+MAX_METRIC_NAMES = 100_000
+
+METRIC_NAMES_ENDPOINT = "/api/v1/label/__name__/values"
+
 
 class PrometheusClient:
     """Client for interacting with Prometheus API."""
@@ -27,6 +98,23 @@ class PrometheusClient:
         username: str | None = None,
         password: str | None = None,
         timeout: int = 30,
+        metadata_ttl: float = 300.0,
+        max_concurrency: int = 10,
+        results_cache_ttl: float = 15.0,
+        results_cache_size: int = 256,
+        accept_encoding: str | None = None,
+        decompress_thread_threshold: int = DEFAULT_THREAD_THRESHOLD,
+        history_backend: str = "query_range",
+        time_alignment: str = "1s",
+        priority_weights: dict[Priority, float] | None = None,
+        max_query_bytes: int = 0,
+        cost_fallback: str = "auto",
+        cardinality_ttl: float = 300.0,
+        bytes_per_sample: int = DEFAULT_BYTES_PER_SAMPLE,
+        snapshot_ttl: float = 10.0,
+        targets_ttl: float = 30.0,
+        tenant: str | None = None,
+        tenant_limits: dict[str, int] | None = None,
     ) -> None:
         """Initialize Prometheus client.
         
@@ -36,20 +124,76 @@ class PrometheusClient:
             username: Optional username for basic authentication
             password: Optional password for basic authentication
             timeout: Request timeout in seconds
+            metadata_ttl: Seconds before cached metric metadata is refreshed
+            max_concurrency: Maximum concurrent requests sent to Prometheus
+            results_cache_ttl: Seconds query results are served from cache
+            results_cache_size: Maximum number of cached query results
+            accept_encoding: Comma-separated response encodings to offer
+                (e.g., "zstd, gzip"); defaults to all supported, "identity"
+                disables compression
+            decompress_thread_threshold: Response size in bytes from which
+                decompression runs in a worker thread
+            history_backend: "query_range" for JSON range queries, or
+                "remote_read" to fetch raw samples of plain selectors from
+                /api/v1/read
+            time_alignment: Grid that end times of relative windows are
+                rounded down to (e.g., "15s"); range queries use the larger
+                of this and their step, so repeated calls send identical
+                requests
+            priority_weights: Share of upstream slots per priority class
+                while several classes are queued
+            max_query_bytes: Estimated response size from which range
+                queries are shaped or refused; 0 disables cost estimation
+            cost_fallback: What to do with queries over budget: "auto"
+                (coarser step, else aggregate), "downsample" or "refuse"
+            cardinality_ttl: Seconds series counts used for cost estimation
+                are cached
+            bytes_per_sample: Estimated encoded size of one sample
+            snapshot_ttl: Seconds the shared alerts and rules snapshots are
+                served before they are refetched
+            targets_ttl: Seconds the scrape target health summary is cached
+            tenant: Tenant sent as X-Scope-OrgID when the request context
+                selects none; None sends no tenant header
+            tenant_limits: Upstream requests each tenant may have in flight,
+                "*" for tenants without their own limit
         """
+        # Settings as given, compared against by reconfigure
+        self._settings: dict[str, Any] = {
+            "prometheus_url": prometheus_url,
+            "auth_token": auth_token,
+            "username": username,
+            "password": password,
+            "timeout": timeout,
+            "metadata_ttl": metadata_ttl,
+            "max_concurrency": max_concurrency,
+            "results_cache_ttl": results_cache_ttl,
+            "results_cache_size": results_cache_size,
+            "accept_encoding": accept_encoding,
+            "decompress_thread_threshold": decompress_thread_threshold,
+            "history_backend": history_backend,
+            "time_alignment": time_alignment,
+            "priority_weights": priority_weights,
+            "max_query_bytes": max_query_bytes,
+            "cost_fallback": cost_fallback,
+            "cardinality_ttl": cardinality_ttl,
+            "bytes_per_sample": bytes_per_sample,
+            "snapshot_ttl": snapshot_ttl,
+            "targets_ttl": targets_ttl,
+            "tenant": tenant,
+            "tenant_limits": tenant_limits,
+        }
+
         self.prometheus_url = prometheus_url.rstrip("/")
         self.timeout = timeout
+
+        if history_backend not in HISTORY_BACKENDS:
+            raise ValueError(f"Invalid history backend: {history_backend}")
+        self.history_backend = history_backend
+        self.time_alignment = parse_duration(time_alignment)
         
         # Prepare authentication headers
-        auth_headers = {}
-        
-        if auth_token:
-            auth_headers["Authorization"] = f"Bearer {auth_token}"
-        elif username and password:
-            import base64
-            credentials = base64.b64encode(f"{username}:{password}".encode()).decode()
-            auth_headers["Authorization"] = f"Basic {credentials}"
-        
+        auth_headers = _auth_headers(auth_token, username, password)
+
         # Initialize Prometheus API client
         self.pc = PrometheusConnect(
             url=self.prometheus_url,
@@ -57,38 +201,278 @@ class PrometheusClient:
             disable_ssl=False,
         )
 
-        # HTTP client for direct API calls
+        # HTTP client for direct API calls, negotiating compressed responses
+        # and counting wire versus decoded bytes per endpoint
+        self.transfer_stats = TransferStats()
+        self.transport = CompressionTransport(
+            stats=self.transfer_stats,
+            thread_threshold=decompress_thread_threshold,
+        )
         self.http_client = httpx.AsyncClient(
             base_url=self.prometheus_url,
-            headers=auth_headers if auth_headers else None,
+            headers={
+                **auth_headers,
+                "Accept-Encoding": accept_encoding_header(accept_encoding),
+            },
             timeout=timeout,
+            transport=self.transport,
         )
 
+        # Requests carry the tenant of their context, sharing one pool;
+        # metadata, alerts and rules are loaded in bulk per tenant and
+        # shared by all its callers
+        self.tenant = None if tenant is None else validate_tenant(tenant)
+        self.tenant_limiter = TenantLimiter(tenant_limits)
+        self.metadata_ttl = metadata_ttl
+        self.snapshot_ttl = snapshot_ttl
+        self._tenants: dict[str | None, TenantState] = {}
+
+        # Identical in-flight requests, keyed by canonical query, and how
+        # many callers still wait for each
+        self._inflight: dict[Hashable, asyncio.Future[Any]] = {}
+        self._inflight_callers: dict[Hashable, int] = {}
+
+        # Upstream requests abandoned by cancelled or timed-out tool calls
+        self.abort_stats = AbortStats()
+
+        # Recent and pre-evaluated results, keyed like in-flight requests
+        # and kept apart per tenant
+        self.results_cache = PartitionedCache(
+            self.current_tenant, ttl=results_cache_ttl, max_entries=results_cache_size
+        )
+
+        # Admission to upstream slots, weighted by priority class and fair
+        # between client sessions
+        self.limiter = AdmissionController(max_concurrency, priority_weights)
+
+        # Range query cost shaping, based on cached series counts per
+        # selector
+        if cost_fallback not in COST_FALLBACKS:
+            raise ValueError(f"Invalid cost fallback: {cost_fallback}")
+        self.max_query_bytes = max_query_bytes
+        self.cost_fallback = cost_fallback
+        self.bytes_per_sample = bytes_per_sample
+        self.cardinality_cache = PartitionedCache(
+            self.current_tenant, ttl=cardinality_ttl, max_entries=1024
+        )
+        self.targets_ttl = targets_ttl
+
+        # Backend features, filled in by startup warmup
+        self.capabilities: Capabilities | None = None
+
+    def reconfigure(self, **settings: Any) -> list[str]:
+        """Apply changed settings to the live client.
+
+        Settings take the names of the constructor parameters; omitted
+        ones are kept. All of them are validated before anything changes,
+        and the change is applied without yielding to the event loop, so
+        no request sees a mix of old and new settings. Pooled connections,
+        queued requests and cached data are kept; caches are only emptied
+        when the upstream URL or credentials change, since their contents
+        would come from another backend or identity.
+
+        Args:
+            **settings: New setting values
+
+        Returns:
+            Names of the settings that changed
+
+        Raises:
+            ValueError: If a setting is unknown or invalid
+        """
+        unknown = settings.keys() - self._settings.keys()
+        if unknown:
+            raise ValueError(f"Unknown client settings: {', '.join(sorted(unknown))}")
+        changed = sorted(
+            name for name, value in settings.items() if value != self._settings[name]
+        )
+        if not changed:
+            return []
+        new = {**self._settings, **settings}
+
+        # Validate everything before touching live state
+        if new["history_backend"] not in HISTORY_BACKENDS:
+            raise ValueError(f"Invalid history backend: {new['history_backend']}")
+        if new["cost_fallback"] not in COST_FALLBACKS:
+            raise ValueError(f"Invalid cost fallback: {new['cost_fallback']}")
+        if new["max_concurrency"] < 1:
+            raise ValueError(
+                f"Concurrency limit must be at least 1: {new['max_concurrency']}"
+            )
+        time_alignment = parse_duration(new["time_alignment"])
+        tenant = new["tenant"]
+        if tenant is not None:
+            validate_tenant(tenant)
+        auth_headers = _auth_headers(
+            new["auth_token"], new["username"], new["password"]
+        )
+        reset = any(
+            name in changed
+            for name in ("prometheus_url", "auth_token", "username", "password")
+        )
+
+        self._settings = new
+        self.prometheus_url = new["prometheus_url"].rstrip("/")
+        self.timeout = new["timeout"]
+        self.history_backend = new["history_backend"]
+        self.time_alignment = time_alignment
+
+        if reset:
+            self.pc = PrometheusConnect(
+                url=self.prometheus_url,
+                headers=auth_headers if auth_headers else None,
+                disable_ssl=False,
+            )
+            self.http_client.base_url = httpx.URL(self.prometheus_url)
+            self.http_client.headers.pop("Authorization", None)
+            self.http_client.headers.update(auth_headers)
+        self.http_client.headers["Accept-Encoding"] = accept_encoding_header(
+            new["accept_encoding"]
+        )
+        self.http_client.timeout = httpx.Timeout(self.timeout)
+        self.transport.thread_threshold = new["decompress_thread_threshold"]
+
+        self.limiter.reconfigure(new["max_concurrency"], new["priority_weights"])
+        self.results_cache.resize(new["results_cache_ttl"], new["results_cache_size"])
+        self.cardinality_cache.resize(new["cardinality_ttl"])
+        self.max_query_bytes = new["max_query_bytes"]
+        self.cost_fallback = new["cost_fallback"]
+        self.bytes_per_sample = new["bytes_per_sample"]
+        self.targets_ttl = new["targets_ttl"]
+
+        self.metadata_ttl = new["metadata_ttl"]
+        self.snapshot_ttl = new["snapshot_ttl"]
+        for state in self._tenants.values():
+            state.metadata_cache.ttl = self.metadata_ttl
+            state.alerts_cache.ttl = self.snapshot_ttl
+            state.rules_cache.ttl = self.snapshot_ttl
+        self.tenant = tenant
+        self.tenant_limiter.set_limits(new["tenant_limits"] or {})
+
+        if reset:
+            self.results_cache.clear()
+            self.cardinality_cache.clear()
+            self._tenants.clear()
+            self.capabilities = None
+        logger.info(f"Reconfigured client: {', '.join(changed)}")
+        return changed
+
+    def current_tenant(self) -> str | None:
+        """Return the tenant upstream requests are sent for in this context."""
+        tenant = current_tenant()
+        return self.tenant if tenant is None else tenant
+
+    def _tenant_state(self) -> TenantState:
+        """Return the caches of the current tenant, creating them on first use."""
+        tenant = self.current_tenant()
+        state = self._tenants.get(tenant)
+        if state is None:
+            state = self._tenants[tenant] = TenantState(
+                metadata_cache=MetricMetadataCache(ttl=self.metadata_ttl),
+                alerts_cache=SnapshotCache(alert_keys, ttl=self.snapshot_ttl),
+                rules_cache=SnapshotCache(rule_keys, ttl=self.snapshot_ttl),
+            )
+        return state
+
+    @property
+    def metadata_cache(self) -> MetricMetadataCache:
+        """Return the current tenant's metric metadata."""
+        return self._tenant_state().metadata_cache
+
+    @property
+    def alerts_cache(self) -> SnapshotCache:
+        """Return the current tenant's alerts snapshot."""
+        return self._tenant_state().alerts_cache
+
+    @property
+    def rules_cache(self) -> SnapshotCache:
+        """Return the current tenant's rules snapshot."""
+        return self._tenant_state().rules_cache
+
+    def _tenant_headers(self) -> dict[str, str]:
+        """Return the headers selecting the current tenant upstream."""
+        tenant = self.current_tenant()
+        return {} if tenant is None else {TENANT_HEADER: tenant}
+
+    @asynccontextmanager
+    async def _slot(self) -> AsyncIterator[None]:
+        """Hold one of the current tenant's slots, then a shared one."""
+        async with self.tenant_limiter.slot(self.current_tenant()):
+            async with self.limiter.slot():
+                yield
+
+    def get_stats(self) -> dict[str, Any]:
+        """Return upstream transfer, cache and concurrency statistics.
+
+        Returns:
+            Statistics dictionary
+        """
+        return {
+            "transfer": self.transfer_stats.snapshot(),
+            "results_cache": {
+                "entries": len(self.results_cache),
+                "hits": self.results_cache.hits,
+                "misses": self.results_cache.misses,
+            },
+            "upstream": self.limiter.stats(),
+            "aborted": self.abort_stats.snapshot(),
+            "snapshots": {
+                "alerts": self.alerts_cache.stats(),
+                "rules": self.rules_cache.stats(),
+            },
+            "tenants": self.tenant_limiter.stats(),
+            "capabilities": (
+                self.capabilities.describe() if self.capabilities else None
+            ),
+        }
+
     async def query_metric(
         self,
         query: str,
         relative_time: str = "5m",
+        step: str = "1m",
+        aggregate_by: list[str] | None = None,
     ) -> dict[str, Any]:
         """Query a metric with relative time.
 
+        Queries whose estimated response exceeds ``max_query_bytes`` are
+        run at a coarser step or aggregated, or refused; see
+        ``plan_range_query``.
+
         Args:
             query: PromQL query string
             relative_time: Relative time expression (e.g., "5m", "1h", "24h")
+            step: Query resolution step width
+            aggregate_by: Labels to sum by if the query must be aggregated
 
         Returns:
             Query result dictionary
 
         Raises:
-            ValueError: If query or time format is invalid
+            ValueError: If query or time format is invalid, or the query is
+                too expensive to run
             httpx.HTTPError: If Prometheus request fails
         """
         try:
-            # Parse relative time to absolute timestamp
-            end_time = datetime.now()
-            start_time = self._parse_relative_time(relative_time, end_time)
+            # Reject invalid PromQL before making a network round trip
+            parsed = parse_promql(query)
 
-            # Execute query
-            result = await self._execute_query(query, start_time, end_time)
+            plan = await self.plan_range_query(query, relative_time, step, aggregate_by)
+            if plan is not None and plan.shaped:
+                record_plan(plan)
+                query, step = plan.query, plan.step
+                parsed = parse_promql(query)
+
+            cache_key = ("query", parsed.canonical, relative_time, step)
+
+            cached: dict[str, Any] | None = self.results_cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"Query '{query}' served from cache")
+                return cached
+
+            result = await self._evaluate_query(query, relative_time, step, cache_key)
+            if result.get("status") == "success":
+                self.results_cache.set(cache_key, result)
 
             logger.info(
                 f"Query '{query}' executed successfully for time range {relative_time}"
@@ -99,6 +483,60 @@ class PrometheusClient:
             logger.error(f"Query failed: {e}")
             raise
 
+    async def query_instant(self, query: str) -> dict[str, Any]:
+        """Evaluate a query at the current time.
+
+        Args:
+            query: PromQL query string
+
+        Returns:
+            Query result dictionary
+
+        Raises:
+            ValueError: If query is invalid
+            httpx.HTTPError: If Prometheus request fails
+        """
+        parsed = parse_promql(query)
+        return await self._coalesce(
+            ("query", parsed.canonical),
+            lambda: self._execute_query(query),
+        )
+
+    async def warm_query(
+        self,
+        query: str,
+        relative_time: str = "5m",
+        ttl: float | None = None,
+        step: str = "1m",
+    ) -> dict[str, Any]:
+        """Evaluate a query and store the result in the results cache.
+
+        Unlike ``query_metric`` this always goes upstream, so the cached
+        entry is refreshed even if it has not expired yet.
+
+        Args:
+            query: PromQL query string
+            relative_time: Relative time expression
+            ttl: Seconds the result stays cached; defaults to the cache TTL
+            step: Query resolution step width
+
+        Returns:
+            Query result dictionary
+
+        Raises:
+            ValueError: If query or time format is invalid
+            httpx.HTTPError: If Prometheus request fails
+        """
+        parsed = parse_promql(query)
+        cache_key = ("query", parsed.canonical, relative_time, step)
+
+        result = await self._evaluate_query(query, relative_time, step, cache_key)
+        if result.get("status") == "success":
+            self.results_cache.set(cache_key, result, ttl)
+
+        logger.debug(f"Warmed query '{query}' for time range {relative_time}")
+        return result
+
     async def get_instance_value(
         self,
         metric_name: str,
@@ -121,7 +559,7 @@ class PrometheusClient:
         """
         try:
             # Build query for specific instance
-            query = f'{metric_name}{{instance="{instance}"}}'
+            query = _instance_selector(metric_name, "=", instance)
 
             result = await self.query_metric(query, relative_time)
 
@@ -132,9 +570,9 @@ class PrometheusClient:
                 values = result["data"]["result"]
                 if values:
                     # Get the most recent value
-                    latest_value = values[0].get("value", [None, None])
-                    if len(latest_value) >= 2:
-                        return float(latest_value[1])
+                    latest_value = _latest_value(values[0])
+                    if latest_value is not None:
+                        return latest_value
 
             logger.warning(
                 f"No value found for metric '{metric_name}' on instance '{instance}'"
@@ -145,100 +583,1068 @@ class PrometheusClient:
             logger.error(f"Failed to get instance value: {e}")
             raise
 
+    async def get_instance_values(
+        self,
+        metric_name: str,
+        instances: list[str] | None = None,
+        instance_regex: str | None = None,
+        relative_time: str = "5m",
+        max_pattern_length: int = MAX_INSTANCE_PATTERN_LENGTH,
+    ) -> dict[str, float | None]:
+        """Get current values of a metric for many instances at once.
+
+        Instances are matched with one regex matcher per query instead of one
+        query per instance; long instance lists are split into several
+        queries, each at most ``max_pattern_length`` characters of regex.
+
+        Args:
+            metric_name: Name of the metric
+            instances: Exact instance identifiers
+            instance_regex: Regex the instance label must fully match; used
+                when instances is not given
+            relative_time: Relative time expression
+            max_pattern_length: Longest regex sent in one query
+
+        Returns:
+            Mapping of instance to its most recent value, sorted by instance.
+            Requested instances without data map to None. If an instance has
+            several series, the first one returned is used.
+
+        Raises:
+            ValueError: If neither instances nor instance_regex is given, or a
+                query fails
+            httpx.HTTPError: If Prometheus request fails
+        """
+        if instances:
+            requested = list(dict.fromkeys(instances))
+            patterns = _chunk_patterns(
+                [escape_regex(instance) for instance in requested],
+                max_pattern_length,
+            )
+        elif instance_regex:
+            requested = []
+            patterns = [instance_regex]
+        else:
+            raise ValueError("Either instances or instance_regex is required")
+
+        results = await asyncio.gather(
+            *(
+                self.query_metric(
+                    _instance_selector(metric_name, "=~", pattern), relative_time
+                )
+                for pattern in patterns
+            )
+        )
+
+        values: dict[str, float | None] = dict.fromkeys(requested)
+        for result in results:
+            if result.get("status") != "success":
+                raise ValueError(
+                    f"Query failed: {result.get('error', 'Unknown error')}"
+                )
+            for entry in result.get("data", {}).get("result", []):
+                instance = entry.get("metric", {}).get("instance")
+                if instance is not None and values.get(instance) is None:
+                    values[instance] = _latest_value(entry)
+
+        found = sum(value is not None for value in values.values())
+        logger.info(
+            f"Retrieved '{metric_name}' for {found} instances in "
+            f"{len(patterns)} queries"
+        )
+        return dict(sorted(values.items()))
+
     async def get_metric_history(
         self,
         metric_name: str,
         relative_time: str = "1h",
         step: str = "1m",
+        aggregate_by: list[str] | None = None,
+        cursor: HistoryCursor | None = None,
     ) -> list[dict[str, Any]]:
-        """Get historical data for a metric.
+        """Get historical data for a metric as one dictionary per sample.
+
+        Like ``get_history_series``, whose series are expanded into data
+        points.
 
         Args:
             metric_name: Name of the metric
             relative_time: Time range for history
             step: Query resolution step width
+            aggregate_by: Labels to sum by if the query must be aggregated
+            cursor: Watermarks of the samples already seen
 
         Returns:
             List of historical data points
 
         Raises:
-            ValueError: If parameters are invalid
+            ValueError: If parameters are invalid, the cursor belongs to
+                another query or the query is too expensive to run
+            httpx.HTTPError: If Prometheus request fails
+        """
+        series_list = await self.get_history_series(
+            metric_name, relative_time, step, aggregate_by, cursor
+        )
+        return [
+            {"timestamp": timestamp, "value": value, "labels": series.labels}
+            for series in series_list
+            for timestamp, value in series.samples()
+        ]
+
+    async def get_history_series(
+        self,
+        metric_name: str,
+        relative_time: str = "1h",
+        step: str = "1m",
+        aggregate_by: list[str] | None = None,
+        cursor: HistoryCursor | None = None,
+    ) -> list[Series]:
+        """Get historical data for a metric as columnar series.
+
+        Range queries over ``max_query_bytes`` are shaped like in
+        ``query_metric``; raw remote-read fetches are not. With a cursor,
+        only the tail of the window after its oldest watermark is fetched
+        and only samples newer than each series' watermark are returned;
+        the cursor must have been issued for the query and step as shaped.
+
+        Args:
+            metric_name: Name of the metric
+            relative_time: Time range for history
+            step: Query resolution step width
+            aggregate_by: Labels to sum by if the query must be aggregated
+            cursor: Watermarks of the samples already seen
+
+        Returns:
+            One series per result entry
+
+        Raises:
+            ValueError: If parameters are invalid, the cursor belongs to
+                another query or the query is too expensive to run
             httpx.HTTPError: If Prometheus request fails
         """
         try:
             # Build range query
             query = f"{metric_name}"
+            parsed = parse_promql(query)
 
-            # Parse relative time
-            end_time = datetime.now()
-            start_time = self._parse_relative_time(relative_time, end_time)
+            selector = remote_read_selector(parsed)
+            remote = self.history_backend == "remote_read" and selector is not None
+            if not remote:
+                # Shape before the cursor check, so a cursor is always tied
+                # to the query and step that are actually run
+                plan = await self.plan_range_query(
+                    query, relative_time, step, aggregate_by
+                )
+                if plan is not None and plan.shaped:
+                    record_plan(plan)
+                    query, step = plan.query, plan.step
+                    parsed = parse_promql(query)
 
-            # Execute range query
-            result = await self._execute_range_query(query, start_time, end_time, step)
+            if cursor is not None and not cursor.matches(query, step):
+                raise ValueError(
+                    "History cursor was issued for a different query or step; "
+                    "the query may have been reshaped to stay within the cost "
+                    "limit, so start again without a cursor"
+                )
 
-            # Format historical data
-            history_data = []
-            if result.get("status") == "success":
-                for series in result.get("data", {}).get("result", []):
-                    metric_labels = series.get("metric", {})
-                    values = series.get("values", [])
-
-                    for timestamp, value in values:
-                        history_data.append(
-                            {
-                                "timestamp": timestamp,
-                                "value": float(value),
-                                "labels": metric_labels,
-                            }
-                        )
+            if cursor is not None and cursor.oldest() is not None:
+                tail = await self._history_tail(
+                    query, parsed, relative_time, step, cursor
+                )
+                series_list = cursor.select(tail)
+            elif remote and selector is not None:
+                # Parse relative time
+                start_time, end_time = self._time_window(relative_time)
+
+                # Raw samples; step does not apply
+                cache_key = ("remote_read", parsed.canonical, relative_time)
+                cached: list[Series] | None = self.results_cache.get(cache_key)
+                if cached is None:
+                    cached = await self._coalesce(
+                        cache_key,
+                        lambda: self._execute_remote_read(
+                            selector, start_time, end_time
+                        ),
+                    )
+                    self.results_cache.set(cache_key, cached)
+                series_list = cached
+            else:
+                # Execute range query
+                result = await self._evaluate_range_query(
+                    query, parsed.canonical, relative_time, step
+                )
+                series_list = (
+                    series_from_matrix(result)
+                    if result.get("status") == "success"
+                    else []
+                )
 
+            samples = sum(len(series) for series in series_list)
             logger.info(
-                f"Retrieved {len(history_data)} historical data points for '{metric_name}'"
+                f"Retrieved {samples} historical data points for '{metric_name}'"
             )
-            return history_data
+            return series_list
 
         except Exception as e:
             logger.error(f"Failed to get metric history: {e}")
             raise
 
+    async def _history_tail(
+        self,
+        query: str,
+        parsed: PromQLQuery,
+        relative_time: str,
+        step: str,
+        cursor: HistoryCursor,
+    ) -> list[Series]:
+        """Fetch the part of a history window a cursor has not seen.
+
+        Args:
+            query: PromQL query string
+            parsed: Parsed query
+            relative_time: Time range for history
+            step: Query resolution step width
+            cursor: Cursor with at least one watermark
+
+        Returns:
+            Series from the oldest watermark to the end of the window
+        """
+        oldest = cursor.oldest() or 0.0
+        selector = remote_read_selector(parsed)
+        remote = self.history_backend == "remote_read" and selector is not None
+
+        start_time, end_time = self._time_window(
+            relative_time, None if remote else step
+        )
+        # Range query evaluations sit on the step grid, so the next unseen
+        # one is a step past the watermark; raw samples are filtered later
+        tail_start = oldest if remote else oldest + parse_step(step)
+        start_time = max(start_time, datetime.fromtimestamp(tail_start, timezone.utc))
+        if start_time > end_time:
+            return []
+
+        cache_key = (
+            "history_tail",
+            parsed.canonical,
+            start_time.timestamp(),
+            end_time.timestamp(),
+            None if remote else step,
+        )
+        if remote and selector is not None:
+            return await self._coalesce(
+                cache_key,
+                lambda: self._execute_remote_read(selector, start_time, end_time),
+            )
+
+        result = await self._coalesce(
+            cache_key,
+            lambda: self._execute_range_query(query, start_time, end_time, step),
+        )
+        return series_from_matrix(result) if result.get("status") == "success" else []
+
+    async def query_range(
+        self,
+        query: str,
+        relative_time: str = "1h",
+        step: str = "1m",
+    ) -> list[Series]:
+        """Evaluate a range query into columnar series.
+
+        Args:
+            query: PromQL query string
+            relative_time: Time range to look back from now
+            step: Query resolution step width
+
+        Returns:
+            One series per result entry
+
+        Raises:
+            ValueError: If the query is invalid or fails
+            httpx.HTTPError: If Prometheus request fails
+        """
+        parsed = parse_promql(query)
+        result = await self._evaluate_range_query(
+            query, parsed.canonical, relative_time, step
+        )
+        return series_from_matrix(result)
+
+    async def query_range_many(
+        self,
+        queries: list[str],
+        relative_time: str = "1h",
+        step: str = "1m",
+        max_pattern_length: int = MAX_INSTANCE_PATTERN_LENGTH,
+    ) -> list[tuple[str, Series]]:
+        """Evaluate many range queries over one shared time grid.
+
+        Plain selectors that differ only in their metric name, such as
+        ``up`` and ``process_cpu_seconds_total`` or ``a{job="x"}`` and
+        ``b{job="x"}``, are fetched together with one ``__name__`` regex
+        matcher per query; long name lists are split into several queries,
+        each at most ``max_pattern_length`` characters of regex. Other
+        expressions are evaluated as given. All queries run concurrently.
+
+        Args:
+            queries: PromQL query strings
+            relative_time: Time range to look back from now
+            step: Query resolution step width
+            max_pattern_length: Longest regex sent in one query
+
+        Returns:
+            Pairs of the query each series answers and the series
+
+        Raises:
+            ValueError: If a query is invalid or fails
+            httpx.HTTPError: If Prometheus request fails
+        """
+        # Selectors keyed by their non-name matchers, then by metric name
+        groups: dict[tuple[str, ...], dict[str, str]] = {}
+        matchers: dict[tuple[str, ...], list[Matcher]] = {}
+        expressions = []
+        for query in dict.fromkeys(queries):
+            expr = parse_promql(query).expr
+            if (
+                isinstance(expr, VectorSelector)
+                and expr.name is not None
+                and expr.range is None
+                and expr.offset is None
+                and expr.at is None
+            ):
+                others = [m for m in expr.matchers if m.name != "__name__"]
+                key = tuple(sorted(str(m) for m in others))
+                groups.setdefault(key, {})[expr.name] = query
+                matchers[key] = others
+            else:
+                expressions.append(query)
+
+        shards: list[tuple[dict[str, str] | None, str]] = [
+            (None, query) for query in expressions
+        ]
+        for key, names in groups.items():
+            if len(names) == 1:
+                shards.append((None, next(iter(names.values()))))
+                continue
+            for pattern in _chunk_patterns(
+                [escape_regex(name) for name in names], max_pattern_length
+            ):
+                selector = VectorSelector(
+                    None, [Matcher("__name__", "=~", pattern), *matchers[key]]
+                ).selector()
+                shards.append((names, selector))
+
+        results = await asyncio.gather(
+            *(self.query_range(query, relative_time, step) for _, query in shards)
+        )
+
+        pairs = []
+        for (sources, query), series_list in zip(shards, results, strict=True):
+            for series in series_list:
+                source = query
+                if sources is not None:
+                    source = sources.get(series.labels.get("__name__", ""), query)
+                pairs.append((source, series))
+        logger.info(
+            f"Fetched {len(queries)} range queries as {len(shards)} requests, "
+            f"{len(pairs)} series"
+        )
+        return pairs
+
+    async def query_histogram(
+        self,
+        metric: str,
+        by: list[str] | None = None,
+        relative_time: str = "1h",
+        step: str = "1m",
+        rate_window: str = "5m",
+        native: bool | None = None,
+    ) -> HistogramMatrix:
+        """Fetch the bucket rates of a histogram over a time range.
+
+        Classic histograms are fetched as one ``_bucket`` rate query summed
+        by ``le`` and the grouping labels, next to small ``_sum`` and
+        ``_count`` rate queries for the mean. Native histograms are fetched
+        as one rate query whose samples carry their buckets.
+
+        Args:
+            metric: Histogram name with optional label matchers, e.g.
+                'http_request_duration_seconds{job="api"}'; a ``_bucket``
+                suffix is ignored
+            by: Labels to keep apart; everything else is summed
+            relative_time: Time range to look back from now
+            step: Query resolution step width
+            rate_window: Range of the rate() over the buckets
+            native: True for native histograms, False for classic ones,
+                None to try classic first and native if it has no buckets,
+                unless warmup found a Prometheus without native histograms
+
+        Returns:
+            Bucket matrix of the histogram groups
+
+        Raises:
+            ValueError: If the metric is not a selector or a query fails
+            httpx.HTTPError: If Prometheus request fails
+        """
+        expr = parse_promql(metric).expr
+        if (
+            not isinstance(expr, VectorSelector)
+            or expr.name is None
+            or expr.range is not None
+        ):
+            raise ValueError(
+                "Histogram must be a metric name with optional label matchers"
+            )
+        name = expr.name.removesuffix("_bucket")
+        matchers = [m for m in expr.matchers if m.name != "__name__"]
+        capabilities = self.capabilities
+        if (
+            native is None
+            and capabilities is not None
+            and capabilities.flavor == "prometheus"
+            and not capabilities.native_histograms
+        ):
+            native = False
+        window = parse_duration(rate_window)
+        grouping = list(by or [])
+
+        def rate(suffix: str, labels: list[str]) -> str:
+            selector = VectorSelector(name + suffix, matchers, range=window)
+            return str(
+                Aggregation(
+                    "sum", Call("rate", [selector]), grouping=labels, has_grouping=True
+                )
+            )
+
+        if native is not True:
+            queries = [
+                rate("_bucket", ["le", *grouping]),
+                rate("_sum", grouping),
+                rate("_count", grouping),
+            ]
+            buckets, sums, counts = await asyncio.gather(
+                *(self.query_range(query, relative_time, step) for query in queries)
+            )
+            if buckets or native is False:
+                return histogram_from_buckets(
+                    buckets, sums, counts, parse_step(step)
+                )
+
+        query = rate("", grouping)
+        result = await self._evaluate_range_query(
+            query, parse_promql(query).canonical, relative_time, step
+        )
+        if result.get("status") != "success":
+            raise ValueError(f"Query failed: {result.get('error', 'Unknown error')}")
+        return histogram_from_native(
+            result.get("data", {}).get("result", []), parse_step(step)
+        )
+
+    async def plan_range_query(
+        self,
+        query: str,
+        relative_time: str,
+        step: str,
+        aggregate_by: list[str] | None = None,
+    ) -> QueryPlan | None:
+        """Estimate a range query's cost and decide how to run it.
+
+        The response size is estimated as series x points x bytes per
+        sample, with series counts from cached ``count()`` queries per
+        selector. Over ``max_query_bytes`` the query gets a coarser step,
+        is aggregated or is refused, depending on ``cost_fallback``.
+
+        Args:
+            query: PromQL query string
+            relative_time: Time range to look back from now
+            step: Query resolution step width
+            aggregate_by: Labels to sum by if the query must be aggregated
+
+        Returns:
+            Plan to run, or None if cost estimation is disabled or the
+            series counts could not be fetched
+
+        Raises:
+            ValueError: If the query is invalid or too expensive to run
+        """
+        if self.max_query_bytes <= 0:
+            return None
+
+        parsed = parse_promql(query)
+        step_seconds = parse_step(step)
+        start_time, end_time = self._time_window(relative_time, step)
+        window = (end_time - start_time).total_seconds()
+
+        try:
+            counts = await self._series_counts(
+                [selector.selector() for selector in parsed.selectors]
+            )
+        except Exception as e:
+            # An estimate is an optimization; run the query as asked
+            logger.warning(f"Cost estimate for '{query}' unavailable: {e}")
+            return None
+
+        series = estimate_series(parsed.expr, counts) or 1
+        points = int(window // step_seconds) + 1
+        over_budget = series * points * self.bytes_per_sample > self.max_query_bytes
+        groups = None
+        if aggregate_by and over_budget:
+            groups = await self._group_count(parsed, aggregate_by)
+
+        return shape_query(
+            parsed,
+            window,
+            step_seconds,
+            series,
+            self.max_query_bytes,
+            fallback=self.cost_fallback,
+            bytes_per_sample=self.bytes_per_sample,
+            aggregate_by=aggregate_by,
+            groups=groups,
+        )
+
+    async def _series_counts(self, selectors: list[str]) -> dict[str, int]:
+        """Return series counts of selectors, from cache where possible."""
+        counts: dict[str, int] = {}
+        missing = []
+        for selector in dict.fromkeys(selectors):
+            cached = self.cardinality_cache.get(("series", selector))
+            if cached is None:
+                missing.append(selector)
+            else:
+                counts[selector] = cached
+
+        fetched = await asyncio.gather(
+            *(self._count(f"count({selector})") for selector in missing)
+        )
+        for selector, count in zip(missing, fetched, strict=True):
+            self.cardinality_cache.set(("series", selector), count)
+            counts[selector] = count
+        return counts
+
+    async def _group_count(self, parsed: PromQLQuery, labels: list[str]) -> int | None:
+        """Return how many series summing a query by labels would leave."""
+        grouped = str(
+            Aggregation(
+                "count",
+                Aggregation("count", parsed.expr, grouping=labels, has_grouping=True),
+            )
+        )
+        key = ("groups", grouped)
+        cached: int | None = self.cardinality_cache.get(key)
+        if cached is not None:
+            return cached
+        try:
+            count = await self._count(grouped)
+        except Exception as e:
+            logger.warning(f"Group count for '{parsed.query}' unavailable: {e}")
+            return None
+        self.cardinality_cache.set(key, count)
+        return count
+
+    async def _count(self, query: str) -> int:
+        """Evaluate an instant ``count()`` query."""
+        result = await self.query_instant(query)
+        if result.get("status") != "success":
+            raise ValueError(f"Query failed: {result.get('error', 'Unknown error')}")
+        entries = result.get("data", {}).get("result", [])
+        value = _latest_value(entries[0]) if entries else None
+        return int(value or 0)
+
+    async def stream_range_query(
+        self,
+        query: str,
+        relative_time: str = "1h",
+        step: str = "1m",
+    ) -> AsyncIterator[Series]:
+        """Evaluate a range query, yielding series while the body arrives.
+
+        Unlike query_range, the response is neither cached nor held in
+        memory as a whole, which suits exports of arbitrarily large results.
+
+        Args:
+            query: PromQL query string
+            relative_time: Time range to look back from now
+            step: Query resolution step width
+
+        Yields:
+            One series per result entry, in response order
+
+        Raises:
+            ValueError: If the query is invalid or the response is malformed
+            httpx.HTTPError: If Prometheus request fails
+        """
+        parse_promql(query)
+        start_time, end_time = self._time_window(relative_time, step)
+        params = {
+            "query": query,
+            "start": start_time.timestamp(),
+            "end": end_time.timestamp(),
+            "step": step,
+        }
+
+        endpoint = "/api/v1/query_range"
+        async with self._slot(), self.abort_stats.track(endpoint):
+            async with self.http_client.stream(
+                "GET",
+                endpoint,
+                params=with_query_timeout(endpoint, params),
+                headers=self._tenant_headers(),
+            ) as response:
+                response.raise_for_status()
+                parser = JSONArrayStream(("data", "result"))
+                async for data in response.aiter_bytes():
+                    for entry in parser.feed(data):
+                        yield series_from_entry(entry)
+
+        if not parser.found or not parser.complete:
+            raise ValueError("Query failed: incomplete or unexpected response body")
+
     async def list_available_metrics(
         self,
         pattern: str | None = None,
     ) -> list[str]:
-        """Query available metrics (not exhaustive listing).
+        """List metric names from the name index.
+
+        The index holds the values of ``__name__`` and is loaded once, by
+        warmup or the first call, and refreshed with the metadata TTL.
 
         Args:
-            pattern: Optional pattern to filter metrics
+            pattern: Optional regex matched against the full metric name
 
         Returns:
             List of available metric names
 
         Raises:
+            ValueError: If pattern is not a valid regex
+            httpx.HTTPError: If Prometheus request fails and nothing is cached
+        """
+        try:
+            await self.ensure_metric_names()
+            metric_names = self.metadata_cache.match_names(pattern)
+
+            logger.info(f"Found {len(metric_names)} available metrics")
+            return metric_names
+
+        except Exception as e:
+            logger.error(f"Failed to list metrics: {e}")
+            raise
+
+    async def get_metric_metadata(
+        self,
+        metric_name: str | None = None,
+        pattern: str | None = None,
+        metric_type: str | None = None,
+    ) -> dict[str, dict[str, str]]:
+        """Get type, help and unit metadata for metrics.
+
+        Metadata is fetched from ``/api/v1/metadata`` in a single bulk request
+        and served from cache until it expires.
+
+        Args:
+            metric_name: Optional exact metric name to look up
+            pattern: Optional regex to filter metric names
+            metric_type: Optional metric type to filter by (e.g., "counter")
+
+        Returns:
+            Mapping of metric name to metadata dictionary
+
+        Raises:
+            ValueError: If pattern is not a valid regex
+            httpx.HTTPError: If Prometheus request fails and nothing is cached
+        """
+        try:
+            await self.ensure_metadata()
+
+            if metric_name:
+                entry = self.metadata_cache.get(metric_name)
+                return {metric_name: entry} if entry else {}
+
+            return self.metadata_cache.search(pattern, metric_type)
+
+        except Exception as e:
+            logger.error(f"Failed to get metric metadata: {e}")
+            raise
+
+    async def describe_metrics(
+        self,
+        metric_names: list[str],
+    ) -> dict[str, dict[str, str]]:
+        """Get cached metadata for a list of metric names.
+
+        Args:
+            metric_names: Metric or series names to annotate
+
+        Returns:
+            Mapping of metric name to metadata for names that have any
+        """
+        await self.ensure_metadata()
+
+        described = {}
+        for metric_name in metric_names:
+            entry = self.metadata_cache.get(metric_name)
+            if entry is not None:
+                described[metric_name] = entry
+        return described
+
+    async def refresh_metric_metadata(self) -> int:
+        """Reload the metric metadata cache from Prometheus.
+
+        Returns:
+            Number of metrics with metadata
+
+        Raises:
+            httpx.HTTPError: If Prometheus request fails
+        """
+        async with self._tenant_state().metadata_lock:
+            response = await self._get("/api/v1/metadata")
+            response.raise_for_status()
+            result = response.json()
+
+            if result.get("status") != "success":
+                raise ValueError(
+                    f"Metadata request failed: {result.get('error', 'Unknown error')}"
+                )
+
+            self.metadata_cache.update(result.get("data", {}))
+            logger.info(f"Loaded metadata for {len(self.metadata_cache)} metrics")
+            return len(self.metadata_cache)
+
+    async def refresh_metric_names(self) -> int:
+        """Reload the metric name index from Prometheus.
+
+        Backends that accept the ``limit`` parameter are asked for at most
+        ``MAX_METRIC_NAMES`` names; others send all and are cut here.
+
+        Returns:
+            Number of metric names in the index
+
+        Raises:
+            ValueError: If the response is not a list of names
+            httpx.HTTPError: If Prometheus request fails
+        """
+        async with self._tenant_state().names_lock:
+            params = None
+            if self.capabilities is not None and self.capabilities.supports_limit:
+                params = {"limit": MAX_METRIC_NAMES + 1}
+            response = await self._get(METRIC_NAMES_ENDPOINT, params)
+            response.raise_for_status()
+            result = response.json()
+
+            names = result.get("data")
+            if result.get("status") != "success" or not isinstance(names, list):
+                raise ValueError(
+                    "Metric names request failed: "
+                    f"{result.get('error', 'Unknown error')}"
+                )
+
+            truncated = len(names) > MAX_METRIC_NAMES
+            if truncated:
+                logger.warning(f"Metric name index cut at {MAX_METRIC_NAMES} names")
+                names = names[:MAX_METRIC_NAMES]
+            self.metadata_cache.update_names(names, truncated)
+            logger.info(f"Loaded {len(names)} metric names")
+            return len(names)
+
+    async def get_alerts(
+        self, criteria: dict[str, str] | None = None
+    ) -> list[dict[str, Any]]:
+        """Get active alerts from the shared snapshot.
+
+        Args:
+            criteria: Required label values, and ``snapshots.STATE`` for
+                the alert state
+
+        Returns:
+            Matching alerts as ``/api/v1/alerts`` returns them
+
+        Raises:
+            ValueError: If the request fails and no snapshot is available
+            httpx.HTTPError: If Prometheus request fails
+        """
+        await self._ensure_snapshot(
+            self.alerts_cache,
+            "/api/v1/alerts",
+            lambda data: data.get("alerts", []),
+        )
+        return self.alerts_cache.select(criteria)
+
+    async def get_rules(
+        self, criteria: dict[str, str] | None = None
+    ) -> list[dict[str, Any]]:
+        """Get alerting and recording rules from the shared snapshot.
+
+        Args:
+            criteria: Required rule label values and ``snapshots`` rule
+                pseudo-fields (name, type, health, group, state)
+
+        Returns:
+            Matching rules, each tagged with its group and file
+
+        Raises:
+            ValueError: If the request fails and no snapshot is available
+            httpx.HTTPError: If Prometheus request fails
+        """
+        await self._ensure_snapshot(
+            self.rules_cache,
+            "/api/v1/rules",
+            lambda data: flatten_rules(data.get("groups", [])),
+        )
+        return self.rules_cache.select(criteria)
+
+    async def get_target_health(self, pool: str | None = None) -> dict[str, Any]:
+        """Get scrape target health aggregated per scrape pool and job.
+
+        The targets response is parsed as it streams in and folded into
+        the summary target by target; the summary is cached for
+        ``targets_ttl`` seconds.
+
+        Args:
+            pool: Only targets of this scrape pool
+
+        Returns:
+            Summary as made by ``TargetHealthAggregator.summary``
+
+        Raises:
+            ValueError: If the response is malformed
+            httpx.HTTPError: If Prometheus request fails
+        """
+        cache_key = ("targets", pool)
+        summary: dict[str, Any] | None = self.results_cache.get(cache_key)
+        if summary is None:
+            summary = await self._coalesce(
+                cache_key, lambda: self._aggregate_targets(pool)
+            )
+            self.results_cache.set(cache_key, summary, ttl=self.targets_ttl)
+        return summary
+
+    async def _aggregate_targets(self, pool: str | None) -> dict[str, Any]:
+        """Stream active targets into a health summary."""
+        params = {"state": "active"}
+        if pool:
+            params["scrapePool"] = pool
+
+        endpoint = "/api/v1/targets"
+        aggregator = TargetHealthAggregator()
+        async with self._slot(), self.abort_stats.track(endpoint):
+            async with self.http_client.stream(
+                "GET", endpoint, params=params, headers=self._tenant_headers()
+            ) as response:
+                response.raise_for_status()
+                parser = JSONArrayStream(("data", "activeTargets"))
+                async for data in response.aiter_bytes():
+                    for target in parser.feed(data):
+                        aggregator.add(target)
+
+        if not parser.found or not parser.complete:
+            raise ValueError(
+                "Targets request failed: incomplete or unexpected response body"
+            )
+        return aggregator.summary()
+
+    async def _ensure_snapshot(
+        self,
+        cache: SnapshotCache,
+        endpoint: str,
+        extract: Callable[[dict[str, Any]], list[dict[str, Any]]],
+    ) -> None:
+        """Refetch a snapshot if it is stale.
+
+        Concurrent callers share one upstream request. When a refresh fails
+        but an older snapshot is available, the stale copy keeps being
+        served.
+
+        Args:
+            cache: Snapshot to refresh
+            endpoint: API path it is fetched from
+            extract: Returns the snapshot items from the response data
+        """
+        if not cache.is_stale():
+            return
+
+        async def refresh() -> dict[str, Any]:
+            response = await self._get(endpoint)
+            response.raise_for_status()
+            result: dict[str, Any] = response.json()
+            if result.get("status") != "success":
+                raise ValueError(
+                    f"Request to {endpoint} failed: "
+                    f"{result.get('error', 'Unknown error')}"
+                )
+            if cache.update(extract(result.get("data", {}))):
+                logger.info(f"Snapshot of {endpoint} changed: {len(cache)} items")
+            return result
+
+        try:
+            await self._coalesce(("snapshot", endpoint), refresh)
+        except Exception as e:
+            if cache.loaded_at is None:
+                raise
+            logger.warning(f"Refresh of {endpoint} failed, serving stale copy: {e}")
+
+    async def get_status(self, endpoint: str) -> dict[str, Any]:
+        """Fetch the data of a status endpoint.
+
+        Args:
+            endpoint: API path, e.g. "/api/v1/status/buildinfo"
+
+        Returns:
+            The ``data`` object of the response
+
+        Raises:
+            ValueError: If the request fails or returns no data object
             httpx.HTTPError: If Prometheus request fails
         """
+        response = await self._get(endpoint)
+        response.raise_for_status()
+        result = response.json()
+        data = result.get("data")
+        if result.get("status") != "success" or not isinstance(data, dict):
+            raise ValueError(
+                f"Request to {endpoint} failed: {result.get('error', 'no data')}"
+            )
+        return data
+
+    async def ensure_metadata(self) -> None:
+        """Load or refresh metric metadata if the cache is stale.
+
+        Concurrent callers share one upstream request. When a refresh fails
+        but older metadata is available, the stale copy keeps being served.
+        """
+        if not self.metadata_cache.is_stale():
+            return
+
+        lock = self._tenant_state().metadata_lock
+        if lock.locked():
+            # Another caller is refreshing; wait for it instead of refetching
+            async with lock:
+                return
+
         try:
-            # Use label values API to get metric names
-            if pattern:
-                query = f'{{__name__=~"{pattern}"}}'
-            else:
-                query = '{__name__=~".+"}'
+            await self.refresh_metric_metadata()
+        except Exception as e:
+            if self.metadata_cache.loaded_at is None:
+                raise
+            logger.warning(f"Metadata refresh failed, serving stale cache: {e}")
 
-            # Get unique metric names
-            result = await self._execute_query(query)
+    async def ensure_metric_names(self) -> None:
+        """Load or refresh the metric name index if it is stale.
 
-            metric_names = set()
-            if result.get("status") == "success":
-                for series in result.get("data", {}).get("result", []):
-                    metric_name = series.get("metric", {}).get("__name__")
-                    if metric_name:
-                        metric_names.add(metric_name)
+        Like ``ensure_metadata``, concurrent callers share one request and
+        a stale index keeps being served when a refresh fails.
+        """
+        if not self.metadata_cache.names_stale():
+            return
 
-            logger.info(f"Found {len(metric_names)} available metrics")
-            return sorted(list(metric_names))
+        lock = self._tenant_state().names_lock
+        if lock.locked():
+            async with lock:
+                return
 
+        try:
+            await self.refresh_metric_names()
         except Exception as e:
-            logger.error(f"Failed to list metrics: {e}")
+            if self.metadata_cache.names_loaded_at is None:
+                raise
+            logger.warning(f"Metric name refresh failed, serving stale index: {e}")
+
+    async def _evaluate_query(
+        self,
+        query: str,
+        relative_time: str,
+        step: str,
+        cache_key: Hashable,
+    ) -> dict[str, Any]:
+        """Evaluate a relative-time query, coalescing identical requests.
+
+        Args:
+            query: PromQL query string
+            relative_time: Relative time expression
+            step: Query resolution step width
+            cache_key: Key identifying the canonical query and time range
+
+        Returns:
+            Query result dictionary
+        """
+        # Parse relative time to an aligned absolute window
+        start_time, end_time = self._time_window(relative_time)
+
+        # Execute query, sharing the request with identical in-flight ones
+        return await self._coalesce(
+            cache_key,
+            lambda: self._execute_query(query, start_time, end_time, step),
+        )
+
+    async def _evaluate_range_query(
+        self,
+        query: str,
+        canonical: str,
+        relative_time: str,
+        step: str,
+    ) -> dict[str, Any]:
+        """Evaluate a range query through the results cache.
+
+        Args:
+            query: PromQL query string
+            canonical: Canonical form of the query
+            relative_time: Relative time expression
+            step: Query resolution step width
+
+        Returns:
+            Query result dictionary
+        """
+        cache_key = ("query_range", canonical, relative_time, step)
+        result: dict[str, Any] | None = self.results_cache.get(cache_key)
+        if result is not None:
+            return result
+
+        # Parse relative time to a step-aligned window
+        start_time, end_time = self._time_window(relative_time, step)
+
+        result = await self._coalesce(
+            cache_key,
+            lambda: self._execute_range_query(query, start_time, end_time, step),
+        )
+        if result.get("status") == "success":
+            self.results_cache.set(cache_key, result)
+        return result
+
+    async def _coalesce(
+        self,
+        key: Hashable,
+        request: Callable[[], Awaitable[T]],
+    ) -> T:
+        """Run a request, sharing it with identical requests already in flight.
+
+        Args:
+            key: Coalescing key, built from the canonical query; requests
+                are only shared within a tenant
+            request: Factory that starts the upstream request
+
+        Returns:
+            Result of the shared request
+        """
+        key = (self.current_tenant(), key)
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(request())
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            logger.debug(f"Coalescing request with in-flight {key}")
+
+        self._inflight_callers[key] = self._inflight_callers.get(key, 0) + 1
+        try:
+            # Shield so one caller giving up does not fail the others
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            if self._inflight_callers[key] == 1 and not future.done():
+                # Nobody is left to read the result; abort the upstream query
+                logger.info(f"Cancelling abandoned upstream request {key}")
+                future.cancel()
             raise
+        finally:
+            self._inflight_callers[key] -= 1
+            if not self._inflight_callers[key]:
+                del self._inflight_callers[key]
 
     def _parse_relative_time(self, relative_time: str, end_time: datetime) -> datetime:
         """Parse relative time expression to absolute timestamp.
@@ -253,35 +1659,47 @@ class PrometheusClient:
         Raises:
             ValueError: If time format is invalid
         """
-        # Parse relative time patterns
-        patterns = [
-            (r"(\d+)m", "minutes"),
-            (r"(\d+)h", "hours"),
-            (r"(\d+)d", "days"),
-            (r"(\d+)w", "weeks"),
-        ]
+        try:
+            seconds = parse_duration(relative_time.lower())
+        except ValueError:
+            raise ValueError(f"Invalid relative time format: {relative_time}") from None
 
-        for pattern, unit in patterns:
-            match = re.match(pattern, relative_time.lower())
-            if match:
-                value = int(match.group(1))
+        return end_time - timedelta(seconds=seconds)
 
-                if unit == "minutes":
-                    return end_time - timedelta(minutes=value)
-                if unit == "hours":
-                    return end_time - timedelta(hours=value)
-                if unit == "days":
-                    return end_time - timedelta(days=value)
-                if unit == "weeks":
-                    return end_time - timedelta(weeks=value)
+    def _time_window(
+        self, relative_time: str, step: str | None = None
+    ) -> tuple[datetime, datetime]:
+        """Resolve a relative time expression to an aligned UTC window.
 
-        raise ValueError(f"Invalid relative time format: {relative_time}")
+        The end time is rounded down to the alignment grid (or the step, if
+        coarser), so equal relative windows asked within one grid interval
+        produce identical upstream requests.
+
+        Args:
+            relative_time: Relative time expression (e.g., "5m", "1h30m")
+            step: Range query step width, if any
+
+        Returns:
+            Start and end time, timezone-aware in UTC
+
+        Raises:
+            ValueError: If the time or step format is invalid
+        """
+        grid = self.time_alignment
+        if step is not None:
+            grid = max(grid, parse_step(step))
+
+        now = time.time()
+        end = math.floor(now / grid) * grid if grid > 0 else now
+        end_time = datetime.fromtimestamp(end, timezone.utc)
+        return self._parse_relative_time(relative_time, end_time), end_time
 
     async def _execute_query(
         self,
         query: str,
         start_time: datetime | None = None,
         end_time: datetime | None = None,
+        step: str | None = None,
     ) -> dict[str, Any]:
         """Execute a PromQL query.
 
@@ -289,6 +1707,7 @@ class PrometheusClient:
             query: PromQL query string
             start_time: Optional start time for range queries
             end_time: Optional end time for range queries
+            step: Optional resolution step width for range queries
 
         Returns:
             Query result dictionary
@@ -303,16 +1722,59 @@ class PrometheusClient:
                     "end": end_time.timestamp(),
                 }
             )
+            if step is not None:
+                params["step"] = step
             endpoint = "/api/v1/query_range"
         else:
             # Instant query
             endpoint = "/api/v1/query"
 
-        response = await self.http_client.get(endpoint, params=params)
+        response = await self._get(endpoint, params)
         response.raise_for_status()
 
         return response.json()
 
+    async def _execute_remote_read(
+        self,
+        selector: VectorSelector,
+        start_time: datetime,
+        end_time: datetime,
+    ) -> list[Series]:
+        """Fetch raw samples for a selector through remote read.
+
+        Streamed chunk responses are decoded as they arrive, so the body is
+        never held in memory as a whole.
+
+        Args:
+            selector: Plain vector selector
+            start_time: Start time
+            end_time: End time
+
+        Returns:
+            Columnar series with raw samples
+        """
+        start_ms = int(start_time.timestamp() * 1000)
+        end_ms = int(end_time.timestamp() * 1000)
+        body = snappy_block(encode_read_request(selector, start_ms, end_ms))
+
+        async with self._slot(), self.abort_stats.track(REMOTE_READ_ENDPOINT):
+            async with self.http_client.stream(
+                "POST",
+                REMOTE_READ_ENDPOINT,
+                content=body,
+                headers={**REMOTE_READ_HEADERS, **self._tenant_headers()},
+            ) as response:
+                response.raise_for_status()
+                content_type = response.headers.get("content-type", "")
+
+                if content_type.startswith(STREAMED_CONTENT_TYPE.split(";")[0]):
+                    decoder = ChunkedReadDecoder(start_ms, end_ms)
+                    async for data in response.aiter_bytes():
+                        decoder.feed(data)
+                    return decoder.finish()
+
+                return decode_read_response(await response.aread())
+
     async def _execute_range_query(
         self,
         query: str,
@@ -338,11 +1800,83 @@ class PrometheusClient:
             "step": step,
         }
 
-        response = await self.http_client.get("/api/v1/query_range", params=params)
+        response = await self._get("/api/v1/query_range", params)
         response.raise_for_status()
 
         return response.json()
 
+    async def _get(
+        self,
+        endpoint: str,
+        params: dict[str, Any] | None = None,
+    ) -> httpx.Response:
+        """Send a GET request once an upstream concurrency slot is free.
+
+        PromQL requests carry the remaining tool deadline as Prometheus'
+        query timeout and the current tenant's header, and requests
+        cancelled mid-flight are recorded in ``abort_stats``.
+
+        Args:
+            endpoint: API path relative to the Prometheus URL
+            params: Optional query parameters
+
+        Returns:
+            HTTP response
+        """
+        params = with_query_timeout(endpoint, params)
+        kwargs: dict[str, Any] = {}
+        if params is not None:
+            kwargs["params"] = params
+        headers = self._tenant_headers()
+        if headers:
+            kwargs["headers"] = headers
+        async with self._slot():
+            async with self.abort_stats.track(endpoint):
+                return await self.http_client.get(endpoint, **kwargs)
+
     async def close(self) -> None:
         """Close HTTP client connections."""
         await self.http_client.aclose()
+
+
+def _auth_headers(
+    auth_token: str | None, username: str | None, password: str | None
+) -> dict[str, str]:
+    """Build the Authorization header for bearer or basic authentication."""
+    if auth_token:
+        return {"Authorization": f"Bearer {auth_token}"}
+    if username and password:
+        credentials = base64.b64encode(f"{username}:{password}".encode()).decode()
+        return {"Authorization": f"Basic {credentials}"}
+    return {}
+
+
+def _instance_selector(metric_name: str, op: str, instance: str) -> str:
+    """Build a selector for a metric with an escaped instance matcher."""
+    return VectorSelector(metric_name, [Matcher("instance", op, instance)]).selector()
+
+
+def _chunk_patterns(patterns: list[str], max_length: int) -> list[str]:
+    """Join regex alternatives into as few patterns as fit the length limit."""
+    chunks: list[str] = []
+    current: list[str] = []
+    length = 0
+    for pattern in patterns:
+        if current and length + 1 + len(pattern) > max_length:
+            chunks.append("|".join(current))
+            current, length = [], 0
+        length += len(pattern) + (1 if current else 0)
+        current.append(pattern)
+    if current:
+        chunks.append("|".join(current))
+    return chunks
+
+
+def _latest_value(entry: dict[str, Any]) -> float | None:
+    """Return the most recent value of a vector or matrix result entry."""
+    sample = entry.get("value")
+    if sample is None and entry.get("values"):
+        sample = entry["values"][-1]
+    if sample is None or len(sample) < 2:
+        return None
+    return float(sample[1])
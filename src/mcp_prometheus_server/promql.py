@@ -0,0 +1,1098 @@
+"""
+Local PromQL parser for MCP server.
+
+Validates PromQL before it is sent to Prometheus, produces a canonical form
+of the query that is insensitive to whitespace and label ordering, and
+extracts the selectors and ranges used for cost estimation.
+"""
+
+import json
+import math
+import re
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+
+# Prometheus duration syntax, e.g. "90s", "1h30m", "500ms"
+_DURATION_UNITS = {
+    "y": 365 * 24 * 3600.0,
+    "w": 7 * 24 * 3600.0,
+    "d": 24 * 3600.0,
+    "h": 3600.0,
+    "m": 60.0,
+    "s": 1.0,
+    "ms": 0.001,
+}
+DURATION_RE = re.compile(
+    r"(?:(?P<y>\d+)y)?(?:(?P<w>\d+)w)?(?:(?P<d>\d+)d)?(?:(?P<h>\d+)h)?"
+    r"(?:(?P<m>\d+)m(?!s))?(?:(?P<s>\d+)s)?(?:(?P<ms>\d+)ms)?"
+)
+
+_TOKEN_DURATION_RE = re.compile(r"(?:\d+(?:ms|[smhdwy]))+")
+_NUMBER_RE = re.compile(r"0[xX][0-9a-fA-F]+|(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][+-]?\d+)?")
+_IDENT_RE = re.compile(r"[a-zA-Z_:][a-zA-Z0-9_:]*")
+_LABEL_NAME_RE = re.compile(r"[a-zA-Z_][a-zA-Z0-9_]*")
+
+_OPERATORS = (
+    "==",
+    "!=",
+    "<=",
+    ">=",
+    "=~",
+    "!~",
+    "+",
+    "-",
+    "*",
+    "/",
+    "%",
+    "^",
+    "<",
+    ">",
+    "=",
+    "(",
+    ")",
+    "{",
+    "}",
+    "[",
+    "]",
+    ",",
+    ":",
+    "@",
+)
+
+AGGREGATIONS = {
+    "sum",
+    "avg",
+    "count",
+    "min",
+    "max",
+    "group",
+    "stddev",
+    "stdvar",
+    "topk",
+    "bottomk",
+    "quantile",
+    "count_values",
+    "limitk",
+    "limit_ratio",
+}
+PARAMETRIZED_AGGREGATIONS = {
+    "topk",
+    "bottomk",
+    "quantile",
+    "count_values",
+    "limitk",
+    "limit_ratio",
+}
+
+# Binary operator precedence, lowest first; "^" is right-associative
+_PRECEDENCE = {
+    "or": 1,
+    "and": 2,
+    "unless": 2,
+    "==": 3,
+    "!=": 3,
+    "<=": 3,
+    "<": 3,
+    ">=": 3,
+    ">": 3,
+    "+": 4,
+    "-": 4,
+    "*": 5,
+    "/": 5,
+    "%": 5,
+    "atan2": 5,
+    "^": 6,
+}
+_COMPARISON_OPERATORS = {"==", "!=", "<=", "<", ">=", ">"}
+_KEYWORD_OPERATORS = {"and", "or", "unless", "atan2"}
+_KEYWORDS = _KEYWORD_OPERATORS | {
+    "by",
+    "without",
+    "on",
+    "ignoring",
+    "group_left",
+    "group_right",
+    "bool",
+    "offset",
+}
+
+
+# Characters with a special meaning in RE2 patterns
+_REGEX_META_RE = re.compile(r"[\\.+*?()|\[\]{}^$]")
+
+
+class PromQLSyntaxError(ValueError):
+    """Raised when a PromQL expression cannot be parsed."""
+
+    def __init__(self, message: str, position: int) -> None:
+        """Initialize syntax error.
+
+        Args:
+            message: Description of the problem
+            position: Character offset in the query where it was detected
+        """
+        super().__init__(f"Invalid PromQL at position {position}: {message}")
+        self.position = position
+
+
+def parse_duration(text: str) -> float:
+    """Parse a Prometheus duration string into seconds.
+
+    Args:
+        text: Duration such as "5m", "90s" or "1h30m"
+
+    Returns:
+        Duration in seconds
+
+    Raises:
+        ValueError: If text is not a valid duration
+    """
+    match = DURATION_RE.fullmatch(text)
+    if not text or match is None:
+        raise ValueError(f"Invalid duration: {text}")
+
+    return sum(
+        int(value) * _DURATION_UNITS[unit]
+        for unit, value in match.groupdict().items()
+        if value is not None
+    )
+
+
+def parse_step(text: str) -> float:
+    """Parse a range query step given as a duration or as float seconds.
+
+    Args:
+        text: Step such as "1m", "60" or "0.5", as the HTTP API accepts it
+
+    Returns:
+        Step in seconds
+
+    Raises:
+        ValueError: If text is neither a duration nor a positive number
+    """
+    try:
+        return parse_duration(text)
+    except ValueError:
+        pass
+
+    try:
+        seconds = float(text)
+    except ValueError:
+        raise ValueError(f"Invalid step: {text}") from None
+    if not math.isfinite(seconds) or seconds <= 0:
+        raise ValueError(f"Invalid step: {text}")
+    return seconds
+
+
+def format_duration(seconds: float) -> str:
+    """Format seconds as a canonical Prometheus duration string.
+
+    Args:
+        seconds: Duration in seconds
+
+    Returns:
+        Duration such as "1h30m"; negative durations are prefixed with "-"
+    """
+    if seconds < 0:
+        return "-" + format_duration(-seconds)
+
+    remaining = round(seconds * 1000)
+    if remaining == 0:
+        return "0s"
+
+    parts = []
+    for unit, unit_seconds in _DURATION_UNITS.items():
+        unit_ms = round(unit_seconds * 1000)
+        count, remaining = divmod(remaining, unit_ms)
+        if count:
+            parts.append(f"{count}{unit}")
+    return "".join(parts)
+
+
+def escape_regex(value: str) -> str:
+    """Escape a literal string for use in a PromQL (RE2) regex matcher.
+
+    Args:
+        value: Literal label value
+
+    Returns:
+        Pattern matching exactly the value
+    """
+    return _REGEX_META_RE.sub(r"\\\g<0>", value)
+
+
+@dataclass
+class Matcher:
+    """Label matcher inside a vector selector."""
+
+    name: str
+    op: str
+    value: str
+
+    def __str__(self) -> str:
+        """Return the matcher in PromQL syntax."""
+        return f"{_format_label_name(self.name)}{self.op}{_quote(self.value)}"
+
+
+@dataclass
+class NumberLiteral:
+    """Scalar number literal."""
+
+    value: float
+
+    def __str__(self) -> str:
+        """Return the number in PromQL syntax."""
+        return _format_number(self.value)
+
+
+@dataclass
+class StringLiteral:
+    """String literal."""
+
+    value: str
+
+    def __str__(self) -> str:
+        """Return the string in PromQL syntax."""
+        return _quote(self.value)
+
+
+@dataclass
+class VectorSelector:
+    """Instant or range vector selector."""
+
+    metric_name: str | None
+    matchers: list[Matcher]
+    range: float | None = None
+    offset: float | None = None
+    at: str | None = None
+
+    def selector(self) -> str:
+        """Return the selector without range, offset or @ modifiers."""
+        matchers = sorted(
+            (m for m in self.matchers if not self._is_name_matcher(m)),
+            key=lambda m: (m.name, m.op, m.value),
+        )
+        name = self.name
+        if name is not None and not _IDENT_RE.fullmatch(name):
+            # UTF-8 metric names must be quoted inside the braces
+            inner = ",".join([_quote(name), *(str(m) for m in matchers)])
+            return f"{{{inner}}}"
+
+        inner = ",".join(str(m) for m in matchers)
+        if name is None:
+            return f"{{{inner}}}"
+        return f"{name}{{{inner}}}" if matchers else name
+
+    @property
+    def name(self) -> str | None:
+        """Return the metric name, whether given bare or as a matcher."""
+        if self.metric_name is not None:
+            return self.metric_name
+        names = [m for m in self.matchers if m.name == "__name__" and m.op == "="]
+        return names[0].value if len(names) == 1 else None
+
+    def _is_name_matcher(self, matcher: Matcher) -> bool:
+        """Return True if matcher is folded into the metric name."""
+        return (
+            self.metric_name is None
+            and self.name is not None
+            and matcher.name == "__name__"
+            and matcher.op == "="
+        )
+
+    def __str__(self) -> str:
+        """Return the selector in canonical PromQL syntax."""
+        text = self.selector()
+        if self.range is not None:
+            text += f"[{format_duration(self.range)}]"
+        return text + _format_modifiers(self.offset, self.at)
+
+
+@dataclass
+class Subquery:
+    """Subquery over an arbitrary expression."""
+
+    expr: "Expr"
+    range: float
+    step: float | None = None
+    offset: float | None = None
+    at: str | None = None
+
+    def __str__(self) -> str:
+        """Return the subquery in canonical PromQL syntax."""
+        step = format_duration(self.step) if self.step is not None else ""
+        text = f"{self.expr}[{format_duration(self.range)}:{step}]"
+        return text + _format_modifiers(self.offset, self.at)
+
+
+@dataclass
+class Call:
+    """Function call."""
+
+    func: str
+    args: list["Expr"]
+
+    def __str__(self) -> str:
+        """Return the call in canonical PromQL syntax."""
+        return f"{self.func}({', '.join(str(arg) for arg in self.args)})"
+
+
+@dataclass
+class Aggregation:
+    """Aggregation such as ``sum by (job) (...)``."""
+
+    op: str
+    expr: "Expr"
+    param: "Expr | None" = None
+    grouping: list[str] = field(default_factory=list)
+    without: bool = False
+    has_grouping: bool = False
+
+    def __str__(self) -> str:
+        """Return the aggregation in canonical PromQL syntax."""
+        text = self.op
+        if self.has_grouping:
+            keyword = "without" if self.without else "by"
+            text += f" {keyword} ({_format_labels(self.grouping)}) "
+        args = (
+            [str(self.expr)]
+            if self.param is None
+            else [str(self.param), str(self.expr)]
+        )
+        return f"{text}({', '.join(args)})"
+
+
+@dataclass
+class VectorMatching:
+    """Vector matching modifiers of a binary expression."""
+
+    on: bool
+    labels: list[str]
+    card: str | None = None
+    include: list[str] = field(default_factory=list)
+
+    def __str__(self) -> str:
+        """Return the modifiers in canonical PromQL syntax."""
+        text = f"{'on' if self.on else 'ignoring'} ({_format_labels(self.labels)})"
+        if self.card is not None:
+            text += f" {self.card} ({_format_labels(self.include)})"
+        return text
+
+
+@dataclass
+class BinaryExpr:
+    """Binary operation between two expressions."""
+
+    op: str
+    lhs: "Expr"
+    rhs: "Expr"
+    return_bool: bool = False
+    matching: VectorMatching | None = None
+
+    def __str__(self) -> str:
+        """Return the operation in canonical PromQL syntax."""
+        op = self.op
+        if self.return_bool:
+            op += " bool"
+        if self.matching is not None:
+            op += f" {self.matching}"
+        return f"{self.lhs} {op} {self.rhs}"
+
+
+@dataclass
+class UnaryExpr:
+    """Unary plus or minus."""
+
+    op: str
+    expr: "Expr"
+
+    def __str__(self) -> str:
+        """Return the expression in canonical PromQL syntax."""
+        return f"{self.op}{self.expr}"
+
+
+@dataclass
+class ParenExpr:
+    """Parenthesized expression."""
+
+    expr: "Expr"
+
+    def __str__(self) -> str:
+        """Return the expression in canonical PromQL syntax."""
+        return f"({self.expr})"
+
+
+Expr = (
+    NumberLiteral
+    | StringLiteral
+    | VectorSelector
+    | Subquery
+    | Call
+    | Aggregation
+    | BinaryExpr
+    | UnaryExpr
+    | ParenExpr
+)
+
+
+class PromQLQuery:
+    """Parsed PromQL query with its canonical form and extracted selectors."""
+
+    def __init__(self, query: str, expr: Expr) -> None:
+        """Initialize parsed query.
+
+        Args:
+            query: Original query text
+            expr: Root of the parsed expression tree
+        """
+        self.query = query
+        self.expr = expr
+        self.canonical = str(expr)
+
+    @property
+    def selectors(self) -> list[VectorSelector]:
+        """Return all vector selectors in the query, in order."""
+        return [
+            node for node in iter_nodes(self.expr) if isinstance(node, VectorSelector)
+        ]
+
+    @property
+    def ranges(self) -> list[float]:
+        """Return all range and subquery windows in seconds, in order."""
+        return [
+            node.range
+            for node in iter_nodes(self.expr)
+            if isinstance(node, (VectorSelector, Subquery)) and node.range is not None
+        ]
+
+    @property
+    def metric_names(self) -> set[str]:
+        """Return the metric names referenced by the query."""
+        return {s.name for s in self.selectors if s.name is not None}
+
+    @property
+    def is_selector(self) -> bool:
+        """Return True if the whole query is a single instant vector selector."""
+        return isinstance(self.expr, VectorSelector) and self.expr.range is None
+
+    def __str__(self) -> str:
+        """Return the canonical query."""
+        return self.canonical
+
+
+def iter_nodes(expr: Expr) -> Iterator[Expr]:
+    """Walk an expression tree depth-first.
+
+    Args:
+        expr: Root expression
+
+    Yields:
+        Every node in the tree, parents before children
+    """
+    yield expr
+    if isinstance(expr, (Subquery, UnaryExpr, ParenExpr)):
+        yield from iter_nodes(expr.expr)
+    elif isinstance(expr, Call):
+        for arg in expr.args:
+            yield from iter_nodes(arg)
+    elif isinstance(expr, Aggregation):
+        if expr.param is not None:
+            yield from iter_nodes(expr.param)
+        yield from iter_nodes(expr.expr)
+    elif isinstance(expr, BinaryExpr):
+        yield from iter_nodes(expr.lhs)
+        yield from iter_nodes(expr.rhs)
+
+
+def parse_promql(query: str) -> PromQLQuery:
+    """Parse and validate a PromQL query.
+
+    Args:
+        query: PromQL query string
+
+    Returns:
+        Parsed query
+
+    Raises:
+        PromQLSyntaxError: If the query is not valid PromQL
+    """
+    parser = _Parser(query)
+    expr = parser.parse()
+    return PromQLQuery(query, expr)
+
+
+def canonicalize(query: str) -> str:
+    """Return the canonical form of a PromQL query.
+
+    Args:
+        query: PromQL query string
+
+    Returns:
+        Canonical query string
+
+    Raises:
+        PromQLSyntaxError: If the query is not valid PromQL
+    """
+    return parse_promql(query).canonical
+
+
+class _Token:
+    """Lexical token."""
+
+    __slots__ = ("kind", "pos", "text", "value")
+
+    def __init__(self, kind: str, text: str, pos: int, value: object = None) -> None:
+        self.kind = kind
+        self.text = text
+        self.pos = pos
+        self.value = value
+
+    def is_keyword(self, *keywords: str) -> bool:
+        """Return True if the token is one of the given keywords."""
+        return self.kind == "IDENT" and self.text.lower() in keywords
+
+
+def _tokenize(query: str) -> list[_Token]:
+    """Split a query into tokens."""
+    tokens = []
+    pos = 0
+    length = len(query)
+    bracket_depth = 0
+
+    while pos < length:
+        char = query[pos]
+
+        if char.isspace():
+            pos += 1
+            continue
+        if char == "#":
+            end = query.find("\n", pos)
+            pos = length if end == -1 else end
+            continue
+
+        if char in "\"'`":
+            string, end = _read_string(query, pos)
+            tokens.append(_Token("STRING", query[pos:end], pos, string))
+            pos = end
+            continue
+
+        if char.isdigit() or (char == "." and query[pos + 1 : pos + 2].isdigit()):
+            match = _TOKEN_DURATION_RE.match(query, pos)
+            if match and DURATION_RE.fullmatch(match.group()):
+                kind, number = "DURATION", parse_duration(match.group())
+            else:
+                match = _NUMBER_RE.match(query, pos)
+                assert match is not None
+                text = match.group()
+                number = (
+                    float(int(text, 16)) if text[:2].lower() == "0x" else float(text)
+                )
+                kind = "NUMBER"
+            end = match.end()
+            if end < length and (query[end].isalnum() or query[end] == "_"):
+                raise PromQLSyntaxError(
+                    f"bad number or duration syntax: '{query[pos : end + 1]}'", pos
+                )
+            tokens.append(_Token(kind, match.group(), pos, number))
+            pos = end
+            continue
+
+        # Inside brackets ":" separates subquery range and step
+        match = None if bracket_depth and char == ":" else _IDENT_RE.match(query, pos)
+        if match:
+            text = match.group()
+            if text.lower() in ("inf", "nan"):
+                tokens.append(_Token("NUMBER", text, pos, float(text)))
+            else:
+                tokens.append(_Token("IDENT", text, pos))
+            pos = match.end()
+            continue
+
+        for op in _OPERATORS:
+            if query.startswith(op, pos):
+                if op == "[":
+                    bracket_depth += 1
+                elif op == "]":
+                    bracket_depth = max(bracket_depth - 1, 0)
+                tokens.append(_Token(op, op, pos))
+                pos += len(op)
+                break
+        else:
+            raise PromQLSyntaxError(f"unexpected character '{char}'", pos)
+
+    tokens.append(_Token("EOF", "", length))
+    return tokens
+
+
+_ESCAPES = {
+    "a": "\a",
+    "b": "\b",
+    "f": "\f",
+    "n": "\n",
+    "r": "\r",
+    "t": "\t",
+    "v": "\v",
+    "\\": "\\",
+    "'": "'",
+    '"': '"',
+}
+
+
+def _read_string(query: str, start: int) -> tuple[str, int]:
+    """Read a quoted string starting at ``start``; return value and end offset."""
+    quote = query[start]
+    pos = start + 1
+    chars: list[str] = []
+
+    while pos < len(query):
+        char = query[pos]
+        if char == quote:
+            return "".join(chars), pos + 1
+        if char == "\n" and quote != "`":
+            break
+        if char == "\\" and quote != "`":
+            pos += 1
+            if pos >= len(query):
+                break
+            escape = query[pos]
+            if escape in _ESCAPES:
+                chars.append(_ESCAPES[escape])
+                pos += 1
+                continue
+            widths = {"x": 2, "u": 4, "U": 8}
+            if escape in widths:
+                digits = query[pos + 1 : pos + 1 + widths[escape]]
+                if len(digits) != widths[escape] or not all(
+                    c in "0123456789abcdefABCDEF" for c in digits
+                ):
+                    raise PromQLSyntaxError("invalid escape sequence in string", pos)
+                chars.append(chr(int(digits, 16)))
+                pos += 1 + widths[escape]
+                continue
+            digits = query[pos : pos + 3]
+            if len(digits) == 3 and all(c in "01234567" for c in digits):
+                chars.append(chr(int(digits, 8)))
+                pos += 3
+                continue
+            raise PromQLSyntaxError(f"unknown escape sequence '\\{escape}'", pos)
+        chars.append(char)
+        pos += 1
+
+    raise PromQLSyntaxError("unterminated quoted string", start)
+
+
+class _Parser:
+    """Recursive-descent PromQL parser."""
+
+    def __init__(self, query: str) -> None:
+        self.tokens = _tokenize(query)
+        self.index = 0
+
+    @property
+    def current(self) -> _Token:
+        return self.tokens[self.index]
+
+    def peek(self, offset: int = 1) -> _Token:
+        return self.tokens[min(self.index + offset, len(self.tokens) - 1)]
+
+    def advance(self) -> _Token:
+        token = self.current
+        if token.kind != "EOF":
+            self.index += 1
+        return token
+
+    def expect(self, kind: str, context: str) -> _Token:
+        token = self.current
+        if token.kind != kind:
+            raise self.error(
+                f'unexpected {self.describe(token)} in {context}, expected "{kind}"'
+            )
+        return self.advance()
+
+    def error(self, message: str, token: _Token | None = None) -> PromQLSyntaxError:
+        return PromQLSyntaxError(message, (token or self.current).pos)
+
+    @staticmethod
+    def describe(token: _Token) -> str:
+        if token.kind == "EOF":
+            return "end of input"
+        return f"'{token.text}'"
+
+    def parse(self) -> Expr:
+        if self.current.kind == "EOF":
+            raise self.error("no expression found in input")
+        expr = self.parse_expr(0)
+        if self.current.kind != "EOF":
+            raise self.error(f"unexpected {self.describe(self.current)}")
+        return expr
+
+    def binary_operator(self) -> str | None:
+        token = self.current
+        if token.kind in _PRECEDENCE:
+            return token.kind
+        if token.kind == "IDENT" and token.text.lower() in _KEYWORD_OPERATORS:
+            return token.text.lower()
+        return None
+
+    def parse_expr(self, min_precedence: int) -> Expr:
+        lhs = self.parse_unary()
+
+        while True:
+            op = self.binary_operator()
+            if op is None or _PRECEDENCE[op] < min_precedence:
+                return lhs
+            self.advance()
+
+            return_bool = False
+            if self.current.is_keyword("bool"):
+                if op not in _COMPARISON_OPERATORS:
+                    raise self.error(
+                        "bool modifier can only be used on comparison operators"
+                    )
+                self.advance()
+                return_bool = True
+
+            matching = self.parse_vector_matching(op)
+
+            # "^" is right-associative, everything else left-associative
+            next_precedence = _PRECEDENCE[op] + (0 if op == "^" else 1)
+            rhs = self.parse_expr(next_precedence)
+            lhs = BinaryExpr(op, lhs, rhs, return_bool, matching)
+
+    def parse_vector_matching(self, op: str) -> VectorMatching | None:
+        if not self.current.is_keyword("on", "ignoring"):
+            return None
+        on = self.advance().text.lower() == "on"
+        matching = VectorMatching(on, self.parse_label_list("vector matching"))
+
+        if self.current.is_keyword("group_left", "group_right"):
+            if op in ("and", "or", "unless"):
+                raise self.error(f'no grouping allowed for "{op}" operation')
+            matching.card = self.advance().text.lower()
+            if self.current.kind == "(":
+                matching.include = self.parse_label_list("grouping")
+        return matching
+
+    def parse_unary(self) -> Expr:
+        token = self.current
+        if token.kind in ("+", "-"):
+            self.advance()
+            # Unary operators bind tighter than everything except "^"
+            operand = self.parse_expr(_PRECEDENCE["^"])
+            if token.kind == "-" and isinstance(operand, NumberLiteral):
+                return NumberLiteral(-operand.value)
+            if token.kind == "+" and isinstance(operand, NumberLiteral):
+                return operand
+            return UnaryExpr(token.kind, operand)
+        return self.parse_postfix(self.parse_primary())
+
+    def parse_primary(self) -> Expr:
+        token = self.current
+
+        if token.kind in ("NUMBER", "DURATION"):
+            self.advance()
+            return NumberLiteral(token.value)  # type: ignore[arg-type]
+        if token.kind == "STRING":
+            self.advance()
+            return StringLiteral(token.value)  # type: ignore[arg-type]
+        if token.kind == "(":
+            self.advance()
+            expr = self.parse_expr(0)
+            self.expect(")", "parenthesized expression")
+            return ParenExpr(expr)
+        if token.kind == "{":
+            return self.parse_selector(None)
+        if token.kind == "IDENT":
+            lowered = token.text.lower()
+            following = self.peek()
+            if lowered in AGGREGATIONS and (
+                following.kind == "(" or following.is_keyword("by", "without")
+            ):
+                return self.parse_aggregation()
+            if lowered in AGGREGATIONS:
+                # Prometheus lexes these as operators, never as metric names
+                raise self.error(
+                    f"unexpected aggregation '{token.text}', expected '(' or "
+                    "grouping clause"
+                )
+            if lowered in _KEYWORDS:
+                raise self.error(f"unexpected keyword '{token.text}'")
+            if following.kind == "(":
+                return self.parse_call()
+            self.advance()
+            return self.parse_selector(token.text)
+
+        raise self.error(f"unexpected {self.describe(token)}")
+
+    def parse_postfix(self, expr: Expr) -> Expr:
+        while True:
+            token = self.current
+            if token.kind == "[":
+                expr = self.parse_range(expr)
+            elif token.is_keyword("offset"):
+                self.advance()
+                sign = -1.0 if self.current.kind == "-" else 1.0
+                if self.current.kind in ("+", "-"):
+                    self.advance()
+                duration = self.current
+                if duration.kind not in ("DURATION", "NUMBER"):
+                    raise self.error(
+                        f"unexpected {self.describe(duration)} in offset, expected duration"
+                    )
+                self.advance()
+                expr = self.apply_modifier(expr, token, offset=sign * duration.value)  # type: ignore[operator]
+            elif token.kind == "@":
+                self.advance()
+                expr = self.apply_modifier(expr, token, at=self.parse_at())
+            else:
+                return expr
+
+    def parse_at(self) -> str:
+        token = self.current
+        if token.kind == "IDENT" and token.text in ("start", "end"):
+            self.advance()
+            self.expect("(", "@ modifier")
+            self.expect(")", "@ modifier")
+            return f"{token.text}()"
+
+        sign = -1.0 if token.kind == "-" else 1.0
+        if token.kind in ("+", "-"):
+            self.advance()
+        number = self.current
+        if number.kind not in ("NUMBER", "DURATION"):
+            raise self.error(
+                f"unexpected {self.describe(number)} in @ modifier, expected timestamp"
+            )
+        self.advance()
+        value = sign * number.value  # type: ignore[operator]
+        if math.isinf(value) or math.isnan(value):
+            raise self.error("timestamp out of bounds for @ modifier", number)
+        return _format_number(value)
+
+    def apply_modifier(
+        self,
+        expr: Expr,
+        token: _Token,
+        offset: float | None = None,
+        at: str | None = None,
+    ) -> Expr:
+        if not isinstance(expr, (VectorSelector, Subquery)):
+            raise self.error(
+                f"{token.text} modifier must be preceded by a vector selector or subquery",
+                token,
+            )
+        if offset is not None:
+            if expr.offset is not None:
+                raise self.error("offset may not be set multiple times", token)
+            expr.offset = offset
+        if at is not None:
+            if expr.at is not None:
+                raise self.error("@ <timestamp> may not be set multiple times", token)
+            expr.at = at
+        return expr
+
+    def parse_range(self, expr: Expr) -> Expr:
+        bracket = self.advance()
+        window = self.parse_range_duration("range")
+
+        if self.current.kind == "]":
+            self.advance()
+            if not isinstance(expr, VectorSelector) or expr.range is not None:
+                raise self.error("ranges only allowed for vector selectors", bracket)
+            if expr.offset is not None or expr.at is not None:
+                raise self.error(
+                    "no offset or @ modifiers allowed before range", bracket
+                )
+            expr.range = window
+            return expr
+
+        self.expect(":", "subquery")
+        step = None
+        if self.current.kind != "]":
+            step = self.parse_range_duration("subquery step")
+        self.expect("]", "subquery")
+        return Subquery(expr, window, step)
+
+    def parse_range_duration(self, context: str) -> float:
+        token = self.current
+        if token.kind not in ("DURATION", "NUMBER"):
+            raise self.error(
+                f"unexpected {self.describe(token)} in {context}, expected duration"
+            )
+        self.advance()
+        if token.value <= 0:  # type: ignore[operator]
+            raise self.error(f"{context} must be positive", token)
+        return token.value  # type: ignore[return-value]
+
+    def parse_selector(self, name: str | None) -> VectorSelector:
+        matchers: list[Matcher] = []
+        start = self.current
+
+        if self.current.kind == "{":
+            self.advance()
+            while self.current.kind != "}":
+                token = self.current
+                if token.kind == "STRING" and self.peek().kind in (",", "}"):
+                    # Quoted metric name, e.g. {"http.requests"}
+                    self.advance()
+                    if name is not None:
+                        raise self.error("metric name must not be set twice", token)
+                    name = token.value  # type: ignore[assignment]
+                else:
+                    matchers.append(self.parse_matcher())
+                if self.current.kind != ",":
+                    break
+                self.advance()
+            self.expect("}", "label matching")
+
+        if name is not None and any(m.name == "__name__" for m in matchers):
+            raise self.error("metric name must not be set twice", start)
+
+        selector = VectorSelector(name, matchers)
+        if selector.name is None and not any(_matches_non_empty(m) for m in matchers):
+            raise self.error(
+                "vector selector must contain at least one non-empty matcher", start
+            )
+        return selector
+
+    def parse_matcher(self) -> Matcher:
+        token = self.current
+        if token.kind == "IDENT":
+            label = token.text
+        elif token.kind == "STRING":
+            label = token.value  # type: ignore[assignment]
+        else:
+            raise self.error(
+                f"unexpected {self.describe(token)} in label matching, expected label"
+            )
+        self.advance()
+
+        op = self.current
+        if op.kind not in ("=", "!=", "=~", "!~"):
+            raise self.error(
+                f"unexpected {self.describe(op)} in label matching, expected label matching operator"
+            )
+        self.advance()
+        value = self.expect("STRING", "label matching")
+        return Matcher(label, op.kind, value.value)  # type: ignore[arg-type]
+
+    def parse_label_list(self, context: str) -> list[str]:
+        self.expect("(", context)
+        labels = []
+        while self.current.kind != ")":
+            token = self.current
+            if token.kind == "IDENT" and _LABEL_NAME_RE.fullmatch(token.text):
+                labels.append(token.text)
+            elif token.kind == "STRING":
+                labels.append(token.value)  # type: ignore[arg-type]
+            else:
+                raise self.error(
+                    f"unexpected {self.describe(token)} in {context}, expected label"
+                )
+            self.advance()
+            if self.current.kind != ",":
+                break
+            self.advance()
+        self.expect(")", context)
+        return labels
+
+    def parse_call(self) -> Call:
+        name = self.advance()
+        self.expect("(", "function call")
+        args = []
+        while self.current.kind != ")":
+            args.append(self.parse_expr(0))
+            if self.current.kind != ",":
+                break
+            self.advance()
+        self.expect(")", f'call to function "{name.text}"')
+        return Call(name.text, args)
+
+    def parse_aggregation(self) -> Aggregation:
+        token = self.advance()
+        op = token.text.lower()
+        aggregation = Aggregation(op, NumberLiteral(0))
+
+        if self.current.is_keyword("by", "without"):
+            self.parse_grouping(aggregation)
+
+        self.expect("(", "aggregation")
+        args = []
+        while self.current.kind != ")":
+            args.append(self.parse_expr(0))
+            if self.current.kind != ",":
+                break
+            self.advance()
+        self.expect(")", "aggregation")
+
+        if self.current.is_keyword("by", "without"):
+            if aggregation.has_grouping:
+                raise self.error("aggregation grouping may only be specified once")
+            self.parse_grouping(aggregation)
+
+        expected = 2 if op in PARAMETRIZED_AGGREGATIONS else 1
+        if len(args) != expected:
+            raise self.error(
+                f"wrong number of arguments for aggregate expression provided, "
+                f"expected {expected}, got {len(args)}",
+                token,
+            )
+        if expected == 2:
+            aggregation.param = args[0]
+        aggregation.expr = args[-1]
+        return aggregation
+
+    def parse_grouping(self, aggregation: Aggregation) -> None:
+        aggregation.without = self.advance().text.lower() == "without"
+        aggregation.grouping = self.parse_label_list("grouping")
+        aggregation.has_grouping = True
+
+
+def _matches_non_empty(matcher: Matcher) -> bool:
+    """Return True if the matcher does not match the empty label value."""
+    if matcher.op == "=":
+        return matcher.value != ""
+    if matcher.op == "!=":
+        return matcher.value == ""
+    try:
+        matches_empty = re.fullmatch(matcher.value, "") is not None
+    except re.error:
+        # RE2 syntax Python cannot compile; let Prometheus decide
+        return True
+    return not matches_empty if matcher.op == "=~" else matches_empty
+
+
+def _quote(value: str) -> str:
+    """Quote a string as a PromQL double-quoted literal."""
+    return json.dumps(value, ensure_ascii=False)
+
+
+def _format_label_name(name: str) -> str:
+    """Format a label name, quoting it if it is not a plain identifier."""
+    return name if _LABEL_NAME_RE.fullmatch(name) else _quote(name)
+
+
+def _format_labels(labels: list[str]) -> str:
+    """Format a sorted, de-duplicated label list."""
+    return ", ".join(_format_label_name(label) for label in sorted(set(labels)))
+
+
+def _format_number(value: float) -> str:
+    """Format a float the way PromQL accepts it."""
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+def _format_modifiers(offset: float | None, at: str | None) -> str:
+    """Format offset and @ modifiers."""
+    text = ""
+    if at is not None:
+        text += f" @ {at}"
+    if offset is not None:
+        text += f" offset {format_duration(offset)}"
+    return text
@@ -0,0 +1,453 @@
+"""
+Remote-read backend for MCP server.
+
+Fetches raw samples from Prometheus' ``/api/v1/read`` endpoint using the
+streamed ``ChunkedReadResponse`` protocol, decoding XOR-compressed chunks
+straight into columnar buffers. This avoids the JSON ``query_range`` path
+for long raw histories. Only the small protobuf subset the protocol needs
+is implemented here, so no protobuf runtime is required.
+"""
+
+import logging
+import struct
+from collections.abc import Iterator
+from typing import Any
+
+from .columnar import Series
+from .promql import PromQLQuery, VectorSelector
+
+try:
+    import snappy
+except ImportError:  # pragma: no cover - optional dependency
+    snappy = None
+
+try:
+    from crc32c import crc32c
+except ImportError:  # pragma: no cover - optional dependency
+    crc32c = None
+
+logger = logging.getLogger(__name__)
+
+REMOTE_READ_ENDPOINT = "/api/v1/read"
+STREAMED_CONTENT_TYPE = (
+    "application/x-streamed-protobuf; proto=prometheus.ChunkedReadResponse"
+)
+REMOTE_READ_HEADERS = {
+    "Content-Type": "application/x-protobuf",
+    "Content-Encoding": "snappy",
+    "Accept": f"{STREAMED_CONTENT_TYPE}, application/x-protobuf",
+    "X-Prometheus-Remote-Read-Version": "0.1.0",
+}
+
+# prometheus.ReadRequest.ResponseType
+_SAMPLES = 0
+_STREAMED_XOR_CHUNKS = 1
+
+# prometheus.Chunk.Encoding
+_XOR_ENCODING = 1
+
+# prometheus.LabelMatcher.Type
+_MATCHER_TYPES = {"=": 0, "!=": 1, "=~": 2, "!~": 3}
+
+_DOUBLE = struct.Struct(">d")
+_UINT64 = struct.Struct(">Q")
+_LE_DOUBLE = struct.Struct("<d")
+
+_MAX_LITERAL = 65536
+
+
+def remote_read_selector(parsed: PromQLQuery) -> VectorSelector | None:
+    """Return the selector if a query can be answered by remote read.
+
+    Remote read returns raw samples for label matchers only, so the query
+    must be a plain instant vector selector without modifiers.
+    """
+    expr = parsed.expr
+    if not isinstance(expr, VectorSelector):
+        return None
+    if expr.range is not None or expr.offset is not None or expr.at is not None:
+        return None
+    return expr
+
+
+# Protobuf encoding
+
+
+def _varint(value: int) -> bytes:
+    """Encode an unsigned or two's complement int64 varint."""
+    value &= (1 << 64) - 1
+    out = bytearray()
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _field_varint(number: int, value: int) -> bytes:
+    """Encode a varint field."""
+    return _varint(number << 3) + _varint(value)
+
+
+def _field_bytes(number: int, value: bytes) -> bytes:
+    """Encode a length-delimited field."""
+    return _varint(number << 3 | 2) + _varint(len(value)) + value
+
+
+def encode_read_request(
+    selector: VectorSelector,
+    start_ms: int,
+    end_ms: int,
+) -> bytes:
+    """Encode a ``prometheus.ReadRequest`` for one selector.
+
+    Args:
+        selector: Vector selector whose matchers are sent
+        start_ms: Range start in milliseconds
+        end_ms: Range end in milliseconds
+
+    Returns:
+        Serialized protobuf message (not yet snappy-compressed)
+    """
+    matchers = [(0, "__name__", selector.metric_name)] if selector.metric_name else []
+    matchers.extend(
+        (_MATCHER_TYPES[matcher.op], matcher.name, matcher.value)
+        for matcher in selector.matchers
+    )
+
+    query = _field_varint(1, start_ms) + _field_varint(2, end_ms)
+    for matcher_type, name, value in matchers:
+        query += _field_bytes(
+            3,
+            _field_varint(1, matcher_type)
+            + _field_bytes(2, name.encode())
+            + _field_bytes(3, value.encode()),
+        )
+
+    # Prefer streamed chunks; servers without them fall back to samples
+    response_types = _varint(_STREAMED_XOR_CHUNKS) + _varint(_SAMPLES)
+    return _field_bytes(1, query) + _field_bytes(2, response_types)
+
+
+def snappy_block(data: bytes) -> bytes:
+    """Wrap data in a snappy block made of literals only.
+
+    Request bodies are a few hundred bytes, so they are framed without
+    compression rather than requiring a snappy library.
+    """
+    out = bytearray(_varint(len(data)))
+    for start in range(0, len(data), _MAX_LITERAL):
+        literal = data[start : start + _MAX_LITERAL]
+        length = len(literal) - 1
+        if length < 60:
+            out.append(length << 2)
+        elif length < 256:
+            out += bytes([60 << 2, length])
+        else:
+            out += bytes([61 << 2]) + length.to_bytes(2, "little")
+        out += literal
+    return bytes(out)
+
+
+# Protobuf decoding
+
+
+def _read_varint(buffer: memoryview | bytes | bytearray, pos: int) -> tuple[int, int]:
+    """Decode a varint, returning its value and the next position."""
+    result = 0
+    shift = 0
+    while True:
+        if pos >= len(buffer):
+            raise ValueError("Truncated remote read message")
+        byte = buffer[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def _int64(value: int) -> int:
+    """Interpret an unsigned varint as a two's complement int64."""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def _iter_fields(buffer: memoryview) -> Iterator[tuple[int, int, Any]]:
+    """Iterate over (field number, wire type, value) of a message."""
+    pos = 0
+    while pos < len(buffer):
+        key, pos = _read_varint(buffer, pos)
+        number, wire_type = key >> 3, key & 0x07
+        if wire_type == 0:
+            varint, pos = _read_varint(buffer, pos)
+            yield number, wire_type, varint
+            continue
+        if wire_type == 1:
+            length = 8
+        elif wire_type == 2:
+            length, pos = _read_varint(buffer, pos)
+        elif wire_type == 5:
+            length = 4
+        else:
+            raise ValueError(f"Unsupported protobuf wire type: {wire_type}")
+        value: memoryview = buffer[pos : pos + length]
+        pos += length
+        yield number, wire_type, value
+
+
+def _decode_label(buffer: memoryview) -> tuple[str, str]:
+    """Decode a ``prometheus.Label``."""
+    name = value = ""
+    for number, _, field in _iter_fields(buffer):
+        if number == 1:
+            name = bytes(field).decode()
+        elif number == 2:
+            value = bytes(field).decode()
+    return name, value
+
+
+# XOR chunk decoding
+
+
+class _BitReader:
+    """Big-endian bit reader over a chunk."""
+
+    def __init__(self, data: bytes, pos: int = 0) -> None:
+        self._data = data
+        self._size = len(data) * 8
+        self._pos = pos
+
+    def read_bits(self, count: int) -> int:
+        end = self._pos + count
+        if end > self._size:
+            raise ValueError("Truncated XOR chunk")
+        first, last = self._pos >> 3, (end + 7) >> 3
+        window = int.from_bytes(self._data[first:last], "big")
+        self._pos = end
+        return (window >> (last * 8 - end)) & ((1 << count) - 1)
+
+    def read_uvarint(self) -> int:
+        result = 0
+        shift = 0
+        while True:
+            byte = self.read_bits(8)
+            result |= (byte & 0x7F) << shift
+            if not byte & 0x80:
+                return result
+            shift += 7
+
+    def read_varint(self) -> int:
+        value = self.read_uvarint()
+        return (value >> 1) ^ -(value & 1)
+
+
+def _read_xor_value(
+    reader: _BitReader, bits: int, leading: int, trailing: int
+) -> tuple[int, int, int]:
+    """Read one XOR-encoded value relative to the previous value bits."""
+    if not reader.read_bits(1):
+        return bits, leading, trailing
+    if reader.read_bits(1):
+        leading = reader.read_bits(5)
+        significant = reader.read_bits(6) or 64
+        trailing = 64 - leading - significant
+    significant = 64 - leading - trailing
+    return bits ^ (reader.read_bits(significant) << trailing), leading, trailing
+
+
+def _read_delta_of_delta(reader: _BitReader) -> int:
+    """Read one timestamp delta-of-delta."""
+    prefix = 0
+    for _ in range(4):
+        prefix <<= 1
+        if not reader.read_bits(1):
+            break
+        prefix |= 1
+
+    if prefix == 0b0:
+        return 0
+    if prefix == 0b1111:
+        return _int64(reader.read_bits(64))
+
+    size = {0b10: 14, 0b110: 17, 0b1110: 20}[prefix]
+    bits = reader.read_bits(size)
+    if bits > 1 << (size - 1):
+        bits -= 1 << size
+    return bits
+
+
+def decode_xor_chunk(data: bytes, series: Series, start_ms: int, end_ms: int) -> None:
+    """Append the samples of an XOR chunk that fall inside a time range.
+
+    Args:
+        data: Chunk bytes in Prometheus' XOR encoding
+        series: Series to append samples to
+        start_ms: Range start in milliseconds
+        end_ms: Range end in milliseconds
+    """
+    count = int.from_bytes(data[:2], "big")
+    if count == 0:
+        return
+
+    reader = _BitReader(data, 16)
+    timestamp = reader.read_varint()
+    bits = reader.read_bits(64)
+    leading = trailing = delta = 0
+
+    for index in range(count):
+        if index == 1:
+            delta = reader.read_uvarint()
+            timestamp += delta
+            bits, leading, trailing = _read_xor_value(reader, bits, leading, trailing)
+        elif index > 1:
+            delta += _read_delta_of_delta(reader)
+            timestamp += delta
+            bits, leading, trailing = _read_xor_value(reader, bits, leading, trailing)
+
+        if timestamp > end_ms:
+            break
+        if timestamp >= start_ms:
+            series.append(timestamp / 1000, _DOUBLE.unpack(_UINT64.pack(bits))[0])
+
+
+# Responses
+
+
+def _series_key(labels: list[tuple[str, str]]) -> tuple[tuple[str, str], ...]:
+    """Return a hashable key for a label set."""
+    return tuple(sorted(labels))
+
+
+class ChunkedReadDecoder:
+    """Incremental decoder for a streamed ``ChunkedReadResponse`` body.
+
+    Frames are a varint length, a big-endian CRC32C of the message and the
+    message itself. Series split across frames are merged.
+    """
+
+    def __init__(self, start_ms: int, end_ms: int) -> None:
+        """Initialize decoder.
+
+        Args:
+            start_ms: Range start in milliseconds; earlier samples are dropped
+            end_ms: Range end in milliseconds; later samples are dropped
+        """
+        self.start_ms = start_ms
+        self.end_ms = end_ms
+        self.skipped_chunks = 0
+        self._buffer = bytearray()
+        self._series: dict[tuple[tuple[str, str], ...], Series] = {}
+
+    def feed(self, data: bytes) -> None:
+        """Decode all complete frames in the received data."""
+        self._buffer += data
+        pos = 0
+        while pos < len(self._buffer):
+            try:
+                size, start = _read_varint(self._buffer, pos)
+            except ValueError:
+                break  # Length prefix not fully received yet
+            end = start + 4 + size
+            if end > len(self._buffer):
+                break
+
+            message = bytes(self._buffer[start + 4 : end])
+            if crc32c is not None:
+                expected = int.from_bytes(self._buffer[start : start + 4], "big")
+                if crc32c(message) != expected:
+                    raise ValueError("Remote read frame checksum mismatch")
+
+            self._decode_frame(memoryview(message))
+            pos = end
+        del self._buffer[:pos]
+
+    def finish(self) -> list[Series]:
+        """Return the decoded series.
+
+        Raises:
+            ValueError: If the body ended inside a frame
+        """
+        if self._buffer:
+            raise ValueError("Truncated remote read response")
+        if self.skipped_chunks:
+            logger.warning(
+                f"Skipped {self.skipped_chunks} non-float chunks in remote read"
+            )
+        return list(self._series.values())
+
+    def _decode_frame(self, message: memoryview) -> None:
+        """Decode one ``ChunkedReadResponse`` message."""
+        for number, _, field in _iter_fields(message):
+            if number == 1:
+                self._decode_series(field)
+
+    def _decode_series(self, message: memoryview) -> None:
+        """Decode one ``ChunkedSeries`` message."""
+        labels = []
+        chunks = []
+        for number, _, field in _iter_fields(message):
+            if number == 1:
+                labels.append(_decode_label(field))
+            elif number == 2:
+                chunks.append(field)
+
+        key = _series_key(labels)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = Series(labels=dict(key))
+
+        for chunk in chunks:
+            encoding, data = 0, b""
+            for number, _, field in _iter_fields(chunk):
+                if number == 3:
+                    encoding = field
+                elif number == 4:
+                    data = bytes(field)
+            if encoding != _XOR_ENCODING:
+                # Native histogram chunks have no float samples to return
+                self.skipped_chunks += 1
+                continue
+            decode_xor_chunk(data, series, self.start_ms, self.end_ms)
+
+
+def decode_read_response(body: bytes) -> list[Series]:
+    """Decode a snappy-compressed, non-streamed ``ReadResponse``.
+
+    Servers that do not support streamed chunks answer in this format.
+
+    Raises:
+        ValueError: If python-snappy is not installed or the body is invalid
+    """
+    if snappy is None:
+        raise ValueError(
+            "Remote read server returned a sampled response; "
+            "install python-snappy to decode it"
+        )
+
+    message = memoryview(snappy.uncompress(body))
+    series_list = []
+    for number, _, result in _iter_fields(message):
+        if number != 1:
+            continue
+        for ts_number, _, timeseries in _iter_fields(result):
+            if ts_number == 1:
+                series_list.append(_decode_timeseries(timeseries))
+    return series_list
+
+
+def _decode_timeseries(message: memoryview) -> Series:
+    """Decode one ``prometheus.TimeSeries`` message."""
+    series = Series(labels={})
+    for number, _, field in _iter_fields(message):
+        if number == 1:
+            name, value = _decode_label(field)
+            series.labels[name] = value
+        elif number == 2:
+            sample_value, timestamp = 0.0, 0
+            for sample_number, _, sample_field in _iter_fields(field):
+                if sample_number == 1:
+                    sample_value = _LE_DOUBLE.unpack(sample_field)[0]
+                elif sample_number == 2:
+                    timestamp = _int64(sample_field)
+            series.append(timestamp / 1000, sample_value)
+    return series
@@ -0,0 +1,275 @@
+"""
+Server-side result handles for MCP server.
+
+Keeps large query results in a byte-bounded LRU under opaque handles, so
+agents can page through, filter, slice and sort them without sending the
+query to Prometheus again.
+"""
+
+import bisect
+import re
+import secrets
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any
+
+from .columnar import Series
+
+SORT_KEYS = ("labels", "last", "min", "max", "mean")
+
+# Rough per-object overhead of a label pair and a series, in bytes
+_LABEL_OVERHEAD = 100
+_SERIES_OVERHEAD = 200
+
+
+def _series_size(series: Series) -> int:
+    """Estimate the memory held by one series."""
+    labels = sum(
+        len(name) + len(value) + _LABEL_OVERHEAD
+        for name, value in series.labels.items()
+    )
+    samples = series.timestamps.itemsize * len(series.timestamps)
+    samples += series.values.itemsize * len(series.values)
+    return _SERIES_OVERHEAD + labels + samples
+
+
+def _label_key(labels: dict[str, str]) -> str:
+    """Return a stable sort key for a label set."""
+    return ",".join(f"{name}={value}" for name, value in sorted(labels.items()))
+
+
+@dataclass
+class StoredResult:
+    """Query result kept under a handle."""
+
+    handle: str
+    query: str
+    result_type: str
+    series: list[Series]
+    size: int
+    created_at: float = field(default_factory=time.time)
+
+
+@dataclass
+class ResultPage:
+    """One page of a stored result after filtering, slicing and sorting."""
+
+    result: StoredResult
+    total: int
+    offset: int
+    series: list[Series]
+
+
+class ResultStore:
+    """Byte-bounded LRU of query results addressed by opaque handles."""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024) -> None:
+        """Initialize result store.
+
+        Args:
+            max_bytes: Approximate memory budget; least recently used results
+                are evicted beyond it
+        """
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._results: OrderedDict[str, StoredResult] = OrderedDict()
+
+    def __len__(self) -> int:
+        """Return number of stored results."""
+        return len(self._results)
+
+    def put(self, query: str, result_type: str, series: list[Series]) -> str | None:
+        """Store a result.
+
+        Args:
+            query: Query that produced the result
+            result_type: Result type (e.g., "vector", "matrix", "metrics")
+            series: Result series
+
+        Returns:
+            Handle of the stored result, or None if it exceeds the budget
+        """
+        size = sum(_series_size(s) for s in series)
+        if size > self.max_bytes:
+            return None
+
+        handle = f"r-{secrets.token_urlsafe(6)}"
+        self._results[handle] = StoredResult(handle, query, result_type, series, size)
+        self.size += size
+        self._evict()
+        return handle
+
+    def resize(self, max_bytes: int) -> None:
+        """Change the memory budget, evicting results beyond a smaller one.
+
+        Args:
+            max_bytes: New approximate memory budget
+        """
+        self.max_bytes = max_bytes
+        self._evict()
+
+    def _evict(self) -> None:
+        """Drop least recently used results until the store fits its budget."""
+        while self.size > self.max_bytes:
+            _, evicted = self._results.popitem(last=False)
+            self.size -= evicted.size
+
+    def get(self, handle: str) -> StoredResult:
+        """Look up a stored result and mark it recently used.
+
+        Raises:
+            ValueError: If the handle is unknown or was evicted
+        """
+        result = self._results.get(handle)
+        if result is None:
+            raise ValueError(f"Unknown or expired result handle: {handle}")
+        self._results.move_to_end(handle)
+        return result
+
+    def drop(self, handle: str) -> bool:
+        """Remove a stored result, returning True if it existed."""
+        result = self._results.pop(handle, None)
+        if result is None:
+            return False
+        self.size -= result.size
+        return True
+
+    def view(
+        self,
+        handle: str,
+        offset: int = 0,
+        limit: int = 20,
+        match: dict[str, str] | None = None,
+        start: float | None = None,
+        end: float | None = None,
+        sort: str = "labels",
+        descending: bool | None = None,
+    ) -> ResultPage:
+        """Return one page of a stored result.
+
+        Args:
+            handle: Result handle
+            offset: Index of the first series to return
+            limit: Maximum number of series to return
+            match: Label name to regex; series must fully match all of them
+            start: Drop samples before this Unix timestamp
+            end: Drop samples after this Unix timestamp
+            sort: "labels" or a statistic of the sliced samples: "last",
+                "min", "max" or "mean"
+            descending: Sort order; defaults to descending for statistics
+                and ascending for labels
+
+        Returns:
+            Requested page
+
+        Raises:
+            ValueError: If the handle, a regex, the sort key or the page
+                bounds are invalid
+        """
+        if offset < 0 or limit < 0:
+            raise ValueError(f"Invalid page: offset {offset}, limit {limit}")
+        result = self.get(handle)
+        if sort not in SORT_KEYS:
+            raise ValueError(f"Invalid sort key: {sort}")
+
+        try:
+            patterns = {
+                name: re.compile(pattern) for name, pattern in (match or {}).items()
+            }
+        except re.error as e:
+            raise ValueError(f"Invalid label pattern: {e}") from e
+
+        selected = [
+            _slice(series, start, end)
+            for series in result.series
+            if all(
+                pattern.fullmatch(series.labels.get(name, ""))
+                for name, pattern in patterns.items()
+            )
+        ]
+
+        if descending is None:
+            descending = sort != "labels"
+        if sort == "labels":
+            selected.sort(key=lambda s: _label_key(s.labels), reverse=descending)
+        else:
+            # Series without samples in the slice always sort last
+            with_samples = [s for s in selected if len(s)]
+            with_samples.sort(key=lambda s: _statistic(s, sort), reverse=descending)
+            selected = with_samples + [s for s in selected if not len(s)]
+
+        return ResultPage(
+            result=result,
+            total=len(selected),
+            offset=offset,
+            series=selected[offset : offset + limit],
+        )
+
+    def summarize(self, handle: str, top_values: int = 10) -> dict[str, Any]:
+        """Summarize label cardinality and time span of a stored result.
+
+        Args:
+            handle: Result handle
+            top_values: Most frequent values to list per label
+
+        Returns:
+            Summary with series and sample counts, time span and, per label,
+            the number of distinct values and the most frequent ones
+        """
+        result = self.get(handle)
+
+        label_values: dict[str, dict[str, int]] = {}
+        first, last, samples = None, None, 0
+        for series in result.series:
+            for name, value in series.labels.items():
+                counts = label_values.setdefault(name, {})
+                counts[value] = counts.get(value, 0) + 1
+            if len(series):
+                samples += len(series)
+                head, tail = series.timestamps[0], series.timestamps[-1]
+                first = head if first is None else min(first, head)
+                last = tail if last is None else max(last, tail)
+
+        return {
+            "handle": handle,
+            "query": result.query,
+            "result_type": result.result_type,
+            "series": len(result.series),
+            "samples": samples,
+            "start": first,
+            "end": last,
+            "labels": {
+                name: {
+                    "distinct": len(counts),
+                    "top": sorted(counts.items(), key=lambda item: -item[1])[
+                        :top_values
+                    ],
+                }
+                for name, counts in sorted(label_values.items())
+            },
+        }
+
+
+def _slice(series: Series, start: float | None, end: float | None) -> Series:
+    """Return the series restricted to a time range."""
+    if start is None and end is None:
+        return series
+    low = 0 if start is None else bisect.bisect_left(series.timestamps, start)
+    high = len(series) if end is None else bisect.bisect_right(series.timestamps, end)
+    return Series(
+        labels=series.labels,
+        timestamps=series.timestamps[low:high],
+        values=series.values[low:high],
+    )
+
+
+def _statistic(series: Series, name: str) -> float:
+    """Compute a sort statistic over a non-empty series."""
+    if name == "last":
+        return float(series.values[-1])
+    if name == "min":
+        return float(min(series.values))
+    if name == "max":
+        return float(max(series.values))
+    return float(sum(series.values)) / len(series.values)
@@ -0,0 +1,164 @@
+"""
+Warm-query scheduler for MCP server.
+
+Pre-evaluates a configured watchlist of queries in the background so that
+interactive tool calls for them are answered from the results cache.
+"""
+
+import asyncio
+import json
+import logging
+import random
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from .concurrency import Priority, request_priority
+from .promql import parse_duration, parse_promql
+
+if TYPE_CHECKING:
+    from .prometheus_client import PrometheusClient
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class WatchQuery:
+    """Query kept warm in the results cache."""
+
+    query: str
+    relative_time: str = "5m"
+    interval: float = 60.0
+
+
+def parse_watchlist(entries: list[Any]) -> list[WatchQuery]:
+    """Build watchlist entries from configuration data.
+
+    Each entry is either a PromQL string or a mapping with ``query`` and
+    optional ``relative_time`` and ``interval`` (duration string or seconds).
+
+    Args:
+        entries: Raw watchlist entries
+
+    Returns:
+        Validated watchlist
+
+    Raises:
+        ValueError: If an entry is malformed or contains invalid PromQL
+    """
+    watchlist = []
+    for raw in entries:
+        entry = {"query": raw} if isinstance(raw, str) else raw
+        if not isinstance(entry, dict) or not entry.get("query"):
+            raise ValueError(f"Invalid watchlist entry: {entry!r}")
+
+        interval = entry.get("interval", 60.0)
+        if isinstance(interval, str):
+            interval = parse_duration(interval)
+        if interval <= 0:
+            raise ValueError(f"Watchlist interval must be positive: {entry!r}")
+
+        # Fail at startup rather than on every scheduled run
+        parse_promql(entry["query"])
+
+        watchlist.append(
+            WatchQuery(
+                query=entry["query"],
+                relative_time=entry.get("relative_time", "5m"),
+                interval=float(interval),
+            )
+        )
+    return watchlist
+
+
+def load_watchlist(path: str | Path) -> list[WatchQuery]:
+    """Load a watchlist from a JSON file.
+
+    The file holds either a list of entries or an object with a ``queries``
+    list, e.g. ``{"queries": [{"query": "up", "interval": "30s"}]}``.
+
+    Args:
+        path: Path to the watchlist file
+
+    Returns:
+        Validated watchlist
+
+    Raises:
+        TypeError: If the file does not hold a list of queries
+        ValueError: If an entry is invalid
+        OSError: If the file cannot be read
+    """
+    data = json.loads(Path(path).read_text())
+    if isinstance(data, dict):
+        data = data.get("queries", [])
+    if not isinstance(data, list):
+        raise TypeError(f"Watchlist must be a list of queries: {path}")
+    return parse_watchlist(data)
+
+
+class WarmQueryScheduler:
+    """Runs watchlist queries on jittered intervals at background priority."""
+
+    def __init__(
+        self,
+        client: "PrometheusClient",
+        watchlist: list[WatchQuery],
+        jitter: float = 0.1,
+    ) -> None:
+        """Initialize scheduler.
+
+        Args:
+            client: Prometheus client whose results cache is warmed
+            watchlist: Queries to keep warm
+            jitter: Fraction by which each interval is randomly stretched or
+                shrunk, so runs do not synchronize
+        """
+        self.client = client
+        self.watchlist = watchlist
+        self.jitter = jitter
+        self._tasks: list[asyncio.Task[None]] = []
+
+    @property
+    def running(self) -> bool:
+        """Return True if the scheduler has been started."""
+        return bool(self._tasks)
+
+    def start(self) -> None:
+        """Start one background loop per watchlist entry."""
+        if self._tasks:
+            return
+        for watch in self.watchlist:
+            self._tasks.append(asyncio.create_task(self._run(watch)))
+        logger.info(f"Warm-query scheduler started with {len(self._tasks)} queries")
+
+    async def stop(self) -> None:
+        """Cancel all background loops and wait for them to finish."""
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _jittered(self, interval: float) -> float:
+        """Return the interval randomly scaled by the jitter fraction."""
+        return interval * random.uniform(1 - self.jitter, 1 + self.jitter)  # noqa: S311
+
+    async def _run(self, watch: WatchQuery) -> None:
+        """Evaluate one watchlist query forever."""
+        # Stagger the first runs instead of starting with a burst
+        await asyncio.sleep(random.uniform(0, watch.interval) * self.jitter)  # noqa: S311
+
+        with request_priority(Priority.BACKGROUND):
+            while True:
+                try:
+                    # Keep the entry fresh until slightly after the next run
+                    await self.client.warm_query(
+                        watch.query,
+                        watch.relative_time,
+                        ttl=watch.interval * (1 + self.jitter) + 5,
+                    )
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.warning(f"Warm query '{watch.query}' failed: {e}")
+
+                await asyncio.sleep(self._jittered(watch.interval))
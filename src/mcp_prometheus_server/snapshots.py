@@ -0,0 +1,186 @@
+"""
+Alert and rule snapshots for MCP server.
+
+Keeps short-lived, indexed copies of the ``/api/v1/alerts`` and
+``/api/v1/rules`` responses shared by all tool calls, so agents asking what
+is firing many times a minute cost one upstream fetch per TTL. Each
+snapshot carries an ETag-style fingerprint of its content that only
+changes when alerts or rules actually change, not on every evaluation.
+"""
+
+import hashlib
+import json
+import time
+from collections.abc import Callable, Iterable
+from typing import Any
+
+# Index keys are (field, value) pairs: label names for labels and these
+# pseudo-fields, which cannot clash since "@" is not valid in label names
+STATE = "@state"
+RULE_NAME = "@name"
+RULE_TYPE = "@type"
+RULE_HEALTH = "@health"
+RULE_GROUP = "@group"
+
+# Alert and rule fields that change on every evaluation; left out of the
+# fingerprint so it only moves when the set of alerts or rules changes
+_VOLATILE_FIELDS = ("value", "lastEvaluation", "evaluationTime")
+
+
+def flatten_rules(groups: Iterable[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Flatten rule groups into rules tagged with their group and file.
+
+    Args:
+        groups: The ``groups`` of a ``/api/v1/rules`` response
+
+    Returns:
+        One entry per rule
+    """
+    return [
+        {**rule, "group": group.get("name", ""), "file": group.get("file", "")}
+        for group in groups
+        for rule in group.get("rules", [])
+    ]
+
+
+def alert_keys(alert: dict[str, Any]) -> list[tuple[str, str]]:
+    """Return the index keys of an alert: its labels and state."""
+    return [*alert.get("labels", {}).items(), (STATE, alert.get("state", ""))]
+
+
+def rule_keys(rule: dict[str, Any]) -> list[tuple[str, str]]:
+    """Return the index keys of a rule: its labels, name, type, health and group."""
+    keys = [
+        *rule.get("labels", {}).items(),
+        (RULE_NAME, rule.get("name", "")),
+        (RULE_TYPE, rule.get("type", "")),
+        (RULE_HEALTH, rule.get("health", "")),
+        (RULE_GROUP, rule.get("group", "")),
+    ]
+    if "state" in rule:
+        keys.append((STATE, rule["state"]))
+    return keys
+
+
+def _stable(item: Any) -> Any:
+    """Drop per-evaluation fields from an alert or rule, recursively."""
+    if isinstance(item, dict):
+        return {
+            key: _stable(value)
+            for key, value in item.items()
+            if key not in _VOLATILE_FIELDS
+        }
+    if isinstance(item, list):
+        return [_stable(value) for value in item]
+    return item
+
+
+def fingerprint(items: list[dict[str, Any]]) -> str:
+    """Return an ETag-style fingerprint of alerts or rules.
+
+    Args:
+        items: Alerts or flattened rules
+
+    Returns:
+        Short hex digest, independent of item order and evaluation times
+    """
+    encoded = sorted(
+        json.dumps(_stable(item), sort_keys=True, separators=(",", ":"))
+        for item in items
+    )
+    return hashlib.blake2b("\n".join(encoded).encode(), digest_size=8).hexdigest()
+
+
+class SnapshotCache:
+    """Indexed, short-lived snapshot of one alerts or rules response."""
+
+    def __init__(
+        self,
+        index_keys: Callable[[dict[str, Any]], Iterable[tuple[str, str]]],
+        ttl: float = 10.0,
+    ) -> None:
+        """Initialize snapshot cache.
+
+        Args:
+            index_keys: Returns the (field, value) keys an item is found by
+            ttl: Seconds before the snapshot is refetched
+        """
+        self.ttl = ttl
+        self.loaded_at: float | None = None
+        self.etag: str | None = None
+        self.changed_at: float | None = None
+        self.fetches = 0
+        self.reads = 0
+        self._index_keys = index_keys
+        self._items: list[dict[str, Any]] = []
+        self._index: dict[tuple[str, str], list[int]] = {}
+
+    def __len__(self) -> int:
+        """Return number of items in the snapshot."""
+        return len(self._items)
+
+    def is_stale(self) -> bool:
+        """Return True if the snapshot was never loaded or has expired."""
+        if self.loaded_at is None:
+            return True
+        return time.monotonic() - self.loaded_at >= self.ttl
+
+    def update(self, items: list[dict[str, Any]]) -> bool:
+        """Replace the snapshot with freshly fetched items.
+
+        Args:
+            items: Alerts or flattened rules
+
+        Returns:
+            True if the content changed since the previous snapshot
+        """
+        self.fetches += 1
+        self.loaded_at = time.monotonic()
+        etag = fingerprint(items)
+
+        index: dict[tuple[str, str], list[int]] = {}
+        for position, item in enumerate(items):
+            for key in self._index_keys(item):
+                index.setdefault(key, []).append(position)
+
+        # Swap items and index together so readers never see a partial update
+        self._items, self._index = items, index
+        if etag == self.etag:
+            return False
+        self.etag = etag
+        self.changed_at = time.time()
+        return True
+
+    def select(self, criteria: dict[str, str] | None = None) -> list[dict[str, Any]]:
+        """Find items matching every (field, value) criterion.
+
+        Args:
+            criteria: Required label values and pseudo-field values;
+                None or empty selects everything
+
+        Returns:
+            Matching items in response order
+        """
+        self.reads += 1
+        if not criteria:
+            return list(self._items)
+
+        # Intersect from the most selective posting list
+        postings = sorted(
+            (self._index.get(key, []) for key in criteria.items()), key=len
+        )
+        positions = set(postings[0])
+        for posting in postings[1:]:
+            positions.intersection_update(posting)
+            if not positions:
+                break
+        return [self._items[position] for position in sorted(positions)]
+
+    def stats(self) -> dict[str, Any]:
+        """Return snapshot size, fingerprint and fetches versus reads."""
+        return {
+            "items": len(self._items),
+            "etag": self.etag,
+            "fetches": self.fetches,
+            "reads": self.reads,
+        }
@@ -0,0 +1,227 @@
+"""
+Compact history rendering for MCP server.
+
+Renders range results as a table with one line per series: a Unicode
+sparkline of the series downsampled to a fixed number of columns, followed
+by its min, max and last value. Labels shared by every series are printed
+once in a header, so each row only carries what tells it apart. The same
+columns and statistics make up the structured form of the table.
+"""
+
+import math
+from collections.abc import Iterable, Sequence
+from typing import Any
+
+from .columnar import Series
+from .structured import sample_value
+
+SPARK_CHARS = "▁▂▃▄▅▆▇█"
+
+# Sparkline columns per series
+DEFAULT_WIDTH = 24
+
+# Series rows rendered before the table is cut short
+DEFAULT_MAX_ROWS = 50
+
+
+def downsample(series: Series, start: float, end: float, width: int) -> list[float]:
+    """Average a series into equal time buckets.
+
+    Args:
+        series: Series to downsample
+        start: Timestamp of the first bucket's start
+        end: Timestamp of the last bucket's end
+        width: Number of buckets
+
+    Returns:
+        Mean of the finite samples in each bucket; NaN for empty buckets
+    """
+    sums = [0.0] * width
+    counts = [0] * width
+    span = end - start
+    for timestamp, value in series.samples():
+        if not math.isfinite(value):
+            continue
+        index = int((timestamp - start) / span * width) if span > 0 else 0
+        index = min(max(index, 0), width - 1)
+        sums[index] += value
+        counts[index] += 1
+    return [
+        total / count if count else math.nan
+        for total, count in zip(sums, counts, strict=True)
+    ]
+
+
+def sparkline(values: Sequence[float]) -> str:
+    """Render values as block characters scaled to their own min and max.
+
+    Args:
+        values: Values to render; NaN renders as a space
+
+    Returns:
+        One character per value
+    """
+    finite = [value for value in values if math.isfinite(value)]
+    if not finite:
+        return " " * len(values)
+
+    low, high = min(finite), max(finite)
+    scale = (len(SPARK_CHARS) - 1) / (high - low) if high > low else 0.0
+    return "".join(
+        SPARK_CHARS[round((value - low) * scale)] if math.isfinite(value) else " "
+        for value in values
+    )
+
+
+def common_labels(label_sets: Iterable[dict[str, str]]) -> dict[str, str]:
+    """Return the labels every label set has with the same value.
+
+    Args:
+        label_sets: Labels of each series
+
+    Returns:
+        Shared label names and values
+    """
+    common: dict[str, str] | None = None
+    for labels in label_sets:
+        if common is None:
+            common = dict(labels)
+        else:
+            common = {
+                name: value
+                for name, value in common.items()
+                if labels.get(name) == value
+            }
+        if not common:
+            break
+    return common or {}
+
+
+def format_labels(labels: dict[str, str]) -> str:
+    """Format labels as a PromQL-style matcher list without braces."""
+    return ", ".join(f'{name}="{value}"' for name, value in sorted(labels.items()))
+
+
+def format_number(value: float) -> str:
+    """Format a sample value with four significant digits."""
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return f"{value:.4g}"
+
+
+def _columns(series_list: Sequence[Series], width: int) -> tuple[float, float, int]:
+    """Return the shared time range and column count of non-empty series."""
+    start = min(series.timestamps[0] for series in series_list)
+    end = max(series.timestamps[-1] for series in series_list)
+    # Short series get one column per sample rather than gaps
+    return start, end, min(width, max(len(series) for series in series_list))
+
+
+def render_table(
+    series_list: Sequence[Series],
+    width: int = DEFAULT_WIDTH,
+    max_rows: int = DEFAULT_MAX_ROWS,
+) -> list[str]:
+    """Render series as a sparkline table with shared labels hoisted.
+
+    All sparklines cover the same time range, so columns line up across
+    rows; each row is scaled to its own min and max.
+
+    Args:
+        series_list: Series to render
+        width: Sparkline columns
+        max_rows: Rows rendered before the rest are summarized
+
+    Returns:
+        Table lines, starting with the shared labels if there are any
+    """
+    series_list = [series for series in series_list if len(series)]
+    if not series_list:
+        return []
+
+    start, end, width = _columns(series_list, width)
+    common = common_labels(series.labels for series in series_list)
+
+    lines = []
+    if common:
+        lines.append(f"Common labels: {{{format_labels(common)}}}")
+
+    rows = []
+    for series in series_list[:max_rows]:
+        distinct = {
+            name: value for name, value in series.labels.items() if name not in common
+        }
+        finite = [value for value in series.values if math.isfinite(value)]
+        rows.append(
+            (
+                format_labels(distinct) or "-",
+                sparkline(downsample(series, start, end, width)),
+                format_number(min(finite)) if finite else "-",
+                format_number(max(finite)) if finite else "-",
+                format_number(series.values[-1]),
+            )
+        )
+
+    header = ("series", "trend", "min", "max", "last")
+    widths = [max(len(row[i]) for row in [header, *rows]) for i in range(5)]
+    for row in [header, *rows]:
+        label, trend, *numbers = row
+        cells = [label.ljust(widths[0]), trend.ljust(widths[1])]
+        cells.extend(
+            number.rjust(column)
+            for number, column in zip(numbers, widths[2:], strict=True)
+        )
+        lines.append("  " + "  ".join(cells).rstrip())
+
+    if len(series_list) > max_rows:
+        lines.append(f"  ... and {len(series_list) - max_rows} more series")
+    return lines
+
+
+def trend_content(
+    series_list: Sequence[Series],
+    width: int = DEFAULT_WIDTH,
+    max_rows: int = DEFAULT_MAX_ROWS,
+) -> dict[str, Any]:
+    """Return the structured form of a sparkline table.
+
+    Carries the downsampled columns and summary statistics the table is
+    drawn from instead of every sample, so it stays as small as the text.
+
+    Args:
+        series_list: Series to summarize
+        width: Columns per series
+        max_rows: Series included before the rest are left out
+
+    Returns:
+        Time range, column count and per-series trend, min, max and last
+    """
+    series_list = [series for series in series_list if len(series)]
+    content: dict[str, Any] = {"status": "success", "result_type": "trend"}
+    series: list[dict[str, Any]] = []
+    if series_list:
+        start, end, width = _columns(series_list, width)
+        content.update(start=start, end=end, columns=width)
+        for item in series_list[:max_rows]:
+            finite = [value for value in item.values if math.isfinite(value)]
+            series.append(
+                {
+                    "labels": item.labels,
+                    "samples": len(item),
+                    "trend": [
+                        sample_value(value)
+                        for value in downsample(item, start, end, width)
+                    ],
+                    "min": min(finite) if finite else None,
+                    "max": max(finite) if finite else None,
+                    "last": sample_value(item.values[-1]),
+                }
+            )
+    content.update(
+        series=series,
+        total_series=len(series_list),
+        truncated=len(series) < len(series_list),
+    )
+    return content
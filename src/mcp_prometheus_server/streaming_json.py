@@ -0,0 +1,136 @@
+"""
+Incremental JSON parsing for MCP server.
+
+Extracts the elements of one nested JSON array (e.g. ``data.result`` of a
+Prometheus response) while the body is still arriving, so large responses
+are processed one series at a time instead of being loaded whole.
+"""
+
+import json
+import re
+from typing import Any
+
+# Characters that change the parser state
+_STRUCTURAL = re.compile(rb'[{}\[\]":]')
+
+# Remainder of a JSON string after its opening quote
+_STRING_END = re.compile(rb'(?:[^"\\]|\\.)*"', re.DOTALL)
+
+
+class JSONArrayStream:
+    """Yields elements of the array at a key path as the body is fed in.
+
+    Only structural characters are inspected; element bytes are handed to
+    ``json.loads`` once each element is complete. Elements must be objects
+    or arrays, as Prometheus result entries are.
+    """
+
+    def __init__(self, path: tuple[str, ...] = ("data", "result")) -> None:
+        """Initialize parser.
+
+        Args:
+            path: Object keys leading from the root to the array
+        """
+        self.path = list(path)
+        self.found = False
+        self.started = False
+        self._buffer = bytearray()
+        self._pos = 0
+        # Key each open container was reached by (None inside arrays)
+        self._keys: list[str | None] = []
+        self._pending_key: str | None = None
+        self._last_string: tuple[int, int] | None = None
+        self._array_depth: int | None = None
+        self._item_start: int | None = None
+
+    def feed(self, data: bytes) -> list[Any]:
+        """Parse more of the body.
+
+        Args:
+            data: Next bytes of the body
+
+        Returns:
+            Array elements completed by this data, decoded
+        """
+        self._buffer += data
+        items = []
+        buffer = self._buffer
+
+        while True:
+            match = _STRUCTURAL.search(buffer, self._pos)
+            if match is None:
+                self._pos = len(buffer)
+                break
+
+            char = buffer[match.start()]
+            pos = match.start()
+
+            if char == ord('"'):
+                end = _STRING_END.match(buffer, pos + 1)
+                if end is None:
+                    # String continues in the next chunk
+                    self._pos = pos
+                    break
+                self._last_string = (pos, end.end())
+                self._pos = end.end()
+                continue
+
+            self._pos = pos + 1
+
+            if char == ord(":"):
+                if self._item_start is None and self._last_string is not None:
+                    key_start, key_end = self._last_string
+                    self._pending_key = json.loads(bytes(buffer[key_start:key_end]))
+                continue
+
+            if char in (ord("{"), ord("[")):
+                self.started = True
+                self._keys.append(self._pending_key)
+                self._pending_key = None
+                depth = len(self._keys)
+                if (
+                    char == ord("[")
+                    and self._array_depth is None
+                    and self._keys[1:] == self.path
+                ):
+                    self._array_depth = depth
+                    self.found = True
+                elif self._array_depth is not None and depth == self._array_depth + 1:
+                    self._item_start = pos
+                continue
+
+            # Closing bracket or brace
+            depth = len(self._keys)
+            self._keys.pop()
+            if self._array_depth is not None:
+                if depth == self._array_depth + 1 and self._item_start is not None:
+                    items.append(json.loads(bytes(buffer[self._item_start : pos + 1])))
+                    self._item_start = None
+                elif depth == self._array_depth:
+                    self._array_depth = None
+
+        self._compact()
+        return items
+
+    @property
+    def complete(self) -> bool:
+        """Return True once the root value has been closed."""
+        return self.started and not self._keys
+
+    def _compact(self) -> None:
+        """Drop consumed bytes that no pending element or key refers to."""
+        keep = self._pos
+        if self._item_start is not None:
+            keep = min(keep, self._item_start)
+        if self._last_string is not None and self._item_start is None:
+            keep = min(keep, self._last_string[0])
+        if keep == 0:
+            return
+
+        del self._buffer[:keep]
+        self._pos -= keep
+        if self._item_start is not None:
+            self._item_start -= keep
+        if self._last_string is not None:
+            start, end = self._last_string
+            self._last_string = (start - keep, end - keep) if start >= keep else None
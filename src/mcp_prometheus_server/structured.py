@@ -0,0 +1,170 @@
+"""
+Structured tool output for MCP server.
+
+Builds the ``structuredContent`` of tool results: query results in a
+compact typed form (scalars, vectors and column-per-series matrices) that
+programs can consume without parsing the text view. The payload is
+encoded once, by the MCP transport; the text shown to agents is rendered
+from it.
+"""
+
+import math
+from collections.abc import Iterable, Sequence
+from typing import Any
+
+from .columnar import Series
+
+# Samples included in one structured result; larger results are cut at a
+# series boundary and marked truncated
+MAX_STRUCTURED_SAMPLES = 100_000
+
+_SPECIAL_VALUES = {"NaN": "NaN", "+Inf": "+Inf", "-Inf": "-Inf", "Inf": "+Inf"}
+
+
+def sample_value(value: str | float) -> float | str:
+    """Convert a sample value to a JSON-safe number.
+
+    Non-finite values, which JSON numbers cannot express, are kept as the
+    strings Prometheus uses for them.
+
+    Args:
+        value: Value as a Prometheus string or a float
+
+    Returns:
+        Finite float, or "NaN", "+Inf" or "-Inf"
+    """
+    if isinstance(value, str):
+        special = _SPECIAL_VALUES.get(value)
+        if special is not None:
+            return special
+        value = float(value)
+    if math.isfinite(value):
+        return value
+    if math.isnan(value):
+        return "NaN"
+    return "+Inf" if value > 0 else "-Inf"
+
+
+def _column(values: Iterable[float]) -> list[Any]:
+    """Convert a column of floats, replacing non-finite values."""
+    column = list(values)
+    if all(map(math.isfinite, column)):
+        return column
+    return [sample_value(value) for value in column]
+
+
+def series_content(series: Series, result_type: str = "matrix") -> dict[str, Any]:
+    """Return the structured form of a columnar series.
+
+    Args:
+        series: Series to convert
+        result_type: "vector" for the latest sample only, else all samples
+
+    Returns:
+        Labels with timestamp/value, or timestamps/values columns
+    """
+    if result_type == "vector":
+        if not len(series):
+            return {"labels": series.labels}
+        return {
+            "labels": series.labels,
+            "timestamp": series.timestamps[-1],
+            "value": sample_value(series.values[-1]),
+        }
+    return {
+        "labels": series.labels,
+        "timestamps": series.timestamps.tolist(),
+        "values": _column(series.values.tolist()),
+    }
+
+
+def query_result_content(
+    result: dict[str, Any], max_samples: int = MAX_STRUCTURED_SAMPLES
+) -> dict[str, Any]:
+    """Return the structured form of a Prometheus query response.
+
+    Args:
+        result: Query response with status and data
+        max_samples: Samples included before the result is truncated
+
+    Returns:
+        Content with the status, result type and scalar, vector or matrix data
+    """
+    if result.get("status") != "success":
+        return {"status": "error", "error": result.get("error", "Unknown error")}
+
+    data = result.get("data", {})
+    result_type = data.get("resultType", "")
+    entries = data.get("result", [])
+
+    if result_type in ("scalar", "string"):
+        timestamp, value = entries
+        return {
+            "status": "success",
+            "result_type": result_type,
+            "timestamp": float(timestamp),
+            "value": value if result_type == "string" else sample_value(value),
+        }
+
+    series: list[dict[str, Any]] = []
+    samples = 0
+    for entry in entries:
+        points = entry.get("values")
+        if points is None:
+            timestamp, value = entry["value"]
+            item = {
+                "labels": entry.get("metric", {}),
+                "timestamp": float(timestamp),
+                "value": sample_value(value),
+            }
+            size = 1
+        else:
+            item = {
+                "labels": entry.get("metric", {}),
+                "timestamps": [float(timestamp) for timestamp, _ in points],
+                "values": [sample_value(value) for _, value in points],
+            }
+            size = len(points)
+        if series and samples + size > max_samples:
+            break
+        series.append(item)
+        samples += size
+
+    return _series_payload(result_type, series, len(entries))
+
+
+def series_list_content(
+    series_list: Sequence[Series], max_samples: int = MAX_STRUCTURED_SAMPLES
+) -> dict[str, Any]:
+    """Return the structured matrix form of columnar series.
+
+    Args:
+        series_list: Series to convert
+        max_samples: Samples included before the result is truncated
+
+    Returns:
+        Matrix content with the status and one column pair per series
+    """
+    series: list[dict[str, Any]] = []
+    samples = 0
+    for item in series_list:
+        if series and samples + len(item) > max_samples:
+            break
+        series.append(series_content(item))
+        samples += len(item)
+    return _series_payload("matrix", series, len(series_list))
+
+
+def _series_payload(
+    result_type: str,
+    series: list[dict[str, Any]],
+    total: int,
+) -> dict[str, Any]:
+    """Assemble a vector or matrix result."""
+    return {
+        "status": "success",
+        "result_type": result_type,
+        "series": series,
+        "total_series": total,
+        "truncated": len(series) < total,
+    }
@@ -0,0 +1,335 @@
+"""
+Query subscriptions for MCP server.
+
+Evaluates subscribed queries on an interval and notifies MCP clients when
+series change, so agents can follow a metric without polling. Subscribers
+to the same query share one evaluation loop.
+"""
+
+import asyncio
+import json
+import logging
+import secrets
+import time
+from collections.abc import Awaitable, Callable
+from typing import TYPE_CHECKING, Any
+
+from .concurrency import Priority, current_session, request_priority
+from .deadlines import without_deadline
+from .promql import parse_promql
+from .tenants import current_tenant
+
+if TYPE_CHECKING:
+    from .prometheus_client import PrometheusClient
+
+logger = logging.getLogger(__name__)
+
+SUBSCRIPTION_URI_PREFIX = "prometheus://subscriptions/"
+
+SeriesKey = tuple[tuple[str, str], ...]
+Notifier = Callable[[str], Awaitable[None]]
+
+
+def _series_key(labels: dict[str, str]) -> SeriesKey:
+    """Return a hashable, order-independent key for a label set."""
+    return tuple(sorted(labels.items()))
+
+
+def _snapshot(result: dict[str, Any]) -> dict[SeriesKey, tuple[float, str]]:
+    """Map each series of an instant query result to its latest sample."""
+    if result.get("status") != "success":
+        raise ValueError(f"Query failed: {result.get('error', 'Unknown error')}")
+
+    data = result.get("data", {})
+    if data.get("resultType") == "scalar":
+        timestamp, value = data.get("result", [0, "NaN"])
+        return {(): (float(timestamp), value)}
+
+    snapshot = {}
+    for series in data.get("result", []):
+        if "value" in series:
+            timestamp, value = series["value"]
+        elif series.get("values"):
+            timestamp, value = series["values"][-1]
+        else:
+            continue
+        snapshot[_series_key(series.get("metric", {}))] = (float(timestamp), value)
+    return snapshot
+
+
+class Subscription:
+    """One client's subscription and the changes it has not read yet."""
+
+    def __init__(
+        self,
+        subscription_id: str,
+        feed: "_Feed",
+        notify: Notifier,
+        session: str,
+    ) -> None:
+        """Initialize subscription.
+
+        Args:
+            subscription_id: Opaque subscription identifier
+            feed: Shared evaluation loop this subscription reads from
+            notify: Callback invoked with the resource URI on changes
+            session: Client session that owns the subscription
+        """
+        self.id = subscription_id
+        self.feed = feed
+        self.notify = notify
+        self.session = session
+        self._changed: dict[SeriesKey, tuple[float, str]] = {}
+        self._removed: set[SeriesKey] = set()
+
+    @property
+    def uri(self) -> str:
+        """Return the MCP resource URI of this subscription."""
+        return f"{SUBSCRIPTION_URI_PREFIX}{self.id}"
+
+    @property
+    def has_pending(self) -> bool:
+        """Return True if there are changes the client has not read."""
+        return bool(self._changed or self._removed)
+
+    def add_changes(
+        self,
+        changed: dict[SeriesKey, tuple[float, str]],
+        removed: set[SeriesKey],
+    ) -> None:
+        """Merge a new delta into the unread changes."""
+        for key in removed:
+            self._changed.pop(key, None)
+        self._removed |= removed
+        self._removed -= changed.keys()
+        self._changed.update(changed)
+
+    def take_delta(self) -> dict[str, Any]:
+        """Return and clear the unread changes.
+
+        Returns:
+            Delta with changed series (latest sample) and removed series
+        """
+        changed, removed = self._changed, self._removed
+        self._changed, self._removed = {}, set()
+        return {
+            "subscription_id": self.id,
+            "query": self.feed.query,
+            "evaluated_at": self.feed.evaluated_at,
+            "changed": [
+                {"labels": dict(key), "timestamp": timestamp, "value": value}
+                for key, (timestamp, value) in sorted(changed.items())
+            ],
+            "removed": [{"labels": dict(key)} for key in sorted(removed)],
+        }
+
+
+class _Feed:
+    """Shared evaluation loop for one canonical query and interval."""
+
+    def __init__(self, query: str, interval: float) -> None:
+        self.query = query
+        self.interval = interval
+        self.subscribers: dict[str, Subscription] = {}
+        self.snapshot: dict[SeriesKey, tuple[float, str]] = {}
+        self.evaluated_at: float | None = None
+        self.task: asyncio.Task[None] | None = None
+
+
+class SubscriptionManager:
+    """Manages query subscriptions and their shared evaluation loops."""
+
+    def __init__(self, client: "PrometheusClient", min_interval: float = 5.0) -> None:
+        """Initialize subscription manager.
+
+        Args:
+            client: Prometheus client used to evaluate queries
+            min_interval: Shortest allowed evaluation interval in seconds
+        """
+        self.client = client
+        self.min_interval = min_interval
+        self._feeds: dict[tuple[str | None, str, float], _Feed] = {}
+        self._subscriptions: dict[str, Subscription] = {}
+
+    def __len__(self) -> int:
+        """Return number of active subscriptions."""
+        return len(self._subscriptions)
+
+    @property
+    def feed_count(self) -> int:
+        """Return number of running evaluation loops."""
+        return len(self._feeds)
+
+    def get(self, subscription_id: str) -> Subscription | None:
+        """Look up a subscription by id or resource URI."""
+        return self._subscriptions.get(
+            subscription_id.removeprefix(SUBSCRIPTION_URI_PREFIX)
+        )
+
+    def active(self) -> list[Subscription]:
+        """Return all active subscriptions."""
+        return list(self._subscriptions.values())
+
+    async def subscribe(
+        self,
+        query: str,
+        interval: float,
+        notify: Notifier,
+    ) -> Subscription:
+        """Subscribe to changes of an instant query.
+
+        The first evaluation runs before returning, so the initial state of
+        every series is available as the subscription's first delta. The
+        subscription belongs to the current client session.
+
+        Args:
+            query: PromQL query string
+            interval: Seconds between evaluations
+            notify: Callback invoked with the resource URI on changes
+
+        Returns:
+            New subscription
+
+        Raises:
+            ValueError: If the query is invalid or the interval too short
+        """
+        parsed = parse_promql(query)
+        if interval < self.min_interval:
+            raise ValueError(
+                f"Subscription interval must be at least {self.min_interval}s"
+            )
+
+        # Feeds are shared within a tenant; the loop inherits its context
+        key = (current_tenant(), parsed.canonical, float(interval))
+        feed = self._feeds.get(key)
+        if feed is None:
+            feed = _Feed(query, float(interval))
+            await self._evaluate(feed)
+            # Another subscriber may have created the feed while we evaluated
+            feed = self._feeds.setdefault(key, feed)
+            if feed.task is None:
+                feed.task = asyncio.create_task(self._run(feed))
+
+        subscription = Subscription(
+            secrets.token_urlsafe(8), feed, notify, current_session()
+        )
+        subscription.add_changes(dict(feed.snapshot), set())
+        feed.subscribers[subscription.id] = subscription
+        self._subscriptions[subscription.id] = subscription
+
+        logger.info(
+            f"Subscription {subscription.id} to '{query}' every {interval}s "
+            f"({len(feed.subscribers)} subscribers on this query)"
+        )
+        return subscription
+
+    async def unsubscribe(self, subscription_id: str) -> bool:
+        """Remove a subscription, stopping its loop if it was the last one.
+
+        Args:
+            subscription_id: Subscription id or resource URI
+
+        Returns:
+            True if a subscription was removed
+        """
+        subscription = self.get(subscription_id)
+        if subscription is None:
+            return False
+
+        del self._subscriptions[subscription.id]
+        feed = subscription.feed
+        feed.subscribers.pop(subscription.id, None)
+
+        if not feed.subscribers:
+            for key, candidate in list(self._feeds.items()):
+                if candidate is feed:
+                    del self._feeds[key]
+            if feed.task is not None:
+                feed.task.cancel()
+
+        logger.info(f"Subscription {subscription.id} removed")
+        return True
+
+    async def unsubscribe_session(self, session: str) -> int:
+        """Remove every subscription of a client session that has ended.
+
+        Subscriptions are otherwise only dropped when a notification fails,
+        which never happens for a query whose result does not change.
+
+        Args:
+            session: Identifier of the client session
+
+        Returns:
+            Number of subscriptions removed
+        """
+        owned = [s.id for s in self._subscriptions.values() if s.session == session]
+        for subscription_id in owned:
+            await self.unsubscribe(subscription_id)
+        return len(owned)
+
+    async def close(self) -> None:
+        """Stop all evaluation loops and drop all subscriptions."""
+        tasks = [feed.task for feed in self._feeds.values() if feed.task is not None]
+        self._feeds.clear()
+        self._subscriptions.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _evaluate(
+        self, feed: _Feed
+    ) -> tuple[dict[SeriesKey, tuple[float, str]], set[SeriesKey]]:
+        """Evaluate a feed's query and compute what changed.
+
+        Returns:
+            Series whose value changed or that are new, and removed series
+        """
+        result = await self.client.query_instant(feed.query)
+        snapshot = _snapshot(result)
+
+        changed = {
+            key: sample
+            for key, sample in snapshot.items()
+            if key not in feed.snapshot or feed.snapshot[key][1] != sample[1]
+        }
+        removed = feed.snapshot.keys() - snapshot.keys()
+
+        feed.snapshot = snapshot
+        feed.evaluated_at = time.time()
+        return changed, set(removed)
+
+    async def _run(self, feed: _Feed) -> None:
+        """Re-evaluate a feed forever and notify subscribers of changes."""
+        # The loop outlives the tool call that started it and yields
+        # upstream slots to interactive requests
+        with without_deadline(), request_priority(Priority.BACKGROUND):
+            await self._loop(feed)
+
+    async def _loop(self, feed: _Feed) -> None:
+        """Evaluate a feed every interval until cancelled."""
+        while True:
+            await asyncio.sleep(feed.interval)
+            try:
+                changed, removed = await self._evaluate(feed)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Subscription query '{feed.query}' failed: {e}")
+                continue
+
+            if not changed and not removed:
+                continue
+
+            for subscription in list(feed.subscribers.values()):
+                subscription.add_changes(changed, removed)
+                try:
+                    await subscription.notify(subscription.uri)
+                except Exception as e:
+                    # The client went away; stop evaluating on its behalf
+                    logger.info(f"Dropping subscription {subscription.id}: {e}")
+                    await self.unsubscribe(subscription.id)
+
+
+def format_delta(delta: dict[str, Any]) -> str:
+    """Serialize a subscription delta as compact JSON."""
+    return json.dumps(delta, separators=(",", ":"))
@@ -0,0 +1,160 @@
+"""
+Scrape target health aggregation for MCP server.
+
+Folds ``/api/v1/targets`` entries, one at a time as they are parsed from
+the response, into per scrape pool and job counts of healthy and failing
+targets, scrape durations and error messages. Only unhealthy targets are
+kept individually, so memory stays flat however large the fleet is.
+"""
+
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any
+
+# Unhealthy targets kept in detail; the rest are only counted
+MAX_UNHEALTHY = 500
+
+# Distinct error messages reported per job, and counted before new ones
+# are ignored
+MAX_ERRORS = 5
+_TRACKED_ERRORS = 20
+
+
+@dataclass
+class JobHealth:
+    """Health of the targets of one scrape pool and job."""
+
+    pool: str
+    job: str
+    up: int = 0
+    down: int = 0
+    unknown: int = 0
+    duration_total: float = 0.0
+    duration_max: float = 0.0
+    errors: Counter[str] = field(default_factory=Counter)
+
+    @property
+    def total(self) -> int:
+        """Return number of targets."""
+        return self.up + self.down + self.unknown
+
+    def to_dict(self) -> dict[str, Any]:
+        """Return a JSON-safe summary."""
+        return {
+            "pool": self.pool,
+            "job": self.job,
+            "total": self.total,
+            "up": self.up,
+            "down": self.down,
+            "unknown": self.unknown,
+            "avg_scrape_seconds": (
+                round(self.duration_total / self.total, 6) if self.total else 0.0
+            ),
+            "max_scrape_seconds": round(self.duration_max, 6),
+            "errors": dict(self.errors.most_common(MAX_ERRORS)),
+        }
+
+
+class TargetHealthAggregator:
+    """Aggregates scrape targets into per-job health in a single pass."""
+
+    def __init__(self, max_unhealthy: int = MAX_UNHEALTHY) -> None:
+        """Initialize aggregator.
+
+        Args:
+            max_unhealthy: Unhealthy targets kept in detail
+        """
+        self.max_unhealthy = max_unhealthy
+        self.jobs: dict[tuple[str, str], JobHealth] = {}
+        self.unhealthy: list[dict[str, Any]] = []
+        self.unhealthy_total = 0
+
+    def add(self, target: dict[str, Any]) -> None:
+        """Account for one active target.
+
+        Args:
+            target: Entry of ``activeTargets``
+        """
+        labels = target.get("labels", {})
+        pool = target.get("scrapePool", "")
+        job = labels.get("job", pool)
+        entry = self.jobs.get((pool, job))
+        if entry is None:
+            entry = self.jobs[(pool, job)] = JobHealth(pool, job)
+
+        health = target.get("health", "unknown")
+        if health == "up":
+            entry.up += 1
+        elif health == "down":
+            entry.down += 1
+        else:
+            entry.unknown += 1
+
+        duration = float(target.get("lastScrapeDuration") or 0.0)
+        entry.duration_total += duration
+        entry.duration_max = max(entry.duration_max, duration)
+
+        error = target.get("lastError", "")
+        if error and (error in entry.errors or len(entry.errors) < _TRACKED_ERRORS):
+            entry.errors[error] += 1
+
+        if health != "up":
+            self.unhealthy_total += 1
+            if len(self.unhealthy) < self.max_unhealthy:
+                self.unhealthy.append(
+                    {
+                        "pool": pool,
+                        "job": job,
+                        "instance": labels.get("instance", target.get("scrapeUrl")),
+                        "health": health,
+                        "last_error": error,
+                        "last_scrape": target.get("lastScrape"),
+                        "scrape_seconds": duration,
+                    }
+                )
+
+    def summary(self) -> dict[str, Any]:
+        """Return the aggregate, jobs with most failing targets first.
+
+        Returns:
+            Totals, per-job health and the unhealthy targets kept in detail
+        """
+        jobs = sorted(
+            self.jobs.values(),
+            key=lambda entry: (-(entry.down + entry.unknown), entry.pool, entry.job),
+        )
+        return {
+            "total": sum(entry.total for entry in jobs),
+            "up": sum(entry.up for entry in jobs),
+            "down": sum(entry.down for entry in jobs),
+            "unknown": sum(entry.unknown for entry in jobs),
+            "jobs": [entry.to_dict() for entry in jobs],
+            "unhealthy": self.unhealthy,
+            "unhealthy_total": self.unhealthy_total,
+        }
+
+
+def filter_summary(summary: dict[str, Any], job: str | None) -> dict[str, Any]:
+    """Restrict a target health summary to one job.
+
+    Args:
+        summary: Summary made by ``TargetHealthAggregator.summary``
+        job: Job name, or None for all jobs
+
+    Returns:
+        Summary with totals recomputed over the job's pools
+    """
+    if job is None:
+        return summary
+
+    jobs = [entry for entry in summary["jobs"] if entry["job"] == job]
+    unhealthy = [entry for entry in summary["unhealthy"] if entry["job"] == job]
+    return {
+        "total": sum(entry["total"] for entry in jobs),
+        "up": sum(entry["up"] for entry in jobs),
+        "down": sum(entry["down"] for entry in jobs),
+        "unknown": sum(entry["unknown"] for entry in jobs),
+        "jobs": jobs,
+        "unhealthy": unhealthy,
+        "unhealthy_total": sum(entry["down"] + entry["unknown"] for entry in jobs),
+    }
@@ -0,0 +1,219 @@
+"""
+Tenant selection for multi-tenant backends.
+
+Cortex, Mimir and Thanos pick the tenant of a request from its
+``X-Scope-OrgID`` header. The tenant of the tool call being handled
+travels with the request context, so one client and one connection pool
+serve every tenant, while caches and upstream concurrency are kept apart
+per tenant.
+"""
+
+import asyncio
+import re
+from collections.abc import AsyncIterator, Iterator
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any
+
+from .metadata_cache import MetricMetadataCache
+from .snapshots import SnapshotCache
+
+TENANT_HEADER = "X-Scope-OrgID"
+
+# Stands for every tenant in allowlists, and for tenants without their own
+# limit in limits
+ANY_TENANT = "*"
+
+# Tenant IDs accepted by Cortex and Mimir
+_TENANT_ID = re.compile(r"[A-Za-z0-9!\-_.*'()]{1,150}")
+
+_current_tenant: ContextVar[str | None] = ContextVar("request_tenant", default=None)
+
+
+def validate_tenant(tenant: str) -> str:
+    """Check that a tenant ID can be sent upstream.
+
+    Args:
+        tenant: Tenant ID
+
+    Returns:
+        The tenant ID
+
+    Raises:
+        ValueError: If the tenant ID is empty, too long or has invalid
+            characters
+    """
+    if not _TENANT_ID.fullmatch(tenant) or tenant in (".", ".."):
+        raise ValueError(f"Invalid tenant: {tenant!r}")
+    return tenant
+
+
+def current_tenant() -> str | None:
+    """Return the tenant selected for the current context, if any."""
+    return _current_tenant.get()
+
+
+@contextmanager
+def request_tenant(tenant: str | None) -> Iterator[None]:
+    """Send upstream requests in this block on behalf of a tenant.
+
+    Args:
+        tenant: Tenant ID; None uses the client's default tenant
+    """
+    token = _current_tenant.set(tenant)
+    try:
+        yield
+    finally:
+        _current_tenant.reset(token)
+
+
+def parse_tenants(spec: str | None) -> set[str]:
+    """Parse the tenants agents may select.
+
+    Args:
+        spec: Comma-separated tenant IDs; "*" allows any tenant
+
+    Returns:
+        Allowed tenant IDs, possibly including "*"
+
+    Raises:
+        ValueError: If a tenant ID is invalid
+    """
+    tenants = {entry.strip() for entry in (spec or "").split(",") if entry.strip()}
+    for tenant in tenants - {ANY_TENANT}:
+        validate_tenant(tenant)
+    return tenants
+
+
+def parse_tenant_limits(spec: str | None) -> dict[str, int]:
+    """Parse per-tenant upstream concurrency limits.
+
+    Args:
+        spec: Comma-separated ``tenant=limit`` pairs, e.g.
+            "team-a=8,team-b=2,*=4"; "*" applies to all other tenants
+
+    Returns:
+        Mapping of tenant ID, or "*", to its limit
+
+    Raises:
+        ValueError: If an entry is malformed or a limit is not positive
+    """
+    limits = {}
+    for entry in (spec or "").split(","):
+        if not entry.strip():
+            continue
+        name, sep, value = entry.partition("=")
+        name = name.strip()
+        try:
+            limit = int(value)
+        except ValueError:
+            raise ValueError(f"Invalid tenant limit: {entry.strip()}") from None
+        if not sep or limit < 1:
+            raise ValueError(f"Invalid tenant limit: {entry.strip()}")
+        if name != ANY_TENANT:
+            validate_tenant(name)
+        limits[name] = limit
+    return limits
+
+
+@dataclass
+class TenantState:
+    """Metadata, alerts and rules of one tenant, shared by its callers."""
+
+    metadata_cache: MetricMetadataCache
+    alerts_cache: SnapshotCache
+    rules_cache: SnapshotCache
+    metadata_lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    names_lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+
+@dataclass
+class _TenantSlots:
+    """Upstream slots of one tenant."""
+
+    semaphore: asyncio.Semaphore
+    limit: int
+    in_use: int = 0
+    waiting: int = 0
+    requests: int = 0
+
+
+class TenantLimiter:
+    """Caps the upstream requests each tenant may have in flight.
+
+    Tenants wait for their own slots before queuing for the shared ones,
+    so a tenant at its limit never holds a shared slot another tenant
+    could use.
+    """
+
+    def __init__(self, limits: dict[str, int] | None = None) -> None:
+        """Initialize limiter.
+
+        Args:
+            limits: Limit per tenant ID, "*" for tenants without their own;
+                tenants without any limit are not capped
+        """
+        self.limits = dict(limits or {})
+        self._tenants: dict[str, _TenantSlots] = {}
+
+    def set_limits(self, limits: dict[str, int]) -> None:
+        """Replace the limits.
+
+        Requests already waiting or in flight finish under the limit they
+        started with.
+
+        Args:
+            limits: Limit per tenant ID, "*" for tenants without their own
+        """
+        self.limits = dict(limits)
+        for tenant, slots in list(self._tenants.items()):
+            if self.limit_for(tenant) != slots.limit:
+                del self._tenants[tenant]
+
+    def limit_for(self, tenant: str) -> int | None:
+        """Return a tenant's limit, or None if it is not capped."""
+        return self.limits.get(tenant, self.limits.get(ANY_TENANT))
+
+    def stats(self) -> dict[str, Any]:
+        """Return slot usage and request counts per tenant."""
+        return {
+            tenant: {
+                "limit": slots.limit,
+                "in_use": slots.in_use,
+                "waiting": slots.waiting,
+                "requests": slots.requests,
+            }
+            for tenant, slots in sorted(self._tenants.items())
+        }
+
+    @asynccontextmanager
+    async def slot(self, tenant: str | None) -> AsyncIterator[None]:
+        """Hold one of a tenant's slots for the duration of the block.
+
+        Args:
+            tenant: Tenant ID; None is not capped
+        """
+        limit = None if tenant is None else self.limit_for(tenant)
+        if tenant is None or limit is None:
+            yield
+            return
+
+        slots = self._tenants.get(tenant)
+        if slots is None:
+            slots = self._tenants[tenant] = _TenantSlots(
+                asyncio.Semaphore(limit), limit
+            )
+
+        slots.waiting += 1
+        try:
+            await slots.semaphore.acquire()
+        finally:
+            slots.waiting -= 1
+        slots.in_use += 1
+        slots.requests += 1
+        try:
+            yield
+        finally:
+            slots.in_use -= 1
+            slots.semaphore.release()
@@ -0,0 +1,169 @@
+"""
+Startup warmup for MCP server.
+
+Opens upstream connections, learns what the backend supports and primes
+the metric metadata and metric name indexes in the background while the
+MCP session is being initialized, so the first tool call does not pay for
+any of it.
+"""
+
+import asyncio
+import logging
+import re
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any
+
+from .concurrency import Priority, request_priority
+
+if TYPE_CHECKING:
+    from .prometheus_client import PrometheusClient
+
+logger = logging.getLogger(__name__)
+
+BUILDINFO_ENDPOINT = "/api/v1/status/buildinfo"
+FLAGS_ENDPOINT = "/api/v1/status/flags"
+
+# Series, label names and label values APIs accept ``limit`` since 2.49
+_LIMIT_PARAM_VERSION = (2, 49)
+
+# Flags only Thanos components register
+_THANOS_FLAGS = ("query.replica-label", "endpoint", "store")
+
+_VERSION_RE = re.compile(r"v?(\d+)\.(\d+)")
+
+
+@dataclass
+class Capabilities:
+    """Features of the upstream backend, as far as they could be detected."""
+
+    flavor: str = "unknown"
+    version: str | None = None
+    supports_limit: bool = False
+    native_histograms: bool = False
+    remote_read: bool = False
+
+    def describe(self) -> str:
+        """Return a one-line summary for display."""
+        features = [
+            name
+            for name, enabled in (
+                ("limit parameter", self.supports_limit),
+                ("native histograms", self.native_histograms),
+                ("remote read", self.remote_read),
+            )
+            if enabled
+        ]
+        version = f" {self.version}" if self.version else ""
+        return f"{self.flavor}{version} ({', '.join(features) or 'no extras'})"
+
+
+def detect_capabilities(
+    buildinfo: dict[str, Any] | None, flags: dict[str, Any] | None
+) -> Capabilities:
+    """Derive backend capabilities from status endpoint data.
+
+    Args:
+        buildinfo: ``data`` of /api/v1/status/buildinfo, or None if it failed
+        flags: ``data`` of /api/v1/status/flags, or None if it failed
+
+    Returns:
+        Detected capabilities; anything not positively detected is off
+    """
+    buildinfo = buildinfo or {}
+    flags = flags or {}
+    version = buildinfo.get("version")
+
+    application = str(buildinfo.get("application", "")).lower()
+    if "mimir" in application:
+        flavor = "mimir"
+    elif "cortex" in application:
+        flavor = "cortex"
+    elif any(flag in flags for flag in _THANOS_FLAGS):
+        flavor = "thanos"
+    elif buildinfo or flags:
+        flavor = "prometheus"
+    else:
+        flavor = "unknown"
+
+    enabled_features = {
+        feature.strip()
+        for feature in str(flags.get("enable-feature", "")).split(",")
+        if feature.strip()
+    }
+
+    match = _VERSION_RE.match(version or "")
+    version_tuple = (int(match.group(1)), int(match.group(2))) if match else None
+
+    return Capabilities(
+        flavor=flavor,
+        version=version,
+        supports_limit=(
+            flavor == "prometheus"
+            and version_tuple is not None
+            and version_tuple >= _LIMIT_PARAM_VERSION
+        ),
+        native_histograms="native-histograms" in enabled_features,
+        remote_read=flavor in ("prometheus", "mimir", "cortex"),
+    )
+
+
+async def _status(client: "PrometheusClient", endpoint: str) -> dict[str, Any] | None:
+    """Fetch the data of a status endpoint, or None if it is unavailable."""
+    try:
+        return await client.get_status(endpoint)
+    except Exception as e:
+        logger.info(f"Warmup: {endpoint} unavailable: {e}")
+        return None
+
+
+async def _prime_metadata(client: "PrometheusClient") -> None:
+    """Load the metric metadata index, logging instead of raising."""
+    try:
+        await client.ensure_metadata()
+    except Exception as e:
+        logger.info(f"Warmup: metric metadata not loaded: {e}")
+
+
+async def _prime_metric_names(client: "PrometheusClient") -> None:
+    """Load the metric name index, logging instead of raising."""
+    try:
+        await client.ensure_metric_names()
+    except Exception as e:
+        logger.info(f"Warmup: metric names not loaded: {e}")
+
+
+async def warm_up(client: "PrometheusClient") -> Capabilities:
+    """Warm connections and caches and detect backend capabilities.
+
+    The status requests and the metadata load run concurrently, which also
+    opens several pooled connections. The metric names are loaded once the
+    capabilities are known, so backends that accept ``limit`` get it.
+    Everything runs at background priority and failures are logged, never
+    raised, so warmup can be left running while the server starts.
+
+    Args:
+        client: Prometheus client to warm
+
+    Returns:
+        Detected capabilities, also stored on ``client.capabilities``
+    """
+    with request_priority(Priority.BACKGROUND):
+        buildinfo, flags, _ = await asyncio.gather(
+            _status(client, BUILDINFO_ENDPOINT),
+            _status(client, FLAGS_ENDPOINT),
+            _prime_metadata(client),
+        )
+
+    capabilities = detect_capabilities(buildinfo, flags)
+    client.capabilities = capabilities
+
+    with request_priority(Priority.BACKGROUND):
+        await _prime_metric_names(client)
+    logger.info(f"Warmup complete: {capabilities.describe()}")
+
+    if client.history_backend == "remote_read" and not capabilities.remote_read:
+        logger.warning(
+            "PROMETHEUS_HISTORY_BACKEND is remote_read but the backend "
+            f"({capabilities.flavor}) does not appear to support it"
+        )
+    return capabilities
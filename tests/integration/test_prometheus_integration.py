@@ -151,24 +151,13 @@ class TestPrometheusIntegration:
 
         mock_response = {
             "status": "success",
-            "data": {
-                "resultType": "vector",
-                "result": [
-                    {"metric": {"__name__": "up"}},
-                    {"metric": {"__name__": "prometheus_build_info"}},
-                    {
-                        "metric": {
-                            "__name__": "prometheus_config_last_reload_successful"
-                        }
-                    },
-                    {
-                        "metric": {
-                            "__name__": "prometheus_rule_group_last_duration_seconds"
-                        }
-                    },
-                    {"metric": {"__name__": "prometheus_tsdb_head_series"}},
-                ],
-            },
+            "data": [
+                "prometheus_build_info",
+                "prometheus_config_last_reload_successful",
+                "prometheus_rule_group_last_duration_seconds",
+                "prometheus_tsdb_head_series",
+                "up",
+            ],
         }
 
         with patch.object(client.http_client, "get") as mock_get:
@@ -191,23 +180,13 @@ class TestPrometheusIntegration:
 
         mock_response = {
             "status": "success",
-            "data": {
-                "resultType": "vector",
-                "result": [
-                    {"metric": {"__name__": "prometheus_build_info"}},
-                    {
-                        "metric": {
-                            "__name__": "prometheus_config_last_reload_successful"
-                        }
-                    },
-                    {
-                        "metric": {
-                            "__name__": "prometheus_rule_group_last_duration_seconds"
-                        }
-                    },
-                    {"metric": {"__name__": "prometheus_tsdb_head_series"}},
-                ],
-            },
+            "data": [
+                "prometheus_build_info",
+                "prometheus_config_last_reload_successful",
+                "prometheus_rule_group_last_duration_seconds",
+                "prometheus_tsdb_head_series",
+                "up",
+            ],
         }
 
         with patch.object(client.http_client, "get") as mock_get:
@@ -226,11 +205,11 @@ class TestPrometheusIntegration:
         """Test error handling in integration scenarios."""
         client = PrometheusClient()
 
-        # Test HTTP error response
+        # Test HTTP error response for errors only Prometheus can detect
         mock_response = {
             "status": "error",
             "errorType": "bad_data",
-            "error": "parse error at char 5: unexpected end of input",
+            "error": 'expected type range vector in call to function "rate"',
         }
 
         with patch.object(client.http_client, "get") as mock_get:
@@ -239,10 +218,16 @@ class TestPrometheusIntegration:
             mock_response_obj.raise_for_status.return_value = None
             mock_get.return_value = mock_response_obj
 
-            result = await client.query_metric("invalid query", "5m")
+            result = await client.query_metric("rate(up)", "5m")
 
             assert result["status"] == "error"
-            assert "parse error" in result["error"]
+            assert "expected type range vector" in result["error"]
+
+            # Syntax errors are rejected locally without a round trip
+            with pytest.raises(ValueError, match="Invalid PromQL"):
+                await client.query_metric("invalid query", "5m")
+
+            mock_get.assert_called_once()
 
     @pytest.mark.asyncio
     async def test_time_range_queries_integration(self):
@@ -295,11 +280,19 @@ class TestPrometheusIntegration:
             },
         }
 
+        names_response = {"status": "success", "data": ["up"]}
+
+        def respond(endpoint, **kwargs):
+            response = Mock()
+            response.raise_for_status.return_value = None
+            if endpoint == "/api/v1/label/__name__/values":
+                response.json.return_value = names_response
+            else:
+                response.json.return_value = mock_response
+            return response
+
         with patch.object(client.http_client, "get") as mock_get:
-            mock_response_obj = Mock()
-            mock_response_obj.json.return_value = mock_response
-            mock_response_obj.raise_for_status.return_value = None
-            mock_get.return_value = mock_response_obj
+            mock_get.side_effect = respond
 
             # Execute multiple concurrent queries
             import asyncio
@@ -390,5 +383,6 @@ class TestPrometheusIntegration:
             assert len(history) == 0
 
             # Test empty metrics list
+            mock_response_obj.json.return_value = {"status": "success", "data": []}
             metrics = await client.list_available_metrics("nonexistent.*")
             assert len(metrics) == 0
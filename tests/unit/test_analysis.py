@@ -0,0 +1,415 @@
+"""
+Tests for analysis module.
+
+Covers series alignment, vectorized anomaly scoring, correlation,
+forecasting and histogram quantiles.
+"""
+
+import math
+
+import pytest
+
+from mcp_prometheus_server.columnar import Series
+
+np = pytest.importorskip("numpy")
+
+from mcp_prometheus_server.analysis import (  # noqa: E402
+    align_series,
+    bucket_quantiles,
+    correlate,
+    detect_anomalies,
+    forecast,
+    histogram_from_buckets,
+    histogram_from_native,
+    native_quantiles,
+    rank_rows,
+    summarize_histograms,
+)
+
+STEP = 60.0
+START = 1_700_000_000.0
+
+
+def _series(labels, values, start=START):
+    """Build a series with one sample per step; None leaves a gap."""
+    series = Series(labels=labels)
+    for i, value in enumerate(values):
+        if value is not None:
+            series.append(start + i * STEP, value)
+    return series
+
+
+def _noisy(level, count, seed):
+    """Return a reproducible noisy signal around a level."""
+    rng = np.random.default_rng(seed)
+    return list(level + rng.normal(0, 1, count))
+
+
+class TestAlignSeries:
+    """Test cases for align_series."""
+
+    def test_gaps_become_nan(self):
+        """Test that series are placed on a shared grid."""
+        grid, matrix = align_series(
+            [
+                _series({"a": "1"}, [1.0, None, 3.0]),
+                _series({"a": "2"}, [5.0], start=START + 2 * STEP),
+            ],
+            STEP,
+        )
+
+        assert list(grid) == [START, START + STEP, START + 2 * STEP]
+        assert matrix[0, 0] == 1.0
+        assert math.isnan(matrix[0, 1])
+        assert np.isnan(matrix[1, :2]).all()
+        assert matrix[1, 2] == 5.0
+
+    def test_empty(self):
+        """Test aligning series without samples."""
+        grid, matrix = align_series([Series(labels={})], STEP)
+
+        assert grid.shape == (0,)
+        assert matrix.shape == (1, 0)
+
+
+class TestDetectAnomalies:
+    """Test cases for detect_anomalies."""
+
+    def test_spike_and_shift_ranked(self):
+        """Test that changed series rank above thousands of steady ones."""
+        steady = [_series({"i": str(i)}, _noisy(10, 120, i)) for i in range(200)]
+        spike = _series({"i": "spike"}, _noisy(10, 119, 1000) + [60.0])
+        shift = _series({"i": "shift"}, _noisy(10, 90, 1001) + _noisy(14, 30, 1002))
+
+        report = detect_anomalies([*steady, spike, shift], step=STEP, window=1800)
+
+        assert report.series_count == 202
+        assert report.scored_count == 202
+        labels = [a.labels["i"] for a in report.anomalies]
+        assert set(labels[:2]) == {"spike", "shift"}
+
+        shifted = report.anomalies[labels.index("shift")]
+        assert shifted.direction == "up"
+        assert shifted.scores["cusum"] > 5
+        assert START + 90 * STEP <= shifted.change_point <= START + 100 * STEP
+
+    def test_single_method(self):
+        """Test that only the requested method is scored."""
+        report = detect_anomalies(
+            [_series({"i": "spike"}, _noisy(10, 59, 1) + [60.0])],
+            step=STEP,
+            window=600,
+            methods=("mad",),
+        )
+
+        assert list(report.anomalies[0].scores) == ["mad"]
+        assert report.anomalies[0].change_point is None
+
+    def test_flat_baseline(self):
+        """Test that constant baselines do not divide by zero."""
+        flat = _series({"i": "flat"}, [1.0] * 60)
+        moved = _series({"i": "moved"}, [1.0] * 59 + [2.0])
+
+        report = detect_anomalies([flat, moved], step=STEP, window=600)
+
+        assert [a.labels["i"] for a in report.anomalies] == ["moved"]
+
+    def test_short_baseline_not_scored(self):
+        """Test that series without enough baseline are skipped."""
+        report = detect_anomalies(
+            [_series({"i": "new"}, [None] * 50 + [100.0] * 10)],
+            step=STEP,
+            window=600,
+        )
+
+        assert report.scored_count == 0
+        assert report.anomalies == []
+
+    def test_limit(self):
+        """Test that at most limit anomalies are returned."""
+        spikes = [
+            _series({"i": str(i)}, _noisy(10, 59, i) + [100.0 + i]) for i in range(5)
+        ]
+
+        report = detect_anomalies(spikes, step=STEP, window=600, limit=2)
+
+        assert len(report.anomalies) == 2
+
+    def test_unknown_method(self):
+        """Test that unknown methods are rejected."""
+        with pytest.raises(ValueError, match="Unknown anomaly method"):
+            detect_anomalies([], step=STEP, window=600, methods=("prophet",))
+
+
+class TestCorrelate:
+    """Test cases for correlate."""
+
+    def test_ranked_by_strength(self):
+        """Test that candidates are ranked by absolute coefficient."""
+        target = _noisy(0, 60, 1)
+        same = _series({"i": "same"}, target)
+        inverse = _series(
+            {"i": "inverse"},
+            [-2 * v + 0.1 * n for v, n in zip(target, _noisy(0, 60, 2), strict=True)],
+        )
+        unrelated = _series({"i": "unrelated"}, _noisy(0, 60, 3))
+
+        report = correlate(_series({}, target), [unrelated, inverse, same], step=STEP)
+
+        assert [c.labels["i"] for c in report.correlations] == [
+            "same",
+            "inverse",
+            "unrelated",
+        ]
+        assert report.correlations[0].coefficient == pytest.approx(1.0)
+        assert report.correlations[1].coefficient < -0.9
+        assert report.correlations[0].index == 2
+
+    def test_matches_numpy(self):
+        """Test that coefficients match np.corrcoef over shared samples."""
+        target = _noisy(5, 40, 4)
+        other = [v + n for v, n in zip(target, _noisy(0, 40, 5), strict=True)]
+        gapped = [None if i % 7 == 0 else v for i, v in enumerate(other)]
+
+        report = correlate(
+            _series({}, target), [_series({"i": "g"}, gapped)], step=STEP
+        )
+
+        keep = [i for i in range(40) if i % 7]
+        expected = np.corrcoef(np.array(target)[keep], np.array(other)[keep])[0, 1]
+        assert report.correlations[0].coefficient == pytest.approx(expected)
+        assert report.correlations[0].points == len(keep)
+
+    def test_spearman_monotonic(self):
+        """Test that rank correlation scores monotonic relations as 1."""
+        target = [float(i) for i in range(30)]
+        cubed = _series({"i": "cubed"}, [v**3 for v in target])
+
+        pearson = correlate(_series({}, target), [cubed], step=STEP)
+        spearman = correlate(_series({}, target), [cubed], step=STEP, method="spearman")
+
+        assert pearson.correlations[0].coefficient < 0.95
+        assert spearman.correlations[0].coefficient == pytest.approx(1.0)
+
+    def test_lag(self):
+        """Test that a delayed copy is found at its lag."""
+        target = _noisy(0, 80, 6)
+        delayed = _series({"i": "delayed"}, [0.0] * 3 + target[:-3])
+
+        report = correlate(_series({}, target), [delayed], step=STEP, max_lag=5 * STEP)
+
+        correlation = report.correlations[0]
+        assert correlation.lag == 3 * STEP
+        assert correlation.coefficient == pytest.approx(1.0)
+        assert abs(correlation.coefficient_at_zero) < 0.5
+
+    def test_too_few_points_and_constant(self):
+        """Test that short and constant candidates are not scored."""
+        target = _noisy(0, 30, 7)
+        short = _series({"i": "short"}, [None] * 25 + target[25:])
+        constant = _series({"i": "constant"}, [1.0] * 30)
+
+        report = correlate(_series({}, target), [short, constant], step=STEP)
+
+        assert report.candidate_count == 2
+        assert report.scored_count == 0
+        assert report.correlations == []
+
+    def test_unknown_method(self):
+        """Test that unknown methods are rejected."""
+        with pytest.raises(ValueError, match="Unknown correlation method"):
+            correlate(_series({}, [1.0]), [], step=STEP, method="kendall")
+
+
+class TestForecast:
+    """Test cases for forecast."""
+
+    def test_linear_time_to_threshold(self):
+        """Test that a steady trend is extended and its crossing found."""
+        growing = _series({"i": "growing"}, [10.0 + i for i in range(60)])
+        flat = _series({"i": "flat"}, _noisy(10, 60, 8))
+
+        report = forecast(
+            [flat, growing], step=STEP, horizon=60 * STEP, threshold=100.0
+        )
+
+        assert report.fitted_count == 2
+        first = report.forecasts[0]
+        assert first.labels["i"] == "growing"
+        assert first.value == pytest.approx(129.0)
+        assert first.lower <= first.value <= first.upper
+        assert first.time_to_threshold == 31 * STEP
+        assert report.forecasts[1].time_to_threshold is None
+
+    def test_falling_threshold(self):
+        """Test that falling series cross thresholds below them."""
+        free = _series({"i": "disk"}, [100.0 - 2 * i for i in range(30)])
+
+        report = forecast([free], step=STEP, horizon=30 * STEP, threshold=0.0)
+
+        assert report.forecasts[0].time_to_threshold == 21 * STEP
+
+    def test_holt_winters_seasonal(self):
+        """Test that Holt-Winters follows a seasonal pattern with trend."""
+        values = [20 + 5 * math.sin(2 * math.pi * i / 12) + 0.05 * i for i in range(96)]
+
+        report = forecast(
+            [_series({}, values)],
+            step=STEP,
+            horizon=6 * STEP,
+            method="holt_winters",
+            season=12 * STEP,
+        )
+
+        expected = 20 + 5 * math.sin(2 * math.pi * 101 / 12) + 0.05 * 101
+        assert report.forecasts[0].value == pytest.approx(expected, abs=0.5)
+
+    def test_seasonal_repeats_last_season(self):
+        """Test that the seasonal baseline repeats the last season."""
+        pattern = [1.0, 5.0, 3.0, 2.0]
+        report = forecast(
+            [_series({}, pattern * 6)],
+            step=STEP,
+            horizon=6 * STEP,
+            method="seasonal",
+            season=4 * STEP,
+        )
+
+        points = report.forecasts[0].points
+        assert [point[1] for point in points] == [1.0, 5.0, 3.0, 2.0, 1.0, 5.0]
+        assert points[0][0] == START + 24 * STEP
+
+    def test_confidence_widens_band(self):
+        """Test that higher confidence gives a wider band."""
+        series = _series({}, _noisy(10, 60, 9))
+
+        narrow = forecast([series], step=STEP, horizon=STEP, confidence=0.5)
+        wide = forecast([series], step=STEP, horizon=STEP, confidence=0.99)
+
+        narrow_width = narrow.forecasts[0].upper - narrow.forecasts[0].lower
+        wide_width = wide.forecasts[0].upper - wide.forecasts[0].lower
+        assert wide_width > narrow_width > 0
+
+    def test_short_history_not_fitted(self):
+        """Test that series with too few samples are skipped."""
+        report = forecast(
+            [_series({}, [None] * 10 + [1.0, 2.0])], step=STEP, horizon=STEP
+        )
+
+        assert report.fitted_count == 0
+        assert report.forecasts == []
+
+    def test_invalid_arguments(self):
+        """Test that unknown methods and missing seasons are rejected."""
+        with pytest.raises(ValueError, match="Unknown forecast method"):
+            forecast([], step=STEP, horizon=STEP, method="arima")
+        with pytest.raises(ValueError, match="requires a season"):
+            forecast([], step=STEP, horizon=STEP, method="seasonal")
+        with pytest.raises(ValueError, match="at least one step"):
+            forecast([], step=STEP, horizon=1.0)
+
+
+def test_rank_rows_ties_and_gaps():
+    """Test that ties share their average rank and NaN stays NaN."""
+    ranks = rank_rows(np.array([[3.0, 1.0, 2.0, 2.0, np.nan]]))
+
+    assert ranks[0, :4].tolist() == [4.0, 1.0, 2.5, 2.5]
+    assert math.isnan(ranks[0, 4])
+
+
+class TestHistogramQuantiles:
+    """Test cases for histogram quantile interpolation."""
+
+    def test_bucket_quantiles_match_prometheus(self):
+        """Test linear interpolation and the +Inf bucket rule."""
+        upper = np.array([1.0, 2.0, 4.0, np.inf])
+        cumulative = np.array([[10.0, 20.0, 30.0, 30.0], [10.0, 20.0, 30.0, 40.0]])
+
+        values = bucket_quantiles(upper, cumulative, [0.5, 0.9, 0.99])
+
+        assert values[:, 0].tolist() == pytest.approx([1.5, 3.4, 3.94])
+        # Ranks in the +Inf bucket return the highest finite bound
+        assert values[2, 1] == 4.0
+
+    def test_bucket_quantiles_undefined(self):
+        """Test empty histograms, missing +Inf and out-of-range quantiles."""
+        empty = bucket_quantiles(np.array([1.0, np.inf]), np.zeros((1, 2)), [0.5])
+        no_inf = bucket_quantiles(np.array([1.0, 2.0]), np.ones((1, 2)), [0.5])
+        bounds = bucket_quantiles(
+            np.array([1.0, np.inf]), np.array([[1.0, 2.0]]), [-0.5, 1.5]
+        )
+
+        assert math.isnan(empty[0, 0])
+        assert math.isnan(no_inf[0, 0])
+        assert bounds[:, 0].tolist() == [-np.inf, np.inf]
+
+    def test_native_quantiles_match_prometheus(self):
+        """Test exponential interpolation and the zero bucket."""
+        lower = np.array([-0.001, 0.5, 1.0, 2.0])
+        upper = np.array([0.001, 1.0, 2.0, 4.0])
+        counts = np.array([[2.0, 3.0, 3.0, 2.0]])
+
+        values = native_quantiles(lower, upper, counts, [0.1, 0.5, 0.9])
+
+        # Only positive buckets, so the zero bucket starts at 0
+        assert values[0, 0] == pytest.approx(0.0005)
+        assert values[1, 0] == pytest.approx(1.0)
+        assert values[2, 0] == pytest.approx(2 * math.sqrt(2))
+
+    def test_classic_summary(self):
+        """Test quantiles and means from classic bucket and sum/count series."""
+        buckets = [
+            _series({"le": le, "handler": "/"}, [rate, 2 * rate])
+            for le, rate in (("0.1", 1.0), ("0.5", 3.0), ("1", 4.0), ("+Inf", 4.0))
+        ]
+        sums = [_series({"handler": "/"}, [1.2, 2.4])]
+        counts = [_series({"handler": "/"}, [4.0, 8.0])]
+
+        histograms = histogram_from_buckets(buckets, sums, counts, STEP)
+        report = summarize_histograms(histograms, (0.5, 0.9), heatmap=True)
+
+        summary = report.summaries[0]
+        assert summary.labels == {"handler": "/"}
+        assert summary.quantiles == pytest.approx({0.5: 0.3, 0.9: 0.8})
+        assert summary.window_quantiles == pytest.approx({0.5: 0.3, 0.9: 0.8})
+        assert summary.mean == pytest.approx(0.3)
+        assert summary.rate == 6.0
+        assert report.buckets[0] == (0.0, 0.1)
+        assert summary.heatmap[1] == [2.0, 4.0]
+
+    def test_native_summary(self):
+        """Test that native samples are placed on the union of their buckets."""
+        entries = [
+            {
+                "metric": {"job": "api"},
+                "histograms": [
+                    [
+                        START,
+                        {
+                            "count": "4",
+                            "sum": "4",
+                            "buckets": [[0, "0.5", "1", "2"], [0, "1", "2", "2"]],
+                        },
+                    ],
+                    [
+                        START + STEP,
+                        {
+                            "count": "4",
+                            "sum": "8",
+                            "buckets": [[0, "1", "2", "2"], [0, "2", "4", "2"]],
+                        },
+                    ],
+                ],
+            }
+        ]
+
+        histograms = histogram_from_native(entries, STEP)
+        report = summarize_histograms(histograms, (0.5,))
+
+        assert report.native
+        assert report.buckets == [(0.5, 1.0), (1.0, 2.0), (2.0, 4.0)]
+        summary = report.summaries[0]
+        assert summary.quantiles[0.5] == pytest.approx(2.0)
+        assert summary.window_quantiles[0.5] == pytest.approx(math.sqrt(2))
+        assert summary.mean == 2.0
+        assert summary.window_mean == 1.5
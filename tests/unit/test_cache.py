@@ -0,0 +1,84 @@
+"""
+Tests for cache module.
+
+Covers expiry, LRU eviction and hit/miss accounting.
+"""
+
+from unittest.mock import patch
+
+from mcp_prometheus_server.cache import PartitionedCache, ResultsCache
+
+
+class TestResultsCache:
+    """Test cases for ResultsCache."""
+
+    def test_set_and_get(self):
+        """Test storing and retrieving an entry."""
+        cache = ResultsCache()
+        cache.set("key", {"status": "success"})
+
+        assert cache.get("key") == {"status": "success"}
+        assert cache.hits == 1
+        assert cache.get("missing") is None
+        assert cache.misses == 1
+
+    def test_entry_expires(self):
+        """Test entries are not returned after their TTL."""
+        cache = ResultsCache(ttl=10)
+
+        with patch("mcp_prometheus_server.cache.time.monotonic", return_value=100.0):
+            cache.set("key", "value")
+            cache.set("long", "value", ttl=60)
+
+        with patch("mcp_prometheus_server.cache.time.monotonic", return_value=111.0):
+            assert cache.get("key") is None
+            assert cache.get("long") == "value"
+
+        assert len(cache) == 1
+
+    def test_lru_eviction(self):
+        """Test least recently used entries are evicted first."""
+        cache = ResultsCache(max_entries=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        assert cache.get("c") == 3
+
+    def test_zero_ttl_disables_caching(self):
+        """Test a zero TTL stores nothing."""
+        cache = ResultsCache(ttl=0)
+        cache.set("key", "value")
+
+        assert len(cache) == 0
+
+    def test_clear(self):
+        """Test clearing the cache."""
+        cache = ResultsCache()
+        cache.set("key", "value")
+        cache.clear()
+
+        assert cache.get("key") is None
+
+
+class TestPartitionedCache:
+    """Test cases for PartitionedCache."""
+
+    def test_partitions_are_separate(self):
+        """Test keys and evictions never cross partitions."""
+        partition = ["a"]
+        cache = PartitionedCache(lambda: partition[0], max_entries=1)
+        cache.set("key", 1)
+
+        partition[0] = "b"
+        assert cache.get("key") is None
+        cache.set("key", 2)
+        cache.set("other", 3)
+
+        partition[0] = "a"
+        assert cache.get("key") == 1
+        assert len(cache) == 2
+        assert (cache.hits, cache.misses) == (1, 1)
@@ -0,0 +1,210 @@
+"""
+Tests for compression module.
+
+Covers encoding negotiation, decoding and per-endpoint byte counters.
+"""
+
+import asyncio
+import gzip
+import json
+import zlib
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+from mcp_prometheus_server.compression import (
+    CompressionTransport,
+    TransferStats,
+    accept_encoding_header,
+    supported_encodings,
+)
+
+PAYLOAD = json.dumps(
+    {
+        "status": "success",
+        "data": {
+            "resultType": "matrix",
+            "result": [
+                {
+                    "metric": {"__name__": "up", "instance": f"host{i}"},
+                    "values": [[1000 + t, "1"] for t in range(200)],
+                }
+                for i in range(20)
+            ],
+        },
+    }
+).encode()
+
+
+def _client(encoding, body, thread_threshold=1024 * 1024, chunked=False):
+    """Build a client whose upstream answers with an encoded body."""
+    seen_headers = {}
+
+    def handler(request):
+        seen_headers.update(request.headers)
+        headers = {"Content-Type": "application/json"}
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        if chunked:
+            chunks = [body[i : i + 1000] for i in range(0, len(body), 1000)]
+            return httpx.Response(200, headers=headers, stream=_Chunks(chunks))
+        return httpx.Response(200, headers=headers, content=body)
+
+    transport = CompressionTransport(
+        httpx.MockTransport(handler), thread_threshold=thread_threshold
+    )
+    client = httpx.AsyncClient(
+        base_url="http://prometheus",
+        headers={"Accept-Encoding": accept_encoding_header()},
+        transport=transport,
+    )
+    return client, transport.stats, seen_headers
+
+
+class _Chunks(httpx.AsyncByteStream):
+    """Upstream body delivered in several chunks without a length."""
+
+    def __init__(self, chunks):
+        self._chunks = chunks
+
+    async def __aiter__(self):
+        for chunk in self._chunks:
+            yield chunk
+
+
+class TestAcceptEncoding:
+    """Test cases for Accept-Encoding negotiation."""
+
+    def test_default_offers_all_supported(self):
+        """Test that the default header lists every decodable encoding."""
+        header = accept_encoding_header()
+
+        assert header == ", ".join(supported_encodings())
+        assert "gzip" in header
+
+    def test_explicit_preference(self):
+        """Test that requested encodings keep their order."""
+        assert accept_encoding_header("deflate, gzip") == "deflate, gzip"
+
+    def test_identity_disables_compression(self):
+        """Test that identity turns compression off."""
+        assert accept_encoding_header("identity") == "identity"
+
+    def test_unavailable_encoding_skipped(self):
+        """Test that unknown encodings are dropped or rejected."""
+        assert accept_encoding_header("snappy, gzip") == "gzip"
+        with pytest.raises(ValueError, match="No supported content encoding"):
+            accept_encoding_header("snappy")
+
+
+class TestCompressionTransport:
+    """Test cases for CompressionTransport."""
+
+    @pytest.mark.asyncio
+    async def test_gzip_response_decoded_and_counted(self):
+        """Test that gzip bodies are decoded and wire bytes are counted."""
+        wire = gzip.compress(PAYLOAD)
+        client, stats, seen_headers = _client("gzip", wire)
+
+        response = await client.get("/api/v1/query_range")
+
+        assert response.json()["status"] == "success"
+        assert "content-encoding" not in response.headers
+        assert "gzip" in seen_headers["accept-encoding"]
+
+        entry = stats.get("/api/v1/query_range")
+        assert entry.requests == 1
+        assert entry.wire_bytes == len(wire)
+        assert entry.decoded_bytes == len(PAYLOAD)
+        assert entry.ratio > 10
+        assert entry.encodings == {"gzip": 1}
+        await client.aclose()
+
+    @pytest.mark.asyncio
+    async def test_deflate_response(self):
+        """Test that deflate bodies are decoded."""
+        client, stats, _ = _client("deflate", zlib.compress(PAYLOAD))
+
+        response = await client.get("/api/v1/query")
+
+        assert response.content == PAYLOAD
+        assert stats.get("/api/v1/query").encodings == {"deflate": 1}
+        await client.aclose()
+
+    @pytest.mark.asyncio
+    async def test_identity_response(self):
+        """Test that uncompressed bodies count the same wire and decoded bytes."""
+        client, stats, _ = _client(None, PAYLOAD)
+
+        response = await client.get("/api/v1/query")
+
+        assert response.content == PAYLOAD
+        entry = stats.get("/api/v1/query")
+        assert entry.wire_bytes == entry.decoded_bytes == len(PAYLOAD)
+        assert entry.encodings == {"identity": 1}
+        await client.aclose()
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("chunked", [False, True])
+    async def test_large_body_decoded_in_thread(self, chunked):
+        """Test that bodies above the threshold decode off the event loop."""
+        wire = gzip.compress(PAYLOAD)
+        client, stats, _ = _client("gzip", wire, thread_threshold=100, chunked=chunked)
+
+        with patch(
+            "mcp_prometheus_server.compression.asyncio.to_thread",
+            wraps=asyncio.to_thread,
+        ) as to_thread:
+            response = await client.get("/api/v1/query_range")
+
+        assert to_thread.called
+        assert response.content == PAYLOAD
+        assert stats.get("/api/v1/query_range").decoded_bytes == len(PAYLOAD)
+        await client.aclose()
+
+    @pytest.mark.asyncio
+    async def test_unsupported_encoding(self):
+        """Test that an unknown encoding raises a decoding error."""
+        client, _, _ = _client("compress", b"\x00")
+
+        with pytest.raises(httpx.DecodingError):
+            await client.get("/api/v1/query")
+        await client.aclose()
+
+    @pytest.mark.asyncio
+    async def test_snappy_passed_through(self):
+        """Test that snappy bodies reach the caller encoded, counting wire bytes."""
+        client, stats, _ = _client("snappy", b"\x05\x10hello")
+
+        response = await client.get("/api/v1/read")
+
+        assert response.content == b"\x05\x10hello"
+        assert response.headers["content-encoding"] == "snappy"
+        entry = stats.get("/api/v1/read")
+        assert entry.wire_bytes == 7
+        assert entry.decoded_bytes == 0
+        await client.aclose()
+
+
+class TestTransferStats:
+    """Test cases for TransferStats."""
+
+    def test_snapshot_and_reset(self):
+        """Test that counters accumulate per endpoint."""
+        stats = TransferStats()
+        stats.record("/api/v1/query", "gzip", 100, 1000)
+        stats.record("/api/v1/query", "identity", 50, 50)
+
+        assert stats.snapshot() == {
+            "/api/v1/query": {
+                "requests": 2,
+                "wire_bytes": 150,
+                "decoded_bytes": 1050,
+                "ratio": 7.0,
+                "encodings": {"gzip": 1, "identity": 1},
+            }
+        }
+
+        stats.reset()
+        assert stats.snapshot() == {}
@@ -0,0 +1,262 @@
+"""
+Tests for concurrency module.
+
+Covers slot limits, weighted priority classes, per-session fairness,
+queue statistics and cancellation.
+"""
+
+import asyncio
+
+import pytest
+
+from mcp_prometheus_server.concurrency import (
+    DEFAULT_WEIGHTS,
+    AdmissionController,
+    Priority,
+    current_priority,
+    current_session,
+    parse_weights,
+    request_priority,
+    request_session,
+)
+
+
+class TestRequestPriority:
+    """Test cases for the request priority context."""
+
+    def test_default_is_interactive(self):
+        """Test requests are interactive unless marked otherwise."""
+        assert current_priority() == Priority.INTERACTIVE
+
+    def test_context_manager_sets_and_restores(self):
+        """Test the context manager scopes the priority."""
+        with request_priority(Priority.BACKGROUND):
+            assert current_priority() == Priority.BACKGROUND
+
+        assert current_priority() == Priority.INTERACTIVE
+
+    def test_session_context_manager(self):
+        """Test the session context manager scopes the session."""
+        with request_session("client-a"):
+            assert current_session() == "client-a"
+
+        assert current_session() == "default"
+
+
+class TestParseWeights:
+    """Test cases for parse_weights."""
+
+    def test_defaults(self):
+        """Test an empty spec keeps the default weights."""
+        assert parse_weights(None) == DEFAULT_WEIGHTS
+
+    def test_overrides(self):
+        """Test listed classes are overridden and others kept."""
+        weights = parse_weights("batch=5, background=0.5")
+
+        assert weights[Priority.INTERACTIVE] == DEFAULT_WEIGHTS[Priority.INTERACTIVE]
+        assert weights[Priority.BATCH] == 5.0
+        assert weights[Priority.BACKGROUND] == 0.5
+
+    @pytest.mark.parametrize("spec", ["urgent=2", "batch", "batch=fast"])
+    def test_invalid(self, spec):
+        """Test unknown classes and malformed weights are rejected."""
+        with pytest.raises(ValueError, match="Invalid priority weight"):
+            parse_weights(spec)
+
+    def test_non_positive(self):
+        """Test weights must be positive."""
+        with pytest.raises(ValueError, match="must be positive"):
+            parse_weights("batch=0")
+
+
+class TestAdmissionController:
+    """Test cases for AdmissionController."""
+
+    def test_invalid_limit(self):
+        """Test a limit below one is rejected."""
+        with pytest.raises(ValueError, match="at least 1"):
+            AdmissionController(0)
+
+    @pytest.mark.asyncio
+    async def test_limit_is_enforced(self):
+        """Test no more than limit requests run concurrently."""
+        semaphore = AdmissionController(2)
+        running = 0
+        peak = 0
+
+        async def work():
+            nonlocal running, peak
+            async with semaphore.slot():
+                running += 1
+                peak = max(peak, running)
+                await asyncio.sleep(0.01)
+                running -= 1
+
+        await asyncio.gather(*(work() for _ in range(6)))
+
+        assert peak == 2
+        assert semaphore.in_use == 0
+
+    @pytest.mark.asyncio
+    async def test_reconfigure_admits_waiters(self):
+        """Test raising the limit admits queued requests right away."""
+        semaphore = AdmissionController(1)
+
+        await semaphore.acquire(Priority.INTERACTIVE)
+        waiter = asyncio.create_task(semaphore.acquire(Priority.INTERACTIVE))
+        await asyncio.sleep(0)
+        assert not waiter.done()
+
+        semaphore.reconfigure(2, {Priority.BATCH: 5.0})
+
+        await asyncio.wait_for(waiter, timeout=1)
+        assert semaphore.in_use == 2
+        assert semaphore.stats()["classes"]["batch"]["weight"] == 5.0
+        with pytest.raises(ValueError, match="at least 1"):
+            semaphore.reconfigure(0)
+
+    @pytest.mark.asyncio
+    async def test_interactive_served_before_background(self):
+        """Test queued interactive requests run before queued background ones."""
+        semaphore = AdmissionController(1)
+        order = []
+
+        async def work(name, priority):
+            async with semaphore.slot(priority):
+                order.append(name)
+
+        await semaphore.acquire(Priority.INTERACTIVE)
+        tasks = [
+            asyncio.create_task(work("background", Priority.BACKGROUND)),
+            asyncio.create_task(work("interactive", Priority.INTERACTIVE)),
+        ]
+        await asyncio.sleep(0)
+        assert semaphore.waiting == 2
+
+        semaphore.release(Priority.INTERACTIVE)
+        await asyncio.gather(*tasks)
+
+        assert order == ["interactive", "background"]
+
+    @pytest.mark.asyncio
+    async def test_background_leaves_a_slot_for_interactive(self):
+        """Test background requests never hold every slot."""
+        semaphore = AdmissionController(2)
+
+        await semaphore.acquire(Priority.BACKGROUND)
+        waiter = asyncio.create_task(semaphore.acquire(Priority.BACKGROUND))
+        await asyncio.sleep(0)
+        assert not waiter.done()
+
+        await asyncio.wait_for(semaphore.acquire(Priority.INTERACTIVE), timeout=1)
+        assert semaphore.in_use == 2
+
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_is_skipped(self):
+        """Test a cancelled waiter does not consume a slot."""
+        semaphore = AdmissionController(1)
+        await semaphore.acquire(Priority.INTERACTIVE)
+
+        waiter = asyncio.create_task(semaphore.acquire(Priority.INTERACTIVE))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+        semaphore.release(Priority.INTERACTIVE)
+        assert semaphore.in_use == 0
+        assert semaphore.waiting == 0
+
+    @pytest.mark.asyncio
+    async def test_classes_share_slots_by_weight(self):
+        """Test queued classes are admitted in proportion to their weights."""
+        controller = AdmissionController(
+            1, {Priority.INTERACTIVE: 3.0, Priority.BATCH: 1.0}
+        )
+        order = []
+
+        async def work(priority):
+            async with controller.slot(priority):
+                order.append(priority)
+
+        await controller.acquire(Priority.INTERACTIVE)
+        tasks = [
+            asyncio.create_task(work(priority))
+            for priority in [Priority.BATCH] * 4 + [Priority.INTERACTIVE] * 12
+        ]
+        await asyncio.sleep(0)
+        controller.release(Priority.INTERACTIVE)
+        await asyncio.gather(*tasks)
+
+        # Every window of four admissions holds three interactive, one batch
+        first_eight = order[:8]
+        assert first_eight.count(Priority.INTERACTIVE) == 6
+        assert first_eight.count(Priority.BATCH) == 2
+
+    @pytest.mark.asyncio
+    async def test_sessions_take_turns_within_a_class(self):
+        """Test one session's backlog does not delay another session."""
+        controller = AdmissionController(1)
+        order = []
+
+        async def work(session, index):
+            async with controller.slot(Priority.INTERACTIVE, session):
+                order.append(f"{session}{index}")
+
+        await controller.acquire(Priority.INTERACTIVE)
+        tasks = [asyncio.create_task(work("a", index)) for index in range(3)]
+        tasks.append(asyncio.create_task(work("b", 0)))
+        await asyncio.sleep(0)
+        controller.release(Priority.INTERACTIVE)
+        await asyncio.gather(*tasks)
+
+        assert order == ["a0", "b0", "a1", "a2"]
+
+    @pytest.mark.asyncio
+    async def test_session_defaults_to_context(self):
+        """Test requests are queued under the current context's session."""
+        controller = AdmissionController(1)
+        order = []
+
+        async def work(session, index):
+            with request_session(session):
+                async with controller.slot(Priority.INTERACTIVE):
+                    order.append(f"{session}{index}")
+
+        await controller.acquire(Priority.INTERACTIVE)
+        tasks = [asyncio.create_task(work("a", index)) for index in range(2)]
+        tasks.append(asyncio.create_task(work("b", 0)))
+        await asyncio.sleep(0)
+        controller.release(Priority.INTERACTIVE)
+        await asyncio.gather(*tasks)
+
+        assert order == ["a0", "b0", "a1"]
+
+    @pytest.mark.asyncio
+    async def test_stats_report_queue_depth_and_waits(self):
+        """Test stats expose per-class queue depth and wait times."""
+        controller = AdmissionController(1)
+        await controller.acquire(Priority.INTERACTIVE)
+        waiter = asyncio.create_task(controller.acquire(Priority.BATCH))
+        await asyncio.sleep(0)
+
+        stats = controller.stats()
+        assert stats["in_use"] == 1
+        assert stats["waiting"] == 1
+        assert stats["classes"]["batch"]["queued"] == 1
+
+        await asyncio.sleep(0.02)
+        controller.release(Priority.INTERACTIVE)
+        await waiter
+
+        batch = controller.stats()["classes"]["batch"]
+        assert batch["queued"] == 0
+        assert batch["admitted"] == 1
+        assert batch["max_wait_ms"] >= 15
+        assert batch["avg_wait_ms"] == batch["max_wait_ms"]
+        assert controller.stats()["classes"]["interactive"]["admitted"] == 1
@@ -0,0 +1,107 @@
+"""
+Tests for config module.
+
+Covers TOML parsing into settings, precedence over the environment and
+reloading a watched file.
+"""
+
+import os
+
+import pytest
+
+from mcp_prometheus_server.config import ConfigSource, ConfigWatcher, parse_config
+
+
+class TestParseConfig:
+    """Test cases for parse_config."""
+
+    def test_values_become_settings(self):
+        """Test keys map to variables and values to their string form."""
+        settings = parse_config(
+            """
+            url = "http://mimir:9009/prometheus"
+            results_cache_ttl = 30
+            warmup = false
+            tenants = ["team-a", "team-b"]
+
+            [tenant_limits]
+            team-a = 8
+            "*" = 2
+            """
+        )
+
+        assert settings == {
+            "PROMETHEUS_URL": "http://mimir:9009/prometheus",
+            "PROMETHEUS_RESULTS_CACHE_TTL": "30",
+            "PROMETHEUS_WARMUP": "false",
+            "PROMETHEUS_TENANTS": "team-a,team-b",
+            "PROMETHEUS_TENANT_LIMITS": "team-a=8,*=2",
+        }
+
+    def test_invalid_toml(self):
+        """Test a malformed file is rejected."""
+        with pytest.raises(ValueError, match="Invalid configuration file"):
+            parse_config("url = ")
+
+
+class TestConfigSource:
+    """Test cases for ConfigSource."""
+
+    def test_file_overrides_environment(self):
+        """Test lookup order and reporting of keys nothing read."""
+        source = ConfigSource(
+            {"PROMETHEUS_URL": "http://file", "PROMETHEUS_TYPO": "1"},
+            environ={"PROMETHEUS_URL": "http://env", "PROMETHEUS_TENANT": "a"},
+        )
+
+        assert source.get("PROMETHEUS_URL") == "http://file"
+        assert source.get("PROMETHEUS_TENANT") == "a"
+        assert source.get("PROMETHEUS_TIMEOUT", "30") == "30"
+        assert source.unknown() == ["typo"]
+
+
+class TestConfigWatcher:
+    """Test cases for ConfigWatcher."""
+
+    def test_applies_changes_and_keeps_config_on_error(self, tmp_path):
+        """Test only changed content is applied and bad files are skipped."""
+        path = tmp_path / "config.toml"
+        path.write_text("results_cache_ttl = 15\n")
+        applied = []
+        watcher = ConfigWatcher(path, applied.append)
+
+        def rewrite(text, mtime):
+            path.write_text(text)
+            os.utime(path, (mtime, mtime))
+
+        assert not watcher.check()
+
+        rewrite("results_cache_ttl = 30\n", 1_000)
+        assert watcher.check()
+        assert applied == [{"PROMETHEUS_RESULTS_CACHE_TTL": "30"}]
+
+        # Touched without a content change
+        rewrite("results_cache_ttl = 30\n", 2_000)
+        assert not watcher.check()
+
+        rewrite("results_cache_ttl = \n", 3_000)
+        assert not watcher.check()
+        assert (watcher.reloads, watcher.failures) == (1, 1)
+        assert len(applied) == 1
+
+    def test_invalid_utf8_skipped(self, tmp_path):
+        """Test that a save with invalid UTF-8 is counted and later edits apply."""
+        path = tmp_path / "config.toml"
+        path.write_text("results_cache_ttl = 15\n")
+        applied = []
+        watcher = ConfigWatcher(path, applied.append)
+
+        path.write_bytes(b"results_cache_ttl = \xff\n")
+        os.utime(path, (1_000, 1_000))
+        assert not watcher.check()
+        assert watcher.failures == 1
+
+        path.write_text("results_cache_ttl = 30\n")
+        os.utime(path, (2_000, 2_000))
+        assert watcher.check()
+        assert applied == [{"PROMETHEUS_RESULTS_CACHE_TTL": "30"}]
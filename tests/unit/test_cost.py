@@ -0,0 +1,161 @@
+"""
+Tests for cost module.
+
+Covers series estimation, step coarsening and query shaping decisions.
+"""
+
+import pytest
+
+from mcp_prometheus_server.cost import (
+    MIN_POINTS,
+    QueryPlan,
+    coarser_step,
+    collect_plans,
+    estimate_series,
+    record_plan,
+    shape_query,
+)
+from mcp_prometheus_server.promql import parse_promql
+
+CARDINALITY = {"up": 100, 'http_requests_total{job="api"}': 40, "node_load1": 10}
+
+
+def _series(query):
+    return estimate_series(parse_promql(query).expr, CARDINALITY)
+
+
+class TestEstimateSeries:
+    """Test cases for estimate_series."""
+
+    def test_selector_and_functions(self):
+        """Test selectors map to their cardinality through functions."""
+        assert _series("up") == 100
+        assert _series('rate(http_requests_total{job="api"}[5m])') == 40
+        assert _series("unknown_metric") == 0
+
+    def test_aggregations(self):
+        """Test aggregations bound the series count."""
+        assert _series("sum(up)") == 1
+        assert _series("sum by (job) (up)") == 100
+        assert _series("topk(5, up)") == 5
+        assert _series('count_values("v", up)') == 100
+
+    def test_binary_expressions(self):
+        """Test binary operators combine both sides."""
+        assert _series("up * 2") == 100
+        assert _series("up or node_load1") == 110
+        assert _series("up unless node_load1") == 100
+        assert _series("up / on (instance) node_load1") == 10
+        assert _series("node_load1 * on (instance) group_left up") == 10
+
+    def test_scalars(self):
+        """Test scalar expressions have no series."""
+        assert _series("1 + 1") is None
+        assert _series("time()") is None
+        assert _series("vector(1)") == 1
+
+
+class TestShapeQuery:
+    """Test cases for shape_query."""
+
+    def test_within_budget_runs_unchanged(self):
+        """Test a cheap query is not shaped."""
+        plan = shape_query(parse_promql("up"), 3600, 60, 10, 10**6)
+
+        assert plan.action == "run"
+        assert not plan.shaped
+        assert plan.query == "up"
+        assert plan.step == "1m"
+        assert plan.estimate.points == 61
+
+    def test_downsamples_to_round_step(self):
+        """Test the step is raised to the finest round step that fits."""
+        # 1000 series x 1441 points x 32 bytes is ~46 MB
+        plan = shape_query(parse_promql("up"), 86400, 60, 1000, 10 * 1024 * 1024)
+
+        assert plan.action == "downsample"
+        assert plan.step == "5m"
+        assert plan.query == "up"
+        assert plan.estimate.bytes <= 10 * 1024 * 1024
+        assert plan.original.points == 1441
+
+    def test_aggregates_with_topk(self):
+        """Test too many series are cut to the top series that fit."""
+        plan = shape_query(parse_promql("up"), 3600, 60, 100000, 1024 * 1024)
+
+        assert plan.action == "aggregate"
+        # Ranked once over the window, so every step keeps the same series
+        assert plan.query == "up and topk(1057, avg_over_time(up[1h:2m] @ end()))"
+        assert plan.estimate.series == 1057
+        assert plan.estimate.points >= MIN_POINTS
+        assert plan.estimate.bytes <= 1024 * 1024
+
+    def test_aggregates_by_labels(self):
+        """Test aggregate_by sums by the labels when the groups fit."""
+        plan = shape_query(
+            parse_promql("rate(x[5m])"),
+            3600,
+            60,
+            100000,
+            1024 * 1024,
+            aggregate_by=["job"],
+            groups=12,
+        )
+
+        assert plan.action == "aggregate"
+        assert plan.query == "sum by (job) (rate(x[5m]))"
+        assert plan.estimate.series == 12
+
+    def test_topk_over_too_many_groups(self):
+        """Test groups that do not fit are limited with topk as well."""
+        plan = shape_query(
+            parse_promql("x"),
+            3600,
+            60,
+            100000,
+            1024 * 1024,
+            aggregate_by=["pod"],
+            groups=50000,
+        )
+
+        assert plan.query == (
+            "sum by (pod) (x) and on (pod) "
+            "topk(1057, avg_over_time((sum by (pod) (x))[1h:2m] @ end()))"
+        )
+        assert parse_promql(plan.query).canonical == plan.query
+
+    @pytest.mark.parametrize("fallback", ["refuse", "downsample"])
+    def test_refusal(self, fallback):
+        """Test queries that cannot be shaped under the policy are refused."""
+        with pytest.raises(ValueError, match="Query refused"):
+            shape_query(
+                parse_promql("up"), 3600, 60, 100000, 1024 * 1024, fallback=fallback
+            )
+
+    def test_invalid_fallback(self):
+        """Test unknown fallbacks are rejected."""
+        with pytest.raises(ValueError, match="Invalid cost fallback"):
+            shape_query(parse_promql("up"), 3600, 60, 1, 1, fallback="drop")
+
+    def test_coarser_step(self):
+        """Test steps are rounded up to the round step table."""
+        assert coarser_step(3600, 15, 1000) == 15
+        assert coarser_step(3600, 15, 50) == 120
+        assert coarser_step(30 * 86400, 60, 10) == 4 * 86400
+
+
+class TestCollectPlans:
+    """Test cases for collecting shaped plans."""
+
+    def test_only_shaped_plans_are_collected(self):
+        """Test unchanged plans and plans outside a block are dropped."""
+        shaped = shape_query(parse_promql("up"), 86400, 60, 1000, 10 * 1024 * 1024)
+        unchanged = shape_query(parse_promql("up"), 3600, 60, 1, 10**6)
+
+        record_plan(shaped)
+        with collect_plans() as plans:
+            record_plan(shaped)
+            record_plan(unchanged)
+
+        assert plans == [shaped]
+        assert isinstance(plans[0], QueryPlan)
@@ -0,0 +1,72 @@
+"""
+Tests for cursors module.
+
+Covers cursor encoding, watermark advancing and tail sample selection.
+"""
+
+from array import array
+
+import pytest
+
+from mcp_prometheus_server.columnar import Series
+from mcp_prometheus_server.cursors import STALENESS_SECONDS, HistoryCursor
+
+
+def _series(labels, timestamps):
+    return Series(
+        labels=labels,
+        timestamps=array("d", timestamps),
+        values=array("d", [float(i) for i in range(len(timestamps))]),
+    )
+
+
+class TestHistoryCursor:
+    """Test cases for HistoryCursor."""
+
+    def test_round_trip(self):
+        """Test a cursor survives encoding as an opaque token."""
+        cursor = HistoryCursor.for_query("rate(x[5m])", "1m").advance(
+            [_series({"i": str(i)}, [1000.0 + i % 2 * 60]) for i in range(50)]
+        )
+
+        token = cursor.encode()
+
+        assert HistoryCursor.decode(token) == cursor
+        assert "=" not in token
+        assert cursor.matches("rate( x [5m] )", "1m")
+        assert not cursor.matches("rate(x[5m])", "5m")
+
+    def test_invalid_token(self):
+        """Test tokens that are not cursors are rejected."""
+        with pytest.raises(ValueError, match="Invalid history cursor"):
+            HistoryCursor.decode("not-a-cursor")
+
+    def test_select_keeps_unseen_samples(self):
+        """Test only samples after each series' own watermark are kept."""
+        cursor = HistoryCursor.for_query("up", "1m").advance(
+            [_series({"i": "a"}, [60.0]), _series({"i": "b"}, [120.0])]
+        )
+
+        tail = cursor.select(
+            [
+                _series({"i": "a"}, [120.0, 180.0]),
+                _series({"i": "b"}, [120.0]),
+                _series({"i": "c"}, [180.0]),
+            ]
+        )
+
+        assert [(series.labels["i"], list(series.timestamps)) for series in tail] == [
+            ("a", [120.0, 180.0]),
+            ("c", [180.0]),
+        ]
+        assert cursor.oldest() == 60.0
+
+    def test_advance_drops_stale_series(self):
+        """Test watermarks far behind the newest one are forgotten."""
+        cursor = HistoryCursor.for_query("up", "1m").advance(
+            [_series({"i": "gone"}, [0.0]), _series({"i": "live"}, [0.0])]
+        )
+
+        cursor = cursor.advance([_series({"i": "live"}, [STALENESS_SECONDS + 180])])
+
+        assert list(cursor.watermarks.values()) == [STALENESS_SECONDS + 180]
@@ -0,0 +1,96 @@
+"""
+Tests for deadlines module.
+
+Covers deadline scoping, query timeouts and aborted request accounting.
+"""
+
+import asyncio
+
+import pytest
+
+from mcp_prometheus_server.deadlines import (
+    AbortStats,
+    deadline,
+    parse_deadlines,
+    remaining_time,
+    with_query_timeout,
+    without_deadline,
+)
+
+
+class TestDeadlines:
+    """Test cases for deadline scoping."""
+
+    def test_parse_deadlines(self):
+        """Test parsing per-tool overrides."""
+        assert parse_deadlines("query_metric=30s, export_query=10m") == {
+            "query_metric": 30,
+            "export_query": 600,
+        }
+        assert parse_deadlines(None) == {}
+
+        with pytest.raises(ValueError, match="Invalid tool deadline"):
+            parse_deadlines("query_metric")
+        with pytest.raises(ValueError, match="Invalid duration"):
+            parse_deadlines("query_metric=soon")
+
+    @pytest.mark.asyncio
+    async def test_nested_deadline_never_extends(self):
+        """Test that inner deadlines only shorten the budget."""
+        assert remaining_time() is None
+
+        with deadline(10):
+            with deadline(60):
+                assert remaining_time() <= 10
+            with deadline(1):
+                assert remaining_time() <= 1
+            with without_deadline():
+                assert remaining_time() is None
+
+        assert remaining_time() is None
+
+    @pytest.mark.asyncio
+    async def test_query_timeout_only_for_queries(self):
+        """Test that only PromQL endpoints get a timeout parameter."""
+        params = {"query": "up"}
+
+        assert with_query_timeout("/api/v1/query", params) is params
+
+        with deadline(9.5):
+            assert with_query_timeout("/api/v1/query", params)["timeout"] == "10s"
+            assert with_query_timeout("/api/v1/metadata", None) is None
+            assert with_query_timeout("/api/v1/series", params) is params
+
+            # Time spent does not change the request; a tighter deadline does
+            await asyncio.sleep(1.1)
+            assert with_query_timeout("/api/v1/query", params)["timeout"] == "10s"
+            with deadline(60):
+                assert with_query_timeout("/api/v1/query", params)["timeout"] == "10s"
+            with deadline(2):
+                assert with_query_timeout("/api/v1/query", params)["timeout"] == "2s"
+
+        assert "timeout" not in params
+
+
+class TestAbortStats:
+    """Test cases for AbortStats."""
+
+    @pytest.mark.asyncio
+    async def test_cancelled_request_recorded(self):
+        """Test that only cancelled requests are counted."""
+        stats = AbortStats()
+
+        async def request(seconds):
+            async with stats.track("/api/v1/query"):
+                await asyncio.sleep(seconds)
+
+        await request(0)
+        task = asyncio.create_task(request(10))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        snapshot = stats.snapshot()
+        assert snapshot["/api/v1/query"]["requests"] == 1
+        assert snapshot["/api/v1/query"]["seconds"] > 0
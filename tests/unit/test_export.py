@@ -0,0 +1,182 @@
+"""
+Tests for export module.
+
+Covers file name validation, streamed range queries and the CSV, Arrow and
+Parquet writers.
+"""
+
+import csv
+import json
+
+import httpx
+import pytest
+
+from mcp_prometheus_server.columnar import Series
+from mcp_prometheus_server.export import export_path, export_series, selector_string
+from mcp_prometheus_server.prometheus_client import PrometheusClient
+
+
+def _series(labels, values, start=1700000000.0):
+    """Build a series with one sample every 60 seconds."""
+    series = Series(labels=labels)
+    for i, value in enumerate(values):
+        series.append(start + i * 60, value)
+    return series
+
+
+async def _iterate(series_list):
+    """Yield series as an async stream."""
+    for series in series_list:
+        yield series
+
+
+SERIES = [
+    _series({"__name__": "up", "job": "api"}, [1.0, 0.0, 1.0]),
+    _series({"__name__": "up", "job": 'd"b'}, [1.0]),
+    Series(labels={"__name__": "up", "job": "empty"}),
+]
+
+
+class TestExportPath:
+    """Test cases for export_path."""
+
+    def test_extension_added(self, tmp_path):
+        """Test that the format extension is appended once."""
+        assert export_path(tmp_path, "cpu", "parquet") == tmp_path / "cpu.parquet"
+        assert export_path(tmp_path, "cpu.csv", "csv") == tmp_path / "cpu.csv"
+
+    @pytest.mark.parametrize("name", ["../etc/passwd", "a/b", ".hidden", "a..b", ""])
+    def test_rejects_paths(self, tmp_path, name):
+        """Test that names cannot leave the export directory."""
+        with pytest.raises(ValueError, match="Invalid export file name"):
+            export_path(tmp_path, name, "csv")
+
+    def test_rejects_format(self, tmp_path):
+        """Test that unknown formats are rejected."""
+        with pytest.raises(ValueError, match="Invalid export format"):
+            export_path(tmp_path, "cpu", "xlsx")
+
+
+class TestExportSeries:
+    """Test cases for export_series."""
+
+    def test_selector_string(self):
+        """Test that label sets are written as escaped selectors."""
+        assert selector_string({"__name__": "up", "job": 'd"b'}) == 'up{job="d\\"b"}'
+        assert selector_string({"__name__": "up"}) == "up"
+        assert selector_string({}) == "{}"
+
+    @pytest.mark.asyncio
+    async def test_csv(self, tmp_path):
+        """Test that CSV rows are written in small batches."""
+        path = tmp_path / "up.csv"
+
+        summary = await export_series(_iterate(SERIES), path, "csv", batch_rows=2)
+
+        with path.open() as file:
+            rows = list(csv.reader(file))
+        assert rows[0] == ["metric", "timestamp", "value"]
+        assert rows[1] == ['up{job="api"}', "1700000000.0", "1.0"]
+        assert len(rows) == 5
+        assert (summary.series, summary.rows) == (3, 4)
+        assert (summary.start, summary.end) == (1700000000.0, 1700000120.0)
+        assert summary.bytes == path.stat().st_size
+        assert list(tmp_path.iterdir()) == [path]
+
+    @pytest.mark.asyncio
+    async def test_failure_removes_partial_file(self, tmp_path):
+        """Test that a failed export leaves no file behind."""
+
+        async def failing():
+            yield SERIES[0]
+            raise ValueError("upstream went away")
+
+        with pytest.raises(ValueError, match="upstream went away"):
+            await export_series(failing(), tmp_path / "up.csv", "csv")
+
+        assert list(tmp_path.iterdir()) == []
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("fmt", ["arrow", "parquet"])
+    async def test_arrow_formats(self, tmp_path, fmt):
+        """Test that Arrow and Parquet files hold one row per sample."""
+        pa = pytest.importorskip("pyarrow")
+        path = tmp_path / f"up.{fmt}"
+
+        summary = await export_series(_iterate(SERIES), path, fmt, batch_rows=2)
+
+        if fmt == "parquet":
+            import pyarrow.parquet as pq
+
+            table = pq.read_table(path)
+        else:
+            table = pa.ipc.open_file(str(path)).read_all()
+
+        assert summary.rows == table.num_rows == 4
+        assert table.column("series").to_pylist() == [
+            'up{job="api"}',
+            'up{job="api"}',
+            'up{job="api"}',
+            'up{job="d\\"b"}',
+        ]
+        assert dict(table.column("labels")[3].as_py())["job"] == 'd"b'
+        assert table.column("timestamp")[1].value == 1700000060000
+        assert table.column("value").to_pylist() == [1.0, 0.0, 1.0, 1.0]
+
+
+class TestStreamRangeQuery:
+    """Test cases for PrometheusClient.stream_range_query."""
+
+    @pytest.mark.asyncio
+    async def test_series_streamed_from_body(self):
+        """Test that series are decoded from a chunked response body."""
+        body = json.dumps(
+            {
+                "status": "success",
+                "data": {
+                    "resultType": "matrix",
+                    "result": [
+                        {"metric": {"job": "a"}, "values": [[1, "1"], [2, "2"]]},
+                        {"metric": {"job": "b"}, "values": [[1, "3"]]},
+                    ],
+                },
+            }
+        ).encode()
+        seen = {}
+
+        def handler(request):
+            seen["params"] = dict(request.url.params)
+
+            async def chunks():
+                for i in range(0, len(body), 16):
+                    yield body[i : i + 16]
+
+            return httpx.Response(200, content=chunks())
+
+        client = PrometheusClient()
+        client.http_client = httpx.AsyncClient(
+            base_url="http://prometheus", transport=httpx.MockTransport(handler)
+        )
+
+        series_list = [s async for s in client.stream_range_query("up", "1h", "5m")]
+
+        assert [s.labels["job"] for s in series_list] == ["a", "b"]
+        assert list(series_list[0].values) == [1.0, 2.0]
+        assert seen["params"]["step"] == "5m"
+        await client.close()
+
+    @pytest.mark.asyncio
+    async def test_truncated_body_raises(self):
+        """Test that a cut-off response is not mistaken for a full result."""
+
+        def handler(request):
+            return httpx.Response(200, content=b'{"data": {"result": [')
+
+        client = PrometheusClient()
+        client.http_client = httpx.AsyncClient(
+            base_url="http://prometheus", transport=httpx.MockTransport(handler)
+        )
+
+        with pytest.raises(ValueError, match="incomplete"):
+            [s async for s in client.stream_range_query("up")]
+        await client.close()
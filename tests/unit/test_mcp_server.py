@@ -6,15 +6,30 @@ Comprehensive tests covering MCP server functionality,
 tool registration, and error handling.
 """
 
-from unittest.mock import AsyncMock, patch
+import asyncio
+from array import array
+from unittest.mock import AsyncMock, Mock, patch
 
 import pytest
 
+from mcp_prometheus_server import mcp_server
+from mcp_prometheus_server.analysis import histogram_from_buckets
+from mcp_prometheus_server.columnar import Series
+from mcp_prometheus_server.concurrency import (
+    Priority,
+    current_priority,
+    current_session,
+)
+from mcp_prometheus_server.cost import record_plan, shape_query
 from mcp_prometheus_server.mcp_server import (
     _format_query_result,
+    apply_config,
     handle_call_tool,
     handle_list_tools,
 )
+from mcp_prometheus_server.prometheus_client import PrometheusClient
+from mcp_prometheus_server.promql import parse_promql
+from mcp_prometheus_server.tenants import current_tenant
 
 
 class TestMCPServerTools:
@@ -25,13 +40,26 @@ class TestMCPServerTools:
         """Test tool listing functionality."""
         tools = await handle_list_tools()
 
-        assert len(tools) == 4
+        assert len(tools) == 18
 
         tool_names = [tool.name for tool in tools]
         assert "query_metric" in tool_names
         assert "get_instance_value" in tool_names
         assert "get_metric_history" in tool_names
         assert "list_available_metrics" in tool_names
+        assert "get_metric_metadata" in tool_names
+        assert "subscribe_metric" in tool_names
+        assert "unsubscribe_metric" in tool_names
+        assert "get_server_stats" in tool_names
+        assert "detect_anomalies" in tool_names
+        assert "correlate_metrics" in tool_names
+        assert "forecast_metric" in tool_names
+        assert "analyze_histogram" in tool_names
+        assert "browse_result" in tool_names
+        assert "summarize_result" in tool_names
+        assert "get_alerts" in tool_names
+        assert "get_rules" in tool_names
+        assert "get_targets" in tool_names
 
     @pytest.mark.asyncio
     async def test_query_metric_tool_schema(self):
@@ -57,11 +85,13 @@ class TestMCPServerTools:
 
         assert (
             instance_tool.description
-            == "Get the current value of a specific metric for a particular instance. Use this when you know the exact metric name and instance identifier. Returns a single numeric value with timestamp."
+            == "Get the current value of a specific metric for a particular instance. Use this when you know the exact metric name and instance identifier. Returns a single numeric value with timestamp. To check many instances at once, pass 'instances' or 'instance_regex' instead of 'instance' to get an instance-to-value table from a single query."
         )
-        required = instance_tool.inputSchema["required"]
-        assert "metric_name" in required
-        assert "instance" in required
+        assert instance_tool.inputSchema["required"] == ["metric_name"]
+        properties = instance_tool.inputSchema["properties"]
+        assert "instance" in properties
+        assert properties["instances"]["type"] == "array"
+        assert "instance_regex" in properties
 
     @pytest.mark.asyncio
     async def test_get_metric_history_tool_schema(self):
@@ -115,7 +145,7 @@ class TestMCPToolCalls:
         with patch("mcp_prometheus_server.mcp_server.prometheus_client") as mock_client:
             mock_client.query_metric = AsyncMock(return_value=mock_result)
 
-            result = await handle_call_tool(
+            result, structured = await handle_call_tool(
                 "query_metric", {"query": "cpu_usage", "relative_time": "5m"}
             )
 
@@ -123,11 +153,24 @@ class TestMCPToolCalls:
             assert result[0].type == "text"
             assert "Query Result:" in result[0].text
             assert "cpu_usage" in result[0].text
+            assert structured == {
+                "status": "success",
+                "result_type": "vector",
+                "series": [
+                    {
+                        "labels": {"__name__": "cpu_usage", "instance": "server1"},
+                        "timestamp": 1640995200.0,
+                        "value": 85.5,
+                    }
+                ],
+                "total_series": 1,
+                "truncated": False,
+            }
 
     @pytest.mark.asyncio
     async def test_query_metric_missing_query(self):
         """Test query_metric tool call with missing query parameter."""
-        result = await handle_call_tool("query_metric", {"relative_time": "5m"})
+        result, _ = await handle_call_tool("query_metric", {"relative_time": "5m"})
 
         assert len(result) == 1
         assert result[0].type == "text"
@@ -140,7 +183,7 @@ class TestMCPToolCalls:
         with patch("mcp_prometheus_server.mcp_server.prometheus_client") as mock_client:
             mock_client.get_instance_value = AsyncMock(return_value=85.5)
 
-            result = await handle_call_tool(
+            result, _ = await handle_call_tool(
                 "get_instance_value",
                 {
                     "metric_name": "cpu_usage",
@@ -159,7 +202,7 @@ class TestMCPToolCalls:
         with patch("mcp_prometheus_server.mcp_server.prometheus_client") as mock_client:
             mock_client.get_instance_value = AsyncMock(return_value=None)
 
-            result = await handle_call_tool(
+            result, _ = await handle_call_tool(
                 "get_instance_value",
                 {"metric_name": "cpu_usage", "instance": "server1"},
             )
@@ -168,10 +211,31 @@ class TestMCPToolCalls:
             assert result[0].type == "text"
             assert "No value found" in result[0].text
 
+    @pytest.mark.asyncio
+    async def test_get_instance_value_batch(self):
+        """Test get_instance_value with several instances returns a table."""
+        with patch("mcp_prometheus_server.mcp_server.prometheus_client") as mock_client:
+            mock_client.get_instance_values = AsyncMock(
+                return_value={"web-01": 0.5, "web-02": None}
+            )
+
+            result, _ = await handle_call_tool(
+                "get_instance_value",
+                {"metric_name": "node_load1", "instances": ["web-01", "web-02"]},
+            )
+
+            mock_client.get_instance_values.assert_awaited_once_with(
+                "node_load1", ["web-01", "web-02"], None, "5m"
+            )
+            text = result[0].text
+            assert "Metric 'node_load1' (1 of 2 instances):" in text
+            assert "  web-01  0.5" in text
+            assert "  web-02  no data" in text
+
     @pytest.mark.asyncio
     async def test_get_instance_value_missing_params(self):
         """Test get_instance_value tool call with missing parameters."""
-        result = await handle_call_tool(
+        result, _ = await handle_call_tool(
             "get_instance_value", {"metric_name": "cpu_usage"}
         )
 
@@ -184,22 +248,17 @@ class TestMCPToolCalls:
     async def test_get_metric_history_success(self):
         """Test successful get_metric_history tool call."""
         mock_history = [
-            {
-                "timestamp": 1640995200,
-                "value": 85.5,
-                "labels": {"__name__": "cpu_usage", "instance": "server1"},
-            },
-            {
-                "timestamp": 1640995260,
-                "value": 87.2,
-                "labels": {"__name__": "cpu_usage", "instance": "server1"},
-            },
+            Series(
+                labels={"__name__": "cpu_usage", "instance": "server1"},
+                timestamps=array("d", [1640995200, 1640995260]),
+                values=array("d", [85.5, 87.2]),
+            )
         ]
 
         with patch("mcp_prometheus_server.mcp_server.prometheus_client") as mock_client:
-            mock_client.get_metric_history = AsyncMock(return_value=mock_history)
+            mock_client.get_history_series = AsyncMock(return_value=mock_history)
 
-            result = await handle_call_tool(
+            result, structured = await handle_call_tool(
                 "get_metric_history",
                 {"metric_name": "cpu_usage", "relative_time": "1h"},
             )
@@ -209,14 +268,122 @@ class TestMCPToolCalls:
             assert "Historical data for 'cpu_usage'" in result[0].text
             assert "85.5" in result[0].text
             assert "87.2" in result[0].text
+            assert structured["metric"] == "cpu_usage"
+            # Sparkline columns and statistics, not raw samples
+            assert structured["result_type"] == "trend"
+            assert structured["series"] == [
+                {
+                    "labels": {"__name__": "cpu_usage", "instance": "server1"},
+                    "samples": 2,
+                    "trend": [85.5, 87.2],
+                    "min": 85.5,
+                    "max": 87.2,
+                    "last": 87.2,
+                }
+            ]
+
+            _, raw = await handle_call_tool(
+                "get_metric_history", {"metric_name": "cpu_usage", "format": "points"}
+            )
+            assert raw["series"] == [
+                {
+                    "labels": {"__name__": "cpu_usage", "instance": "server1"},
+                    "timestamps": [1640995200, 1640995260],
+                    "values": [85.5, 87.2],
+                }
+            ]
+
+    @pytest.mark.asyncio
+    async def test_get_metric_history_formats(self):
+        """Test history as a sparkline table or as raw points."""
+        labels = {"__name__": "cpu_usage", "instance": "server1"}
+        mock_history = [
+            Series(
+                labels=labels,
+                timestamps=array("d", [1640995200 + i * 60 for i in range(12)]),
+                values=array("d", range(12)),
+            )
+        ]
+
+        with patch("mcp_prometheus_server.mcp_server.prometheus_client") as mock_client:
+            mock_client.get_history_series = AsyncMock(return_value=mock_history)
+
+            sparkline, _ = await handle_call_tool(
+                "get_metric_history", {"metric_name": "cpu_usage"}
+            )
+            points, _ = await handle_call_tool(
+                "get_metric_history", {"metric_name": "cpu_usage", "format": "points"}
+            )
+            invalid, _ = await handle_call_tool(
+                "get_metric_history", {"metric_name": "cpu_usage", "format": "csv"}
+            )
+
+        lines = sparkline[0].text.splitlines()
+        assert lines[0] == "Historical data for 'cpu_usage' (1h): 1 series, 12 points"
+        assert lines[1] == 'Common labels: {__name__="cpu_usage", instance="server1"}'
+        assert lines[3].split() == ["-", "▁▂▂▃▄▄▅▅▆▇▇█", "0", "11", "11"]
+        assert len(points[0].text.splitlines()) == 12
+        assert "Invalid history format: csv" in invalid[0].text
+
+    @pytest.mark.asyncio
+    async def test_get_metric_history_cursor(self):
+        """Test history returns a cursor that a follow-up call passes back."""
+        labels = {"__name__": "cpu_usage"}
+        mock_history = [Series(labels, array("d", [1640995200]), array("d", [1.0]))]
+
+        with patch("mcp_prometheus_server.mcp_server.prometheus_client") as mock_client:
+            mock_client.get_history_series = AsyncMock(return_value=mock_history)
+            first, structured = await handle_call_tool(
+                "get_metric_history", {"metric_name": "cpu_usage"}
+            )
+
+            mock_client.get_history_series = AsyncMock(return_value=[])
+            second, _ = await handle_call_tool(
+                "get_metric_history",
+                {"metric_name": "cpu_usage", "cursor": structured["cursor"]},
+            )
+
+            cursor = mock_client.get_history_series.call_args.kwargs["cursor"]
+            assert cursor.oldest() == 1640995200
+            assert f"Cursor: {structured['cursor']}" in first[0].text
+            assert "No new data for 'cpu_usage' since the cursor" in second[0].text
+
+    @pytest.mark.asyncio
+    async def test_get_metric_history_cursor_after_shaping(self):
+        """Test the cursor of a shaped history is issued for the shaped query."""
+        plan = shape_query(parse_promql("up"), 86400, 60, 1000, 10 * 1024 * 1024)
+        labels = {"__name__": "up"}
+        mock_history = [Series(labels, array("d", [1640995200]), array("d", [1.0]))]
+
+        async def shaped_history(metric_name, relative_time, step, **kwargs):
+            record_plan(plan)
+            return mock_history
+
+        with patch("mcp_prometheus_server.mcp_server.prometheus_client") as mock_client:
+            mock_client.get_history_series = shaped_history
+            first, structured = await handle_call_tool(
+                "get_metric_history", {"metric_name": "up", "relative_time": "24h"}
+            )
+
+            mock_client.get_history_series = AsyncMock(return_value=[])
+            await handle_call_tool(
+                "get_metric_history",
+                {"metric_name": "up", "cursor": structured["cursor"]},
+            )
+
+            cursor = mock_client.get_history_series.call_args.kwargs["cursor"]
+            assert cursor.matches("up", "5m")
+            assert cursor.oldest() == 1640995200
+            assert "Note: query downsampled" in first[0].text
+            assert structured["shaping"][0]["step"] == "5m"
 
     @pytest.mark.asyncio
     async def test_get_metric_history_empty(self):
         """Test get_metric_history tool call with no data."""
         with patch("mcp_prometheus_server.mcp_server.prometheus_client") as mock_client:
-            mock_client.get_metric_history = AsyncMock(return_value=[])
+            mock_client.get_history_series = AsyncMock(return_value=[])
 
-            result = await handle_call_tool(
+            result, _ = await handle_call_tool(
                 "get_metric_history", {"metric_name": "cpu_usage"}
             )
 
@@ -227,7 +394,9 @@ class TestMCPToolCalls:
     @pytest.mark.asyncio
     async def test_get_metric_history_missing_metric(self):
         """Test get_metric_history tool call with missing metric_name."""
-        result = await handle_call_tool("get_metric_history", {"relative_time": "1h"})
+        result, _ = await handle_call_tool(
+            "get_metric_history", {"relative_time": "1h"}
+        )
 
         assert len(result) == 1
         assert result[0].type == "text"
@@ -242,7 +411,7 @@ class TestMCPToolCalls:
         with patch("mcp_prometheus_server.mcp_server.prometheus_client") as mock_client:
             mock_client.list_available_metrics = AsyncMock(return_value=mock_metrics)
 
-            result = await handle_call_tool("list_available_metrics", {})
+            result, _ = await handle_call_tool("list_available_metrics", {})
 
             assert len(result) == 1
             assert result[0].type == "text"
@@ -257,7 +426,7 @@ class TestMCPToolCalls:
         with patch("mcp_prometheus_server.mcp_server.prometheus_client") as mock_client:
             mock_client.list_available_metrics = AsyncMock(return_value=mock_metrics)
 
-            result = await handle_call_tool(
+            result, _ = await handle_call_tool(
                 "list_available_metrics", {"pattern": "cpu.*"}
             )
 
@@ -271,16 +440,709 @@ class TestMCPToolCalls:
         with patch("mcp_prometheus_server.mcp_server.prometheus_client") as mock_client:
             mock_client.list_available_metrics = AsyncMock(return_value=[])
 
-            result = await handle_call_tool("list_available_metrics", {})
+            result, _ = await handle_call_tool("list_available_metrics", {})
 
             assert len(result) == 1
             assert result[0].type == "text"
             assert "No metrics found" in result[0].text
 
+    @pytest.mark.asyncio
+    async def test_list_available_metrics_with_metadata(self):
+        """Test list_available_metrics annotates names with cached metadata."""
+        mock_metrics = ["cpu_usage", "memory_usage"]
+        mock_metadata = {
+            "cpu_usage": {"type": "gauge", "help": "CPU usage.", "unit": "percent"}
+        }
+
+        with patch("mcp_prometheus_server.mcp_server.prometheus_client") as mock_client:
+            mock_client.list_available_metrics = AsyncMock(return_value=mock_metrics)
+            mock_client.describe_metrics = AsyncMock(return_value=mock_metadata)
+
+            result, _ = await handle_call_tool(
+                "list_available_metrics", {"include_metadata": True}
+            )
+
+            assert "cpu_usage (gauge, percent): CPU usage." in result[0].text
+            assert "  memory_usage\n" in result[0].text
+
+    @pytest.mark.asyncio
+    async def test_get_metric_metadata_success(self):
+        """Test successful get_metric_metadata tool call."""
+        mock_metadata = {
+            "http_requests_total": {
+                "type": "counter",
+                "help": "Total requests.",
+                "unit": "",
+            }
+        }
+
+        with patch("mcp_prometheus_server.mcp_server.prometheus_client") as mock_client:
+            mock_client.get_metric_metadata = AsyncMock(return_value=mock_metadata)
+
+            result, _ = await handle_call_tool(
+                "get_metric_metadata", {"metric_type": "counter"}
+            )
+
+            assert "Metric metadata (1 found)" in result[0].text
+            assert "http_requests_total (counter): Total requests." in result[0].text
+            mock_client.get_metric_metadata.assert_called_once_with(
+                None, None, "counter"
+            )
+
+    @pytest.mark.asyncio
+    async def test_get_metric_metadata_empty(self):
+        """Test get_metric_metadata tool call with no metadata."""
+        with patch("mcp_prometheus_server.mcp_server.prometheus_client") as mock_client:
+            mock_client.get_metric_metadata = AsyncMock(return_value={})
+
+            result, _ = await handle_call_tool(
+                "get_metric_metadata", {"metric_name": "missing"}
+            )
+
+            assert "No metric metadata found" in result[0].text
+
+    @pytest.mark.asyncio
+    async def test_subscribe_metric_success(self):
+        """Test subscribe_metric returns the resource URI and initial state."""
+        subscription = Mock()
+        subscription.id = "abc"
+        subscription.uri = "prometheus://subscriptions/abc"
+        subscription.take_delta.return_value = {
+            "changed": [{"labels": {"job": "api"}, "timestamp": 1.0, "value": "1"}],
+            "removed": [],
+        }
+
+        with (
+            patch(
+                "mcp_prometheus_server.mcp_server.subscription_manager"
+            ) as mock_manager,
+            patch("mcp_prometheus_server.mcp_server._current_session"),
+        ):
+            mock_manager.subscribe = AsyncMock(return_value=subscription)
+
+            result, _ = await handle_call_tool(
+                "subscribe_metric", {"query": "up", "interval": "30s"}
+            )
+
+            assert mock_manager.subscribe.call_args.args[:2] == ("up", 30.0)
+            assert "prometheus://subscriptions/abc" in result[0].text
+            assert "Initial state (1 series)" in result[0].text
+
+    @pytest.mark.asyncio
+    async def test_session_end_drops_subscriptions(self):
+        """Test subscriptions made in a session are dropped when it ends."""
+        sessions = []
+
+        async def run(*args):
+            sessions.append(current_session())
+
+        with (
+            patch(
+                "mcp_prometheus_server.mcp_server.subscription_manager"
+            ) as mock_manager,
+            patch.object(mcp_server.server, "run", side_effect=run),
+        ):
+            mock_manager.unsubscribe_session = AsyncMock(return_value=1)
+
+            await mcp_server._serve(Mock(), Mock(), Mock())
+
+            assert sessions[0].startswith("session-")
+            mock_manager.unsubscribe_session.assert_awaited_once_with(sessions[0])
+
+    @pytest.mark.asyncio
+    async def test_subscribe_metric_without_session(self):
+        """Test subscribe_metric outside an MCP request reports an error."""
+        result, _ = await handle_call_tool("subscribe_metric", {"query": "up"})
+
+        assert "Error:" in result[0].text
+        assert "active MCP session" in result[0].text
+
+    @pytest.mark.asyncio
+    async def test_unsubscribe_metric(self):
+        """Test unsubscribe_metric for known and unknown subscriptions."""
+        with patch(
+            "mcp_prometheus_server.mcp_server.subscription_manager"
+        ) as mock_manager:
+            mock_manager.unsubscribe = AsyncMock(side_effect=[True, False])
+
+            result, _ = await handle_call_tool(
+                "unsubscribe_metric", {"subscription_id": "abc"}
+            )
+            assert "Unsubscribed from 'abc'" in result[0].text
+
+            result, _ = await handle_call_tool(
+                "unsubscribe_metric", {"subscription_id": "abc"}
+            )
+            assert "No subscription found" in result[0].text
+
+    @pytest.mark.asyncio
+    async def test_detect_anomalies(self):
+        """Test detect_anomalies scans one range result and ranks series."""
+        pytest.importorskip("numpy")
+        steady = Series(labels={"instance": "a"})
+        spiking = Series(labels={"instance": "b"})
+        for i in range(60):
+            steady.append(1640995200 + i * 60, 10.0 + (i % 3))
+            spiking.append(1640995200 + i * 60, 500.0 if i == 59 else 10.0 + (i % 3))
+
+        with patch("mcp_prometheus_server.mcp_server.prometheus_client") as mock_client:
+            mock_client.query_range = AsyncMock(return_value=[steady, spiking])
+
+            result, _ = await handle_call_tool(
+                "detect_anomalies",
+                {"query": "node_load1", "window": "10m", "baseline": "50m"},
+            )
+
+            mock_client.query_range.assert_awaited_once_with("node_load1", "1h", "1m")
+            text = result[0].text
+            assert "2 of 2 series scored" in text
+            assert "1. {'instance': 'b'} up" in text
+            assert "'instance': 'a'" not in text
+
+            # Numeric steps are accepted as the HTTP API accepts them
+            result, _ = await handle_call_tool(
+                "detect_anomalies",
+                {"query": "node_load1", "window": "10m", "step": "60"},
+            )
+            assert "2 of 2 series scored" in result[0].text
+
+    @pytest.mark.asyncio
+    async def test_correlate_metrics(self):
+        """Test correlate_metrics ranks candidates against one target series."""
+        pytest.importorskip("numpy")
+        target = Series(labels={})
+        follows = Series(labels={"__name__": "queue_depth"})
+        flat = Series(labels={"__name__": "up"})
+        for i in range(30):
+            value = float((i * 7) % 11)
+            target.append(1640995200 + i * 60, value)
+            follows.append(1640995200 + i * 60, 2 * value + 1)
+            flat.append(1640995200 + i * 60, 1.0)
+
+        with patch("mcp_prometheus_server.mcp_server.prometheus_client") as mock_client:
+            mock_client.query_range = AsyncMock(return_value=[target])
+            mock_client.query_range_many = AsyncMock(
+                return_value=[("up", flat), ("queue_depth", follows)]
+            )
+
+            result, content = await handle_call_tool(
+                "correlate_metrics",
+                {
+                    "target": "sum(rate(errors[5m]))",
+                    "candidates": ["up", "queue_depth"],
+                },
+            )
+
+            mock_client.query_range_many.assert_awaited_once_with(
+                ["up", "queue_depth"], "1h", "1m"
+            )
+            text = result[0].text
+            assert "1 of 2 series scored" in text
+            assert "1. queue_depth {'__name__': 'queue_depth'}: r=1.000" in text
+            assert content["correlations"][0]["source"] == "queue_depth"
+
+            mock_client.query_range = AsyncMock(return_value=[target, target])
+            result, _ = await handle_call_tool(
+                "correlate_metrics",
+                {"target": "rate(errors[5m])", "candidates": ["up"]},
+            )
+            assert "Target must return exactly one series, got 2" in result[0].text
+
+    @pytest.mark.asyncio
+    async def test_forecast_metric(self):
+        """Test forecast_metric fits the cached history and reports crossings."""
+        pytest.importorskip("numpy")
+        disk = Series(labels={"mountpoint": "/"})
+        for i in range(60):
+            disk.append(1640995200 + i * 300, 1000.0 - 10 * i)
+
+        with patch("mcp_prometheus_server.mcp_server.prometheus_client") as mock_client:
+            mock_client.query_range = AsyncMock(return_value=[disk])
+
+            result, content = await handle_call_tool(
+                "forecast_metric",
+                {"query": "node_filesystem_avail_bytes", "threshold": 0},
+            )
+
+            mock_client.query_range.assert_awaited_once_with(
+                "node_filesystem_avail_bytes", "1d", "5m"
+            )
+            text = result[0].text
+            assert "1 of 1 series fitted" in text
+            assert "{'mountpoint': '/'}: 410 -> " in text
+            assert "reaches 0 in 3h25m" in text
+            assert content["forecasts"][0]["time_to_threshold"] == 41 * 300
+
+            # Bad arguments are rejected before anything is fetched
+            mock_client.query_range.reset_mock()
+            result, _ = await handle_call_tool(
+                "forecast_metric", {"query": "x", "horizon": "soon"}
+            )
+            assert "Invalid duration: soon" in result[0].text
+            mock_client.query_range.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_analyze_histogram(self):
+        """Test analyze_histogram computes many quantiles from one bucket matrix."""
+        pytest.importorskip("numpy")
+        buckets = []
+        for le, rate in (("0.1", 1.0), ("0.5", 3.0), ("1", 4.0), ("+Inf", 4.0)):
+            series = Series(labels={"le": le})
+            series.append(1640995200, rate)
+            buckets.append(series)
+        sums, counts = Series(labels={}), Series(labels={})
+        sums.append(1640995200, 1.2)
+        counts.append(1640995200, 4.0)
+        histograms = histogram_from_buckets(buckets, [sums], [counts], 60.0)
+
+        with patch("mcp_prometheus_server.mcp_server.prometheus_client") as mock_client:
+            mock_client.query_histogram = AsyncMock(return_value=histograms)
+
+            result, content = await handle_call_tool(
+                "analyze_histogram",
+                {
+                    "metric": "latency_seconds",
+                    "quantiles": [0.5, 0.9],
+                    "type": "classic",
+                },
+            )
+
+            mock_client.query_histogram.assert_awaited_once_with(
+                "latency_seconds",
+                by=None,
+                relative_time="1h",
+                step="1m",
+                rate_window="5m",
+                native=False,
+            )
+            text = result[0].text
+            assert "Histogram 'latency_seconds' (classic): 1 of 1" in text
+            assert "Latest: p50=0.3, p90=0.8, mean=0.3" in text
+            assert content["histograms"][0]["quantiles"] == pytest.approx(
+                {"0.5": 0.3, "0.9": 0.8}
+            )
+
+            result, _ = await handle_call_tool(
+                "analyze_histogram", {"metric": "latency_seconds", "quantiles": [99]}
+            )
+            assert "Quantiles must be between 0 and 1" in result[0].text
+
+    @pytest.mark.asyncio
+    async def test_export_query(self, tmp_path):
+        """Test export_query streams the result to a file in the export dir."""
+
+        async def stream(query, relative_time, step):
+            series = Series(labels={"__name__": "up", "job": "api"})
+            series.append(1640995200, 1.0)
+            yield series
+
+        with (
+            patch("mcp_prometheus_server.mcp_server.prometheus_client") as mock_client,
+            patch("mcp_prometheus_server.mcp_server.export_dir", str(tmp_path)),
+        ):
+            mock_client.stream_range_query = stream
+
+            result, _ = await handle_call_tool(
+                "export_query",
+                {"query": "up", "format": "csv", "filename": "up-week"},
+            )
+
+            text = result[0].text
+            assert f"Exported 'up' to {tmp_path / 'up-week.csv'}" in text
+            assert "Series: 1, rows: 1" in text
+            assert (tmp_path / "up-week.csv").exists()
+
+    @pytest.mark.asyncio
+    async def test_export_query_disabled(self):
+        """Test export_query requires an export directory."""
+        with patch("mcp_prometheus_server.mcp_server.export_dir", None):
+            result, _ = await handle_call_tool("export_query", {"query": "up"})
+
+            assert "PROMETHEUS_EXPORT_DIR" in result[0].text
+
+    @pytest.mark.asyncio
+    async def test_query_metric_stores_truncated_result(self):
+        """Test that large results get a handle that browse_result can page."""
+        mock_result = {
+            "status": "success",
+            "data": {
+                "resultType": "vector",
+                "result": [
+                    {
+                        "metric": {"instance": f"server{i}"},
+                        "value": [1640995200, str(i)],
+                    }
+                    for i in range(8)
+                ],
+            },
+        }
+
+        with patch("mcp_prometheus_server.mcp_server.prometheus_client") as mock_client:
+            mock_client.query_metric = AsyncMock(return_value=mock_result)
+
+            result, _ = await handle_call_tool("query_metric", {"query": "up"})
+
+        text = result[0].text
+        assert "Result handle: r-" in text
+        handle = text.split("Result handle: ")[1].split()[0]
+
+        result, _ = await handle_call_tool(
+            "browse_result", {"handle": handle, "sort": "last", "limit": 2}
+        )
+        text = result[0].text
+        assert "series 1-2 of 8" in text
+        assert "'server7'" in text
+        assert "'server6'" in text
+        assert "... 6 more (offset=2)" in text
+
+        result, _ = await handle_call_tool("summarize_result", {"handle": handle})
+        assert "instance: 8 distinct" in result[0].text
+
+    @pytest.mark.asyncio
+    async def test_query_metric_small_result_no_handle(self):
+        """Test that results shown in full are not stored."""
+        mock_result = {
+            "status": "success",
+            "data": {
+                "resultType": "vector",
+                "result": [{"metric": {}, "value": [1640995200, "1"]}],
+            },
+        }
+
+        with patch("mcp_prometheus_server.mcp_server.prometheus_client") as mock_client:
+            mock_client.query_metric = AsyncMock(return_value=mock_result)
+
+            result, _ = await handle_call_tool("query_metric", {"query": "up"})
+
+            assert "Result handle" not in result[0].text
+
+    @pytest.mark.asyncio
+    async def test_list_available_metrics_stores_all_names(self):
+        """Test that truncated metric lists can be paged by handle."""
+        metrics = [f"metric_{i:02d}" for i in range(30)]
+
+        with patch("mcp_prometheus_server.mcp_server.prometheus_client") as mock_client:
+            mock_client.list_available_metrics = AsyncMock(return_value=metrics)
+
+            result, _ = await handle_call_tool("list_available_metrics", {})
+
+        handle = result[0].text.split("Result handle: ")[1].split()[0]
+        result, _ = await handle_call_tool(
+            "browse_result", {"handle": handle, "offset": 20, "limit": 20}
+        )
+        assert "series 21-30 of 30" in result[0].text
+        assert "metric_29" in result[0].text
+
+    @pytest.mark.asyncio
+    async def test_browse_result_unknown_handle(self):
+        """Test browse_result with an unknown handle."""
+        result, _ = await handle_call_tool("browse_result", {"handle": "r-missing"})
+
+        assert "Error: Unknown or expired result handle" in result[0].text
+
+    @pytest.mark.asyncio
+    async def test_get_alerts_filters_and_etag(self):
+        """Test alerts are filtered by label and unchanged etags are short."""
+        client = PrometheusClient()
+        alerts = [
+            {
+                "labels": {"alertname": "HighLoad", "severity": "critical", "i": "a"},
+                "state": "firing",
+                "activeAt": "2024-01-01T00:00:00Z",
+                "value": "3",
+            },
+            {
+                "labels": {"alertname": "HighLoad", "severity": "warning", "i": "b"},
+                "state": "pending",
+                "activeAt": "2024-01-01T00:01:00Z",
+                "value": "2",
+            },
+        ]
+        client.alerts_cache.update(alerts)
+
+        with patch("mcp_prometheus_server.mcp_server.prometheus_client", client):
+            result, structured = await handle_call_tool(
+                "get_alerts", {"alertname": "HighLoad", "severity": "critical"}
+            )
+            unchanged, _ = await handle_call_tool(
+                "get_alerts", {"etag": structured["etag"]}
+            )
+
+        assert result[0].text.splitlines() == [
+            "Alerts: 1 matching (1 firing, 0 pending) of 2 active; "
+            f"etag {structured['etag']}",
+            "  HighLoad [critical] firing since 2024-01-01T00:00:00Z {'i': 'a'}",
+        ]
+        assert structured["alerts"] == alerts[:1]
+        assert unchanged[0].text == f"Alerts unchanged (etag {structured['etag']})"
+
+    @pytest.mark.asyncio
+    async def test_get_rules_shows_errors(self):
+        """Test failing rules are listed with their last error."""
+        client = PrometheusClient()
+        client.rules_cache.update(
+            [
+                {
+                    "name": "job:up:sum",
+                    "type": "recording",
+                    "health": "err",
+                    "lastError": "many-to-many matching not allowed",
+                    "group": "recording",
+                },
+                {"name": "Down", "type": "alerting", "health": "ok", "group": "x"},
+            ]
+        )
+
+        with patch("mcp_prometheus_server.mcp_server.prometheus_client", client):
+            result, _ = await handle_call_tool("get_rules", {"health": "err"})
+
+        assert result[0].text.splitlines()[1:] == [
+            "  recording/job:up:sum (recording, health err)",
+            "    error: many-to-many matching not allowed",
+        ]
+
+    @pytest.mark.asyncio
+    async def test_get_targets(self):
+        """Test the target summary lists failing jobs and unhealthy targets."""
+        summary = {
+            "total": 3,
+            "up": 1,
+            "down": 2,
+            "unknown": 0,
+            "jobs": [
+                {
+                    "pool": "node",
+                    "job": "node",
+                    "total": 3,
+                    "up": 1,
+                    "down": 2,
+                    "unknown": 0,
+                    "avg_scrape_seconds": 0.004,
+                    "max_scrape_seconds": 0.012,
+                    "errors": {"connection refused": 2},
+                }
+            ],
+            "unhealthy": [
+                {
+                    "pool": "node",
+                    "job": "node",
+                    "instance": f"{name}:9100",
+                    "health": "down",
+                    "last_error": "connection refused",
+                    "last_scrape": None,
+                    "scrape_seconds": 0.0,
+                }
+                for name in ("b", "c")
+            ],
+            "unhealthy_total": 2,
+        }
+
+        with patch("mcp_prometheus_server.mcp_server.prometheus_client") as mock_client:
+            mock_client.get_target_health = AsyncMock(return_value=summary)
+
+            result, structured = await handle_call_tool(
+                "get_targets", {"job": "node", "limit": 1}
+            )
+
+        assert result[0].text.splitlines() == [
+            "Targets: 3 total, 1 up, 2 down, 0 unknown across 1 jobs",
+            "  node: 1/3 up, scrape avg 4ms, max 12ms",
+            "    2x connection refused",
+            "Unhealthy targets (2):",
+            "  node b:9100 down: connection refused",
+            "  ... and 1 more",
+        ]
+        assert structured["unhealthy_total"] == 2
+
+    @pytest.mark.asyncio
+    async def test_tenant_argument(self):
+        """Test tool calls run for an allowed tenant and reject others."""
+        seen = []
+
+        async def list_metrics(pattern=None):
+            seen.append(current_tenant())
+            return ["up"]
+
+        with (
+            patch("mcp_prometheus_server.mcp_server.prometheus_client") as mock_client,
+            patch("mcp_prometheus_server.mcp_server.allowed_tenants", {"team-a"}),
+        ):
+            mock_client.list_available_metrics = list_metrics
+
+            tools = await handle_list_tools()
+            await handle_call_tool("list_available_metrics", {"tenant": "team-a"})
+            result, _ = await handle_call_tool(
+                "list_available_metrics", {"tenant": "team-b"}
+            )
+
+        assert all("tenant" in tool.inputSchema["properties"] for tool in tools)
+        assert seen == ["team-a"]
+        assert result[0].text == "Error: Tenant not allowed: team-b"
+
+    def test_apply_config(self):
+        """Test a changed file updates the live server or nothing at all."""
+        module = "mcp_prometheus_server.mcp_server"
+        with (
+            patch(f"{module}.prometheus_client") as mock_client,
+            patch(f"{module}.result_store") as mock_store,
+            patch(f"{module}.subscription_manager"),
+            patch.multiple(
+                module,
+                config=mcp_server.config,
+                client_settings=mcp_server.client_settings,
+                server_settings=mcp_server.server_settings,
+                allowed_tenants=set(),
+                tool_timeout=60.0,
+                tool_deadlines=mcp_server.tool_deadlines,
+                export_dir=None,
+            ),
+        ):
+            mock_client.reconfigure.return_value = ["results_cache_ttl"]
+
+            changed = apply_config(
+                {
+                    "PROMETHEUS_RESULTS_CACHE_TTL": "30",
+                    "PROMETHEUS_TOOL_TIMEOUT": "2m",
+                    "PROMETHEUS_TENANTS": "team-a",
+                }
+            )
+
+            assert changed == ["results_cache_ttl", "allowed_tenants", "tool_timeout"]
+            settings = mock_client.reconfigure.call_args.kwargs
+            assert settings["results_cache_ttl"] == 30.0
+            assert mcp_server.tool_timeout == 120.0
+            assert mcp_server.allowed_tenants == {"team-a"}
+            mock_store.resize.assert_called_once_with(
+                mcp_server.server_settings["result_store_bytes"]
+            )
+
+            with pytest.raises(ValueError):
+                apply_config({"PROMETHEUS_MAX_CONCURRENCY": "many"})
+            assert mcp_server.tool_timeout == 120.0
+            assert mock_client.reconfigure.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_get_server_stats(self):
+        """Test get_server_stats reports wire and decoded bytes."""
+        stats = {
+            "transfer": {
+                "/api/v1/query_range": {
+                    "requests": 3,
+                    "wire_bytes": 2048,
+                    "decoded_bytes": 3 * 1024 * 1024,
+                    "ratio": 1536.0,
+                    "encodings": {"gzip": 3},
+                }
+            },
+            "results_cache": {"entries": 2, "hits": 1, "misses": 3},
+            "upstream": {
+                "limit": 10,
+                "in_use": 1,
+                "waiting": 4,
+                "classes": {
+                    "batch": {
+                        "weight": 3.0,
+                        "queued": 4,
+                        "admitted": 7,
+                        "avg_wait_ms": 120.4,
+                        "max_wait_ms": 900.0,
+                    }
+                },
+            },
+            "aborted": {"/api/v1/query": {"requests": 2, "seconds": 12.5}},
+        }
+
+        with patch("mcp_prometheus_server.mcp_server.prometheus_client") as mock_client:
+            mock_client.get_stats = Mock(return_value=stats)
+
+            result, _ = await handle_call_tool("get_server_stats", {})
+
+            text = result[0].text
+            assert (
+                "/api/v1/query_range: 3 requests, 2.0 KiB wire, 3.0 MiB decoded" in text
+            )
+            assert "gzip x3" in text
+            assert "25% hit rate" in text
+            assert "/api/v1/query: 2 requests, 12.5s of upstream time" in text
+            assert "1/10 in flight, 4 waiting" in text
+            assert (
+                "batch (weight 3): 4 queued, 7 admitted, avg wait 120ms, max 900ms"
+                in text
+            )
+
+    @pytest.mark.asyncio
+    async def test_shaped_query_is_noted(self):
+        """Test a query shaped by the cost estimator is reported."""
+        plan = shape_query(parse_promql("up"), 86400, 60, 1000, 10 * 1024 * 1024)
+
+        async def shaped_query(query, relative_time, **kwargs):
+            record_plan(plan)
+            return {"status": "success", "data": {"resultType": "matrix", "result": []}}
+
+        with patch("mcp_prometheus_server.mcp_server.prometheus_client") as mock_client:
+            mock_client.query_metric = shaped_query
+
+            result, structured = await handle_call_tool("query_metric", {"query": "up"})
+
+        text = result[0].text
+        assert "Note: query downsampled" in text
+        assert "1000 series x 1441 points at step 1m" in text
+        assert "step raised to 5m" in text
+        assert structured["shaping"][0]["action"] == "downsample"
+        assert structured["shaping"][0]["step"] == "5m"
+
+    @pytest.mark.asyncio
+    async def test_tool_priority_and_session(self):
+        """Test tool calls run under their priority class and session."""
+        seen = {}
+
+        async def fake_query(query, relative_time, **kwargs):
+            seen[query] = (current_priority(), current_session())
+            return {"resultType": "vector", "result": []}
+
+        with patch("mcp_prometheus_server.mcp_server.prometheus_client") as mock_client:
+            mock_client.query_metric = fake_query
+
+            await handle_call_tool("query_metric", {"query": "up"})
+            with patch.dict(
+                "mcp_prometheus_server.mcp_server.TOOL_PRIORITIES",
+                {"query_metric": Priority.BATCH},
+            ):
+                await handle_call_tool("query_metric", {"query": "down"})
+
+        assert seen["up"] == (Priority.INTERACTIVE, "default")
+        assert seen["down"] == (Priority.BATCH, "default")
+
+    @pytest.mark.asyncio
+    async def test_tool_deadline_cancels_call(self):
+        """Test that a tool call past its deadline is cancelled and reported."""
+        cancelled = asyncio.Event()
+
+        async def hanging_query(query, relative_time, **kwargs):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        with (
+            patch("mcp_prometheus_server.mcp_server.prometheus_client") as mock_client,
+            patch.dict(
+                "mcp_prometheus_server.mcp_server.tool_deadlines",
+                {"query_metric": 0.05},
+            ),
+        ):
+            mock_client.query_metric = hanging_query
+
+            result, _ = await handle_call_tool("query_metric", {"query": "up"})
+
+            assert "did not finish within 50ms" in result[0].text
+            assert cancelled.is_set()
+
     @pytest.mark.asyncio
     async def test_unknown_tool(self):
         """Test handling of unknown tool."""
-        result = await handle_call_tool("unknown_tool", {"param": "value"})
+        result, _ = await handle_call_tool("unknown_tool", {"param": "value"})
 
         assert len(result) == 1
         assert result[0].type == "text"
@@ -290,7 +1152,7 @@ class TestMCPToolCalls:
     @pytest.mark.asyncio
     async def test_tool_call_with_none_arguments(self):
         """Test tool call with None arguments."""
-        result = await handle_call_tool("query_metric", None)
+        result, _ = await handle_call_tool("query_metric", None)
 
         assert len(result) == 1
         assert result[0].type == "text"
@@ -305,12 +1167,15 @@ class TestMCPToolCalls:
                 side_effect=Exception("Connection failed")
             )
 
-            result = await handle_call_tool("query_metric", {"query": "cpu_usage"})
+            result, structured = await handle_call_tool(
+                "query_metric", {"query": "cpu_usage"}
+            )
 
             assert len(result) == 1
             assert result[0].type == "text"
             assert "Error:" in result[0].text
             assert "Connection failed" in result[0].text
+            assert structured is None
 
 
 class TestFormatQueryResult:
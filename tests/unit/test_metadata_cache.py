@@ -0,0 +1,99 @@
+"""
+Tests for metadata_cache module.
+
+Covers indexing, derived series lookup, searching, expiry and the name index.
+"""
+
+import pytest
+
+from mcp_prometheus_server.metadata_cache import MetricMetadataCache
+
+SAMPLE_METADATA = {
+    "http_requests_total": [
+        {"type": "counter", "help": "Total HTTP requests.", "unit": ""}
+    ],
+    "http_request_duration_seconds": [
+        {"type": "histogram", "help": "Request latency.", "unit": "seconds"}
+    ],
+    "node_memory_free_bytes": [
+        {"type": "gauge", "help": "Free memory.", "unit": "bytes"},
+        {"type": "untyped", "help": "Conflicting target.", "unit": ""},
+    ],
+    "empty_metric": [],
+}
+
+
+class TestMetricMetadataCache:
+    """Test cases for MetricMetadataCache."""
+
+    def test_new_cache_is_stale(self):
+        """Test that an unloaded cache reports stale."""
+        cache = MetricMetadataCache()
+
+        assert cache.is_stale()
+        assert len(cache) == 0
+
+    def test_update_indexes_entries(self):
+        """Test that update loads entries and uses the first item."""
+        cache = MetricMetadataCache()
+        cache.update(SAMPLE_METADATA)
+
+        assert not cache.is_stale()
+        assert len(cache) == 3
+        assert cache.get("node_memory_free_bytes") == {
+            "type": "gauge",
+            "help": "Free memory.",
+            "unit": "bytes",
+        }
+        assert cache.get("empty_metric") is None
+
+    def test_get_resolves_derived_series(self):
+        """Test that histogram series resolve to their parent metric."""
+        cache = MetricMetadataCache()
+        cache.update(SAMPLE_METADATA)
+
+        entry = cache.get("http_request_duration_seconds_bucket")
+
+        assert entry is not None
+        assert entry["type"] == "histogram"
+        assert cache.get("unknown_metric_bucket") is None
+
+    def test_search_by_pattern_and_type(self):
+        """Test searching by regex and by metric type."""
+        cache = MetricMetadataCache()
+        cache.update(SAMPLE_METADATA)
+
+        assert list(cache.search(pattern="http_.*")) == [
+            "http_request_duration_seconds",
+            "http_requests_total",
+        ]
+        assert list(cache.search(metric_type="counter")) == ["http_requests_total"]
+        assert cache.search(pattern="http_.*", metric_type="gauge") == {}
+
+    def test_search_invalid_pattern(self):
+        """Test that an invalid regex raises ValueError."""
+        cache = MetricMetadataCache()
+        cache.update(SAMPLE_METADATA)
+
+        with pytest.raises(ValueError, match="Invalid metric pattern"):
+            cache.search(pattern="(")
+
+    def test_zero_ttl_is_always_stale(self):
+        """Test that a zero TTL forces a refresh on every access."""
+        cache = MetricMetadataCache(ttl=0)
+        cache.update(SAMPLE_METADATA)
+
+        assert cache.is_stale()
+
+    def test_name_index(self):
+        """Test the name index is kept apart from metadata and matched fully."""
+        cache = MetricMetadataCache()
+        assert cache.names_stale()
+
+        cache.update_names(["up", "http_requests_total", "up"])
+
+        assert not cache.names_stale()
+        assert cache.is_stale()
+        assert cache.match_names() == ["http_requests_total", "up"]
+        assert cache.match_names("u") == []
+        assert cache.match_names("u.*") == ["up"]
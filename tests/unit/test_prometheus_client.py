@@ -6,12 +6,30 @@ Comprehensive tests covering Prometheus client functionality,
 relative time parsing, and error handling.
 """
 
-from datetime import datetime, timedelta
+import asyncio
+import json
+import math
+import time
+from array import array
+from datetime import datetime, timedelta, timezone
 from unittest.mock import Mock, patch
 
+import httpx
 import pytest
 
+from mcp_prometheus_server.columnar import Series
+from mcp_prometheus_server.cost import collect_plans
+from mcp_prometheus_server.cursors import HistoryCursor
+from mcp_prometheus_server.deadlines import deadline
 from mcp_prometheus_server.prometheus_client import PrometheusClient
+from mcp_prometheus_server.promql import escape_regex
+from mcp_prometheus_server.tenants import request_tenant
+from mcp_prometheus_server.warmup import Capabilities
+
+
+def _instance_pattern(query):
+    """Extract the unquoted instance regex from a built selector."""
+    return json.loads(query[query.index("=~") + 2 : -1])
 
 
 class TestPrometheusClient:
@@ -131,6 +149,56 @@ class TestPrometheusClient:
 
         assert start_time == expected
 
+    @pytest.mark.parametrize(
+        ("relative_time", "expected"),
+        [
+            ("90s", timedelta(seconds=90)),
+            ("1h30m", timedelta(minutes=90)),
+            ("1d12h", timedelta(hours=36)),
+            ("500ms", timedelta(milliseconds=500)),
+            ("1y", timedelta(days=365)),
+        ],
+    )
+    def test_parse_relative_time_compound(self, relative_time, expected):
+        """Test Prometheus duration syntax, including compound forms."""
+        client = PrometheusClient()
+        end_time = datetime(2024, 1, 1, 12, 0, 0)
+
+        assert client._parse_relative_time(relative_time, end_time) == (
+            end_time - expected
+        )
+
+    @pytest.mark.parametrize("relative_time", ["5mo", "30m1h", "1.5h", "h", ""])
+    def test_parse_relative_time_rejects_partial_match(self, relative_time):
+        """Test that only whole valid durations are accepted."""
+        client = PrometheusClient()
+
+        with pytest.raises(ValueError, match="Invalid relative time format"):
+            client._parse_relative_time(relative_time, datetime(2024, 1, 1))
+
+    def test_time_window_aligned(self):
+        """Test that windows end on the alignment grid, in UTC."""
+        client = PrometheusClient(time_alignment="15s")
+
+        with patch("mcp_prometheus_server.prometheus_client.time.time") as now:
+            now.return_value = 1699999807.9
+            start_time, end_time = client._time_window("5m")
+            now.return_value = 1699999814.2
+            assert client._time_window("5m") == (start_time, end_time)
+
+            assert end_time.tzinfo == timezone.utc
+            assert end_time.timestamp() == 1699999800
+            assert start_time.timestamp() == 1699999800 - 300
+
+            # Range queries align to their step when it is coarser
+            _, end_time = client._time_window("1d", "1h")
+            assert end_time.timestamp() == 1699999200
+
+    def test_invalid_time_alignment(self):
+        """Test that the alignment must be a duration."""
+        with pytest.raises(ValueError, match="Invalid duration"):
+            PrometheusClient(time_alignment="soon")
+
     @pytest.mark.asyncio
     async def test_query_metric_success(self):
         """Test successful metric query."""
@@ -172,6 +240,146 @@ class TestPrometheusClient:
             with pytest.raises(Exception):
                 await client.query_metric("invalid query", "5m")
 
+    @pytest.mark.asyncio
+    async def test_query_metric_rejects_invalid_promql_locally(self):
+        """Test syntax errors are raised without calling Prometheus."""
+        client = PrometheusClient()
+
+        with patch.object(client.http_client, "get") as mock_get:
+            with pytest.raises(ValueError, match="Invalid PromQL"):
+                await client.query_metric("sum(rate(x[5m])", "5m")
+
+            mock_get.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_query_metric_coalesces_equivalent_queries(self):
+        """Test concurrent queries with the same canonical form share a request."""
+        client = PrometheusClient()
+
+        mock_response = {"status": "success", "data": {"result": []}}
+
+        async def slow_get(*args, **kwargs):
+            await asyncio.sleep(0.01)
+            mock_response_obj = Mock()
+            mock_response_obj.json.return_value = mock_response
+            mock_response_obj.raise_for_status.return_value = None
+            return mock_response_obj
+
+        with patch.object(client.http_client, "get", side_effect=slow_get) as mock_get:
+            results = await asyncio.gather(
+                client.query_metric('up{job="a",instance="b"}', "5m"),
+                client.query_metric('up{instance="b", job="a"}', "5m"),
+            )
+
+            assert results[0] == results[1] == mock_response
+            assert mock_get.call_count == 1
+            assert not client._inflight
+
+    @pytest.mark.asyncio
+    async def test_abandoned_query_cancelled_upstream(self):
+        """Test that the upstream request stops once no caller waits for it."""
+        client = PrometheusClient()
+        upstream = {}
+
+        async def hanging_get(*args, **kwargs):
+            upstream["started"] = True
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                upstream["cancelled"] = True
+                raise
+
+        with patch.object(client.http_client, "get", side_effect=hanging_get):
+            first = asyncio.create_task(client.query_metric("up", "5m"))
+            second = asyncio.create_task(client.query_metric("up", "5m"))
+            await asyncio.sleep(0.01)
+
+            # One caller leaving does not affect the shared request
+            first.cancel()
+            await asyncio.sleep(0.01)
+            assert "cancelled" not in upstream
+
+            second.cancel()
+            await asyncio.sleep(0.01)
+            assert upstream["cancelled"]
+            assert not client._inflight
+            assert not client._inflight_callers
+
+        aborted = client.get_stats()["aborted"]
+        assert aborted["/api/v1/query_range"]["requests"] == 1
+
+    @pytest.mark.asyncio
+    async def test_deadline_sent_as_query_timeout(self):
+        """Test that the remaining tool deadline becomes Prometheus' timeout."""
+        client = PrometheusClient()
+
+        with patch.object(client.http_client, "get") as mock_get:
+            mock_response_obj = Mock()
+            mock_response_obj.json.return_value = {"status": "success", "data": {}}
+            mock_response_obj.raise_for_status.return_value = None
+            mock_get.return_value = mock_response_obj
+
+            with deadline(30):
+                await client.query_metric("up", "5m")
+
+            assert mock_get.call_args.kwargs["params"]["timeout"] == "30s"
+
+    @pytest.mark.asyncio
+    async def test_query_metric_served_from_cache(self):
+        """Test repeated queries within the cache TTL skip Prometheus."""
+        client = PrometheusClient()
+
+        mock_response = {"status": "success", "data": {"result": []}}
+
+        with patch.object(client.http_client, "get") as mock_get:
+            mock_response_obj = Mock()
+            mock_response_obj.json.return_value = mock_response
+            mock_response_obj.raise_for_status.return_value = None
+            mock_get.return_value = mock_response_obj
+
+            await client.query_metric("up", "5m")
+            result = await client.query_metric("up ", "5m")
+
+            assert result == mock_response
+            assert mock_get.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_warm_query_populates_cache(self):
+        """Test warmed queries are served to interactive calls from cache."""
+        client = PrometheusClient(results_cache_ttl=0)
+
+        mock_response = {"status": "success", "data": {"result": []}}
+
+        with patch.object(client.http_client, "get") as mock_get:
+            mock_response_obj = Mock()
+            mock_response_obj.json.return_value = mock_response
+            mock_response_obj.raise_for_status.return_value = None
+            mock_get.return_value = mock_response_obj
+
+            await client.warm_query("up == 0", "5m", ttl=60)
+            result = await client.query_metric("up==0", "5m")
+
+            assert result == mock_response
+            assert mock_get.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_failed_results_are_not_cached(self):
+        """Test error responses are not served from cache."""
+        client = PrometheusClient()
+
+        mock_response = {"status": "error", "error": "query timed out"}
+
+        with patch.object(client.http_client, "get") as mock_get:
+            mock_response_obj = Mock()
+            mock_response_obj.json.return_value = mock_response
+            mock_response_obj.raise_for_status.return_value = None
+            mock_get.return_value = mock_response_obj
+
+            await client.query_metric("up", "5m")
+            await client.query_metric("up", "5m")
+
+            assert mock_get.call_count == 2
+
     @pytest.mark.asyncio
     async def test_get_instance_value_success(self):
         """Test successful instance value retrieval."""
@@ -220,6 +428,90 @@ class TestPrometheusClient:
 
             assert value is None
 
+    @pytest.mark.asyncio
+    async def test_get_instance_value_escapes_label_value(self):
+        """Test that quotes in the instance do not break out of the matcher."""
+        client = PrometheusClient()
+
+        with patch.object(client.http_client, "get") as mock_get:
+            mock_response_obj = Mock()
+            mock_response_obj.json.return_value = {
+                "status": "success",
+                "data": {"resultType": "vector", "result": []},
+            }
+            mock_response_obj.raise_for_status.return_value = None
+            mock_get.return_value = mock_response_obj
+
+            await client.get_instance_value("up", 'a"} or vector(1) #', "5m")
+
+            query = mock_get.call_args.kwargs["params"]["query"]
+            assert query == 'up{instance="a\\"} or vector(1) #"}'
+
+    @pytest.mark.asyncio
+    async def test_get_instance_values_chunked(self):
+        """Test that many instances are fetched with few regex queries."""
+        client = PrometheusClient()
+        instances = [f"web-{i:02d}.example:9100" for i in range(10)]
+
+        def respond(endpoint, params):
+            pattern = _instance_pattern(params["query"])
+            result = [
+                {
+                    "metric": {"instance": instance},
+                    "value": [1640995200, str(index)],
+                }
+                for index, instance in enumerate(instances)
+                if escape_regex(instance) in pattern.split("|") and index != 3
+            ]
+            response = Mock()
+            response.json.return_value = {
+                "status": "success",
+                "data": {"resultType": "vector", "result": result},
+            }
+            response.raise_for_status.return_value = None
+            return response
+
+        with patch.object(client.http_client, "get", side_effect=respond) as mock_get:
+            values = await client.get_instance_values(
+                "node_load1", instances, max_pattern_length=100
+            )
+
+            assert mock_get.call_count == 3
+            for call in mock_get.call_args_list:
+                assert len(_instance_pattern(call.kwargs["params"]["query"])) <= 100
+            assert list(values) == sorted(instances)
+            assert values["web-00.example:9100"] == 0.0
+            assert values["web-09.example:9100"] == 9.0
+            assert values["web-03.example:9100"] is None
+
+    @pytest.mark.asyncio
+    async def test_get_instance_values_regex(self):
+        """Test that a regex is passed through as one matcher."""
+        client = PrometheusClient()
+
+        with patch.object(client.http_client, "get") as mock_get:
+            mock_response_obj = Mock()
+            mock_response_obj.json.return_value = {
+                "status": "success",
+                "data": {
+                    "resultType": "vector",
+                    "result": [
+                        {"metric": {"instance": "b"}, "value": [1, "2"]},
+                        {"metric": {"instance": "a"}, "value": [1, "1"]},
+                    ],
+                },
+            }
+            mock_response_obj.raise_for_status.return_value = None
+            mock_get.return_value = mock_response_obj
+
+            values = await client.get_instance_values("up", instance_regex="a|b")
+
+            assert mock_get.call_args.kwargs["params"]["query"] == 'up{instance=~"a|b"}'
+            assert values == {"a": 1.0, "b": 2.0}
+
+        with pytest.raises(ValueError, match="instances or instance_regex"):
+            await client.get_instance_values("up")
+
     @pytest.mark.asyncio
     async def test_get_metric_history_success(self):
         """Test successful metric history retrieval."""
@@ -276,22 +568,333 @@ class TestPrometheusClient:
             assert len(history) == 0
 
     @pytest.mark.asyncio
-    async def test_list_available_metrics_success(self):
-        """Test successful metrics listing."""
+    async def test_get_metric_history_cursor_fetches_tail(self):
+        """Test a cursor limits the range query and result to unseen samples."""
         client = PrometheusClient()
+        base = math.floor(time.time() / 60) * 60 - 600
+        labels = {"__name__": "cpu_usage", "instance": "server1"}
+        cursor = HistoryCursor.for_query("cpu_usage", "1m").advance(
+            [Series(labels=labels, timestamps=array("d", [base, base + 60]))]
+        )
 
         mock_response = {
             "status": "success",
             "data": {
-                "resultType": "vector",
+                "resultType": "matrix",
+                "result": [
+                    {
+                        "metric": labels,
+                        "values": [[base + 60, "1"], [base + 120, "2"]],
+                    },
+                    {"metric": {"instance": "new"}, "values": [[base + 120, "3"]]},
+                ],
+            },
+        }
+
+        with patch.object(client.http_client, "get") as mock_get:
+            mock_response_obj = Mock()
+            mock_response_obj.json.return_value = mock_response
+            mock_response_obj.raise_for_status.return_value = None
+            mock_get.return_value = mock_response_obj
+
+            history = await client.get_metric_history(
+                "cpu_usage", "1h", "1m", cursor=cursor
+            )
+
+            params = mock_get.call_args.kwargs["params"]
+            assert params["start"] == base + 120
+            assert [(point["timestamp"], point["value"]) for point in history] == [
+                (base + 120, 2.0),
+                (base + 120, 3.0),
+            ]
+
+            with pytest.raises(ValueError, match="different query or step"):
+                await client.get_metric_history("cpu_usage", "1h", "5m", cursor=cursor)
+
+    @pytest.mark.asyncio
+    async def test_alerts_snapshot_is_shared(self):
+        """Test concurrent and repeated alert reads cost one fetch."""
+        client = PrometheusClient(snapshot_ttl=60)
+        alert = {"labels": {"alertname": "Down"}, "state": "firing"}
+
+        async def fake_get(endpoint, **kwargs):
+            await asyncio.sleep(0)
+            response = Mock()
+            response.json.return_value = {
+                "status": "success",
+                "data": {"alerts": [alert]},
+            }
+            return response
+
+        with patch.object(client.http_client, "get", side_effect=fake_get) as mock_get:
+            results = await asyncio.gather(
+                *(client.get_alerts({"alertname": "Down"}) for _ in range(5))
+            )
+            await client.get_alerts()
+
+            assert mock_get.call_count == 1
+            assert results[0] == [alert]
+            assert client.get_stats()["snapshots"]["alerts"]["reads"] == 6
+
+            # A failed refresh keeps serving the last snapshot
+            client.alerts_cache.loaded_at = 0.0
+            mock_get.side_effect = httpx.ConnectError("down")
+            assert await client.get_alerts() == [alert]
+
+    @pytest.mark.asyncio
+    async def test_query_range_columnar(self):
+        """Test range query results are returned as columnar series."""
+        client = PrometheusClient()
+
+        mock_response = {
+            "status": "success",
+            "data": {
+                "resultType": "matrix",
                 "result": [
-                    {"metric": {"__name__": "cpu_usage"}},
-                    {"metric": {"__name__": "memory_usage"}},
-                    {"metric": {"__name__": "disk_usage"}},
+                    {
+                        "metric": {"job": "api"},
+                        "values": [[1640995200, "1"], [1640995260, "2.5"]],
+                    }
                 ],
             },
         }
 
+        with patch.object(client.http_client, "get") as mock_get:
+            mock_response_obj = Mock()
+            mock_response_obj.json.return_value = mock_response
+            mock_response_obj.raise_for_status.return_value = None
+            mock_get.return_value = mock_response_obj
+
+            series_list = await client.query_range("rate(x[5m])", "1h", "1m")
+
+            assert series_list[0].labels == {"job": "api"}
+            assert list(series_list[0].values) == [1.0, 2.5]
+            assert mock_get.call_args.kwargs["params"]["step"] == "1m"
+
+            # Second call is served from the results cache
+            await client.query_range("rate(x[5m])", "1h", "1m")
+            assert mock_get.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_query_range_many_batches_names(self):
+        """Test that metric names are fetched with few __name__ regex queries."""
+        client = PrometheusClient()
+        names = [f"metric_{i:02d}" for i in range(6)]
+        queries = [*names, 'a{job="x"}', 'b{job="x"}', "rate(c[5m])"]
+
+        def respond(endpoint, params):
+            query = params["query"]
+            if query.startswith('{__name__=~"'):
+                pattern = query.split('"')[1]
+                labels = [{"__name__": name} for name in pattern.split("|")]
+                if "job" in query:
+                    labels = [{**entry, "job": "x"} for entry in labels]
+            else:
+                labels = [{}]
+            response = Mock()
+            response.json.return_value = {
+                "status": "success",
+                "data": {
+                    "resultType": "matrix",
+                    "result": [
+                        {"metric": entry, "values": [[1640995200, "1"]]}
+                        for entry in labels
+                    ],
+                },
+            }
+            response.raise_for_status.return_value = None
+            return response
+
+        with patch.object(client.http_client, "get", side_effect=respond) as mock_get:
+            pairs = await client.query_range_many(
+                queries, "1h", "1m", max_pattern_length=20
+            )
+
+            sent = sorted(
+                call.kwargs["params"]["query"] for call in mock_get.call_args_list
+            )
+            assert sent == [
+                "rate(c[5m])",
+                '{__name__=~"a|b",job="x"}',
+                '{__name__=~"metric_00|metric_01"}',
+                '{__name__=~"metric_02|metric_03"}',
+                '{__name__=~"metric_04|metric_05"}',
+            ]
+            assert sorted(source for source, _ in pairs) == sorted(queries)
+
+    @pytest.mark.asyncio
+    async def test_query_histogram_falls_back_to_native(self):
+        """Test that the bucket matrix is fetched once, then native is tried."""
+        pytest.importorskip("numpy")
+        client = PrometheusClient()
+        native = {
+            "metric": {"job": "api"},
+            "histograms": [
+                [
+                    1640995200,
+                    {"count": "2", "sum": "3", "buckets": [[0, "1", "2", "2"]]},
+                ]
+            ],
+        }
+
+        def respond(endpoint, params):
+            # Only the native query has data
+            suffixes = ("_bucket{", "_sum{", "_count{")
+            classic = any(suffix in params["query"] for suffix in suffixes)
+            result = [] if classic else [native]
+            response = Mock()
+            response.json.return_value = {
+                "status": "success",
+                "data": {"resultType": "matrix", "result": result},
+            }
+            response.raise_for_status.return_value = None
+            return response
+
+        with patch.object(client.http_client, "get", side_effect=respond) as mock_get:
+            histograms = await client.query_histogram(
+                'latency_seconds_bucket{job="api"}', by=["job"]
+            )
+
+            sent = [call.kwargs["params"]["query"] for call in mock_get.call_args_list]
+            assert sent == [
+                'sum by (job, le) (rate(latency_seconds_bucket{job="api"}[5m]))',
+                'sum by (job) (rate(latency_seconds_sum{job="api"}[5m]))',
+                'sum by (job) (rate(latency_seconds_count{job="api"}[5m]))',
+                'sum by (job) (rate(latency_seconds{job="api"}[5m]))',
+            ]
+            assert histograms.native
+            assert histograms.groups == [{"job": "api"}]
+
+            with pytest.raises(ValueError, match="metric name"):
+                await client.query_histogram("rate(latency_seconds_bucket[5m])")
+
+            # No native fallback where warmup found them disabled
+            client.capabilities = Capabilities(flavor="prometheus")
+            mock_get.reset_mock()
+            histograms = await client.query_histogram("size_bytes")
+            assert mock_get.call_count == 3
+            assert not histograms.native
+
+    @staticmethod
+    def _cost_responses(mock_get, series_count):
+        """Answer count() queries with a series count, range queries empty."""
+
+        def respond(endpoint, params=None):
+            response = Mock()
+            response.raise_for_status.return_value = None
+            if endpoint == "/api/v1/query":
+                result = [{"metric": {}, "value": [1700000000, str(series_count)]}]
+                response.json.return_value = {
+                    "status": "success",
+                    "data": {"resultType": "vector", "result": result},
+                }
+            else:
+                response.json.return_value = {
+                    "status": "success",
+                    "data": {"resultType": "matrix", "result": []},
+                }
+            return response
+
+        mock_get.side_effect = respond
+
+    @pytest.mark.asyncio
+    async def test_expensive_history_is_downsampled(self):
+        """Test a range query over budget is sent with a coarser step."""
+        client = PrometheusClient(max_query_bytes=10 * 1024 * 1024)
+
+        with patch.object(client.http_client, "get") as mock_get:
+            self._cost_responses(mock_get, 1000)
+
+            await client.get_metric_history("up", "24h", "1m")
+
+            count_call, range_call = mock_get.call_args_list
+            assert count_call.kwargs["params"]["query"] == "count(up)"
+            assert range_call.kwargs["params"]["query"] == "up"
+            assert range_call.kwargs["params"]["step"] == "5m"
+
+            # Series counts are cached for later estimates
+            await client.get_metric_history("up", "12h", "1m")
+            assert mock_get.call_count == 3
+
+    @pytest.mark.asyncio
+    async def test_history_cursor_follows_shaped_query(self):
+        """Test a cursor must be issued for the query as cost shaping runs it."""
+        client = PrometheusClient(max_query_bytes=10 * 1024 * 1024)
+        base = math.floor(time.time() / 300) * 300 - 600
+        series = [Series(labels={"__name__": "up"}, timestamps=array("d", [base]))]
+
+        with patch.object(client.http_client, "get") as mock_get:
+            self._cost_responses(mock_get, 1000)
+
+            shaped = HistoryCursor.for_query("up", "5m").advance(series)
+            await client.get_metric_history("up", "24h", "1m", cursor=shaped)
+
+            params = mock_get.call_args.kwargs["params"]
+            assert params["step"] == "5m"
+            assert params["start"] == base + 300
+
+            unshaped = HistoryCursor.for_query("up", "1m").advance(series)
+            with pytest.raises(ValueError, match="different query or step"):
+                await client.get_metric_history("up", "24h", "1m", cursor=unshaped)
+
+    @pytest.mark.asyncio
+    async def test_expensive_query_is_aggregated_and_recorded(self):
+        """Test too many series are summed by the requested labels."""
+        client = PrometheusClient(max_query_bytes=1024 * 1024)
+
+        with patch.object(client.http_client, "get") as mock_get:
+            self._cost_responses(mock_get, 200000)
+
+            with collect_plans() as plans:
+                await client.query_metric(
+                    "rate(x[5m])", "1h", "1m", aggregate_by=["job"]
+                )
+
+            queries = [
+                call.kwargs["params"]["query"] for call in mock_get.call_args_list
+            ]
+            assert queries[0] == "count(x)"
+            assert queries[1] == "count(count by (job) (rate(x[5m])))"
+            assert "sum by (job) (rate(x[5m]))" in queries[2]
+            assert plans[0].action == "aggregate"
+
+    @pytest.mark.asyncio
+    async def test_expensive_query_refused(self):
+        """Test a query over budget is refused when the policy says so."""
+        client = PrometheusClient(max_query_bytes=1024, cost_fallback="refuse")
+
+        with patch.object(client.http_client, "get") as mock_get:
+            self._cost_responses(mock_get, 1000)
+
+            with pytest.raises(ValueError, match="Query refused"):
+                await client.query_metric("up", "1h")
+
+            endpoints = [call.args[0] for call in mock_get.call_args_list]
+            assert "/api/v1/query_range" not in endpoints
+
+    @pytest.mark.asyncio
+    async def test_cost_estimate_failure_runs_query(self):
+        """Test a failed series count does not block the query."""
+        client = PrometheusClient(max_query_bytes=1024)
+
+        with patch.object(client, "query_instant", side_effect=Exception("down")):
+            assert await client.plan_range_query("up", "1h", "1m") is None
+
+    def test_invalid_cost_fallback(self):
+        """Test unknown cost fallbacks are rejected."""
+        with pytest.raises(ValueError, match="Invalid cost fallback"):
+            PrometheusClient(cost_fallback="drop")
+
+    @pytest.mark.asyncio
+    async def test_list_available_metrics_success(self):
+        """Test metric names are loaded once into the name index."""
+        client = PrometheusClient()
+
+        mock_response = {
+            "status": "success",
+            "data": ["cpu_usage", "memory_usage", "disk_usage"],
+        }
+
         with patch.object(client.http_client, "get") as mock_get:
             mock_response_obj = Mock()
             mock_response_obj.json.return_value = mock_response
@@ -299,24 +902,69 @@ class TestPrometheusClient:
             mock_get.return_value = mock_response_obj
 
             metrics = await client.list_available_metrics()
+            again = await client.list_available_metrics()
 
-            assert len(metrics) == 3
-            assert "cpu_usage" in metrics
-            assert "memory_usage" in metrics
-            assert "disk_usage" in metrics
+            assert metrics == again == ["cpu_usage", "disk_usage", "memory_usage"]
+            mock_get.assert_called_once_with("/api/v1/label/__name__/values")
 
     @pytest.mark.asyncio
     async def test_list_available_metrics_with_pattern(self):
         """Test metrics listing with pattern filter."""
         client = PrometheusClient()
 
+        mock_response = {
+            "status": "success",
+            "data": ["cpu_usage", "cpu_temperature", "memory_usage"],
+        }
+
+        with patch.object(client.http_client, "get") as mock_get:
+            mock_response_obj = Mock()
+            mock_response_obj.json.return_value = mock_response
+            mock_response_obj.raise_for_status.return_value = None
+            mock_get.return_value = mock_response_obj
+
+            metrics = await client.list_available_metrics("cpu.*")
+
+            assert metrics == ["cpu_temperature", "cpu_usage"]
+            with pytest.raises(ValueError, match="Invalid metric pattern"):
+                await client.list_available_metrics("cpu[")
+
+    @pytest.mark.asyncio
+    async def test_metric_names_limit_when_supported(self):
+        """Test the name index asks for a limit only where it is supported."""
+        client = PrometheusClient()
+        client.capabilities = Capabilities(flavor="prometheus", supports_limit=True)
+
+        with patch.object(client.http_client, "get") as mock_get:
+            mock_response_obj = Mock()
+            mock_response_obj.json.return_value = {
+                "status": "success",
+                "data": ["a", "b", "c"],
+            }
+            mock_response_obj.raise_for_status.return_value = None
+            mock_get.return_value = mock_response_obj
+
+            with patch("mcp_prometheus_server.prometheus_client.MAX_METRIC_NAMES", 2):
+                assert await client.refresh_metric_names() == 2
+
+            params = mock_get.call_args.kwargs["params"]
+            assert params == {"limit": 3}
+            assert client.metadata_cache.match_names() == ["a", "b"]
+            assert client.metadata_cache.names_truncated
+
+    @pytest.mark.asyncio
+    async def test_get_metric_metadata_bulk_load_cached(self):
+        """Test metadata is loaded once in bulk and then served from cache."""
+        client = PrometheusClient()
+
         mock_response = {
             "status": "success",
             "data": {
-                "resultType": "vector",
-                "result": [
-                    {"metric": {"__name__": "cpu_usage"}},
-                    {"metric": {"__name__": "cpu_temperature"}},
+                "http_requests_total": [
+                    {"type": "counter", "help": "Total requests.", "unit": ""}
+                ],
+                "http_request_duration_seconds": [
+                    {"type": "histogram", "help": "Latency.", "unit": "seconds"}
                 ],
             },
         }
@@ -327,11 +975,67 @@ class TestPrometheusClient:
             mock_response_obj.raise_for_status.return_value = None
             mock_get.return_value = mock_response_obj
 
-            metrics = await client.list_available_metrics("cpu.*")
+            metadata = await client.get_metric_metadata(pattern="http_.*")
+            counters = await client.get_metric_metadata(metric_type="counter")
+            single = await client.get_metric_metadata(
+                "http_request_duration_seconds_bucket"
+            )
+            described = await client.describe_metrics(
+                ["http_requests_total", "unknown_metric"]
+            )
 
-            assert len(metrics) == 2
-            assert "cpu_usage" in metrics
-            assert "cpu_temperature" in metrics
+            assert len(metadata) == 2
+            assert list(counters) == ["http_requests_total"]
+            assert single["http_request_duration_seconds_bucket"]["type"] == "histogram"
+            assert list(described) == ["http_requests_total"]
+            mock_get.assert_called_once_with("/api/v1/metadata")
+
+    @pytest.mark.asyncio
+    async def test_get_metric_metadata_serves_stale_on_failure(self):
+        """Test stale metadata is served when a refresh fails."""
+        client = PrometheusClient(metadata_ttl=0)
+        client.metadata_cache.update(
+            {"up": [{"type": "gauge", "help": "Target up.", "unit": ""}]}
+        )
+
+        with patch.object(client.http_client, "get") as mock_get:
+            mock_get.side_effect = Exception("Connection failed")
+
+            metadata = await client.get_metric_metadata("up")
+
+            assert metadata["up"]["type"] == "gauge"
+
+    @pytest.mark.asyncio
+    async def test_get_metric_metadata_failure_without_cache(self):
+        """Test metadata errors propagate when nothing is cached."""
+        client = PrometheusClient()
+
+        with patch.object(client.http_client, "get") as mock_get:
+            mock_get.side_effect = Exception("Connection failed")
+
+            with pytest.raises(Exception, match="Connection failed"):
+                await client.get_metric_metadata()
+
+    @pytest.mark.asyncio
+    async def test_get_status(self):
+        """Test status data is returned and error responses raise."""
+        client = PrometheusClient()
+
+        with patch.object(client.http_client, "get") as mock_get:
+            mock_response_obj = Mock()
+            mock_response_obj.json.return_value = {
+                "status": "success",
+                "data": {"version": "2.53.0"},
+            }
+            mock_response_obj.raise_for_status.return_value = None
+            mock_get.return_value = mock_response_obj
+
+            data = await client.get_status("/api/v1/status/buildinfo")
+            assert data == {"version": "2.53.0"}
+
+            mock_response_obj.json.return_value = {"status": "error", "error": "nope"}
+            with pytest.raises(ValueError, match="failed: nope"):
+                await client.get_status("/api/v1/status/buildinfo")
 
     @pytest.mark.asyncio
     async def test_execute_query_instant(self):
@@ -464,3 +1168,43 @@ class TestPrometheusClient:
                 await client.query_metric("cpu_usage", time_format)
 
             assert mock_get.call_count == len(time_formats)
+
+    def test_reconfigure_keeps_warm_state(self):
+        """Test tuning settings keeps caches and connections."""
+        client = PrometheusClient(results_cache_size=4)
+        http_client = client.http_client
+        client.results_cache.set("key", {"status": "success"})
+
+        changed = client.reconfigure(
+            timeout=5, results_cache_size=8, max_concurrency=3, tenant="team-a"
+        )
+
+        assert changed == ["max_concurrency", "results_cache_size", "tenant", "timeout"]
+        assert client.http_client is http_client
+        assert client.http_client.timeout.read == 5
+        assert client.limiter.limit == 3
+        assert client.reconfigure(timeout=5) == []
+        with request_tenant(None):
+            assert client.current_tenant() == "team-a"
+
+    def test_reconfigure_new_upstream_clears_caches(self):
+        """Test a new URL or credentials drop data cached from the old one."""
+        client = PrometheusClient()
+        client.results_cache.set("key", {"status": "success"})
+
+        client.reconfigure(prometheus_url="http://mimir:9009/", auth_token="secret")
+
+        assert client.results_cache.get("key") is None
+        assert str(client.http_client.base_url) == "http://mimir:9009"
+        assert client.http_client.headers["Authorization"] == "Bearer secret"
+
+    def test_reconfigure_rejects_invalid_settings(self):
+        """Test nothing changes when any setting is invalid."""
+        client = PrometheusClient()
+
+        with pytest.raises(ValueError, match="Invalid cost fallback"):
+            client.reconfigure(timeout=5, cost_fallback="drop")
+        with pytest.raises(ValueError, match="Unknown client settings"):
+            client.reconfigure(retries=3)
+
+        assert client.timeout == 30
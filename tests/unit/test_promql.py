@@ -0,0 +1,198 @@
+"""
+Tests for promql module.
+
+Covers parsing, canonicalization, selector extraction and syntax errors.
+"""
+
+import re
+
+import pytest
+
+from mcp_prometheus_server.promql import (
+    PromQLSyntaxError,
+    canonicalize,
+    escape_regex,
+    format_duration,
+    parse_duration,
+    parse_promql,
+    parse_step,
+)
+
+
+class TestDurations:
+    """Test cases for duration parsing and formatting."""
+
+    @pytest.mark.parametrize(
+        ("text", "seconds"),
+        [
+            ("5m", 300),
+            ("90s", 90),
+            ("1h30m", 5400),
+            ("500ms", 0.5),
+            ("2w", 1209600),
+            ("1y", 31536000),
+        ],
+    )
+    def test_parse_duration(self, text, seconds):
+        """Test parsing valid Prometheus durations."""
+        assert parse_duration(text) == seconds
+
+    @pytest.mark.parametrize("text", ["", "5", "5mo", "30m1h", "1.5h", "m"])
+    def test_parse_duration_invalid(self, text):
+        """Test invalid durations raise ValueError."""
+        with pytest.raises(ValueError, match="Invalid duration"):
+            parse_duration(text)
+
+    @pytest.mark.parametrize(
+        ("text", "seconds"), [("1m", 60), ("60", 60), ("0.5", 0.5), ("1e1", 10)]
+    )
+    def test_parse_step(self, text, seconds):
+        """Test steps are accepted as durations or float seconds."""
+        assert parse_step(text) == seconds
+
+    @pytest.mark.parametrize("text", ["", "1mo", "0", "-5", "inf", "nan"])
+    def test_parse_step_invalid(self, text):
+        """Test invalid steps raise ValueError."""
+        with pytest.raises(ValueError, match="Invalid step"):
+            parse_step(text)
+
+    def test_format_duration(self):
+        """Test durations are formatted in compound canonical form."""
+        assert format_duration(90) == "1m30s"
+        assert format_duration(3600) == "1h"
+        assert format_duration(0.25) == "250ms"
+        assert format_duration(-300) == "-5m"
+        assert format_duration(0) == "0s"
+
+
+class TestEscapeRegex:
+    """Test cases for regex escaping."""
+
+    def test_escaped_value_matches_literally(self):
+        """Test that escaped values match only themselves."""
+        value = "web-01.example:9100 (a|b) [x]+*?^${}\\"
+        pattern = re.compile(escape_regex(value))
+
+        assert pattern.fullmatch(value)
+        assert not pattern.fullmatch("web-01Xexample:9100 (a|b) [x]+*?^${}\\")
+        assert escape_regex("a.b") == "a\\.b"
+
+
+class TestCanonicalization:
+    """Test cases for canonical query form."""
+
+    @pytest.mark.parametrize(
+        ("first", "second"),
+        [
+            ('up{job="a",instance="b"}', 'up{ instance = "b", job="a" }'),
+            ("sum(rate(x[5m])) by (b, a)", "sum by (a,b) (rate(x[300s]))"),
+            ('{__name__="up", job="a"}', "up{job='a'}"),
+            ("rate(x[1h30m])", "rate(x[90m])"),
+            ("a/on(z,y)group_left b", "a / on (y, z) group_left () b"),
+            ("x  # comment\n+ 1", "x + 1.0"),
+        ],
+    )
+    def test_equivalent_queries_share_canonical_form(self, first, second):
+        """Test queries differing in formatting canonicalize identically."""
+        assert canonicalize(first) == canonicalize(second)
+
+    def test_canonical_form_is_stable(self):
+        """Test canonical output parses back to itself."""
+        query = (
+            'histogram_quantile(0.99, sum by (le) (rate(req_bucket{code=~"5.."}'
+            "[5m] offset 1h))) > bool 0.5"
+        )
+        canonical = canonicalize(query)
+
+        assert canonicalize(canonical) == canonical
+
+    def test_precedence(self):
+        """Test operator precedence and associativity."""
+        expr = parse_promql("1 + 2 * 3 ^ 2 ^ 2").expr
+
+        assert expr.op == "+"
+        assert expr.rhs.op == "*"
+        assert expr.rhs.rhs.op == "^"
+        assert expr.rhs.rhs.rhs.op == "^"
+
+    def test_unary_minus_binds_below_power(self):
+        """Test that -2^2 parses as -(2^2)."""
+        expr = parse_promql("-2^2").expr
+
+        assert expr.op == "-"
+        assert expr.expr.op == "^"
+
+
+class TestExtraction:
+    """Test cases for selector and range extraction."""
+
+    def test_selectors_and_ranges(self):
+        """Test selectors and ranges are pulled out of nested expressions."""
+        parsed = parse_promql(
+            'sum(rate(http_requests_total{job="api"}[5m])) / max_over_time(up[1h:1m])'
+        )
+
+        assert [s.selector() for s in parsed.selectors] == [
+            'http_requests_total{job="api"}',
+            "up",
+        ]
+        assert parsed.ranges == [300, 3600]
+        assert parsed.metric_names == {"http_requests_total", "up"}
+        assert not parsed.is_selector
+
+    def test_is_selector(self):
+        """Test bare selector detection."""
+        assert parse_promql('up{job="x"}').is_selector
+        assert not parse_promql("up[5m]").is_selector
+
+    def test_offset_and_at_modifiers(self):
+        """Test offset and @ modifiers are kept on selectors."""
+        selector = parse_promql("up offset -5m @ end()").selectors[0]
+
+        assert selector.offset == -300
+        assert selector.at == "end()"
+
+
+class TestSyntaxErrors:
+    """Test cases for locally rejected queries."""
+
+    @pytest.mark.parametrize(
+        "query",
+        [
+            "",
+            "invalid query",
+            "rate(x[5m]",
+            'x{a="b"',
+            "{}",
+            '{a=~".*"}',
+            "x[5mo]",
+            "rate(x)[5m]",
+            "foo offset 5m [5m]",
+            "topk(x)",
+            "a + bool b",
+            'up{__name__="x"}',
+            "sum by (a) (x) by (b)",
+            "sum",
+            'count{job="api"}',
+            "rate(sum[5m])",
+        ],
+    )
+    def test_invalid_queries(self, query):
+        """Test invalid PromQL raises PromQLSyntaxError."""
+        with pytest.raises(PromQLSyntaxError, match="Invalid PromQL"):
+            parse_promql(query)
+
+    def test_error_position(self):
+        """Test syntax errors report the offending position."""
+        with pytest.raises(PromQLSyntaxError) as exc_info:
+            parse_promql("sum(rate(x[5m])")
+
+        assert exc_info.value.position == 15
+        assert isinstance(exc_info.value, ValueError)
+
+    def test_bare_aggregation_keyword(self):
+        """Test aggregation keywords are not accepted as metric names."""
+        with pytest.raises(PromQLSyntaxError, match="unexpected aggregation 'sum'"):
+            parse_promql("sum + 1")
+
+        assert parse_promql('{__name__="sum"}').selectors[0].name == "sum"
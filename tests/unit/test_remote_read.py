@@ -0,0 +1,398 @@
+"""
+Tests for remote_read module.
+
+Covers request encoding, XOR chunk decoding, streamed frame parsing and the
+remote-read history backend of PrometheusClient.
+"""
+
+import math
+import struct
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+from mcp_prometheus_server.columnar import Series
+from mcp_prometheus_server.prometheus_client import PrometheusClient
+from mcp_prometheus_server.promql import parse_promql
+from mcp_prometheus_server.remote_read import (
+    STREAMED_CONTENT_TYPE,
+    ChunkedReadDecoder,
+    _field_bytes,
+    _field_varint,
+    _iter_fields,
+    _read_varint,
+    _varint,
+    decode_xor_chunk,
+    encode_read_request,
+    remote_read_selector,
+    snappy_block,
+)
+
+
+class _BitWriter:
+    """Big-endian bit writer mirroring Prometheus' bstream."""
+
+    def __init__(self):
+        self.bits = []
+
+    def write(self, value, count):
+        self.bits.extend((value >> shift) & 1 for shift in range(count - 1, -1, -1))
+
+    def write_bytes(self, data):
+        for byte in data:
+            self.write(byte, 8)
+
+    def to_bytes(self):
+        padded = self.bits + [0] * (-len(self.bits) % 8)
+        return bytes(
+            int("".join(map(str, padded[i : i + 8])), 2)
+            for i in range(0, len(padded), 8)
+        )
+
+
+def _float_bits(value):
+    return struct.unpack(">Q", struct.pack(">d", value))[0]
+
+
+def _zigzag(value):
+    return (value << 1) ^ (value >> 63)
+
+
+def _encode_xor(samples):
+    """Encode (timestamp_ms, value) samples in Prometheus' XOR chunk format."""
+    writer = _BitWriter()
+    leading = trailing = None
+    prev_t = prev_delta = 0
+    prev_bits = 0
+
+    for index, (timestamp, value) in enumerate(samples):
+        bits = _float_bits(value)
+        if index == 0:
+            writer.write_bytes(_varint(_zigzag(timestamp)))
+            writer.write(bits, 64)
+            prev_t, prev_bits = timestamp, bits
+            continue
+
+        delta = timestamp - prev_t
+        if index == 1:
+            writer.write_bytes(_varint(delta))
+        else:
+            dod = delta - prev_delta
+            if dod == 0:
+                writer.write(0, 1)
+            elif -(1 << 13) + 1 <= dod <= 1 << 13:
+                writer.write(0b10, 2)
+                writer.write(dod & ((1 << 14) - 1), 14)
+            elif -(1 << 16) + 1 <= dod <= 1 << 16:
+                writer.write(0b110, 3)
+                writer.write(dod & ((1 << 17) - 1), 17)
+            elif -(1 << 19) + 1 <= dod <= 1 << 19:
+                writer.write(0b1110, 4)
+                writer.write(dod & ((1 << 20) - 1), 20)
+            else:
+                writer.write(0b1111, 4)
+                writer.write(dod & ((1 << 64) - 1), 64)
+
+        xor = bits ^ prev_bits
+        if xor == 0:
+            writer.write(0, 1)
+        else:
+            writer.write(1, 1)
+            new_leading = min(64 - xor.bit_length(), 31)
+            new_trailing = (xor & -xor).bit_length() - 1
+            if (
+                leading is not None
+                and new_leading >= leading
+                and new_trailing >= trailing
+            ):
+                writer.write(0, 1)
+                writer.write(xor >> trailing, 64 - leading - trailing)
+            else:
+                leading, trailing = new_leading, new_trailing
+                significant = 64 - leading - trailing
+                writer.write(1, 1)
+                writer.write(leading, 5)
+                writer.write(significant % 64, 6)
+                writer.write(xor >> trailing, significant)
+
+        prev_t, prev_delta, prev_bits = timestamp, delta, bits
+
+    return len(samples).to_bytes(2, "big") + writer.to_bytes()
+
+
+def _chunked_series(labels, chunk_samples):
+    """Encode a ChunkedSeries message."""
+    message = b"".join(
+        _field_bytes(
+            1, _field_bytes(1, name.encode()) + _field_bytes(2, value.encode())
+        )
+        for name, value in labels.items()
+    )
+    for samples in chunk_samples:
+        message += _field_bytes(
+            2,
+            _field_varint(1, samples[0][0])
+            + _field_varint(2, samples[-1][0])
+            + _field_varint(3, 1)
+            + _field_bytes(4, _encode_xor(samples)),
+        )
+    return message
+
+
+def _frame(*series_messages):
+    """Encode a length-prefixed ChunkedReadResponse frame."""
+    message = b"".join(_field_bytes(1, series) for series in series_messages)
+    return _varint(len(message)) + b"\x00\x00\x00\x00" + message
+
+
+def _read_response(labels, samples):
+    """Encode a sampled ReadResponse with one series."""
+    series = b"".join(
+        _field_bytes(
+            1, _field_bytes(1, name.encode()) + _field_bytes(2, value.encode())
+        )
+        for name, value in labels.items()
+    )
+    for timestamp, value in samples:
+        sample = b"\x09" + struct.pack("<d", value) + _field_varint(2, timestamp)
+        series += _field_bytes(2, sample)
+    return _field_bytes(1, _field_bytes(1, series))
+
+
+def _uncompress_literals(block):
+    """Decode a snappy block made of literals only, as snappy_block writes."""
+    length, pos = _read_varint(block, 0)
+    out = bytearray()
+    while len(out) < length:
+        tag = block[pos] >> 2
+        pos += 1
+        if tag == 60:
+            tag, pos = block[pos], pos + 1
+        elif tag == 61:
+            tag, pos = int.from_bytes(block[pos : pos + 2], "little"), pos + 2
+        out += block[pos : pos + tag + 1]
+        pos += tag + 1
+    return bytes(out)
+
+
+SAMPLES = [
+    (1_700_000_000_000, 1.0),
+    (1_700_000_015_000, 1.0),
+    (1_700_000_030_000, 2.5),
+    (1_700_000_045_100, -3.75),
+    (1_700_000_060_000, 1e300),
+    (1_700_000_075_000, 0.0),
+    (1_700_000_900_000, math.pi),
+    (1_700_100_000_000, 42.0),
+]
+
+
+class TestXorChunk:
+    """Test cases for XOR chunk decoding."""
+
+    def test_round_trip(self):
+        """Test that encoded samples decode to the same values."""
+        series = Series(labels={})
+
+        decode_xor_chunk(_encode_xor(SAMPLES), series, 0, 2**62)
+
+        assert list(series.samples()) == [(t / 1000, v) for t, v in SAMPLES]
+
+    def test_range_filter(self):
+        """Test that samples outside the range are dropped."""
+        series = Series(labels={})
+
+        decode_xor_chunk(
+            _encode_xor(SAMPLES), series, 1_700_000_030_000, 1_700_000_060_000
+        )
+
+        assert list(series.values) == [2.5, -3.75, 1e300]
+
+    def test_empty_chunk(self):
+        """Test that a chunk without samples decodes to nothing."""
+        series = Series(labels={})
+
+        decode_xor_chunk(b"\x00\x00", series, 0, 2**62)
+
+        assert len(series) == 0
+
+
+class TestChunkedReadDecoder:
+    """Test cases for streamed response decoding."""
+
+    def test_frames_split_across_reads(self):
+        """Test that frames are decoded regardless of read boundaries."""
+        labels = {"__name__": "up", "job": "api"}
+        body = _frame(_chunked_series(labels, [SAMPLES[:4]])) + _frame(
+            _chunked_series(labels, [SAMPLES[4:]]),
+            _chunked_series({"__name__": "up", "job": "db"}, [SAMPLES[:2]]),
+        )
+        decoder = ChunkedReadDecoder(0, 2**62)
+
+        for i in range(0, len(body), 7):
+            decoder.feed(body[i : i + 7])
+        series_list = decoder.finish()
+
+        assert [s.labels for s in series_list] == [
+            {"__name__": "up", "job": "api"},
+            {"__name__": "up", "job": "db"},
+        ]
+        assert len(series_list[0]) == len(SAMPLES)
+        assert len(series_list[1]) == 2
+
+    def test_truncated_body(self):
+        """Test that a body ending inside a frame is rejected."""
+        body = _frame(_chunked_series({"__name__": "up"}, [SAMPLES]))
+        decoder = ChunkedReadDecoder(0, 2**62)
+        decoder.feed(body[:-3])
+
+        with pytest.raises(ValueError, match="Truncated"):
+            decoder.finish()
+
+
+class TestReadRequest:
+    """Test cases for request encoding."""
+
+    def test_encode_read_request(self):
+        """Test that matchers and range are encoded into the query."""
+        selector = remote_read_selector(parse_promql('up{job=~"api|db"}'))
+
+        message = memoryview(encode_read_request(selector, 1000, 2000))
+        fields = list(_iter_fields(message))
+
+        query = dict(
+            (number, value)
+            for number, _, value in _iter_fields(fields[0][2])
+            if number != 3
+        )
+        matchers = [
+            [bytes(v) if not isinstance(v, int) else v for _, _, v in _iter_fields(m)]
+            for number, _, m in _iter_fields(fields[0][2])
+            if number == 3
+        ]
+        assert query == {1: 1000, 2: 2000}
+        assert matchers == [[0, b"__name__", b"up"], [2, b"job", b"api|db"]]
+        assert bytes(fields[1][2]) == b"\x01\x00"
+
+    def test_snappy_block_literals(self):
+        """Test the literal-only snappy framing."""
+        data = bytes(range(256)) * 300
+
+        block = snappy_block(data)
+
+        length, pos = _read_varint(block, 0)
+        assert length == len(data)
+        assert block[pos] == 61 << 2
+        assert int.from_bytes(block[pos + 1 : pos + 3], "little") == 65535
+
+    def test_remote_read_selector(self):
+        """Test which queries can use remote read."""
+        assert remote_read_selector(parse_promql("up")) is not None
+        assert remote_read_selector(parse_promql("rate(up[5m])")) is None
+        assert remote_read_selector(parse_promql("up offset 5m")) is None
+
+
+class TestRemoteReadBackend:
+    """Test cases for the remote-read history backend."""
+
+    @pytest.mark.asyncio
+    async def test_get_metric_history_remote_read(self):
+        """Test that history for a selector is fetched via remote read."""
+        now_ms = int(datetime.now().timestamp() * 1000)
+        samples = [(now_ms - 60_000 + i * 15_000, float(i)) for i in range(4)]
+        requests = []
+
+        def handler(request):
+            requests.append(request)
+            return httpx.Response(
+                200,
+                headers={"Content-Type": STREAMED_CONTENT_TYPE},
+                content=_frame(
+                    _chunked_series({"__name__": "up", "job": "api"}, [samples])
+                ),
+            )
+
+        client = PrometheusClient(history_backend="remote_read")
+        client.http_client = httpx.AsyncClient(
+            base_url="http://prometheus", transport=httpx.MockTransport(handler)
+        )
+
+        history = await client.get_metric_history("up", "1h", "1m")
+
+        assert [point["value"] for point in history] == [0.0, 1.0, 2.0, 3.0]
+        assert history[0]["labels"] == {"__name__": "up", "job": "api"}
+        assert requests[0].url.path == "/api/v1/read"
+        assert requests[0].headers["content-encoding"] == "snappy"
+
+        # Served from cache the second time
+        await client.get_metric_history("up", "1h", "1m")
+        assert len(requests) == 1
+        await client.http_client.aclose()
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("streamed", [True, False])
+    async def test_remote_read_through_compression_transport(self, streamed):
+        """Test both response formats through the client's real transport."""
+        now_ms = int(datetime.now().timestamp() * 1000)
+        samples = [(now_ms - 60_000 + i * 15_000, float(i)) for i in range(4)]
+        labels = {"__name__": "up", "job": "api"}
+
+        if streamed:
+            headers = {"Content-Type": STREAMED_CONTENT_TYPE}
+            body = _frame(_chunked_series(labels, [samples]))
+        else:
+            headers = {
+                "Content-Type": "application/x-protobuf",
+                "Content-Encoding": "snappy",
+            }
+            body = snappy_block(_read_response(labels, samples))
+
+        def handler(request):
+            return httpx.Response(200, headers=headers, content=body)
+
+        client = PrometheusClient(history_backend="remote_read")
+        # Replace only the network below the client's CompressionTransport
+        client.transport._transport = httpx.MockTransport(handler)
+        fake_snappy = SimpleNamespace(uncompress=_uncompress_literals)
+
+        with patch("mcp_prometheus_server.remote_read.snappy", fake_snappy):
+            history = await client.get_metric_history("up", "1h", "1m")
+
+        assert [point["value"] for point in history] == [0.0, 1.0, 2.0, 3.0]
+        assert history[0]["labels"] == labels
+        transfer = client.transport.stats.get("/api/v1/read")
+        assert transfer.wire_bytes == len(body)
+        assert transfer.decoded_bytes == (len(body) if streamed else 0)
+        await client.http_client.aclose()
+
+    @pytest.mark.asyncio
+    async def test_expressions_use_query_range(self):
+        """Test that non-selector queries still go through query_range."""
+        paths = []
+
+        def handler(request):
+            paths.append(request.url.path)
+            return httpx.Response(
+                200,
+                json={
+                    "status": "success",
+                    "data": {"resultType": "matrix", "result": []},
+                },
+            )
+
+        client = PrometheusClient(history_backend="remote_read")
+        client.http_client = httpx.AsyncClient(
+            base_url="http://prometheus", transport=httpx.MockTransport(handler)
+        )
+
+        assert await client.get_metric_history("rate(up[5m])", "1h", "1m") == []
+        assert paths == ["/api/v1/query_range"]
+        await client.http_client.aclose()
+
+    def test_invalid_backend(self):
+        """Test that unknown backends are rejected."""
+        with pytest.raises(ValueError, match="Invalid history backend"):
+            PrometheusClient(history_backend="graphite")
@@ -0,0 +1,150 @@
+"""
+Tests for result_store module.
+
+Covers handle storage, byte-bounded eviction and paged views.
+"""
+
+import pytest
+
+from mcp_prometheus_server.columnar import Series
+from mcp_prometheus_server.result_store import ResultStore
+
+
+def _series(instance, job, values, start=1000.0):
+    """Build a series with one sample every 60 seconds."""
+    series = Series(labels={"instance": instance, "job": job})
+    for i, value in enumerate(values):
+        series.append(start + i * 60, value)
+    return series
+
+
+def _store():
+    """Build a store holding a small matrix result."""
+    store = ResultStore()
+    handle = store.put(
+        "up",
+        "matrix",
+        [
+            _series("c", "api", [1.0, 5.0, 2.0]),
+            _series("a", "db", [9.0, 1.0, 1.0]),
+            _series("b", "api", [3.0, 3.0, 3.0]),
+        ],
+    )
+    return store, handle
+
+
+class TestResultStore:
+    """Test cases for ResultStore."""
+
+    def test_page_sorted_by_labels(self):
+        """Test paging in label order."""
+        store, handle = _store()
+
+        page = store.view(handle, offset=1, limit=1)
+
+        assert page.total == 3
+        assert [s.labels["instance"] for s in page.series] == ["b"]
+
+    def test_filter_by_label(self):
+        """Test that label regexes must fully match."""
+        store, handle = _store()
+
+        page = store.view(handle, match={"job": "ap."})
+        assert [s.labels["instance"] for s in page.series] == ["b", "c"]
+
+        assert store.view(handle, match={"job": "ap"}).total == 0
+
+    def test_sort_by_statistic(self):
+        """Test sorting by a statistic, descending by default."""
+        store, handle = _store()
+
+        page = store.view(handle, sort="max")
+        assert [s.labels["instance"] for s in page.series] == ["a", "c", "b"]
+
+        page = store.view(handle, sort="last", descending=False)
+        assert [s.labels["instance"] for s in page.series] == ["a", "c", "b"]
+
+    def test_time_slice(self):
+        """Test that samples are restricted to the time range before sorting."""
+        store, handle = _store()
+
+        page = store.view(handle, start=1060, end=1060, sort="max")
+
+        assert [s.labels["instance"] for s in page.series] == ["c", "b", "a"]
+        assert all(list(s.timestamps) == [1060.0] for s in page.series)
+
+        page = store.view(handle, start=5000, sort="max")
+        assert page.total == 3
+        assert all(len(s) == 0 for s in page.series)
+
+    def test_invalid_arguments(self):
+        """Test that bad handles, regexes, sort keys and pages are rejected."""
+        store, handle = _store()
+
+        with pytest.raises(ValueError, match="Unknown or expired"):
+            store.view("r-missing")
+        with pytest.raises(ValueError, match="Invalid label pattern"):
+            store.view(handle, match={"job": "("})
+        with pytest.raises(ValueError, match="Invalid sort key"):
+            store.view(handle, sort="median")
+        with pytest.raises(ValueError, match="Invalid page"):
+            store.view(handle, offset=-2)
+        with pytest.raises(ValueError, match="Invalid page"):
+            store.view(handle, limit=-1)
+
+    def test_byte_bounded_eviction(self):
+        """Test that least recently used results are evicted over budget."""
+        store = ResultStore(max_bytes=3000)
+        first = store.put("a", "matrix", [_series("a", "x", [1.0] * 50)])
+        second = store.put("b", "matrix", [_series("b", "x", [1.0] * 50)])
+
+        store.get(first)
+        third = store.put("c", "matrix", [_series("c", "x", [1.0] * 50)])
+
+        assert store.size <= 3000
+        store.get(first)
+        store.get(third)
+        with pytest.raises(ValueError):
+            store.get(second)
+
+    def test_resize_evicts(self):
+        """Test that shrinking the budget evicts results right away."""
+        store, handle = _store()
+        kept = store.put("down", "vector", [_series("b", "api", [1.0])])
+
+        store.resize(store.size - 1)
+
+        assert len(store) == 1
+        assert store.size <= store.max_bytes
+        assert store.get(kept).query == "down"
+        with pytest.raises(ValueError, match="Unknown or expired"):
+            store.get(handle)
+
+    def test_oversized_result_not_stored(self):
+        """Test that a result larger than the budget is refused."""
+        store = ResultStore(max_bytes=100)
+
+        assert store.put("a", "matrix", [_series("a", "x", [1.0] * 50)]) is None
+        assert len(store) == 0
+
+    def test_summarize(self):
+        """Test label cardinality and time span summary."""
+        store, handle = _store()
+
+        summary = store.summarize(handle)
+
+        assert summary["series"] == 3
+        assert summary["samples"] == 9
+        assert (summary["start"], summary["end"]) == (1000.0, 1120.0)
+        assert summary["labels"]["job"] == {
+            "distinct": 2,
+            "top": [("api", 2), ("db", 1)],
+        }
+
+    def test_drop(self):
+        """Test removing a result frees its bytes."""
+        store, handle = _store()
+
+        assert store.drop(handle)
+        assert store.size == 0
+        assert not store.drop(handle)
@@ -0,0 +1,103 @@
+"""
+Tests for scheduler module.
+
+Covers watchlist parsing and background warm-query execution.
+"""
+
+import asyncio
+import json
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+from mcp_prometheus_server.concurrency import Priority, current_priority
+from mcp_prometheus_server.scheduler import (
+    WarmQueryScheduler,
+    WatchQuery,
+    load_watchlist,
+    parse_watchlist,
+)
+
+
+class TestWatchlist:
+    """Test cases for watchlist configuration."""
+
+    def test_parse_watchlist(self):
+        """Test parsing string and mapping entries."""
+        watchlist = parse_watchlist(
+            [
+                "up",
+                {"query": "up == 0", "interval": "30s", "relative_time": "1m"},
+                {"query": "vector(1)", "interval": 5},
+            ]
+        )
+
+        assert watchlist == [
+            WatchQuery("up"),
+            WatchQuery("up == 0", "1m", 30.0),
+            WatchQuery("vector(1)", "5m", 5.0),
+        ]
+
+    @pytest.mark.parametrize(
+        "entry",
+        [{}, {"query": ""}, {"query": "up", "interval": 0}, {"query": "sum("}, 42],
+    )
+    def test_parse_watchlist_invalid(self, entry):
+        """Test malformed entries and invalid PromQL are rejected."""
+        with pytest.raises(ValueError):
+            parse_watchlist([entry])
+
+    def test_load_watchlist(self, tmp_path):
+        """Test loading a watchlist file."""
+        path = tmp_path / "watchlist.json"
+        path.write_text(json.dumps({"queries": [{"query": "up", "interval": "1m"}]}))
+
+        assert load_watchlist(path) == [WatchQuery("up", "5m", 60.0)]
+
+        path.write_text(json.dumps({"queries": "up"}))
+        with pytest.raises(TypeError, match="must be a list"):
+            load_watchlist(path)
+
+
+class TestWarmQueryScheduler:
+    """Test cases for WarmQueryScheduler."""
+
+    @pytest.mark.asyncio
+    async def test_runs_watchlist_at_background_priority(self):
+        """Test watchlist queries are warmed repeatedly at background priority."""
+        priorities = []
+        client = Mock()
+
+        async def warm_query(*args, **kwargs):
+            priorities.append(current_priority())
+            return {"status": "success"}
+
+        client.warm_query = AsyncMock(side_effect=warm_query)
+        scheduler = WarmQueryScheduler(
+            client, [WatchQuery("up", "5m", 0.01)], jitter=0.0
+        )
+
+        scheduler.start()
+        assert scheduler.running
+        await asyncio.sleep(0.05)
+        await scheduler.stop()
+
+        assert not scheduler.running
+        assert client.warm_query.call_count >= 2
+        client.warm_query.assert_called_with("up", "5m", ttl=5.01)
+        assert set(priorities) == {Priority.BACKGROUND}
+
+    @pytest.mark.asyncio
+    async def test_failures_do_not_stop_the_loop(self):
+        """Test a failing warm query is retried on the next interval."""
+        client = Mock()
+        client.warm_query = AsyncMock(side_effect=Exception("Connection failed"))
+        scheduler = WarmQueryScheduler(
+            client, [WatchQuery("up", "5m", 0.01)], jitter=0.0
+        )
+
+        scheduler.start()
+        await asyncio.sleep(0.05)
+        await scheduler.stop()
+
+        assert client.warm_query.call_count >= 2
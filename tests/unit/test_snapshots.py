@@ -0,0 +1,93 @@
+"""
+Tests for snapshots module.
+
+Covers rule flattening, change fingerprints and indexed selection.
+"""
+
+from mcp_prometheus_server.snapshots import (
+    RULE_GROUP,
+    RULE_HEALTH,
+    STATE,
+    SnapshotCache,
+    alert_keys,
+    fingerprint,
+    flatten_rules,
+    rule_keys,
+)
+
+
+def _alert(name, severity, state="firing", value="1", **labels):
+    return {
+        "labels": {"alertname": name, "severity": severity, **labels},
+        "state": state,
+        "activeAt": "2024-01-01T00:00:00Z",
+        "value": value,
+    }
+
+
+class TestFingerprint:
+    """Test cases for fingerprint."""
+
+    def test_ignores_order_and_values(self):
+        """Test evaluation results and order do not change the fingerprint."""
+        a = _alert("A", "critical")
+        b = _alert("B", "warning")
+
+        assert fingerprint([a, b]) == fingerprint([_alert("B", "warning"), a])
+        assert fingerprint([a]) == fingerprint([_alert("A", "critical", value="9")])
+        assert fingerprint([a]) != fingerprint([_alert("A", "critical", "pending")])
+
+
+class TestSnapshotCache:
+    """Test cases for SnapshotCache."""
+
+    def test_select_intersects_index(self):
+        """Test items are found by every given label and state."""
+        cache = SnapshotCache(alert_keys)
+        alerts = [
+            _alert("A", "critical", namespace="prod"),
+            _alert("A", "warning", namespace="prod"),
+            _alert("B", "critical", "pending", namespace="dev"),
+        ]
+        cache.update(alerts)
+
+        assert cache.select({"alertname": "A", "namespace": "prod"}) == alerts[:2]
+        assert cache.select({"severity": "critical", STATE: "pending"}) == [alerts[2]]
+        assert cache.select({"alertname": "C"}) == []
+        assert cache.select() == alerts
+        assert cache.reads == 4
+
+    def test_update_reports_changes(self):
+        """Test the etag only moves when the content changes."""
+        cache = SnapshotCache(alert_keys, ttl=60)
+        assert cache.is_stale()
+
+        assert cache.update([_alert("A", "critical")])
+        etag = cache.etag
+        assert not cache.update([_alert("A", "critical", value="5")])
+        assert cache.etag == etag
+        assert cache.update([])
+        assert cache.etag != etag
+        assert cache.fetches == 3
+        assert not cache.is_stale()
+
+    def test_rules(self):
+        """Test rule groups are flattened and indexed by rule fields."""
+        rules = flatten_rules(
+            [
+                {
+                    "name": "node",
+                    "file": "node.yml",
+                    "rules": [
+                        {"name": "Down", "type": "alerting", "health": "ok"},
+                        {"name": "x:sum", "type": "recording", "health": "err"},
+                    ],
+                }
+            ]
+        )
+        cache = SnapshotCache(rule_keys)
+        cache.update(rules)
+
+        assert rules[0]["group"] == "node"
+        assert rules[0]["file"] == "node.yml"
+        assert cache.select({RULE_GROUP: "node", RULE_HEALTH: "err"}) == [rules[1]]
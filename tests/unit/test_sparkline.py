@@ -0,0 +1,120 @@
+"""
+Tests for sparkline module.
+
+Covers downsampling, sparkline scaling, label hoisting, table rendering and
+their structured form.
+"""
+
+import json
+import math
+from array import array
+
+from mcp_prometheus_server.columnar import Series
+from mcp_prometheus_server.sparkline import (
+    SPARK_CHARS,
+    common_labels,
+    downsample,
+    format_number,
+    render_table,
+    sparkline,
+    trend_content,
+)
+
+
+def _series(labels, values, start=0.0, step=60.0):
+    return Series(
+        labels=labels,
+        timestamps=array("d", [start + i * step for i in range(len(values))]),
+        values=array("d", values),
+    )
+
+
+class TestDownsample:
+    """Test cases for downsample."""
+
+    def test_bucket_means(self):
+        """Test samples are averaged into equal time buckets."""
+        series = _series({}, [1.0, 3.0, 5.0, 7.0])
+
+        assert downsample(series, 0.0, 180.0, 2) == [2.0, 6.0]
+
+    def test_empty_buckets_and_non_finite_samples(self):
+        """Test buckets without finite samples are NaN."""
+        series = _series({}, [1.0, math.nan, math.inf, 4.0])
+
+        buckets = downsample(series, 0.0, 180.0, 4)
+
+        assert buckets[0] == 1.0
+        assert math.isnan(buckets[1])
+        assert math.isnan(buckets[2])
+        assert buckets[3] == 4.0
+
+
+class TestSparkline:
+    """Test cases for sparkline."""
+
+    def test_scaled_to_min_and_max(self):
+        """Test the lowest value maps to the lowest block and vice versa."""
+        assert sparkline([0.0, 7.0, 3.5, math.nan]) == "▁█▅ "
+        assert sparkline([2.0, 2.0]) == SPARK_CHARS[0] * 2
+        assert sparkline([math.nan]) == " "
+
+
+class TestRenderTable:
+    """Test cases for render_table and helpers."""
+
+    def test_common_labels_are_hoisted(self):
+        """Test shared labels move to the header and rows keep the rest."""
+        series_list = [
+            _series({"__name__": "up", "job": "api", "instance": "a"}, [0.0, 1.0]),
+            _series({"__name__": "up", "job": "api", "instance": "b"}, [1.0, 1.0]),
+        ]
+
+        lines = render_table(series_list)
+
+        assert lines[0] == 'Common labels: {__name__="up", job="api"}'
+        assert lines[1].split() == ["series", "trend", "min", "max", "last"]
+        assert lines[2].split() == ['instance="a"', "▁█", "0", "1", "1"]
+        assert lines[3].split() == ['instance="b"', "▁▁", "1", "1", "1"]
+
+    def test_rows_are_limited(self):
+        """Test rows beyond max_rows are summarized."""
+        series_list = [_series({"i": str(i)}, [float(i)]) for i in range(5)]
+
+        lines = render_table(series_list, max_rows=2)
+
+        assert len(lines) == 4
+        assert lines[-1] == "  ... and 3 more series"
+
+    def test_helpers(self):
+        """Test label intersection and number formatting."""
+        assert common_labels([{"a": "1", "b": "2"}, {"a": "1", "b": "3"}]) == {"a": "1"}
+        assert common_labels([]) == {}
+        assert format_number(1234567.0) == "1.235e+06"
+        assert format_number(-math.inf) == "-Inf"
+        assert render_table([]) == []
+
+
+class TestTrendContent:
+    """Test cases for trend_content."""
+
+    def test_columns_instead_of_samples(self):
+        """Test a day of 50 series is reduced to the sparkline columns."""
+        timestamps = array("d", (i * 60.0 for i in range(1441)))
+        series_list = [
+            Series({"i": str(i)}, timestamps, array("d", [float(i)] * 1441))
+            for i in range(50)
+        ]
+        series_list[0].values[-1] = math.nan
+
+        content = trend_content(series_list, max_rows=40)
+
+        assert content["columns"] == 24
+        assert (content["start"], content["end"]) == (0.0, 86400.0)
+        assert content["total_series"] == 50
+        assert content["truncated"]
+        first = content["series"][0]
+        assert len(first["trend"]) == 24
+        assert (first["samples"], first["min"], first["last"]) == (1441, 0.0, "NaN")
+        assert len(json.dumps(content)) < 50 * 1441
+        assert trend_content([])["series"] == []
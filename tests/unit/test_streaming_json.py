@@ -0,0 +1,79 @@
+"""
+Tests for streaming_json module.
+
+Covers extracting array elements from a body split at arbitrary points.
+"""
+
+import json
+
+from mcp_prometheus_server.streaming_json import JSONArrayStream
+
+BODY = json.dumps(
+    {
+        "status": "success",
+        "data": {
+            "resultType": "matrix",
+            "result": [
+                {"metric": {"job": 'a"p}i[', "path": "\\"}, "values": [[1, "1"]]},
+                {"metric": {"result": "x"}, "values": [[2, "2"], [3, "3"]]},
+            ],
+        },
+        "warnings": ["result: [ignored]"],
+    }
+).encode()
+
+
+def _feed_in_chunks(parser, body, size):
+    """Feed a body in fixed-size chunks and collect all elements."""
+    items = []
+    for start in range(0, len(body), size):
+        items.extend(parser.feed(body[start : start + size]))
+    return items
+
+
+class TestJSONArrayStream:
+    """Test cases for JSONArrayStream."""
+
+    def test_elements_match_json_loads(self):
+        """Test that every chunking yields the same elements as json.loads."""
+        expected = json.loads(BODY)["data"]["result"]
+
+        for size in (1, 2, 7, 64, len(BODY)):
+            parser = JSONArrayStream()
+            assert _feed_in_chunks(parser, BODY, size) == expected
+            assert parser.found
+            assert parser.complete
+
+    def test_elements_emitted_before_body_ends(self):
+        """Test that an element is available as soon as it is closed."""
+        parser = JSONArrayStream()
+        cut = BODY.index(b"}, {") + 1
+
+        assert len(parser.feed(BODY[:cut])) == 1
+        assert len(parser.feed(BODY[cut:])) == 1
+
+    def test_buffer_stays_small(self):
+        """Test that consumed elements are dropped from the buffer."""
+        entry = json.dumps({"metric": {}, "values": [[1, "1"]] * 100})
+        body = ('{"data": {"result": [' + ",".join([entry] * 200) + "]}}").encode()
+        parser = JSONArrayStream()
+
+        items = _feed_in_chunks(parser, body, 1000)
+
+        assert len(items) == 200
+        assert len(parser._buffer) < 2 * len(entry)
+
+    def test_missing_path(self):
+        """Test that a body without the array yields nothing."""
+        parser = JSONArrayStream()
+
+        assert parser.feed(b'{"status": "error", "error": "bad"}') == []
+        assert not parser.found
+        assert parser.complete
+
+    def test_truncated_body_incomplete(self):
+        """Test that a cut-off body is reported as incomplete."""
+        parser = JSONArrayStream()
+        parser.feed(BODY[:-10])
+
+        assert not parser.complete
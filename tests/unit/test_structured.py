@@ -0,0 +1,136 @@
+"""
+Tests for structured module.
+
+Covers JSON-safe sample values and structured query and history results.
+"""
+
+import json
+import math
+from array import array
+
+from mcp_prometheus_server.columnar import Series
+from mcp_prometheus_server.structured import (
+    query_result_content,
+    sample_value,
+    series_content,
+    series_list_content,
+)
+
+
+class TestSampleValue:
+    """Test cases for sample_value."""
+
+    def test_numbers_and_special_values(self):
+        """Test values parse to floats and non-finite ones stay strings."""
+        assert sample_value("1.5") == 1.5
+        assert sample_value(2.0) == 2.0
+        assert sample_value("NaN") == "NaN"
+        assert sample_value("Inf") == "+Inf"
+        assert sample_value(float("-inf")) == "-Inf"
+        assert sample_value(float("nan")) == "NaN"
+
+
+class TestQueryResultContent:
+    """Test cases for query_result_content."""
+
+    def test_matrix_is_columnar(self):
+        """Test range results become timestamp and value columns."""
+        result = {
+            "status": "success",
+            "data": {
+                "resultType": "matrix",
+                "result": [
+                    {
+                        "metric": {"job": "api"},
+                        "values": [[1000, "1"], [1060, "+Inf"]],
+                    }
+                ],
+            },
+        }
+
+        content = query_result_content(result)
+
+        assert content["result_type"] == "matrix"
+        assert content["series"] == [
+            {
+                "labels": {"job": "api"},
+                "timestamps": [1000.0, 1060.0],
+                "values": [1.0, "+Inf"],
+            }
+        ]
+        assert not content["truncated"]
+        # Strict JSON: no NaN or Infinity literals
+        json.dumps(content, allow_nan=False)
+
+    def test_truncated_at_series_boundary(self):
+        """Test large results keep whole series up to the sample budget."""
+        result = {
+            "status": "success",
+            "data": {
+                "resultType": "vector",
+                "result": [
+                    {"metric": {"i": str(i)}, "value": [1000, str(i)]} for i in range(5)
+                ],
+            },
+        }
+
+        content = query_result_content(result, max_samples=3)
+
+        assert [series["value"] for series in content["series"]] == [0.0, 1.0, 2.0]
+        assert content["total_series"] == 5
+        assert content["truncated"]
+
+    def test_scalar_and_error(self):
+        """Test scalar results and failed queries."""
+        scalar = {
+            "status": "success",
+            "data": {"resultType": "scalar", "result": [1000, "42"]},
+        }
+        failed = {"status": "error", "error": "bad query"}
+
+        assert query_result_content(scalar) == {
+            "status": "success",
+            "result_type": "scalar",
+            "timestamp": 1000.0,
+            "value": 42.0,
+        }
+        assert query_result_content(failed) == {"status": "error", "error": "bad query"}
+
+
+class TestSeriesListContent:
+    """Test cases for series_list_content."""
+
+    def test_columns_and_truncation(self):
+        """Test series become column pairs, cut at a series boundary."""
+        a = Series({"job": "a"}, array("d", [1.0, 2.0]), array("d", [1.0, math.nan]))
+        b = Series({"job": "b"}, array("d", [1.0, 2.0]), array("d", [3.0, 4.0]))
+
+        content = series_list_content([a, b])
+        truncated = series_list_content([a, b], max_samples=3)
+
+        assert content["series"] == [
+            {"labels": {"job": "a"}, "timestamps": [1.0, 2.0], "values": [1.0, "NaN"]},
+            {"labels": {"job": "b"}, "timestamps": [1.0, 2.0], "values": [3.0, 4.0]},
+        ]
+        assert content["total_series"] == 2
+        assert len(truncated["series"]) == 1
+        assert truncated["truncated"]
+
+
+class TestSeriesContent:
+    """Test cases for series_content."""
+
+    def test_vector_and_matrix(self):
+        """Test a columnar series as its latest sample or all samples."""
+        series = Series(
+            labels={"job": "a"},
+            timestamps=array("d", [1.0, 2.0]),
+            values=array("d", [5.0, 6.0]),
+        )
+
+        assert series_content(series, "vector") == {
+            "labels": {"job": "a"},
+            "timestamp": 2.0,
+            "value": 6.0,
+        }
+        assert series_content(series)["values"] == [5.0, 6.0]
@@ -0,0 +1,178 @@
+"""
+Tests for subscriptions module.
+
+Covers shared evaluation loops, delta computation and unsubscription.
+"""
+
+import asyncio
+import json
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+from mcp_prometheus_server.concurrency import request_session
+from mcp_prometheus_server.subscriptions import (
+    SUBSCRIPTION_URI_PREFIX,
+    SubscriptionManager,
+    format_delta,
+)
+
+
+def _vector(*samples):
+    """Build an instant query result from (instance, value) pairs."""
+    return {
+        "status": "success",
+        "data": {
+            "resultType": "vector",
+            "result": [
+                {"metric": {"instance": instance}, "value": [1000.0, value]}
+                for instance, value in samples
+            ],
+        },
+    }
+
+
+def _client(*results):
+    """Build a client mock returning the given results in order."""
+    client = Mock()
+    client.query_instant = AsyncMock(side_effect=list(results))
+    return client
+
+
+class TestSubscriptionManager:
+    """Test cases for SubscriptionManager."""
+
+    @pytest.mark.asyncio
+    async def test_initial_state_is_first_delta(self):
+        """Test that a new subscription starts with every series."""
+        manager = SubscriptionManager(_client(_vector(("a", "1"), ("b", "2"))))
+
+        subscription = await manager.subscribe("up", 10, AsyncMock())
+        delta = subscription.take_delta()
+
+        assert subscription.uri == f"{SUBSCRIPTION_URI_PREFIX}{subscription.id}"
+        assert [series["labels"] for series in delta["changed"]] == [
+            {"instance": "a"},
+            {"instance": "b"},
+        ]
+        assert delta["removed"] == []
+        assert not subscription.has_pending
+        await manager.close()
+
+    @pytest.mark.asyncio
+    async def test_subscribers_share_one_feed(self):
+        """Test that equivalent queries share one evaluation loop."""
+        client = _client(_vector(("a", "1")))
+        manager = SubscriptionManager(client)
+
+        first = await manager.subscribe("up", 10, AsyncMock())
+        second = await manager.subscribe("up  ", 10, AsyncMock())
+
+        assert len(manager) == 2
+        assert manager.feed_count == 1
+        assert first.feed is second.feed
+        assert client.query_instant.await_count == 1
+        await manager.close()
+
+    @pytest.mark.asyncio
+    async def test_loop_notifies_only_changes(self):
+        """Test that the loop sends changed and removed series only."""
+        client = _client(
+            _vector(("a", "1"), ("b", "2")),
+            _vector(("a", "1"), ("b", "2")),
+            _vector(("a", "5"), ("c", "3")),
+        )
+        notify = AsyncMock()
+        manager = SubscriptionManager(client, min_interval=0)
+
+        subscription = await manager.subscribe("up", 0.01, notify)
+        subscription.take_delta()
+
+        for _ in range(100):
+            if client.query_instant.await_count >= 3:
+                break
+            await asyncio.sleep(0.01)
+
+        notify.assert_awaited_once_with(subscription.uri)
+        delta = subscription.take_delta()
+        assert delta["changed"] == [
+            {"labels": {"instance": "a"}, "timestamp": 1000.0, "value": "5"},
+            {"labels": {"instance": "c"}, "timestamp": 1000.0, "value": "3"},
+        ]
+        assert delta["removed"] == [{"labels": {"instance": "b"}}]
+        await manager.close()
+
+    @pytest.mark.asyncio
+    async def test_unsubscribe_stops_feed(self):
+        """Test that removing the last subscriber cancels the loop."""
+        manager = SubscriptionManager(_client(_vector(("a", "1"))))
+
+        first = await manager.subscribe("up", 10, AsyncMock())
+        second = await manager.subscribe("up", 10, AsyncMock())
+        task = first.feed.task
+
+        assert await manager.unsubscribe(first.id)
+        assert not task.cancelled()
+        assert await manager.unsubscribe(second.uri)
+        assert not await manager.unsubscribe(second.id)
+
+        await asyncio.sleep(0)
+        assert task.cancelled()
+        assert manager.feed_count == 0
+
+    @pytest.mark.asyncio
+    async def test_unsubscribe_session(self):
+        """Test that an ended session's subscriptions are dropped."""
+        manager = SubscriptionManager(_client(_vector(("a", "1")), _vector(("a", "1"))))
+
+        with request_session("client-a"):
+            first = await manager.subscribe("up", 10, AsyncMock())
+            await manager.subscribe("up", 20, AsyncMock())
+        with request_session("client-b"):
+            other = await manager.subscribe("up", 10, AsyncMock())
+
+        assert first.session == "client-a"
+        assert await manager.unsubscribe_session("client-a") == 2
+        assert manager.active() == [other]
+        assert manager.feed_count == 1
+        await manager.close()
+
+    @pytest.mark.asyncio
+    async def test_interval_too_short(self):
+        """Test that intervals below the minimum are rejected."""
+        manager = SubscriptionManager(_client(), min_interval=5)
+
+        with pytest.raises(ValueError, match="at least 5"):
+            await manager.subscribe("up", 1, AsyncMock())
+
+    @pytest.mark.asyncio
+    async def test_failed_query_not_subscribed(self):
+        """Test that a failing first evaluation creates no subscription."""
+        manager = SubscriptionManager(_client({"status": "error", "error": "bad data"}))
+
+        with pytest.raises(ValueError, match="bad data"):
+            await manager.subscribe("up", 10, AsyncMock())
+        assert len(manager) == 0
+        assert manager.feed_count == 0
+
+
+class TestSubscription:
+    """Test cases for Subscription delta merging."""
+
+    @pytest.mark.asyncio
+    async def test_merge_changes(self):
+        """Test that unread changes merge into the latest state."""
+        manager = SubscriptionManager(_client(_vector(("a", "1"))))
+        subscription = await manager.subscribe("up", 10, AsyncMock())
+        subscription.take_delta()
+
+        a = (("instance", "a"),)
+        subscription.add_changes({}, {a})
+        subscription.add_changes({a: (2000.0, "7")}, set())
+
+        delta = json.loads(format_delta(subscription.take_delta()))
+        assert delta["changed"] == [
+            {"labels": {"instance": "a"}, "timestamp": 2000.0, "value": "7"}
+        ]
+        assert delta["removed"] == []
+        await manager.close()
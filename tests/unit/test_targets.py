@@ -0,0 +1,133 @@
+"""
+Tests for targets module.
+
+Covers per-job target health aggregation and the streamed targets request.
+"""
+
+import json
+
+import httpx
+import pytest
+
+from mcp_prometheus_server.prometheus_client import PrometheusClient
+from mcp_prometheus_server.targets import TargetHealthAggregator, filter_summary
+
+
+def _target(job, instance, health="up", error="", duration=0.01, pool=None):
+    return {
+        "labels": {"job": job, "instance": instance},
+        "scrapePool": pool or job,
+        "scrapeUrl": f"http://{instance}/metrics",
+        "health": health,
+        "lastError": error,
+        "lastScrape": "2024-01-01T00:00:00Z",
+        "lastScrapeDuration": duration,
+    }
+
+
+TARGETS = [
+    _target("node", "a:9100", duration=0.02),
+    _target("node", "b:9100", "down", "connection refused", 0.0),
+    _target("node", "c:9100", "down", "connection refused", 0.0),
+    _target("api", "d:8080", duration=0.1),
+    _target("api", "e:8080", "unknown"),
+]
+
+
+class TestTargetHealthAggregator:
+    """Test cases for TargetHealthAggregator."""
+
+    def test_summary_per_job(self):
+        """Test health, durations and errors are folded per pool and job."""
+        aggregator = TargetHealthAggregator()
+        for target in TARGETS:
+            aggregator.add(target)
+
+        summary = aggregator.summary()
+
+        assert (summary["total"], summary["up"], summary["down"]) == (5, 2, 2)
+        node = summary["jobs"][0]
+        assert node["job"] == "node"
+        assert (node["up"], node["down"]) == (1, 2)
+        assert node["max_scrape_seconds"] == 0.02
+        assert node["errors"] == {"connection refused": 2}
+        assert [t["instance"] for t in summary["unhealthy"]] == [
+            "b:9100",
+            "c:9100",
+            "e:8080",
+        ]
+
+    def test_unhealthy_details_are_bounded(self):
+        """Test only the first unhealthy targets are kept in detail."""
+        aggregator = TargetHealthAggregator(max_unhealthy=1)
+        for target in TARGETS:
+            aggregator.add(target)
+
+        summary = aggregator.summary()
+
+        assert len(summary["unhealthy"]) == 1
+        assert summary["unhealthy_total"] == 3
+
+    def test_filter_summary(self):
+        """Test a summary is narrowed to one job with recomputed totals."""
+        aggregator = TargetHealthAggregator()
+        for target in TARGETS:
+            aggregator.add(target)
+
+        summary = filter_summary(aggregator.summary(), "api")
+
+        assert (summary["total"], summary["up"], summary["unknown"]) == (2, 1, 1)
+        assert [t["instance"] for t in summary["unhealthy"]] == ["e:8080"]
+
+
+class TestGetTargetHealth:
+    """Test cases for PrometheusClient.get_target_health."""
+
+    @pytest.mark.asyncio
+    async def test_streamed_and_cached(self):
+        """Test targets are aggregated from a chunked body and cached."""
+        body = json.dumps(
+            {
+                "status": "success",
+                "data": {"activeTargets": TARGETS, "droppedTargets": []},
+            }
+        ).encode()
+        requests = []
+
+        def handler(request):
+            requests.append(dict(request.url.params))
+
+            async def chunks():
+                for i in range(0, len(body), 64):
+                    yield body[i : i + 64]
+
+            return httpx.Response(200, content=chunks())
+
+        client = PrometheusClient(targets_ttl=60)
+        client.http_client = httpx.AsyncClient(
+            base_url="http://prometheus", transport=httpx.MockTransport(handler)
+        )
+
+        summary = await client.get_target_health("node")
+        again = await client.get_target_health("node")
+
+        assert summary["total"] == 5
+        assert again is summary
+        assert requests == [{"state": "active", "scrapePool": "node"}]
+        await client.close()
+
+    @pytest.mark.asyncio
+    async def test_truncated_body_raises(self):
+        """Test that a cut-off targets response is rejected."""
+
+        def handler(request):
+            return httpx.Response(200, content=b'{"data": {"activeTargets": [')
+
+        client = PrometheusClient()
+        client.http_client = httpx.AsyncClient(
+            base_url="http://prometheus", transport=httpx.MockTransport(handler)
+        )
+
+        with pytest.raises(ValueError, match="incomplete"):
+            await client.get_target_health()
+        await client.close()
@@ -0,0 +1,100 @@
+"""
+Tests for tenants module.
+
+Covers tenant validation, configuration parsing, per-tenant limits and
+tenant-aware requests sharing one client.
+"""
+
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from mcp_prometheus_server.prometheus_client import PrometheusClient
+from mcp_prometheus_server.tenants import (
+    TENANT_HEADER,
+    TenantLimiter,
+    parse_tenant_limits,
+    parse_tenants,
+    request_tenant,
+    validate_tenant,
+)
+
+
+class TestTenantConfig:
+    """Test cases for tenant validation and parsing."""
+
+    def test_validate_tenant(self):
+        """Test tenant IDs are checked against the allowed characters."""
+        assert validate_tenant("team-a_1.prod") == "team-a_1.prod"
+        for tenant in ("", "..", "a/b", "a|b", "x" * 151):
+            with pytest.raises(ValueError, match="Invalid tenant"):
+                validate_tenant(tenant)
+
+    def test_parse_tenants(self):
+        """Test the tenant allowlist accepts IDs and the wildcard."""
+        assert parse_tenants(" team-a, *,") == {"team-a", "*"}
+        assert parse_tenants(None) == set()
+        with pytest.raises(ValueError, match="Invalid tenant"):
+            parse_tenants("a b")
+
+    def test_parse_tenant_limits(self):
+        """Test per-tenant limits with a default for other tenants."""
+        assert parse_tenant_limits("team-a=8, *=2") == {"team-a": 8, "*": 2}
+        for spec in ("team-a", "team-a=0", "team-a=x"):
+            with pytest.raises(ValueError, match="Invalid tenant limit"):
+                parse_tenant_limits(spec)
+
+
+class TestTenantLimiter:
+    """Test cases for TenantLimiter."""
+
+    @pytest.mark.asyncio
+    async def test_limit_per_tenant(self):
+        """Test a tenant at its limit waits while other tenants proceed."""
+        limiter = TenantLimiter({"busy": 1})
+
+        async with limiter.slot("busy"):
+            waiter = asyncio.create_task(limiter.slot("busy").__aenter__())
+            await asyncio.sleep(0)
+            assert not waiter.done()
+            assert limiter.stats()["busy"]["waiting"] == 1
+
+            async with limiter.slot("other"), limiter.slot(None):
+                pass
+
+        await asyncio.wait_for(waiter, 1)
+        assert limiter.stats()["busy"]["requests"] == 2
+        assert "other" not in limiter.stats()
+
+
+class TestTenantRequests:
+    """Test cases for tenant-aware PrometheusClient requests."""
+
+    @pytest.mark.asyncio
+    async def test_header_and_cache_per_tenant(self):
+        """Test tenants share the client but not cached results."""
+        tenants = []
+
+        def handler(request):
+            tenants.append(request.headers.get(TENANT_HEADER))
+            body = {
+                "status": "success",
+                "data": {"resultType": "matrix", "result": []},
+            }
+            return httpx.Response(200, content=json.dumps(body).encode())
+
+        client = PrometheusClient(tenant="default")
+        client.http_client = httpx.AsyncClient(
+            base_url="http://prometheus", transport=httpx.MockTransport(handler)
+        )
+
+        await client.query_range("up", "1h", "1m")
+        with request_tenant("team-a"):
+            await client.query_range("up", "1h", "1m")
+            await client.query_range("up", "1h", "1m")
+        await client.query_range("up", "1h", "1m")
+
+        assert tenants == ["default", "team-a"]
+        await client.close()
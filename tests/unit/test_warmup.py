@@ -0,0 +1,121 @@
+"""
+Tests for warmup module.
+
+Covers capability detection from status endpoints and the warmup run.
+"""
+
+import httpx
+import pytest
+
+from mcp_prometheus_server.prometheus_client import MAX_METRIC_NAMES, PrometheusClient
+from mcp_prometheus_server.warmup import detect_capabilities, warm_up
+
+
+class TestDetectCapabilities:
+    """Test cases for detect_capabilities."""
+
+    def test_prometheus(self):
+        """Test a recent Prometheus with native histograms enabled."""
+        capabilities = detect_capabilities(
+            {"version": "2.53.1", "revision": "abc"},
+            {"enable-feature": "exemplar-storage, native-histograms"},
+        )
+
+        assert capabilities.flavor == "prometheus"
+        assert capabilities.supports_limit
+        assert capabilities.native_histograms
+        assert capabilities.remote_read
+
+    def test_old_prometheus(self):
+        """Test that older versions do not get the limit parameter."""
+        capabilities = detect_capabilities({"version": "2.45.0"}, {})
+
+        assert not capabilities.supports_limit
+        assert not capabilities.native_histograms
+
+    def test_thanos(self):
+        """Test that Thanos is recognized by its flags."""
+        capabilities = detect_capabilities(
+            {"version": "0.35.0"}, {"query.replica-label": "replica"}
+        )
+
+        assert capabilities.flavor == "thanos"
+        assert not capabilities.remote_read
+        assert not capabilities.supports_limit
+
+    def test_mimir(self):
+        """Test that Mimir is recognized by its build info."""
+        capabilities = detect_capabilities(
+            {"application": "Grafana Mimir", "version": "2.12.0"}, None
+        )
+
+        assert capabilities.flavor == "mimir"
+        assert capabilities.remote_read
+
+    def test_nothing_known(self):
+        """Test that failed status requests enable nothing."""
+        capabilities = detect_capabilities(None, None)
+
+        assert capabilities.flavor == "unknown"
+        assert capabilities.describe() == "unknown (no extras)"
+
+
+class TestWarmUp:
+    """Test cases for warm_up."""
+
+    @pytest.mark.asyncio
+    async def test_detects_and_primes_metadata(self):
+        """Test that status endpoints, metadata and metric names are fetched."""
+        requested = []
+
+        def handler(request):
+            requested.append(request.url.path)
+            if request.url.path == "/api/v1/status/buildinfo":
+                data = {"version": "3.1.0"}
+            elif request.url.path == "/api/v1/status/flags":
+                return httpx.Response(404)
+            elif request.url.path == "/api/v1/label/__name__/values":
+                assert request.url.params["limit"] == str(MAX_METRIC_NAMES + 1)
+                data = ["up"]
+            else:
+                data = {"up": [{"type": "gauge", "help": "Up", "unit": ""}]}
+            return httpx.Response(200, json={"status": "success", "data": data})
+
+        client = PrometheusClient()
+        client.http_client = httpx.AsyncClient(
+            base_url="http://prometheus", transport=httpx.MockTransport(handler)
+        )
+
+        capabilities = await warm_up(client)
+
+        assert sorted(requested[:3]) == [
+            "/api/v1/metadata",
+            "/api/v1/status/buildinfo",
+            "/api/v1/status/flags",
+        ]
+        # Names are loaded once the limit parameter is known to be supported
+        assert requested[3:] == ["/api/v1/label/__name__/values"]
+        assert client.capabilities is capabilities
+        assert capabilities.flavor == "prometheus"
+        assert capabilities.supports_limit
+        assert client.metadata_cache.get("up")["type"] == "gauge"
+        assert await client.list_available_metrics() == ["up"]
+        assert "prometheus 3.1.0" in client.get_stats()["capabilities"]
+        await client.close()
+
+    @pytest.mark.asyncio
+    async def test_unreachable_backend(self):
+        """Test that warmup never raises when Prometheus is down."""
+
+        def handler(request):
+            raise httpx.ConnectError("connection refused")
+
+        client = PrometheusClient()
+        client.http_client = httpx.AsyncClient(
+            base_url="http://prometheus", transport=httpx.MockTransport(handler)
+        )
+
+        capabilities = await warm_up(client)
+
+        assert capabilities.flavor == "unknown"
+        await client.close()